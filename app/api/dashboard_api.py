@@ -2,6 +2,7 @@
 API routes for dashboard functionality.
 """
 
+import asyncio
 import logging
 import os
 import time
@@ -85,6 +86,30 @@ async def get_dashboard_summary():
         logger.error(f"Error getting dashboard summary: {str(e)}", exc_info=True)
         return jsonify({"error": "Failed to retrieve dashboard data"}), 500
 
+@dashboard_bp.route('/stats/ai')
+@require_auth(endpoint_name='ai_stats')
+async def get_ai_stats():
+    """Get AI usage statistics, including latency percentiles and token totals per model per day"""
+    guild_id = request.args.get('guild_id')
+    try:
+        days = int(request.args.get('days', 7))
+    except ValueError:
+        return jsonify({"error": "days must be a number"}), 400
+    
+    try:
+        if not data_service:
+            logger.warning("Data service not available for AI stats")
+            return jsonify({"ai_models": [], "ai_daily": [], "ai_users": [], "ai_latency": []})
+        
+        filter_criteria = {'guild_id': guild_id} if guild_id else None
+        stats = await data_service.get_ai_stats(filter_criteria, days)
+        if 'error' in stats:
+            return jsonify({"error": "Failed to retrieve AI statistics"}), 500
+        return jsonify(stats)
+    except Exception as e:
+        logger.error(f"Error getting AI stats: {str(e)}", exc_info=True)
+        return jsonify({"error": "Failed to retrieve AI statistics"}), 500
+
 @dashboard_bp.route('/bot/status')
 @require_auth(endpoint_name='bot_status')  # Enhanced with endpoint name for better logging
 async def get_bot_status():
@@ -148,6 +173,36 @@ async def get_bot_guilds():
         logger.error(f"Error getting bot guilds: {str(e)}", exc_info=True)
         return jsonify({"error": "Failed to retrieve guild list"}), 500
 
+@dashboard_bp.route('/ai/ask-all', methods=['POST'])
+@require_auth(require_user=True, endpoint_name='ai_ask_all')
+async def ask_all_models():
+    """Ask every configured AI model the same question concurrently (the API form of /ask all)"""
+    try:
+        data = await request.get_json(silent=True) or {}
+        prompt = str(data.get('prompt', '')).strip()
+        if not prompt:
+            return jsonify({"error": "A prompt is required"}), 400
+        
+        if not bot_instance_ref or not hasattr(bot_instance_ref, 'client'):
+            return jsonify({"error": "Bot reference not available"}), 404
+        
+        client = bot_instance_ref.client
+        ai_cog = client.get_cog('AICogCommands')
+        if not ai_cog:
+            return jsonify({"error": "AI commands not available"}), 503
+        
+        # The AI clients belong to the bot's event loop; the API server runs its own
+        future = asyncio.run_coroutine_threadsafe(ai_cog.ask_all(prompt), client.loop)
+        answers = await asyncio.wrap_future(future)
+        
+        return jsonify({
+            "prompt": prompt,
+            "answers": answers
+        })
+    except Exception as e:
+        logger.error(f"Error asking all AI models: {str(e)}", exc_info=True)
+        return jsonify({"error": "Failed to get AI answers"}), 500
+
 def get_bot_uptime():
     """Get the bot's uptime as a string"""
     if not bot_instance_ref or not hasattr(bot_instance_ref, 'client'):
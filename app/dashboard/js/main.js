@@ -344,6 +344,9 @@ async function loadAIStats(guildId, days) {
         
         // Update recent AI interactions
         updateRecentAIInteractions(data);
+        
+        // Update latency and token usage per model per day
+        updateAILatencyTable(data);
     } catch (error) {
         console.error('Failed to load AI statistics:', error);
     }
@@ -423,6 +426,39 @@ function updateRecentAIInteractions(data) {
     });
 }
 
+/**
+ * Update the AI latency table
+ */
+function updateAILatencyTable(data) {
+    const tableBody = document.querySelector('#ai-latency-table tbody');
+    tableBody.innerHTML = '';
+    
+    if (!data || !data.ai_latency || data.ai_latency.length === 0) {
+        tableBody.innerHTML = '<tr><td colspan="8" class="text-center">No AI latency data to display</td></tr>';
+        return;
+    }
+    
+    const seconds = value => (value === null || value === undefined) ? '-' : `${value.toFixed(2)}s`;
+    
+    // Newest day first
+    data.ai_latency.slice().reverse().forEach(entry => {
+        const row = document.createElement('tr');
+        
+        row.innerHTML = `
+            <td>${escapeHtml(entry.date || '')}</td>
+            <td>${escapeHtml(entry.model || 'Unknown Model')}</td>
+            <td>${formatNumber(entry.count || 0)}</td>
+            <td>${seconds(entry.latency_p50)} / ${seconds(entry.latency_p95)}</td>
+            <td>${seconds(entry.ttft_p50)} / ${seconds(entry.ttft_p95)}</td>
+            <td>${formatNumber(entry.prompt_tokens || 0)}</td>
+            <td>${formatNumber(entry.cached_tokens || 0)}</td>
+            <td>${formatNumber(entry.completion_tokens || 0)}</td>
+        `;
+        
+        tableBody.appendChild(row);
+    });
+}
+
 /**
  * Setup refresh timer
  */
@@ -18,15 +18,23 @@ from config.config import (
     ENCRYPTION_KEY, ENABLE_MESSAGE_LOGGING, ENABLE_AI_LOGGING,
     DASHBOARD_HOST, DASHBOARD_PORT,
     API_HOST, API_PORT,  # Added API_HOST and API_PORT for correct API server config
-    LOG_LEVEL, ENABLE_DEBUG_LOGGING, LOG_FILE_PATH
+    LOG_LEVEL, ENABLE_DEBUG_LOGGING, LOG_FILE_PATH,
+    ENABLE_HISTORY_BACKFILL, BACKFILL_MAX_CONCURRENCY, BACKFILL_REQUESTS_PER_SECOND,
+    BACKFILL_LOOKBACK_DAYS, BACKFILL_CHECKPOINTS_FILE,
+    USER_STATE_TIMEOUT, USER_STATE_COMPRESS_AFTER, USER_STATE_MAX_MEMORY_BYTES,
+    USER_STATE_PERSIST, USER_STATE_DB_PATH, USER_STATE_SNAPSHOT_INTERVAL
 )
 from utils.logger import setup_logger
-from utils.ai_services import get_openai_client, get_google_genai_client, get_claude_client, get_grok_client
+from utils.provider_clients import ProviderClients
+from utils.token_counter import load_encoding
 from app.discord.state import BotState
 from app.discord.task_scheduler import TaskScheduler
 from app.discord.role_color_manager import RoleColorManager
 from app.discord.task_manager import TaskManager
 from app.discord.message_monitor import MessageMonitor
+from app.discord.history_backfill import HistoryBackfill
+from app.discord.event_bus import MessageEventBus, MessageFilter
+from app.discord.regex_guard import get_regex_guard
 from utils.ai_logger import AIInteractionLogger
 from app.discord.cogs import PremiumRolesCog, UserStateCog, ImageGeneration, RoleColorCog, MessageListenersCog  # Dashboard removed
 from app.discord.cogs.gen_ai_cog import AICogCommands
@@ -57,8 +65,20 @@ class DiscordBot:
         # Use Bot instead of AutoShardedClient for cogs support
         self.client = commands.Bot(command_prefix="!", intents=self.intents, tree_cls=app_commands.CommandTree)
         self.tree = self.client.tree
-        self.bot_state = BotState(timeout=3600)
+        
+        # Single on_message dispatch point shared by the monitor, listeners and commands
+        self.event_bus = MessageEventBus(self.logger)
+        self.client.event_bus = self.event_bus
+        self.bot_state = BotState(
+            timeout=USER_STATE_TIMEOUT,
+            compress_after=USER_STATE_COMPRESS_AFTER,
+            max_memory_bytes=USER_STATE_MAX_MEMORY_BYTES,
+            db_path=USER_STATE_DB_PATH if USER_STATE_PERSIST else None,
+            snapshot_interval=USER_STATE_SNAPSHOT_INTERVAL
+        )
         self.response_channels = {}  # Cache response channels by guild ID
+        self.history_backfill = None  # Created in setup hook once the client is available
+        self.encoding_task = None  # Loads the tokenizer in the background on the first on_ready
         
         # Initialize message and AI logging services
         self._init_logging_services()
@@ -160,25 +180,38 @@ class DiscordBot:
     def _init_ai_clients(self):
         """Initialize AI service clients"""
         self.logger.debug("Initializing AI clients...")
-        self.openai_client = get_openai_client(OPENAI_API_KEY)
-        self.logger.debug("OpenAI client initialized.")
-        self.google_client = get_google_genai_client(GOOGLE_GENAI_API_KEY)
-        self.logger.debug("Google GenAI client initialized.")
-        self.claude_client = get_claude_client(CLAUDE_API_KEY)
-        self.logger.debug("Claude client initialized.")
-        self.grok_client = get_grok_client(GROK_API_KEY)
-        self.logger.debug("Grok client initialized.")
+        # One client per provider, on a shared kept-alive connection pool
+        self.provider_clients = ProviderClients()
+        self.provider_clients.create(OPENAI_API_KEY, GOOGLE_GENAI_API_KEY, CLAUDE_API_KEY, GROK_API_KEY)
+        self.openai_client = self.provider_clients.get('openai')
+        self.google_client = self.provider_clients.get('google')
+        self.claude_client = self.provider_clients.get('claude')
+        self.grok_client = self.provider_clients.get('grok')
         self.logger.debug("AI clients initialization complete.")
     
     async def _setup_hook(self):
         """Async setup hook for initializing cogs"""
         self.logger.debug("Running setup hook...")
         
+        self.event_bus.set_bot_user_id(self.client.user.id if self.client.user else None)
+        self._register_message_handlers()
+        
         # Set client reference in the message monitor if available
         if hasattr(self, 'message_monitor') and self.message_monitor:
             self.message_monitor.set_client(self.client)
             self.logger.debug("Client reference set in MessageMonitor.")
             
+            if ENABLE_HISTORY_BACKFILL:
+                self.history_backfill = HistoryBackfill(
+                    self.client,
+                    self.message_monitor,
+                    checkpoint_file=BACKFILL_CHECKPOINTS_FILE,
+                    max_concurrency=BACKFILL_MAX_CONCURRENCY,
+                    requests_per_second=BACKFILL_REQUESTS_PER_SECOND,
+                    lookback_days=BACKFILL_LOOKBACK_DAYS
+                )
+                self.logger.debug("History backfill initialized.")
+            
         # AI Commands Cog
         self.logger.debug("Initializing AICogCommands...")
         ai_cog = AICogCommands(
@@ -242,7 +275,8 @@ class DiscordBot:
         self.logger.debug("Initializing MessageListenersCog...")
         message_listeners_cog = MessageListenersCog(
             self.client,
-            self.logger
+            self.logger,
+            db=self.message_monitor.db if self.message_monitor else None
         )
         await self.client.add_cog(message_listeners_cog)
         self.logger.debug("MessageListenersCog added.")
@@ -303,11 +337,36 @@ class DiscordBot:
         self.scheduler.start_task(task_id)
         self.logger.debug(f"Daily color cycle task scheduled with ID: {task_id}")
     
+    def _register_message_handlers(self):
+        """Subscribe the bot's own message handlers to the event bus"""
+        async def store_message(context):
+            # Process message through the message monitor if enabled
+            if self.message_monitor:
+                await self.message_monitor.process_message(context.message)
+                if self.history_backfill:
+                    self.history_backfill.note_live_message(context.message)
+        
+        async def run_monitor_listeners(context):
+            # Listeners with callbacks registered on the monitor; they apply their own bot filters
+            await self.message_monitor.process_listeners(context.message)
+        
+        async def process_commands(context):
+            # Process commands - this is required for the bot to respond to commands
+            await self.client.process_commands(context.message)
+        
+        # Storage sees every message (including bots); it runs alongside the other handlers
+        self.event_bus.subscribe('message_monitor', store_message, MessageFilter(include_bots=True), priority=100)
+        if self.message_monitor:
+            self.event_bus.subscribe('monitor_listeners', run_monitor_listeners, MessageFilter(include_bots=True), priority=50)
+        self.event_bus.subscribe('commands', process_commands, MessageFilter(prefixes=(self.client.command_prefix,)), priority=0)
+        self.logger.debug("Message handlers registered with the event bus.")
+    
     def run(self):
         """Run the Discord bot"""
         @self.client.event
         async def on_ready():
             self.logger.info(f"Logged in as {self.client.user}")
+            self.event_bus.set_bot_user_id(self.client.user.id)
             self.logger.debug("on_ready event triggered.")
             
             # Cache response channels
@@ -325,11 +384,26 @@ class DiscordBot:
                 await self.ai_logger.db.initialize()
                 self.logger.debug("AI logger database initialized.")
             
+            # Catch up on messages missed while offline, in the background (only on the first on_ready)
+            if self.history_backfill:
+                self.history_backfill.start()
+                self.logger.debug("History backfill started.")
+            
             # Register scheduled tasks
             self.logger.debug("Registering scheduled tasks...")
             self.task_manager.register_tasks(self.tree)
             self.logger.debug("Scheduled tasks registered.")
             
+            # Restore conversations from the last snapshot and keep snapshotting them
+            self.bot_state.start()
+            
+            # Open provider connections now, and keep them open, so first requests skip connection setup
+            self.provider_clients.start()
+            
+            # Load the tokenizer in a worker thread; token counts are estimated until it is ready
+            if self.encoding_task is None:
+                self.encoding_task = asyncio.create_task(load_encoding())
+            
             # Sync commands with Discord
             self.logger.debug("Syncing application commands...")
             # Add retry mechanism for command sync
@@ -417,14 +491,8 @@ class DiscordBot:
         async def on_message(message):
             self.logger.debug(f"Received message from {message.author}: {message.content[:50]}...")
             try:
-                # Process message through the message monitor if enabled
-                if self.message_monitor:
-                    self.logger.debug(f"Processing message {message.id} with MessageMonitor.")
-                    await self.message_monitor.process_message(message)
-                
-                # Process commands - this is required for the bot to respond to commands
-                self.logger.debug(f"Processing commands for message {message.id}.")
-                await self.client.process_commands(message)
+                # Normalize once and run only the handlers whose filters can match
+                await self.event_bus.dispatch(message)
             except Exception as e:
                 self.logger.error(f"Error processing message event for message {message.id}: {str(e)}")
         
@@ -437,6 +505,12 @@ class DiscordBot:
                     await self.message_monitor.process_message_edit(before, after)
                 except Exception as e:
                     self.logger.error(f"Error processing message edit event for message {after.id}: {str(e)}")
+            
+            @self.client.event
+            async def on_guild_join(guild):
+                self.logger.info(f"Joined guild {guild.name} ({guild.id})")
+                if self.history_backfill:
+                    asyncio.create_task(self.history_backfill.backfill_guild(guild))
         
         # Add a handler for cleanup when the bot is about to close
         @self.client.event
@@ -562,6 +636,28 @@ class DiscordBot:
         try:
             # Dashboard cleanup removed
             
+            # Persist backfill checkpoints before the database goes away
+            if self.history_backfill:
+                await self.history_backfill.close()
+            
+            # Stop regex listener worker processes
+            get_regex_guard().close()
+            
+            # Finish queued listener sends and write pending counters and listener edits before shutting down
+            message_listeners_cog = self.client.get_cog('MessageListenersCog')
+            if message_listeners_cog:
+                await message_listeners_cog.action_executor.close()
+                await message_listeners_cog.counters.close()
+                await message_listeners_cog.listener_store.flush()
+            
+            # Stop background AI work and finish writes to the persistent AI response cache
+            ai_cog = self.client.get_cog('AICogCommands')
+            if ai_cog:
+                await ai_cog.close()
+            
+            # Write the final conversation snapshot
+            await self.bot_state.close()
+            
             # Close database connections asynchronously
             tasks = []
             if hasattr(self, 'message_monitor') and self.message_monitor:
@@ -593,9 +689,9 @@ class DiscordBot:
             else:
                 self.logger.debug("No database connections needed closing.")
 
-            # Clean up AI clients (synchronous)
+            # Close AI clients' HTTP connection pools
             self.logger.debug("Cleaning up AI clients...")
-            # ... (rest of the synchronous cleanup code remains the same)
+            await self.provider_clients.close()
             self.logger.debug("AI clients cleaned up.")
             
             # Clean up task scheduler (synchronous)
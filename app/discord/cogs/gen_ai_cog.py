@@ -1,23 +1,43 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
+import asyncio
 import time
 # Add imports for Optional and Dict
-from typing import Optional, Dict 
+from typing import Optional, Dict, List
 import logging # Import logging
 from utils.ai_services import (
     OpenAIStrategy, GoogleGenAIStrategy, ClaudeStrategy, 
-    GrokStrategy, SummarizationStrategy
+    GrokStrategy, SummarizationStrategy, is_error_response, hedged_response,
+    InlineSummaryFilter, with_inline_summary, split_inline_summary, with_length_limit,
+    fan_out_responses, ResponseMetrics
 )
+from utils.response_cache import ResponseCache
+from utils.single_flight import SingleFlight
+from utils.extractive_summary import extractive_summary
 from config.ai_config import (
     GPT_SYSTEM_PROMPT, GOOGLE_SYSTEM_PROMPT, CLAUDE_SYSTEM_PROMPT, GROK_SYSTEM_PROMPT,
-    SUMMARIZATION_PROVIDER
+    SUMMARIZATION_PROVIDER, SUMMARIZATION_FALLBACK, SUMMARY_MODE, AI_INLINE_SUMMARY, RESPONSE_LENGTHS,
+    AI_STREAMING_ENABLED, STREAM_EDIT_INTERVAL, AI_CONTEXT_TRIM_STEP,
+    OpenAIConfig, GoogleConfig, ClaudeConfig, GrokConfig,
+    AI_CACHE_MAX_ENTRIES, AI_CACHE_MAX_BYTES, AI_CACHE_TTL, AI_CACHE_PERSIST, AI_CACHE_DB_PATH,
+    CONTEXT_COMPACTION_ENABLED, CONTEXT_COMPACTION_TRIGGER_TOKENS, CONTEXT_COMPACTION_KEEP_RECENT
 )
 from config.base import DEFAULT_SUMMARY_LIMIT
-from utils.utilities import route_response
+from utils.utilities import route_response, route_streamed_response, response_destination
+from app.discord.streaming_reply import StreamingReply, StreamingEmbeds
+from app.discord.context_compactor import ContextCompactor
 from app.discord.state import BotState # Import BotState
 from app.discord.message_monitor import MessageMonitor # Import MessageMonitor
 
+# Model name and system prompt of each provider's /ask command
+ASK_MODELS = {
+    'openai': ("GPT-4o-mini", GPT_SYSTEM_PROMPT),
+    'google': ("Google GenAI", GOOGLE_SYSTEM_PROMPT),
+    'claude': ("Claude", CLAUDE_SYSTEM_PROMPT),
+    'grok': ("Grok", GROK_SYSTEM_PROMPT)
+}
+
 class AICogCommands(commands.Cog):
     """Cog for AI-related commands"""
     
@@ -37,10 +57,30 @@ class AICogCommands(commands.Cog):
         # Summarization client - defaults to Google for backward compatibility
         self.summarization_client = None
         self.summarization_provider = SUMMARIZATION_PROVIDER
+        # Summarization strategies in order of preference: the configured provider, then fallbacks
+        self.summarization_strategies = []
+        # Strategy of each provider, built once the clients are set up
+        self.strategies = {}
         
-        # Response cache to avoid regenerating identical responses
-        self.response_cache = {}
-        self.cache_max_size = 50
+        # Response cache to avoid regenerating identical responses (and summaries)
+        self.response_cache = ResponseCache(
+            max_entries=AI_CACHE_MAX_ENTRIES,
+            max_bytes=AI_CACHE_MAX_BYTES,
+            ttl=AI_CACHE_TTL,
+            db_path=AI_CACHE_DB_PATH if AI_CACHE_PERSIST else None
+        )
+        # Identical requests made while one is in flight share its provider call
+        self.in_flight = SingleFlight()
+        # Cache key of each user's in-flight prompt, to recognize double submissions
+        self.pending_prompts = {}
+        # Older turns of long conversations are folded into a rolling summary after replies
+        self.compactor = ContextCompactor(
+            self._summarize_context,
+            trigger_tokens=CONTEXT_COMPACTION_TRIGGER_TOKENS,
+            keep_recent=CONTEXT_COMPACTION_KEEP_RECENT
+        )
+        # Background work started by requests (summary refinements)
+        self.background_tasks = set()
         
         # Create the ask command group for app_commands
         self.ask_group = app_commands.Group(name="ask", description="Ask various AI models")
@@ -52,6 +92,14 @@ class AICogCommands(commands.Cog):
         self.claude_client = claude_client
         self.grok_client = grok_client
         
+        # Strategies are stateless per request, so every command shares one per provider
+        self.strategies = {
+            'openai': OpenAIStrategy(openai_client, self.logger),
+            'google': GoogleGenAIStrategy(google_client, self.logger),
+            'claude': ClaudeStrategy(claude_client, self.logger),
+            'grok': GrokStrategy(grok_client, self.logger)
+        }
+        
         # Determine which client to use for summarization based on the provider
         if self.summarization_provider == 'google':
             self.summarization_client = google_client
@@ -67,6 +115,23 @@ class AICogCommands(commands.Cog):
             self.summarization_client = google_client
             self.summarization_provider = 'google'
         
+        self.summarization_strategies = [
+            SummarizationStrategy(self.summarization_client, self.logger, provider=self.summarization_provider)
+        ]
+        if SUMMARIZATION_FALLBACK:
+            # Other providers summarize with their own main model
+            fallbacks = [
+                ('google', google_client, GoogleConfig.MODEL),
+                ('openai', openai_client, OpenAIConfig.MODEL),
+                ('claude', claude_client, ClaudeConfig.MODEL),
+                ('grok', grok_client, GrokConfig.MODEL)
+            ]
+            for provider, client, model in fallbacks:
+                if client and provider != self.summarization_provider:
+                    self.summarization_strategies.append(
+                        SummarizationStrategy(client, self.logger, provider=provider, model=model)
+                    )
+        
         # Register the commands in the group
         self._register_ask_commands()
         
@@ -82,7 +147,7 @@ class AICogCommands(commands.Cog):
             await self._handle_ai_request(
                 interaction, 
                 question, 
-                OpenAIStrategy(self.openai_client, self.logger),
+                self.strategies['openai'],
                 "GPT-4o-mini", 
                 GPT_SYSTEM_PROMPT
             )
@@ -93,7 +158,7 @@ class AICogCommands(commands.Cog):
             await self._handle_ai_request(
                 interaction, 
                 question, 
-                GoogleGenAIStrategy(self.google_client, self.logger),
+                self.strategies['google'],
                 "Google GenAI", 
                 GOOGLE_SYSTEM_PROMPT
             )
@@ -104,7 +169,7 @@ class AICogCommands(commands.Cog):
             await self._handle_ai_request(
                 interaction, 
                 question, 
-                ClaudeStrategy(self.claude_client, self.logger),
+                self.strategies['claude'],
                 "Claude", 
                 CLAUDE_SYSTEM_PROMPT
             )
@@ -115,10 +180,15 @@ class AICogCommands(commands.Cog):
             await self._handle_ai_request(
                 interaction, 
                 question, 
-                GrokStrategy(self.grok_client, self.logger),
+                self.strategies['grok'],
                 "Grok", 
                 GROK_SYSTEM_PROMPT
             )
+        
+        # Every model at once
+        @self.ask_group.command(name="all", description="Ask every AI model at once and compare their answers")
+        async def ask_all(interaction: discord.Interaction, question: str):
+            await self._handle_fan_out_request(interaction, question)
     
     # Only hybrid command - !ask - which uses Google's model
     @commands.command(name="ask", description="Ask Google GenAI a question")
@@ -128,7 +198,7 @@ class AICogCommands(commands.Cog):
         await self._handle_ai_request(
             fake_interaction,
             question,
-            GoogleGenAIStrategy(self.google_client, self.logger),
+            self.strategies['google'],
             "Google GenAI", 
             GOOGLE_SYSTEM_PROMPT
         )
@@ -193,37 +263,79 @@ class AICogCommands(commands.Cog):
         
         # Get user state and update context
         uid = str(interaction.user.id)
-        user_state = self.bot_state.get_user_state(uid)
-        user_state.add_prompt("user", prompt)
-        context = user_state.get_context()
+        user_state = await self.bot_state.load_user_state(uid)
+        pending_key = (uid, model_name, prompt)
+        # A resubmission of a prompt that is still being answered joins the first request
+        duplicate_key = self.pending_prompts.get(pending_key)
+        if duplicate_key is None:
+            user_state.add_prompt("user", prompt)
+        # Size the answer for where it will be shown
+        max_tokens, max_chars = RESPONSE_LENGTHS.get(response_destination(interaction, self.response_channels), (0, 0))
+        strategy = strategy.with_max_tokens(max_tokens)
+        if max_chars:
+            system_prompt = with_length_limit(system_prompt, max_chars)
+        if AI_INLINE_SUMMARY:
+            # Ask for the summary of a long answer in the same completion
+            system_prompt = with_inline_summary(system_prompt, DEFAULT_SUMMARY_LIMIT)
+        # Only as much of the conversation as fits the model's token budget is sent
+        context = user_state.get_context(strategy.provider, strategy.context_budget(system_prompt), AI_CONTEXT_TRIM_STEP)
         
         try:
-            # Check if we have a cached response for this exact prompt and context
-            cache_key = f"{model_name}:{prompt}:{len(context)}"
-            if cache_key in self.response_cache:
-                self.logger.debug(f"Using cached response for {cache_key}")
-                result = self.response_cache[cache_key]
+            # Check if we have a cached response for this exact conversation and model settings
+            cache_key = duplicate_key or strategy.cache_key(context, system_prompt)
+            if duplicate_key is None:
+                self.pending_prompts[pending_key] = cache_key
+            reply = None
+            metrics = None
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                self.logger.debug(f"Using cached {model_name} response for {cache_key[:12]}")
+                result = cached
                 execution_time = 0.0  # No execution time for cached responses
             else:
                 # Record start time for performance tracking
                 start_time = time.time()
                 
-                # Generate response using the appropriate strategy
-                result = await strategy.generate_response(context, system_prompt)
+                async def generate():
+                    nonlocal reply, metrics
+                    if self._can_stream(interaction):
+                        # Show the answer as it is written; users wait only for the first tokens
+                        reply = StreamingReply(interaction, f"✉️: {prompt}\n📫: ", edit_interval=STREAM_EDIT_INTERVAL)
+                        # Only the answer part is shown while an inline summary is written
+                        inline = InlineSummaryFilter() if AI_INLINE_SUMMARY else None
+                        metrics = ResponseMetrics()
+                        async for delta in strategy.stream_response(context, system_prompt, metrics):
+                            await reply.feed(inline.feed(delta) if inline else delta)
+                        if inline:
+                            await reply.feed(inline.flush())
+                        result = await reply.finish()
+                        if inline:
+                            result = inline.text
+                        self.logger.debug(f"{model_name} stream finished with {reply.edits} edits across {len(reply.messages)} messages")
+                    else:
+                        # Generate response using the appropriate strategy
+                        result = await strategy.generate_response(context, system_prompt)
+                        metrics = getattr(result, 'metrics', None)
+                    
+                    # Cache the response (error messages are not cached)
+                    if not is_error_response(result):
+                        self.response_cache.set(cache_key, result)
+                    return result
+                
+                result, shared = await self.in_flight.run(cache_key, generate)
+                if shared:
+                    self.logger.debug(f"Shared an in-flight {model_name} response for {cache_key[:12]}")
                 
                 # Calculate execution time
                 execution_time = time.time() - start_time
-                
-                # Cache the response
-                self.response_cache[cache_key] = result
-                # Manage cache size
-                if len(self.response_cache) > self.cache_max_size:
-                    # Remove a random key to prevent staleness patterns
-                    keys = list(self.response_cache.keys())
-                    del self.response_cache[keys[0]]
             
-            # Update user state with the assistant's response
-            user_state.add_prompt("assistant", result)
+            inline_summary = None
+            if AI_INLINE_SUMMARY:
+                result, inline_summary = split_inline_summary(result, DEFAULT_SUMMARY_LIMIT)
+            
+            # Update user state with the assistant's response (once for a double submission)
+            if duplicate_key is None:
+                user_state.add_prompt("assistant", result)
             
             # Log the AI interaction if message_monitor is available
             await self._log_ai_interaction(
@@ -236,29 +348,161 @@ class AICogCommands(commands.Cog):
                     "context_length": len(context),
                     "channel_name": interaction.channel.name if hasattr(interaction.channel, "name") else "DM",
                     "user_name": f"{interaction.user.name}#{interaction.user.discriminator}" if hasattr(interaction.user, "discriminator") else interaction.user.name
-                }
+                },
+                execution_time=execution_time,
+                # A request that shared another's provider call used no tokens of its own
+                metrics=metrics
             )
             
-            # Determine if summarization is needed
+            # Determine if summarization is needed; unless the model already wrote one or
+            # configured otherwise it is done locally, so long answers do not wait for a second model call
             summary = None
             if len(result) > DEFAULT_SUMMARY_LIMIT:
-                summary = await self._summarize_response(result)
+                if inline_summary:
+                    summary = inline_summary
+                elif SUMMARY_MODE == 'llm':
+                    summary = await self._summarize_response(result)
+                else:
+                    summary = extractive_summary(result, DEFAULT_SUMMARY_LIMIT)
             
             # Route the response
-            await route_response(
-                interaction, 
-                prompt, 
-                result, 
-                summary, 
-                self.response_channels, 
-                self.logger
-            )
+            if reply is not None:
+                summary_target = await route_streamed_response(reply, prompt, result, summary, self.response_channels, self.logger)
+            else:
+                summary_target = await route_response(
+                    interaction, 
+                    prompt, 
+                    result, 
+                    summary, 
+                    self.response_channels, 
+                    self.logger
+                )
+            
+            if summary_target is not None and not inline_summary and SUMMARY_MODE == 'refine' and self.summarization_strategies:
+                # Swap the instant summary for a model-written one once it is ready
+                self._start_background(self._refine_summary(summary_target, prompt, result))
+            
+            if CONTEXT_COMPACTION_ENABLED and self.summarization_strategies:
+                self.compactor.maybe_compact(user_state)
         except Exception as e:
             self.logger.error(f"Error in {model_name} response generation: {e}", exc_info=True)
             await interaction.followup.send("An error occurred while processing your request. Please try again later.")
+        finally:
+            if duplicate_key is None:
+                self.pending_prompts.pop(pending_key, None)
     
-    async def _log_ai_interaction(self, interaction: discord.Interaction, model: str, prompt: str, response: str, metadata: Optional[Dict] = None):
-        """Log AI interaction details to the database via MessageMonitor."""
+    def _fan_out_providers(self) -> List[str]:
+        """Providers /ask all queries: those with a configured client."""
+        return [provider for provider in ASK_MODELS if provider in self.strategies and self.strategies[provider].client]
+    
+    async def ask_all(self, prompt: str, on_delta=None, on_answer=None) -> List[Dict]:
+        """
+        Ask every configured model the same single-turn question concurrently.
+        
+        Answers are sized to share one Discord message. Cached answers are returned
+        without a provider call; new ones are cached as they complete.
+        
+        Args:
+            prompt (str): The question
+            on_delta (callable, optional): Coroutine function called with (provider, delta)
+                as answers stream in
+            on_answer (callable, optional): Coroutine function called with each answer
+                as soon as it completes
+                
+        Returns:
+            List[Dict]: provider, model, response, latency (seconds), cached and metrics
+                (token usage and timing) of each answer, in the order they completed
+        """
+        max_tokens, max_chars = RESPONSE_LENGTHS['fan_out']
+        # The conversation of a single-provider /ask is not shared with the other models
+        context = [{"role": "user", "content": prompt}]
+        answers = []
+        
+        async def finished(provider, response, latency, cached):
+            metrics = None if cached else getattr(response, 'metrics', None)
+            answer = {
+                'provider': provider,
+                'model': ASK_MODELS[provider][0],
+                'response': response,
+                'latency': round(latency, 3),
+                'cached': cached,
+                'metrics': metrics.to_dict() if metrics else None
+            }
+            answers.append(answer)
+            if on_answer:
+                await on_answer(answer)
+        
+        requests = {}
+        for provider in self._fan_out_providers():
+            strategy = self.strategies[provider].with_max_tokens(max_tokens)
+            system_prompt = with_length_limit(ASK_MODELS[provider][1], max_chars)
+            cached = await self.response_cache.get(strategy.cache_key(context, system_prompt))
+            if cached is not None:
+                await finished(provider, cached, 0.0, True)
+            else:
+                requests[provider] = (strategy, system_prompt)
+        
+        async for provider, response, latency in fan_out_responses(requests, context, on_delta):
+            strategy, system_prompt = requests[provider]
+            if not is_error_response(response):
+                self.response_cache.set(strategy.cache_key(context, system_prompt), response)
+            self.logger.info(f"Fan-out answer from {provider} took {latency:.2f}s")
+            await finished(provider, response, latency, False)
+        return answers
+    
+    async def _handle_fan_out_request(self, interaction, prompt):
+        """Handle /ask all: every model's answer streams into its own embed."""
+        self.logger.info(f"Handling fan-out request from user {interaction.user}: {prompt}")
+        await interaction.response.defer()
+        
+        providers = self._fan_out_providers()
+        if not providers:
+            await interaction.followup.send("Sorry, no AI provider is configured.")
+            return
+        embeds = StreamingEmbeds(
+            interaction,
+            {provider: ASK_MODELS[provider][0] for provider in providers},
+            f"✉️: {prompt}",
+            edit_interval=STREAM_EDIT_INTERVAL
+        )
+        
+        async def on_answer(answer):
+            footer = "Cached" if answer['cached'] else f"{answer['latency']:.1f}s"
+            await embeds.complete(answer['provider'], answer['response'], footer)
+            await self._log_ai_interaction(
+                interaction,
+                answer['model'],
+                prompt,
+                answer['response'],
+                metadata={
+                    "fan_out": True,
+                    "cached": answer['cached'],
+                    "channel_name": interaction.channel.name if hasattr(interaction.channel, "name") else "DM"
+                },
+                execution_time=0.0 if answer['cached'] else answer['latency'],
+                metrics=None if answer['cached'] else getattr(answer['response'], 'metrics', None)
+            )
+        
+        try:
+            await self.ask_all(
+                prompt,
+                on_delta=embeds.feed if self._can_stream(interaction) else None,
+                on_answer=on_answer
+            )
+        except Exception as e:
+            self.logger.error(f"Error in fan-out response generation: {e}", exc_info=True)
+            await interaction.followup.send("An error occurred while processing your request. Please try again later.")
+        finally:
+            await embeds.finish()
+    
+    def _can_stream(self, interaction) -> bool:
+        """Whether a response can be streamed into the interaction's follow-up messages."""
+        # Text commands use a stand-in interaction without webhook follow-ups
+        return AI_STREAMING_ENABLED and isinstance(interaction, discord.Interaction)
+    
+    async def _log_ai_interaction(self, interaction: discord.Interaction, model: str, prompt: str, response: str, metadata: Optional[Dict] = None,
+                                  execution_time: Optional[float] = None, metrics: Optional[ResponseMetrics] = None):
+        """Log AI interaction details, with its latency and token usage, to the database via MessageMonitor."""
         # Use message_monitor if available
         if self.message_monitor:
             try:
@@ -270,9 +514,18 @@ class AICogCommands(commands.Cog):
                     'model': model,
                     'prompt': prompt,
                     'response': response,
-                    'metadata': metadata or {}
+                    'metadata': metadata or {},
+                    'execution_time': execution_time
                     # timestamp and interaction_id are added by store_ai_interaction
                 }
+                if metrics is not None:
+                    interaction_data.update({
+                        'tokens_used': metrics.total_tokens,
+                        'prompt_tokens': metrics.prompt_tokens,
+                        'completion_tokens': metrics.completion_tokens,
+                        'cached_tokens': metrics.cached_tokens,
+                        'time_to_first_token': metrics.time_to_first_token
+                    })
                 # Use store_ai_interaction which exists in MessageMonitor
                 await self.message_monitor.store_ai_interaction(interaction_data)
                 self.logger.debug(f"AI interaction logged for user {interaction.user.name} using {model}")
@@ -283,25 +536,93 @@ class AICogCommands(commands.Cog):
     
     async def _summarize_response(self, response: str) -> str:
         """Summarize a response using the configured summarization service"""
+        summary = await self._model_summary(response)
+        if summary is None:
+            # Return a basic summary if the smart summarization fails
+            return response[:DEFAULT_SUMMARY_LIMIT] + "... (truncated)"
+        return summary
+    
+    async def _model_summary(self, response: str) -> Optional[str]:
+        """Summarize a response with the summarization providers (None if every provider failed)"""
         self.logger.debug(f"Summarizing response using {self.summarization_provider} provider")
         summary_prompt = f"Summarize the following text to less than {DEFAULT_SUMMARY_LIMIT} characters:\n\n{response}"
         
         try:
-            # Use the generic SummarizationStrategy with the configured provider
-            summarization_strategy = SummarizationStrategy(
-                self.summarization_client, 
-                self.logger,
-                provider=self.summarization_provider
-            )
+            # The configured provider's strategy determines the cache key
+            summarization_strategy = self.summarization_strategies[0]
             
             # Select an appropriate system prompt based on the summarization task
             summarization_system_prompt = "You are a text summarization assistant. Your task is to create concise, accurate summaries of longer content."
+            summary_context = [{"role": "user", "content": summary_prompt}]
             
-            return await summarization_strategy.generate_response(
-                [{"role": "user", "content": summary_prompt}], 
-                summarization_system_prompt
-            )
+            cache_key = summarization_strategy.cache_key(summary_context, summarization_system_prompt)
+            summary = await self.response_cache.get(cache_key)
+            if summary is not None:
+                self.logger.debug("Using cached summary")
+                return summary
+            
+            async def summarize():
+                # Falls back to, or hedges with, the other providers when the configured one fails or is slow
+                summary = await hedged_response(self.summarization_strategies, summary_context, summarization_system_prompt)
+                if not is_error_response(summary):
+                    self.response_cache.set(cache_key, summary)
+                return summary
+            
+            summary, _ = await self.in_flight.run(cache_key, summarize)
+            if is_error_response(summary):
+                self.logger.warning(f"Summarization failed with every provider: {summary}")
+                return None
+            return summary
         except Exception as e:
             self.logger.error(f"Error during summarization with {self.summarization_provider}: {e}", exc_info=True)
-            # Return a basic summary if the smart summarization fails
-            return response[:DEFAULT_SUMMARY_LIMIT] + "... (truncated)"
\ No newline at end of file
+            return None
+    
+    async def _refine_summary(self, target, prompt: str, response: str):
+        """
+        Replace the local summary a user was shown with a model-written one.
+        
+        Args:
+            target: The StreamingReply or message showing the summary
+            prompt (str): The user's prompt
+            response (str): The full response
+        """
+        summary = await self._model_summary(response)
+        if summary is None:
+            return
+        try:
+            if isinstance(target, StreamingReply):
+                await target.replace(summary)
+            else:
+                await target.edit(content=f"✉️: {prompt}\n📫: {summary}")
+            self.logger.debug("Replaced local summary with a model summary")
+        except discord.HTTPException as e:
+            self.logger.warning(f"Could not update summary message: {e}")
+    
+    def _start_background(self, coroutine):
+        """Run a coroutine in the background, keeping a reference until it finishes."""
+        task = asyncio.create_task(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+    
+    async def close(self):
+        """Stop background work and finish writes to the persistent response cache."""
+        for task in list(self.background_tasks):
+            task.cancel()
+        if self.background_tasks:
+            await asyncio.gather(*self.background_tasks, return_exceptions=True)
+        await self.compactor.close()
+        await self.response_cache.close()
+    
+    async def _summarize_context(self, compaction_prompt: str) -> Optional[str]:
+        """Write the rolling summary of a compacted conversation (None if summarization failed)"""
+        summarization_system_prompt = "You are a conversation summarization assistant. Your task is to keep a short, faithful record of a conversation."
+        summary = await hedged_response(
+            self.summarization_strategies,
+            [{"role": "user", "content": compaction_prompt}],
+            summarization_system_prompt
+        )
+        if is_error_response(summary):
+            self.logger.warning(f"Context compaction failed with every provider: {summary}")
+            return None
+        return summary
\ No newline at end of file
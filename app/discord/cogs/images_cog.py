@@ -6,6 +6,9 @@ import os
 import uuid
 import aiohttp
 import io
+from utils.ai_services import call_provider
+from utils.provider_gateway import ProviderBusy, get_gateway
+from config.ai_config import OpenAIConfig
 
 class ImageGeneration(commands.Cog):
     """Cog for image generation using DALL-E"""
@@ -28,16 +31,22 @@ class ImageGeneration(commands.Cog):
         try:
             # Generate the image using OpenAI's DALL-E 3
             self.logger.info("Generating image using DALL-E 3...")
-            response = self.openai_client.images.generate(
-                prompt=prompt,
-                n=1,  # Generate one image
-                size="1024x1024"  # Specify the image size
-            )
+            async with get_gateway('openai_images').admit():
+                response = await call_provider(
+                    self.openai_client.images.generate,
+                    OpenAIConfig.IMAGE_TIMEOUT,
+                    prompt=prompt,
+                    n=1,  # Generate one image
+                    size="1024x1024"  # Specify the image size
+                )
             image_url = response.data[0].url
             self.logger.info(f"Image generated successfully")
             
             # Send the image URL to the user
             await interaction.followup.send(f"Here is your generated image:\n{image_url}")
+        except ProviderBusy as e:
+            self.logger.warning(f"Image generation queue full: {e}")
+            await interaction.followup.send("Image generation is busy right now. Please try again in a minute.")
         except Exception as e:
             self.logger.error(f"Error generating image: {e}", exc_info=True)
             await interaction.followup.send("An error occurred while generating the image. Please try again later.")
@@ -51,12 +60,15 @@ class ImageGeneration(commands.Cog):
         try:
             # Generate the image using OpenAI's GPT-Image-1, strictly following the example
             self.logger.info("Generating image using GPT-Image-1...")
-            response = self.openai_client.images.generate(
-                model="gpt-image-1",
-                prompt=prompt,
-                n=1,
-                size="1024x1024"
-            )
+            async with get_gateway('openai_images').admit():
+                response = await call_provider(
+                    self.openai_client.images.generate,
+                    OpenAIConfig.IMAGE_TIMEOUT,
+                    model="gpt-image-1",
+                    prompt=prompt,
+                    n=1,
+                    size="1024x1024"
+                )
             
             # Process the response - the example shows the response has b64_json property
             try:
@@ -97,6 +109,9 @@ class ImageGeneration(commands.Cog):
                     self.logger.error(f"Could not get image URL either: {inner_e}")
                     await interaction.followup.send("An error occurred while processing the generated image. Please try again later.")
                 
+        except ProviderBusy as e:
+            self.logger.warning(f"Image generation queue full: {e}")
+            await interaction.followup.send("Image generation is busy right now. Please try again in a minute.")
         except Exception as e:
             self.logger.error(f"Error generating image with GPT-Image-1: {e}", exc_info=True)
             
@@ -7,7 +7,15 @@ import re
 import random
 from typing import Dict, List, Callable, Optional, Union, Any, Pattern, Literal
 import asyncio
-from config.config import MESSAGE_LISTENERS_FILE
+from config.config import (
+    MESSAGE_LISTENERS_FILE, LISTENER_COUNTER_FLUSH_INTERVAL, LISTENER_SENDS_PER_WINDOW, LISTENER_SEND_WINDOW
+)
+from app.discord.event_bus import MessageContext, MessageFilter
+from app.discord.listener_index import CooldownStore, ListenerIndex
+from app.discord.regex_guard import check_pattern, get_regex_guard
+from app.discord.response_templates import CounterStore, compile_template
+from app.discord.listener_actions import ListenerActionExecutor
+from app.discord.listener_store import get_listener_store
 
 class MessageListener:
     """
@@ -73,8 +81,21 @@ class MessageListener:
         self.allowed_roles = allowed_roles or []
         self.disallowed_roles = disallowed_roles or []
         
-        # Tracking user cooldowns
-        self.user_cooldowns = {}
+        # Tracking user cooldowns (expired entries are dropped automatically)
+        self.user_cooldowns = CooldownStore()
+    
+    @property
+    def action_value(self) -> Any:
+        return self._action_value
+    
+    @action_value.setter
+    def action_value(self, value: Any):
+        # Parse the response template once, whenever the action value changes
+        self._action_value = value
+        if isinstance(value, dict):
+            self.response_template = compile_template(value.get('content', ''))
+        else:
+            self.response_template = compile_template(value)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert the listener to a dictionary for serialization"""
@@ -112,56 +133,56 @@ class MessageListener:
         Check if user is on cooldown.
         Returns True if the user can trigger the action (not on cooldown).
         """
-        if self.cooldown <= 0:
-            return True
-            
-        current_time = asyncio.get_event_loop().time()
-        last_trigger = self.user_cooldowns.get(user_id, 0)
-        
-        if current_time - last_trigger >= self.cooldown:
-            self.user_cooldowns[user_id] = current_time
-            return True
-        return False
+        return self.user_cooldowns.try_acquire(user_id, self.cooldown)
     
-    def should_trigger(self, message: discord.Message) -> bool:
+    def should_trigger(self, context: MessageContext, content_matched: bool = False) -> bool:
         """
         Check if this listener should trigger based on the message and all conditions.
+        
+        Cheap checks run first; the random chance and the cooldown (which starts a new
+        cooldown as a side effect) run only once everything else has passed.
+        
+        Args:
+            context (MessageContext): The message, normalized once by the event bus
+            content_matched (bool): Whether a ListenerIndex already matched the trigger
         """
         if not self.enabled:
             return False
             
-        # Random chance check
-        if random.random() > self.chance:
-            return False
-            
         # Channel restrictions
-        if self.allowed_channels and message.channel.id not in self.allowed_channels:
+        if self.allowed_channels and context.channel_id not in self.allowed_channels:
             return False
-        if message.channel.id in self.disallowed_channels:
+        if context.channel_id in self.disallowed_channels:
             return False
             
         # Role restrictions
-        if isinstance(message.author, discord.Member):
-            user_role_ids = [role.id for role in message.author.roles]
-            if self.allowed_roles and not any(role_id in user_role_ids for role_id in self.allowed_roles):
+        if isinstance(context.message.author, discord.Member):
+            if self.allowed_roles and not any(role_id in context.role_ids for role_id in self.allowed_roles):
                 return False
-            if any(role_id in user_role_ids for role_id in self.disallowed_roles):
+            if any(role_id in context.role_ids for role_id in self.disallowed_roles):
                 return False
                 
         # Bot mention requirement
-        if self.require_mention and not message.mentions:
+        if self.require_mention and not context.mentions_bot:
             return False
-        if self.require_mention and not any(mention.id == message.guild.me.id for mention in message.mentions):
+            
+        if not content_matched and not self.matches_content(context):
             return False
             
-        # Cooldown check
-        if not self.check_cooldown(message.author.id):
+        # Random chance check
+        if random.random() > self.chance:
             return False
             
-        # Message content checks based on trigger type
-        content = message.content
-        if self.ignore_case and isinstance(content, str):
-            content = content.lower()
+        # Cooldown check
+        return self.check_cooldown(context.author_id)
+    
+    def matches_content(self, context: MessageContext) -> bool:
+        """
+        Check the message content against this listener's trigger on its own.
+        
+        The cog normally uses a ListenerIndex instead; this is the reference behaviour.
+        """
+        content = context.lowered if self.ignore_case else context.content
             
         if self.trigger_type == 'contains':
             trigger = self.trigger_value.lower() if self.ignore_case and isinstance(self.trigger_value, str) else self.trigger_value
@@ -188,92 +209,15 @@ class MessageListener:
             
         return False
 
-    async def execute_action(self, bot: commands.Bot, message: discord.Message) -> None:
+    def render_response(self, message: discord.Message, counters: Optional[CounterStore] = None) -> str:
         """
-        Execute the action for this listener based on the action type.
-        """
-        try:
-            if self.action_type == 'reply':
-                # For reply actions, format the response with variables
-                response = self._format_response(self.action_value, message)
-                await message.channel.send(response)
-                
-            elif self.action_type == 'react':
-                # For reaction actions, add the emoji as a reaction
-                await message.add_reaction(self.action_value)
-                
-            elif self.action_type == 'dm':
-                # For DM actions, send a direct message to the user
-                response = self._format_response(self.action_value, message)
-                await message.author.send(response)
-                
-            elif self.action_type == 'webhook':
-                # For webhook actions, a bit more complex - only if channel has webhook permissions
-                if isinstance(message.channel, discord.TextChannel) and message.channel.permissions_for(message.guild.me).manage_webhooks:
-                    webhooks = await message.channel.webhooks()
-                    webhook = discord.utils.get(webhooks, name="MessageListener")
-                    
-                    if webhook is None:
-                        webhook = await message.channel.create_webhook(name="MessageListener")
-                        
-                    # webhook_data should be a dict with 'content', 'username', and 'avatar_url'
-                    webhook_data = self.action_value
-                    content = self._format_response(webhook_data.get('content', ''), message)
-                    
-                    await webhook.send(
-                        content=content,
-                        username=webhook_data.get('username', 'Message Listener'),
-                        avatar_url=webhook_data.get('avatar_url', None)
-                    )
-                    
-            # Custom actions would be implemented at the cog level and accessed by name
-        except Exception as e:
-            print(f"Error executing action for listener {self.name}: {e}")
-    
-    def _format_response(self, response_template: str, message: discord.Message) -> str:
-        """
-        Format a response template with variables from the message.
+        Render this listener's precompiled response template for a message.
         
-        Supported variables:
-        - {user} - Username
-        - {user.mention} - User mention
-        - {user.id} - User ID
-        - {channel} - Channel name
-        - {guild} - Server name
-        - {random.number:min:max} - Random number between min and max
-        - {message} - User's message content
-        - {message.id} - Message ID
-        - {timestamp} - Current timestamp
-        - {count:name} - Increment and show a counter with the given name
+        The action itself is carried out by the cog's ListenerActionExecutor.
         """
-        if not isinstance(response_template, str):
-            return str(response_template)
-            
-        # Basic replacements
-        replacements = {
-            '{user}': message.author.display_name,
-            '{user.mention}': message.author.mention,
-            '{user.id}': str(message.author.id),
-            '{channel}': getattr(message.channel, 'name', 'Unknown'),
-            '{guild}': getattr(message.guild, 'name', 'Unknown'),
-            '{message}': message.content,
-            '{message.id}': str(message.id),
-            '{timestamp}': discord.utils.format_dt(discord.utils.utcnow())
-        }
-        
-        result = response_template
-        for key, value in replacements.items():
-            result = result.replace(key, value)
-            
-        # Handle random numbers
-        random_pattern = r'\{random\.number:(\d+):(\d+)\}'
-        for match in re.finditer(random_pattern, response_template):
-            min_val = int(match.group(1))
-            max_val = int(match.group(2))
-            random_num = str(random.randint(min_val, max_val))
-            result = result.replace(match.group(0), random_num)
-            
-        return result
+        if self.response_template is None:
+            return str(self.action_value)
+        return self.response_template.render(message, counters)
 
 # UI Components for configuring listeners
 class ListenerModal(discord.ui.Modal):
@@ -365,6 +309,9 @@ class ListenerModal(discord.ui.Modal):
             )
             return
         
+        # Validating a regex pattern can take longer than Discord allows for the first response
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        
         # Get the current settings view to access the selected types and values
         view = interaction.message.view if is_edit and hasattr(interaction, 'message') else None
         
@@ -395,6 +342,15 @@ class ListenerModal(discord.ui.Modal):
         elif trigger_type == 'regex':
             # Keep as string, will be compiled when the listener is created
             trigger_value = trigger_value_raw
+            
+            # Reject patterns that could stall the bot before they are ever saved
+            problem = await get_regex_guard().validate(trigger_value, re.IGNORECASE)
+            if problem:
+                await interaction.followup.send(
+                    f"❌ The regex pattern was rejected: {problem}",
+                    ephemeral=True
+                )
+                return
         else:
             # For all other types, use as-is
             trigger_value = trigger_value_raw
@@ -438,7 +394,7 @@ class ListenerModal(discord.ui.Modal):
             # For edits, remove the old listener and add the new one with the same name
             self.cog.remove_listener(name)
             self.cog.add_listener(MessageListener.from_dict(listener_data))
-            await interaction.response.send_message(
+            await interaction.followup.send(
                 f"✅ Listener '{name}' has been updated successfully!",
                 ephemeral=True
             )
@@ -446,12 +402,12 @@ class ListenerModal(discord.ui.Modal):
             # For new listeners, just add it
             result = self.cog.add_listener(MessageListener.from_dict(listener_data))
             if result:
-                await interaction.response.send_message(
+                await interaction.followup.send(
                     f"✅ Listener '{name}' has been created successfully!",
                     ephemeral=True
                 )
             else:
-                await interaction.response.send_message(
+                await interaction.followup.send(
                     f"Error creating listener. Please try again.",
                     ephemeral=True
                 )
@@ -609,13 +565,27 @@ class MessageListenersCog(commands.Cog):
     A cog for handling configurable message listeners that respond to different triggers.
     """
     
-    def __init__(self, bot, logger):
+    def __init__(self, bot, logger, db=None):
         self.bot = bot
         self.logger = logger
         self.listeners: List[MessageListener] = []
+        self.listener_index = ListenerIndex([])
         self.listeners_file = MESSAGE_LISTENERS_FILE
+        self.listener_store = get_listener_store(self.listeners_file)
+        self._index_generation = 0
+        self._background_tasks = set()
         self.custom_actions: Dict[str, Callable] = {}
         
+        # {count:name} values, kept in memory and flushed to the database in batches
+        self.counters = CounterStore(db, flush_interval=LISTENER_COUNTER_FLUSH_INTERVAL)
+        
+        # Runs triggered actions concurrently, queueing sends per channel
+        self.action_executor = ListenerActionExecutor(
+            self.counters,
+            messages_per_window=LISTENER_SENDS_PER_WINDOW,
+            window=LISTENER_SEND_WINDOW
+        )
+        
         # Create the listener command group
         self.listener_group = app_commands.Group(
             name="listener", 
@@ -901,11 +871,10 @@ class MessageListenersCog(commands.Cog):
     def _load_listeners(self):
         """Load message listeners from JSON file"""
         try:
-            if os.path.exists(self.listeners_file):
-                with open(self.listeners_file, 'r') as f:
-                    listeners_data = json.load(f)
-                    
-                self.listeners = [MessageListener.from_dict(listener_data) for listener_data in listeners_data]
+            listeners_data = self.listener_store.load()
+            if listeners_data is not None:
+                self.listeners = self._build_listeners(listeners_data)
+                self.listener_index = ListenerIndex(self.listeners)
                 self.logger.info(f"Loaded {len(self.listeners)} message listeners from {self.listeners_file}")
             else:
                 # Initialize with default listeners if file doesn't exist
@@ -916,17 +885,72 @@ class MessageListenersCog(commands.Cog):
             # Initialize with defaults if there's an error
             self._initialize_default_listeners()
     
+    def _build_listeners(self, listeners_data: List[Dict[str, Any]]) -> List[MessageListener]:
+        """Create listeners from their definitions, disabling regex listeners that fail the safety checks"""
+        listeners = [MessageListener.from_dict(listener_data) for listener_data in listeners_data]
+        self._disable_unsafe_regex_listeners(listeners)
+        return listeners
+    
+    def _disable_unsafe_regex_listeners(self, listeners: List[MessageListener]):
+        """Disable regex listeners whose patterns fail the static safety checks"""
+        for listener in listeners:
+            if listener.trigger_type != 'regex' or not listener.enabled:
+                continue
+            pattern = getattr(listener.trigger_value, 'pattern', listener.trigger_value)
+            problem = check_pattern(pattern)
+            if problem:
+                listener.enabled = False
+                self.logger.warning(f"Disabled regex listener '{listener.name}': {problem}")
+    
+    def _rebuild_index(self):
+        """
+        Recompile the listener index in a worker thread and swap it in as one assignment.
+        
+        Message handling keeps using the previous index until the new one is ready.
+        """
+        snapshot = list(self.listeners)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.listener_index = ListenerIndex(snapshot)
+            return
+        self._index_generation += 1
+        task = loop.create_task(self._swap_index(snapshot, self._index_generation))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _swap_index(self, snapshot: List[MessageListener], generation: int):
+        index = await asyncio.to_thread(ListenerIndex, snapshot)
+        # A newer rebuild supersedes this one
+        if generation == self._index_generation:
+            self.listener_index = index
+    
+    async def _on_listeners_file_changed(self, listeners_data: List[Dict[str, Any]]):
+        """
+        Apply listener definitions that changed on disk (or were saved by the message monitor).
+        
+        Listeners and their index are built in a worker thread; cooldowns carry over for
+        listeners that kept their name.
+        """
+        def build():
+            listeners = self._build_listeners(listeners_data)
+            return listeners, ListenerIndex(listeners)
+        
+        listeners, index = await asyncio.to_thread(build)
+        previous = {listener.name: listener for listener in self.listeners}
+        for listener in listeners:
+            old = previous.get(listener.name)
+            if old is not None:
+                listener.user_cooldowns = old.user_cooldowns
+        self._index_generation += 1
+        self.listeners, self.listener_index = listeners, index
+        self.logger.info(f"Reloaded {len(listeners)} message listeners from {self.listeners_file}")
+    
     def _save_listeners(self):
-        """Save message listeners to JSON file"""
+        """Save message listeners to JSON file (written atomically in the background)"""
         try:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(self.listeners_file), exist_ok=True)
-            
-            # Convert listeners to dict and save
             listeners_data = [listener.to_dict() for listener in self.listeners]
-            with open(self.listeners_file, 'w') as f:
-                json.dump(listeners_data, f, indent=4)
-                
+            self.listener_store.save(listeners_data, source=self._on_listeners_file_changed)
             self.logger.info(f"Saved {len(self.listeners)} message listeners to {self.listeners_file}")
             return True
         except Exception as e:
@@ -985,6 +1009,7 @@ class MessageListenersCog(commands.Cog):
             )
         ]
         
+        self.listener_index = ListenerIndex(self.listeners)
         self.logger.info(f"Initialized {len(self.listeners)} default message listeners")
     
     def add_listener(self, listener: MessageListener) -> bool:
@@ -994,15 +1019,21 @@ class MessageListenersCog(commands.Cog):
             return False
             
         self.listeners.append(listener)
+        self._rebuild_index()
         self._save_listeners()
         return True
     
     def remove_listener(self, name: str) -> bool:
         """Remove a message listener by name"""
-        initial_count = len(self.listeners)
+        removed = [l for l in self.listeners if l.name == name]
         self.listeners = [l for l in self.listeners if l.name != name]
         
-        if len(self.listeners) < initial_count:
+        if removed:
+            # The current index may still hold the listener until the rebuilt one is swapped in
+            for listener in removed:
+                listener.enabled = False
+            get_regex_guard().reset(name)
+            self._rebuild_index()
             self._save_listeners()
             return True
         return False
@@ -1024,28 +1055,82 @@ class MessageListenersCog(commands.Cog):
             if hasattr(listener, key):
                 setattr(listener, key, value)
                 
+        self._rebuild_index()
         self._save_listeners()
         return True
     
     def enable_listener(self, name: str, enabled: bool = True) -> bool:
         """Enable or disable a listener"""
+        if enabled:
+            # Give a re-enabled regex listener a clean slate
+            get_regex_guard().reset(name)
         return self.update_listener(name, enabled=enabled)
     
-    @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         """
-        Event listener for all messages.
-        Checks all registered listeners and executes their actions if triggered.
+        Fallback message listener, used only when the bot has no event bus.
         """
         # Don't respond to messages from bots (including self)
         if message.author.bot:
             return
+        await self.handle_message(MessageContext(message, self.bot.user.id if self.bot.user else None))
+    
+    async def handle_message(self, context: MessageContext):
+        """
+        Check all registered listeners against a message and start the triggered actions.
+        
+        Actions run in the background; this returns once they are queued.
+        
+        Args:
+            context (MessageContext): The normalized message (never from a bot)
+        """
+        index = self.listener_index
+        matched = index.candidates(context)
+        regex_listeners = index.deferred_regex(context)
+        if regex_listeners:
+            matched.extend(await self._match_regex_listeners(regex_listeners, context))
+            matched.sort(key=index.position)
             
-        # Process all registered listeners
-        for listener in self.listeners:
-            if listener.should_trigger(message):
-                self.logger.debug(f"Listener '{listener.name}' triggered by message: {message.content}")
-                await listener.execute_action(self.bot, message)
+        for listener in matched:
+            if listener.should_trigger(context, content_matched=True):
+                self.logger.debug(f"Listener '{listener.name}' triggered by message: {context.content}")
+                self.action_executor.submit(listener, context.message)
+    
+    async def _match_regex_listeners(self, listeners: List[MessageListener], context: MessageContext) -> List[MessageListener]:
+        """
+        Match regex listeners in the regex guard's worker, disabling any that keep exceeding the time budget.
+        
+        Returns:
+            List[MessageListener]: The listeners whose pattern matched
+        """
+        guard = get_regex_guard()
+        items = [
+            (
+                listener.name,
+                listener.trigger_value.pattern,
+                listener.trigger_value.flags,
+                context.lowered if listener.ignore_case else context.content
+            )
+            for listener in listeners
+        ]
+        outcomes = await guard.search_many(items)
+        
+        matched = []
+        for listener, outcome in zip(listeners, outcomes):
+            if outcome.matched:
+                matched.append(listener)
+            elif outcome.timed_out and guard.should_disable(listener.name):
+                guard.mark_disabled(listener.name)
+                self.update_listener(listener.name, enabled=False)
+                self.logger.warning(
+                    f"Disabled regex listener '{listener.name}' after {guard.strikes.get(listener.name, 0)} "
+                    f"searches exceeded {guard.time_budget * 1000:.0f}ms"
+                )
+        return matched
+    
+    def get_regex_stats(self) -> Dict[str, Any]:
+        """Get regex guard metrics (searches, timeouts, worker restarts, disabled listeners)"""
+        return get_regex_guard().get_stats()
     
     @commands.Cog.listener()
     async def on_ready(self):
@@ -1073,6 +1158,37 @@ class MessageListenersCog(commands.Cog):
         """
         self.bot.tree.add_command(self.listener_group)
         self.logger.info("Listener command group registered")
+        
+        # Receive messages through the shared event bus when the bot provides one
+        event_bus = getattr(self.bot, 'event_bus', None)
+        if event_bus:
+            event_bus.subscribe('message_listeners', self.handle_message, MessageFilter(), priority=50)
+        else:
+            self.bot.add_listener(self.on_message, 'on_message')
+        
+        self.counters.start()
+        
+        # Pick up edits made to the listeners file while the bot is running
+        self.listener_store.subscribe(self._on_listeners_file_changed)
+        self.listener_store.start_watching()
+    
+    async def cog_unload(self):
+        """Stop receiving messages and persist counters and listeners when the cog is unloaded."""
+        event_bus = getattr(self.bot, 'event_bus', None)
+        if event_bus:
+            event_bus.unsubscribe('message_listeners')
+        else:
+            self.bot.remove_listener(self.on_message, 'on_message')
+
+        self.listener_store.unsubscribe(self._on_listeners_file_changed)
+        await self.listener_store.flush()
+        await self.action_executor.close()
+        await self.counters.close()
+    
+    @commands.Cog.listener()
+    async def on_webhooks_update(self, channel: discord.abc.GuildChannel):
+        """Drop the cached listener webhook when a channel's webhooks change"""
+        self.action_executor.invalidate_webhook(channel.id)
 
 def setup(bot):
     """Setup function for loading the cog"""
@@ -15,7 +15,7 @@ class UserStateCog(commands.Cog):
         """Clear a user's conversation history"""
         self.logger.info(f"User {interaction.user} invoked /clear_history")
         uid = str(interaction.user.id)
-        user_state = self.bot_state.get_user_state(uid)
+        user_state = await self.bot_state.load_user_state(uid)
         user_state.clear_history()
         self.logger.info(f"Cleared history for user {interaction.user}")
         await interaction.response.send_message("Your conversation history has been cleared.")
\ No newline at end of file
@@ -2,8 +2,8 @@ import discord
 import logging
 import time
 from discord import app_commands
-from utils.ai_services import OpenAIStrategy, GoogleGenAIStrategy, ClaudeStrategy, GrokStrategy
-from config.ai_config import GPT_SYSTEM_PROMPT, GOOGLE_SYSTEM_PROMPT, CLAUDE_SYSTEM_PROMPT, GROK_SYSTEM_PROMPT
+from utils.ai_services import OpenAIStrategy, GoogleGenAIStrategy, ClaudeStrategy, GrokStrategy, call_provider
+from config.ai_config import GPT_SYSTEM_PROMPT, GOOGLE_SYSTEM_PROMPT, CLAUDE_SYSTEM_PROMPT, GROK_SYSTEM_PROMPT, OpenAIConfig
 from config.base import DEFAULT_SUMMARY_LIMIT, ENCRYPTION_KEY
 from app.discord.state import BotState
 from utils.utilities import route_response
@@ -104,7 +104,7 @@ class BotCommands:
         async def clear_history(interaction: discord.Interaction):
             self.logger.info(f"User {interaction.user} invoked /clear_history")
             uid = str(interaction.user.id)
-            user_state = self.bot_state.get_user_state(uid)
+            user_state = await self.bot_state.load_user_state(uid)
             user_state.clear_history()
             self.logger.info(f"Cleared history for user {interaction.user}")
             await interaction.response.send_message("Your conversation history has been cleared.")
@@ -118,7 +118,9 @@ class BotCommands:
             try:
                 # Generate the image using OpenAI's DALL-E 3
                 self.logger.info("Generating image using DALL-E 3...")
-                response = self.openai_client.images.generate(
+                response = await call_provider(
+                    self.openai_client.images.generate,
+                    OpenAIConfig.IMAGE_TIMEOUT,
                     prompt=prompt,
                     n=1,  # Generate one image
                     size="1024x1024"  # Specify the image size
@@ -175,7 +177,7 @@ class BotCommands:
         
         # Get user state and update context
         uid = str(interaction.user.id)
-        user_state = self.bot_state.get_user_state(uid)
+        user_state = await self.bot_state.load_user_state(uid)
         user_state.add_prompt("user", prompt)
         context = user_state.get_context()
         
@@ -203,6 +205,7 @@ class BotCommands:
                     model=model_name,
                     prompt=prompt,
                     response=result,
+                    tokens_used=getattr(getattr(result, 'metrics', None), 'total_tokens', None),
                     execution_time=execution_time,
                     metadata={
                         "system_prompt": system_prompt,
@@ -0,0 +1,125 @@
+"""
+Background compaction of long conversations.
+
+Once a user's context grows past its compaction threshold, the older turns are
+folded into a rolling summary entry at the start of the context. Only the newest
+turns are kept verbatim. Prompts stay short while the conversation keeps its
+continuity.
+
+Compaction runs as a background task after a reply has been sent, and never on
+the request path. At most one compaction runs per user at a time. Turns added
+while a summary is being written are kept as they are.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.discord.state import UserState
+
+logger = logging.getLogger('discord_bot')
+
+Summarizer = Callable[[str], Awaitable[Optional[str]]]
+
+COMPACTION_INSTRUCTIONS = (
+    "Update the running summary of a conversation between a user and an AI assistant. "
+    "Merge the previous summary with the new turns below into one summary of at most {words} words. "
+    "Keep facts, names, decisions and open questions the assistant may need later; drop pleasantries."
+)
+
+class ContextCompactor:
+    """
+    Folds the older turns of long conversations into a rolling summary, off the request path.
+    """
+
+    def __init__(self, summarize: Summarizer, trigger_tokens: int = 3000, keep_recent: int = 6,
+                 summary_words: int = 200):
+        """
+        Args:
+            summarize (callable): Coroutine function turning a compaction prompt into a summary
+                (None or an error message when summarization failed)
+            trigger_tokens (int): Context size in tokens that triggers compaction
+            keep_recent (int): Newest context entries kept verbatim
+            summary_words (int): Target length of the rolling summary
+        """
+        self.summarize = summarize
+        self.trigger_tokens = trigger_tokens
+        self.keep_recent = keep_recent
+        self.summary_words = summary_words
+        self.running: Dict[str, asyncio.Task] = {}
+
+        # Statistics
+        self.compactions = 0
+        self.failures = 0
+        self.folded_entries = 0
+
+    def needs_compaction(self, user_state: UserState) -> bool:
+        """Whether a user's context has outgrown its threshold (or is about to hit the item cap)."""
+        if len(user_state.context) <= self.keep_recent:
+            return False
+        if len(user_state.context) >= user_state.max_context_items - 1:
+            return True
+        return user_state.context_tokens() > self.trigger_tokens
+
+    def maybe_compact(self, user_state: UserState) -> Optional[asyncio.Task]:
+        """
+        Start compacting a user's context in the background if it needs it.
+
+        Args:
+            user_state (UserState): The user's state
+
+        Returns:
+            Optional[asyncio.Task]: The compaction task, if one was started
+        """
+        if user_state.user_id in self.running or not self.needs_compaction(user_state):
+            return None
+        task = asyncio.create_task(self._compact(user_state))
+        self.running[user_state.user_id] = task
+        task.add_done_callback(lambda _: self.running.pop(user_state.user_id, None))
+        return task
+
+    def build_prompt(self, user_state: UserState, folded: list) -> str:
+        """Build the summarization prompt for folding entries into the rolling summary."""
+        lines = [COMPACTION_INSTRUCTIONS.format(words=self.summary_words), ""]
+        previous = user_state.get_summary()
+        if previous:
+            lines += ["Previous summary:", previous, ""]
+        lines.append("New turns:")
+        for entry in folded:
+            speaker = "User" if entry["role"] == "user" else "Assistant"
+            lines.append(f"{speaker}: {entry['content']}")
+        return "\n".join(lines)
+
+    async def _compact(self, user_state: UserState):
+        folded = user_state.compactable_entries(self.keep_recent)
+        if not folded:
+            return
+        try:
+            summary = await self.summarize(self.build_prompt(user_state, folded))
+        except Exception as e:
+            summary = None
+            logger.error(f"Error compacting context of user {user_state.user_id}: {e}", exc_info=True)
+        if not summary:
+            # Keep the turns; the item cap still bounds the context
+            self.failures += 1
+            return
+        user_state.apply_compaction(folded, summary.strip())
+        self.compactions += 1
+        self.folded_entries += len(folded)
+        logger.debug(f"Compacted {len(folded)} turns of user {user_state.user_id} into a rolling summary")
+
+    async def close(self):
+        """Cancel running compactions."""
+        for task in list(self.running.values()):
+            task.cancel()
+        if self.running:
+            await asyncio.gather(*self.running.values(), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get compaction metrics."""
+        return {
+            'running': len(self.running),
+            'compactions': self.compactions,
+            'failures': self.failures,
+            'folded_entries': self.folded_entries
+        }
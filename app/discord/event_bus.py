@@ -0,0 +1,262 @@
+"""
+Single dispatch point for incoming Discord messages.
+
+Every message is normalized once into a MessageContext (lowercased text, role and
+mention id sets, channel/guild ids) and handed only to the subscribers whose
+declarative MessageFilter can match it. Subscriptions are indexed by bot/human,
+guild and channel so a handler restricted to one channel is never even looked at
+for messages elsewhere. Subscribers are independent: they are started in priority
+order and run concurrently, so a slow one (storage) never holds up the others.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import discord
+
+logger = logging.getLogger('discord_bot')
+
+class MessageContext:
+    """Per-message values computed once and shared by all subscribers."""
+
+    __slots__ = (
+        'message', 'channel', 'content', 'lowered', 'author_id', 'is_bot',
+        'channel_id', 'guild_id', 'role_ids', 'mention_ids', 'mentions_bot'
+    )
+
+    def __init__(self, message: discord.Message, bot_user_id: Optional[int] = None):
+        """
+        Build the context for a message.
+
+        Args:
+            message (discord.Message): The incoming message
+            bot_user_id (int, optional): The bot's own user ID, used for mentions_bot
+        """
+        self.message = message
+        self.channel = message.channel
+        self.content = message.content or ''
+        self.lowered = self.content.lower()
+        self.author_id = message.author.id
+        self.is_bot = message.author.bot
+        self.channel_id = message.channel.id
+        self.guild_id = message.guild.id if message.guild else None
+        roles = getattr(message.author, 'roles', None)
+        self.role_ids: FrozenSet[int] = frozenset(role.id for role in roles) if roles else frozenset()
+        self.mention_ids: FrozenSet[int] = frozenset(user.id for user in message.mentions)
+        self.mentions_bot = bot_user_id is not None and bot_user_id in self.mention_ids
+
+class MessageFilter:
+    """
+    Declarative conditions a message must meet before a subscriber runs.
+
+    The guild/channel/bot conditions are answered by the bus index; the rest are
+    cheap checks against the precomputed MessageContext.
+    """
+
+    __slots__ = (
+        'include_bots', 'guild_only', 'guild_ids', 'channel_ids', 'exclude_channel_ids',
+        'role_ids', 'exclude_role_ids', 'require_mention', 'prefixes', 'keywords'
+    )
+
+    def __init__(self, include_bots: bool = False, guild_only: bool = False,
+                 guild_ids: Optional[Iterable[int]] = None, channel_ids: Optional[Iterable[int]] = None,
+                 exclude_channel_ids: Optional[Iterable[int]] = None, role_ids: Optional[Iterable[int]] = None,
+                 exclude_role_ids: Optional[Iterable[int]] = None, require_mention: bool = False,
+                 prefixes: Optional[Iterable[str]] = None, keywords: Optional[Iterable[str]] = None):
+        """
+        Args:
+            include_bots (bool): Whether messages from bots (including this one) are delivered
+            guild_only (bool): Skip direct messages
+            guild_ids (Iterable[int], optional): Only these guilds
+            channel_ids (Iterable[int], optional): Only these channels
+            exclude_channel_ids (Iterable[int], optional): Never these channels
+            role_ids (Iterable[int], optional): Author must have at least one of these roles
+            exclude_role_ids (Iterable[int], optional): Author must have none of these roles
+            require_mention (bool): The bot must be mentioned
+            prefixes (Iterable[str], optional): Raw content must start with one of these
+            keywords (Iterable[str], optional): Lowercased content must contain one of these
+        """
+        self.include_bots = include_bots
+        self.guild_only = guild_only
+        self.guild_ids = frozenset(guild_ids or ())
+        self.channel_ids = frozenset(channel_ids or ())
+        self.exclude_channel_ids = frozenset(exclude_channel_ids or ())
+        self.role_ids = frozenset(role_ids or ())
+        self.exclude_role_ids = frozenset(exclude_role_ids or ())
+        self.require_mention = require_mention
+        self.prefixes = tuple(prefixes or ())
+        self.keywords = tuple(keyword.lower() for keyword in (keywords or ()))
+
+    def matches(self, context: MessageContext) -> bool:
+        """Check the conditions the index does not already cover."""
+        if self.guild_only and context.guild_id is None:
+            return False
+        if context.channel_id in self.exclude_channel_ids:
+            return False
+        if self.role_ids and self.role_ids.isdisjoint(context.role_ids):
+            return False
+        if self.exclude_role_ids and not self.exclude_role_ids.isdisjoint(context.role_ids):
+            return False
+        if self.require_mention and not context.mentions_bot:
+            return False
+        if self.prefixes and not context.content.startswith(self.prefixes):
+            return False
+        if self.keywords and not any(keyword in context.lowered for keyword in self.keywords):
+            return False
+        return True
+
+MessageHandler = Callable[[MessageContext], Awaitable[None]]
+
+class Subscription:
+    """A named handler with its filter and priority (higher starts first)."""
+
+    __slots__ = ('name', 'handler', 'filter', 'priority', 'order')
+
+    def __init__(self, name: str, handler: MessageHandler, message_filter: MessageFilter,
+                 priority: int, order: int):
+        self.name = name
+        self.handler = handler
+        self.filter = message_filter
+        self.priority = priority
+        self.order = order
+
+    def sort_key(self) -> Tuple[int, int]:
+        return (-self.priority, self.order)
+
+class _SubscriptionIndex:
+    """Subscriptions bucketed by scope; each bucket is kept in dispatch order."""
+
+    __slots__ = ('everywhere', 'by_guild', 'by_channel')
+
+    def __init__(self):
+        self.everywhere: List[Subscription] = []
+        self.by_guild: Dict[int, List[Subscription]] = {}
+        self.by_channel: Dict[int, List[Subscription]] = {}
+
+    def add(self, subscription: Subscription):
+        message_filter = subscription.filter
+        if message_filter.channel_ids:
+            for channel_id in message_filter.channel_ids:
+                self.by_channel.setdefault(channel_id, []).append(subscription)
+        elif message_filter.guild_ids:
+            for guild_id in message_filter.guild_ids:
+                self.by_guild.setdefault(guild_id, []).append(subscription)
+        else:
+            self.everywhere.append(subscription)
+
+    def finalize(self):
+        self.everywhere.sort(key=Subscription.sort_key)
+        for bucket in itertools.chain(self.by_guild.values(), self.by_channel.values()):
+            bucket.sort(key=Subscription.sort_key)
+
+    def candidates(self, context: MessageContext) -> Iterable[Subscription]:
+        buckets = [self.everywhere]
+        if context.guild_id is not None and context.guild_id in self.by_guild:
+            buckets.append(self.by_guild[context.guild_id])
+        if context.channel_id in self.by_channel:
+            buckets.append(self.by_channel[context.channel_id])
+        if len(buckets) == 1:
+            return buckets[0]
+        return heapq.merge(*buckets, key=Subscription.sort_key)
+
+class MessageEventBus:
+    """
+    Dispatches each message once to the subscribers whose filters can match it.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger('discord_bot')
+        self.subscriptions: Dict[str, Subscription] = {}
+        self.bot_user_id: Optional[int] = None
+        self._order = itertools.count()
+        self._human_index = _SubscriptionIndex()
+        self._bot_index = _SubscriptionIndex()
+
+        # Dispatch statistics
+        self.messages_dispatched = 0
+        self.handler_calls = 0
+        self.handler_errors = 0
+
+    def set_bot_user_id(self, user_id: Optional[int]):
+        """Set the bot's user ID so contexts can answer mentions_bot."""
+        self.bot_user_id = user_id
+
+    def subscribe(self, name: str, handler: MessageHandler,
+                  message_filter: Optional[MessageFilter] = None, priority: int = 0) -> Subscription:
+        """
+        Register (or replace) a handler.
+
+        Args:
+            name (str): Unique subscription name
+            handler (callable): Async function taking a MessageContext
+            message_filter (MessageFilter, optional): Conditions for delivery (default: humans, everywhere)
+            priority (int): Higher priorities start first
+
+        Returns:
+            Subscription: The registered subscription
+        """
+        subscription = Subscription(name, handler, message_filter or MessageFilter(), priority, next(self._order))
+        self.subscriptions[name] = subscription
+        self._rebuild()
+        self.logger.debug(f"Event bus subscription '{name}' registered (priority {priority})")
+        return subscription
+
+    def unsubscribe(self, name: str) -> bool:
+        """Remove a handler by name."""
+        if self.subscriptions.pop(name, None) is None:
+            return False
+        self._rebuild()
+        return True
+
+    def _rebuild(self):
+        """Rebuild both indexes and swap them in, so dispatch never sees a partial index."""
+        human_index = _SubscriptionIndex()
+        bot_index = _SubscriptionIndex()
+        for subscription in self.subscriptions.values():
+            human_index.add(subscription)
+            if subscription.filter.include_bots:
+                bot_index.add(subscription)
+        human_index.finalize()
+        bot_index.finalize()
+        self._human_index, self._bot_index = human_index, bot_index
+
+    async def dispatch(self, message: discord.Message) -> MessageContext:
+        """
+        Normalize a message and run every matching subscriber concurrently,
+        started in priority order, until all have finished.
+
+        A failing handler is logged and does not stop the others.
+
+        Returns:
+            MessageContext: The context that was built for the message
+        """
+        context = MessageContext(message, self.bot_user_id)
+        self.messages_dispatched += 1
+        index = self._bot_index if context.is_bot else self._human_index
+        matching = [subscription for subscription in index.candidates(context) if subscription.filter.matches(context)]
+        self.handler_calls += len(matching)
+        if len(matching) == 1:
+            await self._run(matching[0], context)
+        elif matching:
+            await asyncio.gather(*(self._run(subscription, context) for subscription in matching))
+        return context
+
+    async def _run(self, subscription: Subscription, context: MessageContext):
+        """Run one handler, logging (and counting) its failure."""
+        try:
+            await subscription.handler(context)
+        except Exception as e:
+            self.handler_errors += 1
+            self.logger.error(f"Error in message handler '{subscription.name}' for message {context.message.id}: {e}", exc_info=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get dispatch statistics."""
+        return {
+            'subscriptions': len(self.subscriptions),
+            'messages_dispatched': self.messages_dispatched,
+            'handler_calls': self.handler_calls,
+            'handler_errors': self.handler_errors
+        }
@@ -0,0 +1,336 @@
+"""
+Channel history backfill.
+
+Crawls the history of every readable text channel so messages posted while the
+bot was offline (or before it joined a guild) end up in the database. Each
+channel keeps a checkpoint of the newest message id that has been stored, so an
+interrupted crawl resumes where it stopped instead of starting over.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+import discord
+
+logger = logging.getLogger('discord_bot')
+
+class RateLimiter:
+    """Spaces out history requests so all workers together stay under a request rate."""
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until the next request slot is available."""
+        if self.interval <= 0:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def penalize(self, delay: float):
+        """Push the next slot back after the API reported a rate limit."""
+        self.next_slot = max(self.next_slot, time.monotonic() + delay)
+
+class HistoryBackfill:
+    """
+    Resumable, concurrent crawler that feeds missed channel history into MessageMonitor.
+    """
+
+    def __init__(self, client, message_monitor, checkpoint_file: str,
+                 max_concurrency: int = 4, requests_per_second: float = 4.0,
+                 lookback_days: int = 7, page_size: int = 100,
+                 max_retries: int = 5, flush_interval: float = 30.0):
+        """
+        Initialize the backfill engine.
+
+        Args:
+            client: The Discord client (or a stand-in exposing the same attributes)
+            message_monitor: Object with an async process_message(message) method
+            checkpoint_file (str): JSON file holding the per-channel checkpoints
+            max_concurrency (int): Maximum number of channels crawled at the same time
+            requests_per_second (float): Global cap on history page requests
+            lookback_days (int): How far back to crawl channels that have no checkpoint yet
+            page_size (int): Messages requested per history call (Discord caps this at 100)
+            max_retries (int): Retries for a page before the channel is given up for this run
+            flush_interval (float): Minimum seconds between checkpoint writes
+        """
+        self.client = client
+        self.message_monitor = message_monitor
+        self.checkpoint_file = checkpoint_file
+        self.max_concurrency = max(1, max_concurrency)
+        self.lookback_days = lookback_days
+        self.page_size = max(1, min(page_size, 100))
+        self.max_retries = max_retries
+        self.flush_interval = flush_interval
+        self.rate_limiter = RateLimiter(requests_per_second)
+
+        # channel_id -> newest stored message id
+        self.checkpoints: Dict[str, int] = self._load_checkpoints()
+        # Newest live message ids seen for channels whose crawl has not finished yet
+        self.pending_live: Dict[str, int] = {}
+        self.completed_channels = set()
+        self.active_channels = set()
+        self.dirty = False
+        self.last_flush = 0.0
+        self.flush_lock = asyncio.Lock()
+        self._startup_task: Optional[asyncio.Task] = None
+
+        # Throughput statistics of the latest run
+        self.stats = self._new_stats()
+
+    @staticmethod
+    def _new_stats() -> Dict[str, float]:
+        return {
+            'channels_done': 0,
+            'channels_failed': 0,
+            'messages': 0,
+            'requests': 0,
+            'rate_limited': 0,
+            'elapsed': 0.0
+        }
+
+    # ----- Checkpoint persistence -----
+
+    def _load_checkpoints(self) -> Dict[str, int]:
+        """Load checkpoints from file."""
+        if not os.path.exists(self.checkpoint_file):
+            return {}
+        try:
+            with open(self.checkpoint_file, 'r') as f:
+                data = json.load(f)
+            return {str(channel_id): int(message_id) for channel_id, message_id in data.items()}
+        except (json.JSONDecodeError, ValueError, AttributeError) as e:
+            logger.error(f"Error reading backfill checkpoints from {self.checkpoint_file}: {e}")
+            return {}
+
+    def _write_checkpoints(self, snapshot: Dict[str, int]):
+        """Write checkpoints atomically so a crash never leaves a truncated file."""
+        os.makedirs(os.path.dirname(self.checkpoint_file), exist_ok=True)
+        tmp_path = f"{self.checkpoint_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_file)
+
+    async def flush(self, force: bool = False):
+        """Persist checkpoints if they changed and the flush interval has passed."""
+        if not self.dirty:
+            return
+        if not force and time.monotonic() - self.last_flush < self.flush_interval:
+            return
+        async with self.flush_lock:
+            if not self.dirty:
+                return
+            snapshot = {channel_id: message_id for channel_id, message_id in self.checkpoints.items()}
+            self.dirty = False
+            self.last_flush = time.monotonic()
+            try:
+                await asyncio.to_thread(self._write_checkpoints, snapshot)
+            except Exception as e:
+                self.dirty = True
+                logger.error(f"Error saving backfill checkpoints: {e}", exc_info=True)
+
+    def _advance(self, channel_id: str, message_id: int):
+        """Move a channel's checkpoint forward (never backwards)."""
+        if message_id > self.checkpoints.get(channel_id, 0):
+            self.checkpoints[channel_id] = message_id
+            self.dirty = True
+
+    def note_live_message(self, message):
+        """
+        Record a message that arrived through the gateway.
+
+        Channels that finished their crawl advance their checkpoint straight away, so the
+        next restart only crawls the downtime gap. For channels still being crawled the id is
+        held back until the crawl completes, otherwise a crash mid-crawl would skip the gap.
+        """
+        channel = getattr(message, 'channel', None)
+        if channel is None or getattr(message, 'guild', None) is None:
+            return
+        channel_id = str(channel.id)
+        if channel_id in self.active_channels or channel_id not in self.completed_channels:
+            if message.id > self.pending_live.get(channel_id, 0):
+                self.pending_live[channel_id] = message.id
+            return
+        self._advance(channel_id, message.id)
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            asyncio.create_task(self.flush())
+
+    # ----- Crawling -----
+
+    def _start_after(self, channel_id: str) -> int:
+        """Snowflake to resume from: the checkpoint, or the start of the lookback window."""
+        if channel_id in self.checkpoints:
+            return self.checkpoints[channel_id]
+        start = datetime.now(timezone.utc) - timedelta(days=self.lookback_days)
+        return discord.utils.time_snowflake(start)
+
+    def _readable_channels(self, guild) -> List:
+        """Text channels in a guild that the bot can read history from."""
+        channels = []
+        me = guild.me
+        for channel in guild.text_channels:
+            try:
+                permissions = channel.permissions_for(me)
+                if permissions.read_messages and permissions.read_message_history:
+                    channels.append(channel)
+            except Exception as e:
+                logger.debug(f"Skipping channel {channel.id} during backfill: {e}")
+        return channels
+
+    async def _fetch_page(self, channel, after_id: int, stats: Dict[str, float]) -> List:
+        """Fetch one page of history after a snowflake, retrying on rate limits and server errors."""
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire()
+            stats['requests'] += 1
+            try:
+                return [
+                    message async for message in channel.history(
+                        limit=self.page_size,
+                        after=discord.Object(id=after_id),
+                        oldest_first=True
+                    )
+                ]
+            except discord.Forbidden:
+                raise
+            except discord.HTTPException as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                if e.status == 429:
+                    stats['rate_limited'] += 1
+                    delay = float(getattr(e, 'retry_after', 0) or 2 ** attempt)
+                    self.rate_limiter.penalize(delay)
+                else:
+                    delay = min(2 ** attempt, 30)
+                logger.warning(f"History request for channel {channel.id} failed ({e.status}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def backfill_channel(self, channel, stats: Optional[Dict[str, float]] = None) -> int:
+        """
+        Crawl one channel from its checkpoint up to the present.
+
+        Args:
+            channel: The text channel to crawl
+            stats (dict, optional): Statistics of the run the channel belongs to (default: the latest run)
+
+        Returns:
+            int: Number of messages handed to the message monitor
+        """
+        stats = self.stats if stats is None else stats
+        channel_id = str(channel.id)
+        self.active_channels.add(channel_id)
+        after_id = self._start_after(channel_id)
+        stored = 0
+        try:
+            while True:
+                page = await self._fetch_page(channel, after_id, stats)
+                if not page:
+                    break
+                for message in page:
+                    await self.message_monitor.process_message(message)
+                    stored += 1
+                after_id = page[-1].id
+                self._advance(channel_id, after_id)
+                stats['messages'] += len(page)
+                await self.flush()
+                if len(page) < self.page_size:
+                    break
+
+            # Fold in any live messages that arrived while the crawl was running
+            live_id = self.pending_live.pop(channel_id, 0)
+            if live_id:
+                self._advance(channel_id, live_id)
+            self.completed_channels.add(channel_id)
+            stats['channels_done'] += 1
+            logger.debug(f"Backfilled {stored} messages in channel {channel_id}")
+            return stored
+        except discord.Forbidden:
+            logger.info(f"No permission to read history in channel {channel_id}, skipping backfill")
+            stats['channels_failed'] += 1
+            return stored
+        except Exception as e:
+            logger.error(f"Error backfilling channel {channel_id} after {stored} messages: {e}", exc_info=True)
+            stats['channels_failed'] += 1
+            return stored
+        finally:
+            self.active_channels.discard(channel_id)
+
+    async def backfill_channels(self, channels: Iterable) -> Dict[str, float]:
+        """
+        Crawl a set of channels with bounded concurrency.
+
+        Returns:
+            Dict[str, float]: Statistics of this run (messages, requests, elapsed seconds, ...)
+        """
+        stats = self._new_stats()
+        self.stats = stats
+        queue = asyncio.Queue()
+        for channel in channels:
+            if str(channel.id) not in self.active_channels:
+                queue.put_nowait(channel)
+
+        async def worker():
+            while True:
+                try:
+                    channel = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self.backfill_channel(channel, stats)
+
+        start = time.monotonic()
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.max_concurrency, queue.qsize()))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            stats['elapsed'] = time.monotonic() - start
+            await self.flush(force=True)
+
+        if stats['elapsed'] > 0:
+            rate = stats['messages'] / stats['elapsed']
+            logger.info(
+                f"Backfill finished: {stats['messages']} messages from {stats['channels_done']} channels "
+                f"in {stats['elapsed']:.1f}s ({rate:.1f} msg/s, {stats['requests']} requests, "
+                f"{stats['channels_failed']} failed)"
+            )
+        return dict(stats)
+
+    async def backfill_guild(self, guild) -> Dict[str, float]:
+        """Crawl every readable text channel in a guild."""
+        channels = self._readable_channels(guild)
+        logger.info(f"Starting history backfill for {len(channels)} channels in guild {guild.name} ({guild.id})")
+        return await self.backfill_channels(channels)
+
+    async def backfill_guilds(self, guilds: Optional[Iterable] = None) -> Dict[str, float]:
+        """Crawl all guilds the client is in (or the given ones) as one bounded run."""
+        guilds = list(guilds if guilds is not None else self.client.guilds)
+        channels = []
+        for guild in guilds:
+            channels.extend(self._readable_channels(guild))
+        logger.info(f"Starting history backfill for {len(channels)} channels across {len(guilds)} guilds")
+        return await self.backfill_channels(channels)
+
+    def start(self) -> asyncio.Task:
+        """
+        Start catching up on all guilds in the background, once per process.
+
+        on_ready fires again after every reconnect; later calls return the first run's task.
+        """
+        if self._startup_task is None:
+            self._startup_task = asyncio.create_task(self.backfill_guilds())
+        return self._startup_task
+
+    async def close(self):
+        """Persist any outstanding checkpoints."""
+        await self.flush(force=True)
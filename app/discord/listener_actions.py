@@ -0,0 +1,275 @@
+"""
+Execution of message listener actions.
+
+Actions no longer run inline in the message handler, one listener after another.
+The executor starts each triggered action as its own task. Reactions go straight
+to the API. Everything that sends a message goes through a per-channel queue, so
+sends to one channel keep their trigger order and respect Discord's per-channel
+send limit, while other channels carry on in parallel.
+
+Channel webhooks are looked up (or created) once and then cached until Discord
+reports that the channel's webhooks changed.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Set
+
+import discord
+
+logger = logging.getLogger('discord_bot')
+
+WEBHOOK_NAME = "MessageListener"
+
+SendJob = Callable[[], Awaitable[Any]]
+
+class SendBucket:
+    """
+    Sliding-window limit on sends to one channel (Discord allows bursts of about 5 per 5 seconds).
+    """
+
+    __slots__ = ('capacity', 'window', 'sent', 'blocked_until')
+
+    def __init__(self, capacity: int = 5, window: float = 5.0):
+        self.capacity = capacity
+        self.window = window
+        self.sent: Deque[float] = deque()
+        self.blocked_until = 0.0
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """Seconds to wait before the next send may go out."""
+        now = time.monotonic() if now is None else now
+        while self.sent and self.sent[0] <= now - self.window:
+            self.sent.popleft()
+        wait = self.blocked_until - now
+        if len(self.sent) >= self.capacity:
+            wait = max(wait, self.sent[0] + self.window - now)
+        return max(0.0, wait)
+
+    def record(self, now: Optional[float] = None):
+        """Record that a send went out."""
+        self.sent.append(time.monotonic() if now is None else now)
+
+    def penalize(self, retry_after: float):
+        """Hold all sends after the API reported a rate limit."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+class _ChannelQueue:
+    """Pending sends for one destination and the task draining them."""
+
+    __slots__ = ('jobs', 'bucket', 'worker')
+
+    def __init__(self, capacity: int, window: float):
+        self.jobs: asyncio.Queue = asyncio.Queue()
+        self.bucket = SendBucket(capacity, window)
+        self.worker: Optional[asyncio.Task] = None
+
+class WebhookCache:
+    """
+    The listener webhook of each channel, fetched or created at most once per channel.
+
+    Concurrent lookups for the same channel share one request.
+    """
+
+    def __init__(self):
+        self.webhooks: Dict[int, asyncio.Future] = {}
+        self.lookups = 0
+
+    async def get(self, channel: discord.TextChannel) -> discord.Webhook:
+        """Get the channel's listener webhook, creating it if needed."""
+        pending = self.webhooks.get(channel.id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fetch(channel))
+            self.webhooks[channel.id] = pending
+        try:
+            return await asyncio.shield(pending)
+        except Exception:
+            # Do not cache failures
+            if self.webhooks.get(channel.id) is pending:
+                del self.webhooks[channel.id]
+            raise
+
+    async def _fetch(self, channel: discord.TextChannel) -> discord.Webhook:
+        self.lookups += 1
+        webhooks = await channel.webhooks()
+        webhook = discord.utils.get(webhooks, name=WEBHOOK_NAME)
+        if webhook is None:
+            webhook = await channel.create_webhook(name=WEBHOOK_NAME)
+        return webhook
+
+    def invalidate(self, channel_id: int):
+        """Forget a channel's webhook (after a webhooks update event or a failed send)."""
+        self.webhooks.pop(channel_id, None)
+
+class ListenerActionExecutor:
+    """
+    Runs triggered listener actions concurrently, with ordered, rate-aware sends per channel.
+    """
+
+    def __init__(self, counters=None, messages_per_window: int = 5, window: float = 5.0,
+                 idle_timeout: float = 60.0, max_retries: int = 3):
+        """
+        Args:
+            counters (CounterStore, optional): Store backing {count:name} variables
+            messages_per_window (int): Sends allowed per channel in each window
+            window (float): Length of the send window in seconds
+            idle_timeout (float): Seconds before an idle channel queue's worker exits
+            max_retries (int): Attempts for a send that hits a rate limit
+        """
+        self.counters = counters
+        self.messages_per_window = messages_per_window
+        self.window = window
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self.webhooks = WebhookCache()
+        self.channels: Dict[Hashable, _ChannelQueue] = {}
+        self.tasks: Set[asyncio.Task] = set()
+
+        # Statistics
+        self.actions_started = 0
+        self.sends = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+    def submit(self, listener, message: discord.Message):
+        """
+        Start a listener's action for a message without waiting for it to finish.
+
+        Response templates are rendered immediately, so counters and send order
+        follow trigger order even though the sends happen later.
+
+        Args:
+            listener (MessageListener): The triggered listener
+            message (discord.Message): The message that triggered it
+        """
+        self.actions_started += 1
+        action_type = listener.action_type
+        if action_type == 'react':
+            self._spawn(self._react(listener, message))
+        elif action_type == 'reply':
+            content = listener.render_response(message, self.counters)
+            self._enqueue(message.channel.id, lambda: message.channel.send(content), listener.name)
+        elif action_type == 'dm':
+            content = listener.render_response(message, self.counters)
+            self._enqueue(('dm', message.author.id), lambda: message.author.send(content), listener.name)
+        elif action_type == 'webhook':
+            channel = message.channel
+            if not isinstance(channel, discord.TextChannel) or not channel.permissions_for(message.guild.me).manage_webhooks:
+                return
+            webhook_data = listener.action_value
+            content = listener.render_response(message, self.counters)
+            self._enqueue(channel.id, lambda: self._send_webhook(channel, webhook_data, content), listener.name)
+        # Custom actions would be implemented at the cog level and accessed by name
+
+    def _spawn(self, coroutine: Awaitable[Any]):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _react(self, listener, message: discord.Message):
+        try:
+            await message.add_reaction(listener.action_value)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error executing action for listener {listener.name}: {e}")
+
+    async def _send_webhook(self, channel: discord.TextChannel, webhook_data: Dict[str, Any], content: str):
+        send_options = {
+            'content': content,
+            'username': webhook_data.get('username', 'Message Listener'),
+            'avatar_url': webhook_data.get('avatar_url', None)
+        }
+        webhook = await self.webhooks.get(channel)
+        try:
+            await webhook.send(**send_options)
+        except discord.NotFound:
+            # The cached webhook was deleted; look it up again once
+            self.webhooks.invalidate(channel.id)
+            webhook = await self.webhooks.get(channel)
+            await webhook.send(**send_options)
+
+    def _enqueue(self, key: Hashable, job: SendJob, listener_name: str):
+        queue = self.channels.get(key)
+        if queue is None:
+            queue = self.channels[key] = _ChannelQueue(self.messages_per_window, self.window)
+        queue.jobs.put_nowait((job, listener_name))
+        if queue.worker is None or queue.worker.done():
+            queue.worker = asyncio.create_task(self._drain(key, queue))
+
+    async def _drain(self, key: Hashable, queue: _ChannelQueue):
+        """Send a destination's queued messages in order, then exit once idle."""
+        while True:
+            try:
+                job, listener_name = await asyncio.wait_for(queue.jobs.get(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                # A job queued as the wait timed out still needs this worker
+                if not queue.jobs.empty():
+                    continue
+                if self.channels.get(key) is queue:
+                    del self.channels[key]
+                return
+            try:
+                await self._send(queue.bucket, job, listener_name)
+            finally:
+                queue.jobs.task_done()
+
+    async def _send(self, bucket: SendBucket, job: SendJob, listener_name: str):
+        for attempt in range(self.max_retries):
+            delay = bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            bucket.record()
+            try:
+                await job()
+                self.sends += 1
+                return
+            except discord.HTTPException as e:
+                if e.status != 429 or attempt == self.max_retries - 1:
+                    self.errors += 1
+                    logger.error(f"Error executing action for listener {listener_name}: {e}")
+                    return
+                self.rate_limited += 1
+                retry_after = getattr(e, 'retry_after', None)
+                if not retry_after:
+                    headers = getattr(e.response, 'headers', None) or {}
+                    retry_after = float(headers.get('Retry-After', 1.0))
+                bucket.penalize(retry_after)
+                logger.warning(f"Listener {listener_name} hit a rate limit; retrying in {retry_after:.1f}s")
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error executing action for listener {listener_name}: {e}")
+                return
+
+    def invalidate_webhook(self, channel_id: int):
+        """Drop a channel's cached webhook."""
+        self.webhooks.invalidate(channel_id)
+
+    async def close(self, timeout: float = 5.0):
+        """Give queued sends a short time to finish, then cancel what is left."""
+        pending = [queue.jobs.join() for queue in self.channels.values()]
+        if pending or self.tasks:
+            try:
+                await asyncio.wait_for(asyncio.gather(*pending, *list(self.tasks)), timeout=timeout)
+            except (asyncio.TimeoutError, Exception):
+                pass
+        for queue in self.channels.values():
+            if queue.worker is not None:
+                queue.worker.cancel()
+        for task in list(self.tasks):
+            task.cancel()
+        self.channels.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get executor metrics."""
+        return {
+            'actions_started': self.actions_started,
+            'sends': self.sends,
+            'rate_limited': self.rate_limited,
+            'errors': self.errors,
+            'active_channels': len(self.channels),
+            'queued_sends': sum(queue.jobs.qsize() for queue in self.channels.values()),
+            'webhook_lookups': self.webhooks.lookups,
+            'cached_webhooks': len(self.webhooks.webhooks)
+        }
@@ -0,0 +1,242 @@
+"""
+Compiled matching index for message listeners.
+
+Instead of asking every listener whether it matches every message, the index
+compiles all plain-text triggers (contains, contains_any, startswith, endswith,
+exact) into Aho-Corasick automatons, bucketed by the channels a listener is
+allowed in. One pass over the message content then yields every listener whose
+trigger matched, so the per-message cost stays nearly flat as the number of
+listeners grows. Regex triggers are not matched here: the index only lists the
+ones in scope, and the owner runs them in the time-bounded regex guard.
+
+The index is immutable once built; owners build a new one when listeners change
+and swap the reference, so message handling never sees a half-built index.
+"""
+
+import heapq
+import time
+from collections import deque
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Trigger kinds handled by the automaton
+CONTAINS = 0
+STARTSWITH = 1
+ENDSWITH = 2
+EXACT = 3
+
+TEXT_TRIGGER_KINDS = {
+    'contains': CONTAINS,
+    'contains_any': CONTAINS,
+    'startswith': STARTSWITH,
+    'endswith': ENDSWITH,
+    'exact': EXACT
+}
+
+class AhoCorasick:
+    """Multi-pattern substring automaton reporting every (end index, length, payload) hit."""
+
+    __slots__ = ('goto', 'fail', 'outputs')
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]]):
+        """
+        Build the automaton.
+
+        Args:
+            patterns: (text, payload) pairs; empty texts are ignored
+        """
+        self.goto: List[Dict[str, int]] = [{}]
+        self.outputs: List[List[Tuple[int, Any]]] = [[]]
+        for text, payload in patterns:
+            if not text:
+                continue
+            state = 0
+            for char in text:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.outputs.append([])
+                state = next_state
+            self.outputs[state].append((len(text), payload))
+
+        # Breadth-first construction of failure links; outputs inherit from their fallback state
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state].extend(self.outputs[self.fail[next_state]])
+
+    def search(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (end index, pattern length, payload) for every occurrence in text."""
+        goto = self.goto
+        fail = self.fail
+        outputs = self.outputs
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                for length, payload in outputs[state]:
+                    yield index, length, payload
+
+class CooldownStore:
+    """
+    Per-key cooldowns that forget keys once they expire.
+
+    Expiries are kept in a heap so purging is proportional to what expired,
+    rather than a scan of every user who ever triggered a listener.
+    """
+
+    __slots__ = ('expiries', 'heap')
+
+    def __init__(self):
+        self.expiries: Dict[Hashable, float] = {}
+        self.heap: List[Tuple[float, Hashable]] = []
+
+    def _purge(self, now: float):
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            expiry, key = heapq.heappop(heap)
+            if self.expiries.get(key) == expiry:
+                del self.expiries[key]
+
+    def try_acquire(self, key: Hashable, cooldown: float, now: Optional[float] = None) -> bool:
+        """
+        Start a cooldown for key unless one is already running.
+
+        Returns:
+            bool: True if the key was not on cooldown (and now is)
+        """
+        if cooldown <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        self._purge(now)
+        if key in self.expiries:
+            return False
+        expiry = now + cooldown
+        self.expiries[key] = expiry
+        heapq.heappush(self.heap, (expiry, key))
+        return True
+
+    def __len__(self) -> int:
+        return len(self.expiries)
+
+class _PatternSet:
+    """Compiled triggers for one scope (all channels, or a single allowed channel)."""
+
+    __slots__ = ('folded', 'cased', 'always', 'exact_empty', 'deferred_regex')
+
+    def __init__(self, entries: List[Tuple[int, Any]]):
+        folded_patterns = []
+        cased_patterns = []
+        self.always: Set[int] = set()
+        self.exact_empty: Set[int] = set()
+        # Regex listeners left to the caller, for time-bounded matching off the event loop
+        self.deferred_regex: List[int] = []
+
+        for position, listener in entries:
+            kind = TEXT_TRIGGER_KINDS.get(listener.trigger_type)
+            if kind is not None:
+                values = listener.trigger_value
+                if isinstance(values, str) or listener.trigger_type != 'contains_any':
+                    values = [values]
+                for value in values:
+                    if not isinstance(value, str):
+                        continue
+                    if not value:
+                        # An empty trigger matches like str.startswith('') would
+                        (self.exact_empty if kind == EXACT else self.always).add(position)
+                        continue
+                    if listener.ignore_case:
+                        folded_patterns.append((value.lower(), (position, kind)))
+                    else:
+                        cased_patterns.append((value, (position, kind)))
+            elif listener.trigger_type == 'regex':
+                self.deferred_regex.append(position)
+
+        self.folded = AhoCorasick(folded_patterns) if folded_patterns else None
+        self.cased = AhoCorasick(cased_patterns) if cased_patterns else None
+
+    def match(self, content: str, lowered: str, hits: Set[int]):
+        """Add the positions of listeners whose trigger matches to hits."""
+        hits.update(self.always)
+        if not content:
+            hits.update(self.exact_empty)
+        for automaton, text in ((self.folded, lowered), (self.cased, content)):
+            if automaton is None:
+                continue
+            text_length = len(text)
+            for end, length, (position, kind) in automaton.search(text):
+                if position in hits:
+                    continue
+                if (kind == CONTAINS
+                        or (kind == STARTSWITH and end + 1 == length)
+                        or (kind == ENDSWITH and end + 1 == text_length)
+                        or (kind == EXACT and length == text_length)):
+                    hits.add(position)
+
+class ListenerIndex:
+    """
+    Immutable index answering "which enabled listeners' triggers match this message?".
+    """
+
+    def __init__(self, listeners: Iterable[Any]):
+        """
+        Compile an index over a snapshot of listeners.
+
+        Args:
+            listeners: Listener objects with trigger_type, trigger_value, ignore_case,
+                enabled and allowed_channels attributes
+        """
+        self.listeners = list(listeners)
+        self.positions = {id(listener): position for position, listener in enumerate(self.listeners)}
+        global_entries = []
+        channel_entries: Dict[int, List[Tuple[int, Any]]] = {}
+        for position, listener in enumerate(self.listeners):
+            if not listener.enabled:
+                continue
+            if listener.allowed_channels:
+                for channel_id in listener.allowed_channels:
+                    channel_entries.setdefault(channel_id, []).append((position, listener))
+            else:
+                global_entries.append((position, listener))
+
+        self.global_set = _PatternSet(global_entries)
+        self.channel_sets = {
+            channel_id: _PatternSet(entries) for channel_id, entries in channel_entries.items()
+        }
+
+    def candidates(self, context) -> List[Any]:
+        """
+        Listeners whose text trigger matches the message, in their configured order.
+
+        Args:
+            context: A MessageContext (needs content, lowered and channel_id)
+        """
+        hits: Set[int] = set()
+        self.global_set.match(context.content, context.lowered, hits)
+        channel_set = self.channel_sets.get(context.channel_id)
+        if channel_set is not None:
+            channel_set.match(context.content, context.lowered, hits)
+        return [self.listeners[position] for position in sorted(hits)]
+
+    def deferred_regex(self, context) -> List[Any]:
+        """Regex listeners in scope for the message, for the caller to match."""
+        positions = list(self.global_set.deferred_regex)
+        channel_set = self.channel_sets.get(context.channel_id)
+        if channel_set is not None:
+            positions.extend(channel_set.deferred_regex)
+        return [self.listeners[position] for position in sorted(positions)]
+
+    def position(self, listener) -> int:
+        """Configured order of a listener, for merging deferred matches back in."""
+        return self.positions.get(id(listener), len(self.listeners))
@@ -0,0 +1,227 @@
+"""
+Shared, hot-reloadable storage for message listener definitions.
+
+The message monitor and the message listeners cog both read message_listeners.json.
+The store gives them a single owner for that file:
+
+- saves are written in the background as a temp file plus os.replace, so an edit
+  never blocks the event loop and readers never see a half-written file; rapid
+  successive saves collapse into one write of the latest data
+- the file's mtime and size are polled, and external edits are parsed off the loop
+  and handed to every subscriber
+- a save from one subscriber is passed on to the others, so they stay in sync
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('discord_bot')
+
+ListenerData = List[Dict[str, Any]]
+ChangeCallback = Callable[[ListenerData], Awaitable[None]]
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _read_file(path: str) -> Tuple[ListenerData, Optional[Tuple[int, int]]]:
+    signature = _file_signature(path)
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"{path} does not contain a list of listeners")
+    return data, signature
+
+def _write_file(path: str, data: ListenerData) -> Optional[Tuple[int, int]]:
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.listeners-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return _file_signature(path)
+
+class ListenerStore:
+    """
+    Owner of one listener definitions file.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 2.0):
+        """
+        Args:
+            path (str): Path of the listeners JSON file
+            poll_interval (float): Seconds between checks for external edits
+        """
+        self.path = path
+        self.poll_interval = poll_interval
+        self.data: Optional[ListenerData] = None
+        self.signature: Optional[Tuple[int, int]] = None
+        self.subscribers: List[ChangeCallback] = []
+
+        self._pending: Optional[Tuple[ListenerData, Optional[ChangeCallback]]] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.writes = 0
+        self.reloads = 0
+
+    def load(self) -> Optional[ListenerData]:
+        """
+        Read the file synchronously (for startup, before the event loop is busy).
+
+        Returns:
+            Optional[ListenerData]: The listener definitions, or None if the file does not exist
+        """
+        if self.data is not None:
+            return self.data
+        if not os.path.exists(self.path):
+            return None
+        self.data, self.signature = _read_file(self.path)
+        return self.data
+
+    def save(self, data: ListenerData, source: Optional[ChangeCallback] = None):
+        """
+        Replace the stored definitions and write them in the background.
+
+        Args:
+            data (ListenerData): The complete list of listener definitions
+            source (callable, optional): The saving subscriber, which is not notified of its own save
+        """
+        self.data = data
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop yet (startup or scripts): write directly
+            self.signature = _write_file(self.path, data)
+            self.writes += 1
+            return
+        self._pending = (data, source)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_pending())
+
+    async def _write_pending(self):
+        while self._pending is not None:
+            data, source = self._pending
+            self._pending = None
+            try:
+                self.signature = await asyncio.to_thread(_write_file, self.path, data)
+                self.writes += 1
+                logger.debug(f"Saved {len(data)} listener definitions to {self.path}")
+            except Exception as e:
+                logger.error(f"Error saving listener definitions to {self.path}: {e}", exc_info=True)
+                continue
+            await self._notify(data, exclude=source)
+
+    async def flush(self):
+        """Wait until every pending save has been written."""
+        while self._writer is not None and not self._writer.done():
+            await asyncio.shield(self._writer)
+
+    def subscribe(self, callback: ChangeCallback):
+        """
+        Get notified with the new definitions whenever the file changes.
+
+        Args:
+            callback (callable): Async function taking the list of listener definitions
+        """
+        if callback not in self.subscribers:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback: ChangeCallback):
+        """Stop notifying a subscriber."""
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    async def _notify(self, data: ListenerData, exclude: Optional[ChangeCallback] = None):
+        for callback in list(self.subscribers):
+            if exclude is not None and callback == exclude:
+                continue
+            try:
+                await callback(data)
+            except Exception as e:
+                logger.error(f"Error applying reloaded listener definitions: {e}", exc_info=True)
+
+    def start_watching(self):
+        """Start polling the file for external edits (requires a running event loop)."""
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self.check_for_changes()
+
+    async def check_for_changes(self) -> bool:
+        """
+        Reload the file if it was changed by something other than this store.
+
+        Returns:
+            bool: Whether new definitions were loaded
+        """
+        if self._writer is not None and not self._writer.done():
+            # Our own write is in flight; its signature is recorded when it finishes
+            return False
+        signature = await asyncio.to_thread(_file_signature, self.path)
+        if signature is None or signature == self.signature:
+            return False
+        try:
+            data, signature = await asyncio.to_thread(_read_file, self.path)
+        except (ValueError, OSError) as e:
+            # Possibly caught mid-write by an editor that does not replace atomically; retry next poll
+            logger.warning(f"Ignoring unreadable listener definitions in {self.path}: {e}")
+            return False
+        self.data, self.signature = data, signature
+        self.reloads += 1
+        logger.info(f"Reloaded {len(data)} listener definitions from {self.path}")
+        await self._notify(data)
+        return True
+
+    async def close(self):
+        """Stop watching and finish pending writes."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store metrics."""
+        return {
+            'path': self.path,
+            'listeners': len(self.data or []),
+            'writes': self.writes,
+            'reloads': self.reloads,
+            'subscribers': len(self.subscribers),
+            'watching': self._watcher is not None and not self._watcher.done()
+        }
+
+_stores: Dict[str, ListenerStore] = {}
+
+def get_listener_store(path: str) -> ListenerStore:
+    """Get the shared store for a listeners file, so every reader of the file uses the same one."""
+    path = os.path.abspath(path)
+    store = _stores.get(path)
+    if store is None:
+        from config.bot_config import LISTENER_FILE_POLL_INTERVAL
+        store = _stores[path] = ListenerStore(path, poll_interval=LISTENER_FILE_POLL_INTERVAL)
+    return store
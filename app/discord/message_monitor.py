@@ -15,10 +15,16 @@ from collections import OrderedDict
 import sqlite3
 
 from utils.database import UnifiedDatabase
+from app.discord.regex_guard import check_pattern, get_regex_guard
+from app.discord.listener_store import get_listener_store
 from config.storage_config import FILES_DIRECTORY
 
 logger = logging.getLogger('discord_bot')
 
+async def _unregistered_callback(message, match):
+    """Callback of a loaded listener until one is registered at runtime."""
+    pass
+
 class LRUCache(OrderedDict):
     """LRU Cache implementation based on OrderedDict"""
     def __init__(self, capacity: int):
@@ -81,6 +87,8 @@ class MessageMonitor:
         self.encryption_key = encryption_key
         self.listeners: List[MessageListener] = []
         self.listeners_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'message_listeners.json')
+        self.listener_store = get_listener_store(self.listeners_file)
+        self._unparsed_listener_data: List[Dict[str, Any]] = []
         self.client = None  # Will be set by the bot when it initializes
         
         # Initialize caches
@@ -94,6 +102,7 @@ class MessageMonitor:
         self.max_processing_samples = 100
         
         self._load_listeners()
+        self.listener_store.subscribe(self._on_listeners_file_changed)
         logger.info(f"Loaded {len(self.listeners)} message listeners")
     
     def set_client(self, client):
@@ -101,6 +110,8 @@ class MessageMonitor:
         self.client = client
         # Also set it in the database so it can access Discord data if needed
         self.db.set_discord_client(client)
+        # The client is set from the bot's setup hook, once the event loop is running
+        self.listener_store.start_watching()
         logger.info("Discord client reference set in MessageMonitor")
 
     def get_database(self):
@@ -124,89 +135,104 @@ class MessageMonitor:
     def _load_listeners(self):
         """Load message listeners from file."""
         try:
-            if os.path.exists(self.listeners_file):
-                with open(self.listeners_file, 'r') as f:
-                    listeners_data = json.load(f)
-                
-                # Clear existing listeners
-                self.listeners = []
-                
-                # Create placeholder callback - will be replaced at runtime
-                async def placeholder_callback(message, match):
-                    logger.warning(f"Placeholder callback called for {message.content}")
-                    pass
-                
-                # Add listeners from file
-                for listener_data in listeners_data:
-                    # Use 'trigger_value' instead of 'pattern'
-                    regex_pattern = listener_data.get('trigger_value') 
-                    if not regex_pattern:
-                        logger.warning(f"Listener '{listener_data.get('name', 'Unnamed')}' is missing 'trigger_value'. Skipping.")
-                        continue
-                        
-                    # Handle case where trigger_value might be a list (for contains_any)
-                    # For simplicity in MessageListener, we'll join list triggers with | for regex
-                    # A more robust solution might involve handling trigger_type directly in process_listeners
-                    if isinstance(regex_pattern, list):
-                        # Escape special regex characters in each item before joining
-                        regex_pattern = '|'.join(re.escape(item) for item in regex_pattern)
-                    
-                    listener = MessageListener(
-                        name=listener_data['name'],
-                        # Pass the extracted/processed regex_pattern
-                        regex_pattern=regex_pattern, 
-                        callback=placeholder_callback,  # Will be replaced
-                        priority=listener_data.get('priority', 0),
-                        enabled=listener_data.get('enabled', True),
-                        # Read ignore_case from JSON, default to True if not present
-                        ignore_bot=listener_data.get('ignore_bot', True), 
-                        human_only=listener_data.get('human_only', False)
-                        # Note: ignore_case is handled by re.IGNORECASE flag during compile
-                    )
-                    # Compile regex with ignore_case flag from JSON if available
-                    ignore_case_flag = re.IGNORECASE if listener_data.get('ignore_case', True) else 0
-                    listener.regex = re.compile(listener.pattern, ignore_case_flag)
-                    
-                    self.listeners.append(listener)
-            # Sort listeners by priority (higher first) - Moved outside the loop
-            self.listeners.sort(key=lambda l: l.priority, reverse=True)
-
+            listeners_data = self.listener_store.load()
+            if listeners_data is not None:
+                self.listeners, self._unparsed_listener_data = self._build_listeners(listeners_data)
         except json.JSONDecodeError as e:
             logger.error(f"Error decoding JSON from {self.listeners_file}: {e}", exc_info=True)
         except Exception as e:
             logger.error(f"Error loading message listeners: {e}", exc_info=True)
             # Create empty file if it doesn't exist
             if not os.path.exists(self.listeners_file):
-                os.makedirs(os.path.dirname(self.listeners_file), exist_ok=True)
-                with open(self.listeners_file, 'w') as f:
-                    json.dump([], f)
+                self.listener_store.save([])
+
+    def _build_listeners(self, listeners_data: List[Dict[str, Any]]):
+        """
+        Create listeners from their stored definitions.
+        
+        Args:
+            listeners_data: Listener definitions as stored in the listeners file
+            
+        Returns:
+            tuple: (listeners sorted by priority, definitions that could not be turned into a listener)
+        """
+        # Callbacks are registered at runtime; keep them across reloads
+        callbacks = {listener.name: listener.callback for listener in self.listeners}
+        
+        listeners = []
+        unparsed = []
+        for listener_data in listeners_data:
+            # Use 'trigger_value' instead of 'pattern'
+            regex_pattern = listener_data.get('trigger_value') 
+            if not regex_pattern or not isinstance(regex_pattern, (str, list)):
+                logger.warning(f"Listener '{listener_data.get('name', 'Unnamed')}' is missing 'trigger_value'. Skipping.")
+                unparsed.append(listener_data)
+                continue
+                
+            # Handle case where trigger_value might be a list (for contains_any)
+            # For simplicity in MessageListener, we'll join list triggers with | for regex
+            # A more robust solution might involve handling trigger_type directly in process_listeners
+            if isinstance(regex_pattern, list):
+                # Escape special regex characters in each item before joining
+                regex_pattern = '|'.join(re.escape(item) for item in regex_pattern)
+            
+            try:
+                listener = MessageListener(
+                    name=listener_data['name'],
+                    # Pass the extracted/processed regex_pattern
+                    regex_pattern=regex_pattern, 
+                    callback=callbacks.get(listener_data['name'], _unregistered_callback),
+                    priority=listener_data.get('priority', 0),
+                    enabled=listener_data.get('enabled', True),
+                    # Read ignore_case from JSON, default to True if not present
+                    ignore_bot=listener_data.get('ignore_bot', True), 
+                    human_only=listener_data.get('human_only', False)
+                    # Note: ignore_case is handled by re.IGNORECASE flag during compile
+                )
+                # Compile regex with ignore_case flag from JSON if available
+                ignore_case_flag = re.IGNORECASE if listener_data.get('ignore_case', True) else 0
+                listener.regex = re.compile(listener.pattern, ignore_case_flag)
+            except (KeyError, re.error) as e:
+                logger.warning(f"Listener '{listener_data.get('name', 'Unnamed')}' could not be loaded: {e}")
+                unparsed.append(listener_data)
+                continue
+            
+            listeners.append(listener)
+        # Sort listeners by priority (higher first)
+        listeners.sort(key=lambda l: l.priority, reverse=True)
+        return listeners, unparsed
+
+    async def _on_listeners_file_changed(self, listeners_data: List[Dict[str, Any]]):
+        """Rebuild listeners off the event loop after the listeners file changed, then swap them in."""
+        listeners, unparsed = await asyncio.to_thread(self._build_listeners, listeners_data)
+        self.listeners, self._unparsed_listener_data = listeners, unparsed
+        logger.info(f"Reloaded {len(listeners)} message listeners")
 
     def save_listeners(self):
-        """Save message listeners to file."""
+        """Save message listeners to file (written atomically in the background)."""
         try:
+            # Other readers of the file (the listeners cog) store more fields; keep them
+            stored = {entry.get('name'): entry for entry in (self.listener_store.data or [])}
             listeners_data = []
             for listener in self.listeners:
                 # Save using the 'trigger_value' key to match the loading logic
-                listeners_data.append({
+                entry = dict(stored.get(listener.name, {}))
+                entry.update({
                     'name': listener.name,
-                    # Save the original pattern string used to create the listener
-                    'trigger_value': listener.pattern, 
                     'priority': listener.priority,
                     'enabled': listener.enabled,
                     'ignore_bot': listener.ignore_bot,
                     'human_only': listener.human_only,
                     # Persist ignore_case setting (derived from regex flags)
                     'ignore_case': bool(listener.regex.flags & re.IGNORECASE)
-                    # Add back other fields if needed for other cogs (description, action_type etc.)
-                    # 'description': listener_data.get('description', ''), # Example
-                    # 'action_type': listener_data.get('action_type', ''), # Example
-                    # 'action_value': listener_data.get('action_value', '') # Example
                 })
+                if entry.get('trigger_type', 'regex') == 'regex':
+                    # Save the original pattern string used to create the listener
+                    entry['trigger_value'] = listener.pattern
+                listeners_data.append(entry)
+            listeners_data.extend(self._unparsed_listener_data)
             
-            os.makedirs(os.path.dirname(self.listeners_file), exist_ok=True)
-            with open(self.listeners_file, 'w') as f:
-                json.dump(listeners_data, f, indent=2)
-            
+            self.listener_store.save(listeners_data, source=self._on_listeners_file_changed)
             logger.info(f"Saved {len(listeners_data)} message listeners")
         except Exception as e:
             logger.error(f"Error saving message listeners: {e}", exc_info=True)
@@ -228,8 +254,13 @@ class MessageMonitor:
             human_only (bool): Whether to only trigger on messages from humans
             
         Returns:
-            MessageListener: The created listener
+            MessageListener: The created listener (disabled if the pattern fails the safety checks)
         """
+        problem = check_pattern(regex_pattern, re.IGNORECASE)
+        if problem:
+            logger.warning(f"Listener '{name}' added disabled: {problem}")
+            enabled = False
+            
         listener = MessageListener(
             name=name,
             regex_pattern=regex_pattern,
@@ -334,6 +365,9 @@ class MessageMonitor:
         """
         Process a message and store it in the database with performance tracking.
         
+        Listeners are not run here; the bot dispatches live messages to
+        process_listeners through the event bus.
+        
         Args:
             message (Message): The Discord message to process
             
@@ -440,9 +474,6 @@ class MessageMonitor:
             if channel and isinstance(channel, TextChannel) and guild and channel_id not in self.channel_cache:
                 await self.store_channel(channel)
             
-            # Process message listeners in background to avoid slowing down message processing
-            asyncio.create_task(self.process_listeners(message))
-            
             # Track processing time
             process_time = time.time() - start_time
             self.processing_times.append(process_time)
@@ -499,7 +530,10 @@ class MessageMonitor:
 
     async def process_listeners(self, message: Message) -> List[str]:
         """
-        Process all message listeners on a message.
+        Run the listeners that have a callback registered at runtime on a message.
+        
+        Listeners loaded from the listeners file without one are evaluated by the
+        message listeners cog only, so each pattern is searched once per message.
         
         Args:
             message (Message): The Discord message to process
@@ -509,8 +543,9 @@ class MessageMonitor:
         """
         triggered = []
         
+        candidates = []
         for listener in self.listeners:
-            if not listener.enabled:
+            if not listener.enabled or listener.callback is _unregistered_callback:
                 continue
                 
             # Check if we should ignore this message
@@ -519,16 +554,38 @@ class MessageMonitor:
                 
             if listener.ignore_bot and message.author.bot:
                 continue
+            
+            candidates.append(listener)
+        
+        if not candidates:
+            return triggered
+        
+        # Run the patterns in the regex guard's worker so a pathological pattern can't stall the loop
+        # Strikes are kept apart from the cog's listeners of the same name
+        guard = get_regex_guard()
+        outcomes = await guard.search_many([
+            (f"monitor:{listener.name}", listener.regex.pattern, listener.regex.flags, message.content)
+            for listener in candidates
+        ])
+        
+        for listener, outcome in zip(candidates, outcomes):
+            if outcome.timed_out and guard.should_disable(outcome.key):
+                guard.mark_disabled(outcome.key)
+                # Saved through the listener store, which passes the change on to the cog
+                self.disable_listener(listener.name)
+                logger.warning(f"Disabled listener '{listener.name}' after repeatedly exceeding the regex time budget")
+                continue
+            if not outcome.matched:
+                continue
                 
-            # Check for regex pattern match
-            match = listener.regex.search(message.content)
-            if match:
-                try:
-                    logger.debug(f"Listener '{listener.name}' matched message {message.id}")
-                    await listener.callback(message, match)
-                    triggered.append(listener.name)
-                except Exception as e:
-                    logger.error(f"Error in listener '{listener.name}': {e}", exc_info=True)
+            # Match data comes from the worker's group spans; the pattern is not run again here
+            match = outcome.match(listener.regex, message.content)
+            try:
+                logger.debug(f"Listener '{listener.name}' matched message {message.id}")
+                await listener.callback(message, match)
+                triggered.append(listener.name)
+            except Exception as e:
+                logger.error(f"Error in listener '{listener.name}': {e}", exc_info=True)
         
         return triggered
 
@@ -808,6 +865,8 @@ class MessageMonitor:
         """Close the database connection and any other resources."""
         logger.debug("Closing MessageMonitor resources...")
         try:
+            # Stop watching the listeners file and finish any pending save
+            await self.listener_store.close()
             if hasattr(self, 'db') and self.db:
                 logger.debug("Closing database connection.")
                 # Await the async close method
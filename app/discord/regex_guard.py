@@ -0,0 +1,420 @@
+"""
+Time-bounded execution of admin-supplied regular expressions.
+
+Python's re engine cannot be interrupted and holds the GIL while it backtracks,
+so a single catastrophic pattern such as (a+)+$ would freeze the event loop.
+Regex listeners therefore run in a separate worker process: every search gets a
+time budget, a worker that overruns it is killed and replaced, and listeners that
+keep overrunning are reported so their owners can disable them.
+
+This module only uses the standard library so the worker process starts quickly.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional, Pattern, Sequence, Tuple
+
+logger = logging.getLogger('discord_bot')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MAX_PATTERN_LENGTH = 500
+
+# A group containing an unbounded quantifier that is itself repeated, e.g. (a+)+ or (\w+\s?)*
+_NESTED_QUANTIFIER = re.compile(r'\((?:[^()\\]|\\.)*(?<!\\)[+*](?:[^()\\]|\\.)*\)(?:[+*]|\{\d*,\d*\})')
+
+def check_pattern(pattern: str, flags: int = 0) -> Optional[str]:
+    """
+    Static checks for a listener pattern.
+
+    Args:
+        pattern (str): The regular expression
+        flags (int): re flags it will be compiled with
+
+    Returns:
+        Optional[str]: A description of the problem, or None if the pattern looks safe
+    """
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        return f"Pattern is longer than {MAX_PATTERN_LENGTH} characters."
+    try:
+        re.compile(pattern, flags)
+    except re.error as e:
+        return f"Invalid regular expression: {e}"
+    if _NESTED_QUANTIFIER.search(pattern):
+        return "Nested quantifiers such as (a+)+ can backtrack catastrophically; simplify the pattern."
+    return None
+
+def _probe_strings(pattern: str) -> List[str]:
+    """Inputs that commonly trigger exponential backtracking for a pattern."""
+    seeds = []
+    for char in pattern:
+        if char.isalnum() and char not in seeds:
+            seeds.append(char)
+        if len(seeds) >= 4:
+            break
+    seeds.extend(seed for seed in ('a', '1', ' ') if seed not in seeds)
+    probes = []
+    for seed in seeds:
+        probes.append(seed * 32 + '!')
+        probes.append((seed + ' ') * 24 + '!')
+    return probes
+
+def _worker_main():
+    """
+    Worker process loop: read batches of [pattern, flags, text] as JSON lines on stdin
+    and write [index, group spans, error] for each search as soon as it finishes.
+    """
+    cache: Dict[Tuple[str, int], Any] = {}
+    output = sys.stdout
+    output.write('"ready"\n')
+    output.flush()
+    for line in sys.stdin:
+        batch = json.loads(line)
+        for index, (pattern, flags, text) in enumerate(batch):
+            try:
+                compiled = cache.get((pattern, flags))
+                if compiled is None:
+                    if len(cache) > 512:
+                        cache.clear()
+                    compiled = cache[(pattern, flags)] = re.compile(pattern, flags)
+                match = compiled.search(text)
+                result = [index, [list(span) for span in match.regs] if match else None, None]
+            except re.error as e:
+                result = [index, None, str(e)]
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+
+class GuardedMatch:
+    """
+    The re.Match API over a match found by the worker, built from its group spans
+    without searching the text again on the event loop.
+    """
+
+    __slots__ = ('re', 'string', 'regs')
+
+    def __init__(self, pattern: Pattern, string: str, regs: Sequence[Tuple[int, int]]):
+        """
+        Args:
+            pattern (Pattern): The compiled pattern (for group names)
+            string (str): The text that was searched
+            regs: (start, end) of the whole match and of each group, (-1, -1) for groups that did not take part
+        """
+        self.re = pattern
+        self.string = string
+        self.regs = tuple(tuple(span) for span in regs)
+
+    @property
+    def pos(self) -> int:
+        return 0
+
+    @property
+    def lastindex(self) -> Optional[int]:
+        taken = [index for index, (start, _) in enumerate(self.regs) if index and start >= 0]
+        return max(taken, key=lambda index: self.regs[index][1]) if taken else None
+
+    def _index(self, group) -> int:
+        if isinstance(group, str):
+            try:
+                return self.re.groupindex[group]
+            except KeyError:
+                raise IndexError("no such group") from None
+        if not 0 <= group < len(self.regs):
+            raise IndexError("no such group")
+        return group
+
+    def _value(self, index: int, default=None):
+        start, end = self.regs[index]
+        return default if start < 0 else self.string[start:end]
+
+    def group(self, *groups):
+        if not groups:
+            return self._value(0)
+        values = tuple(self._value(self._index(group)) for group in groups)
+        return values[0] if len(values) == 1 else values
+
+    def __getitem__(self, group):
+        return self.group(group)
+
+    def groups(self, default=None) -> tuple:
+        return tuple(self._value(index, default) for index in range(1, len(self.regs)))
+
+    def groupdict(self, default=None) -> Dict[str, Any]:
+        return {name: self._value(index, default) for name, index in self.re.groupindex.items()}
+
+    def span(self, group=0) -> Tuple[int, int]:
+        return self.regs[self._index(group)]
+
+    def start(self, group=0) -> int:
+        return self.span(group)[0]
+
+    def end(self, group=0) -> int:
+        return self.span(group)[1]
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __repr__(self) -> str:
+        return f"<GuardedMatch span={self.regs[0]} match={self.group()!r}>"
+
+class RegexOutcome:
+    """Result of one guarded search."""
+
+    __slots__ = ('key', 'regs', 'timed_out', 'error', 'elapsed')
+
+    def __init__(self, key: Hashable, regs: Optional[Sequence[Tuple[int, int]]] = None, timed_out: bool = False,
+                 error: Optional[str] = None, elapsed: float = 0.0):
+        self.key = key
+        self.regs = tuple(tuple(span) for span in regs) if regs else None
+        self.timed_out = timed_out
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def matched(self) -> bool:
+        return self.regs is not None
+
+    @property
+    def span(self) -> Optional[Tuple[int, int]]:
+        """Span of the whole match, or None."""
+        return self.regs[0] if self.regs else None
+
+    def match(self, pattern: Pattern, text: str) -> Optional[GuardedMatch]:
+        """
+        Match data for callbacks, without running the pattern again.
+
+        Args:
+            pattern (Pattern): The compiled pattern that was searched
+            text (str): The text that was searched
+
+        Returns:
+            Optional[GuardedMatch]: The match, or None if the search did not match
+        """
+        return GuardedMatch(pattern, text, self.regs) if self.regs else None
+
+class _RegexWorker:
+    """
+    One worker process, started with "python -m" so it never re-imports the bot's main module.
+    Used from one thread at a time.
+    """
+
+    def __init__(self):
+        self.process = None
+        self.results = None
+        self.restarts = 0
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'app.discord.regex_guard'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=PROJECT_ROOT,
+            text=True,
+            encoding='utf-8'
+        )
+        self.results = queue.Queue()
+        threading.Thread(target=self._read_results, args=(self.process.stdout, self.results),
+                         daemon=True, name='RegexWorkerReader').start()
+        try:
+            ready = self.results.get(timeout=30)
+        except queue.Empty:
+            ready = None
+        if ready != 'ready':
+            self.stop(kill=True)
+            raise RuntimeError("Regex worker failed to start")
+
+    @staticmethod
+    def _read_results(stream, results):
+        for line in stream:
+            results.put(json.loads(line))
+        results.put(None)
+
+    def stop(self, kill: bool = False):
+        if self.process is None:
+            return
+        try:
+            if not kill:
+                self.process.stdin.close()
+                self.process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait(timeout=1)
+        self.process = None
+
+    def run_batch(self, items: Sequence[Tuple[Hashable, str, int, str]], budget: float) -> List[RegexOutcome]:
+        """Search every item, restarting the worker and moving on whenever one overruns the budget."""
+        outcomes: List[Optional[RegexOutcome]] = [None] * len(items)
+        start = 0
+        while start < len(items):
+            if self.process is None or self.process.poll() is not None:
+                self.start()
+            batch = [[pattern, flags, text] for _, pattern, flags, text in items[start:]]
+            self.process.stdin.write(json.dumps(batch) + '\n')
+            self.process.stdin.flush()
+            for offset in range(len(items) - start):
+                position = start + offset
+                began = time.perf_counter()
+                try:
+                    result = self.results.get(timeout=budget)
+                except queue.Empty:
+                    result = None
+                if result is None:
+                    outcomes[position] = RegexOutcome(items[position][0], timed_out=True, elapsed=budget)
+                    # The worker is stuck in the regex engine; the only way out is to kill it
+                    self.stop(kill=True)
+                    self.restarts += 1
+                    start = position + 1
+                    break
+                index, regs, error = result
+                outcomes[start + index] = RegexOutcome(items[start + index][0], regs=regs,
+                                                       error=error, elapsed=time.perf_counter() - began)
+            else:
+                start = len(items)
+        return outcomes
+
+class RegexGuard:
+    """
+    Runs listener regexes in worker processes with a per-search time budget.
+    """
+
+    def __init__(self, time_budget: float = 0.05, max_strikes: int = 3, workers: int = 1):
+        """
+        Args:
+            time_budget (float): Seconds a single search may take before it is abandoned
+            max_strikes (int): Timeouts after which a pattern should be disabled
+            workers (int): Number of worker processes
+        """
+        self.time_budget = time_budget
+        self.max_strikes = max_strikes
+        self.worker_count = max(1, workers)
+        self.workers: Optional[asyncio.Queue] = None
+        self.all_workers: List[_RegexWorker] = []
+
+        self.strikes: Dict[Hashable, int] = {}
+        self.disabled: Dict[Hashable, float] = {}
+        self.stats = {
+            'searches': 0,
+            'matches': 0,
+            'timeouts': 0,
+            'errors': 0,
+            'max_elapsed_ms': 0.0
+        }
+
+    def _ensure_workers(self):
+        if self.workers is None:
+            self.workers = asyncio.Queue()
+            for _ in range(self.worker_count):
+                worker = _RegexWorker()
+                self.all_workers.append(worker)
+                self.workers.put_nowait(worker)
+
+    async def search_many(self, items: Sequence[Tuple[Hashable, str, int, str]],
+                          count_strikes: bool = True, budget: Optional[float] = None) -> List[RegexOutcome]:
+        """
+        Search several (key, pattern, flags, text) items off the event loop.
+
+        Args:
+            items: Searches to run; key identifies the pattern owner for strikes
+            count_strikes (bool): Whether timeouts count towards disabling the key
+            budget (float, optional): Override the per-search time budget
+
+        Returns:
+            List[RegexOutcome]: One outcome per item, in order
+        """
+        if not items:
+            return []
+        self._ensure_workers()
+        worker = await self.workers.get()
+        try:
+            outcomes = await asyncio.to_thread(worker.run_batch, list(items), budget or self.time_budget)
+        finally:
+            self.workers.put_nowait(worker)
+
+        for outcome in outcomes:
+            self.stats['searches'] += 1
+            self.stats['max_elapsed_ms'] = max(self.stats['max_elapsed_ms'], outcome.elapsed * 1000)
+            if outcome.timed_out:
+                self.stats['timeouts'] += 1
+                if count_strikes:
+                    self.strikes[outcome.key] = self.strikes.get(outcome.key, 0) + 1
+                    logger.warning(f"Regex for '{outcome.key}' exceeded its {self.time_budget * 1000:.0f}ms budget "
+                                   f"({self.strikes[outcome.key]}/{self.max_strikes})")
+            elif outcome.error:
+                self.stats['errors'] += 1
+            elif outcome.matched:
+                self.stats['matches'] += 1
+        return outcomes
+
+    async def validate(self, pattern: str, flags: int = 0) -> Optional[str]:
+        """
+        Check a pattern before it is saved: static checks, then a timed run against inputs
+        that commonly cause catastrophic backtracking.
+
+        Probes run one at a time and stop at the first that overruns the budget, so
+        rejecting a pattern costs at most one time budget (plus a worker start).
+
+        Returns:
+            Optional[str]: A description of the problem, or None if the pattern is acceptable
+        """
+        problem = check_pattern(pattern, flags)
+        if problem:
+            return problem
+        for probe in _probe_strings(pattern):
+            outcome, = await self.search_many([('validate', pattern, flags, probe)], count_strikes=False)
+            if outcome.timed_out:
+                return (f"Pattern took longer than {self.time_budget * 1000:.0f}ms on a short test input "
+                        "and would stall the bot; simplify it.")
+        return None
+
+    def should_disable(self, key: Hashable) -> bool:
+        """Whether a key has exceeded its budget often enough to be disabled."""
+        return key not in self.disabled and self.strikes.get(key, 0) >= self.max_strikes
+
+    def mark_disabled(self, key: Hashable):
+        """Record that the owner disabled a key."""
+        self.disabled[key] = time.time()
+
+    def reset(self, key: Hashable):
+        """Forget strikes for a key (after it was edited or re-enabled)."""
+        self.strikes.pop(key, None)
+        self.disabled.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get guard metrics."""
+        stats = dict(self.stats)
+        stats['worker_restarts'] = sum(worker.restarts for worker in self.all_workers)
+        stats['strikes'] = dict(self.strikes)
+        stats['disabled'] = list(self.disabled)
+        return stats
+
+    def close(self):
+        """Stop all worker processes."""
+        for worker in self.all_workers:
+            worker.stop()
+
+_default_guard: Optional[RegexGuard] = None
+
+def get_regex_guard() -> RegexGuard:
+    """Get the process-wide RegexGuard configured from bot settings."""
+    global _default_guard
+    if _default_guard is None:
+        from config.bot_config import (
+            REGEX_LISTENER_TIME_BUDGET_MS, REGEX_LISTENER_MAX_STRIKES, REGEX_LISTENER_WORKERS
+        )
+        _default_guard = RegexGuard(
+            time_budget=REGEX_LISTENER_TIME_BUDGET_MS / 1000,
+            max_strikes=REGEX_LISTENER_MAX_STRIKES,
+            workers=REGEX_LISTENER_WORKERS
+        )
+    return _default_guard
+
+if __name__ == "__main__":
+    _worker_main()
@@ -0,0 +1,253 @@
+"""
+Compiled response templates and persistent counters for message listener actions.
+
+A template such as "🎲 {user} rolled a {random.number:1:20}!" is parsed once, when
+the listener is created or loaded, into a render plan: a tuple of literal strings
+and variable renderers. Rendering is then a single pass over the plan, and text
+that comes from the message itself (e.g. a user typing "{user}") is never
+substituted again.
+
+{count:name} counters are kept in memory and written to the database in batches
+by a periodic flush, so a busy reply listener never waits on disk.
+"""
+
+import asyncio
+import logging
+import random
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import discord
+
+logger = logging.getLogger('discord_bot')
+
+_VARIABLE = re.compile(r'\{([^{}]+)\}')
+_RANDOM_NUMBER = re.compile(r'random\.number:(\d+):(\d+)$')
+_COUNTER = re.compile(r'count:([\w.-]{1,64})$')
+
+Renderer = Callable[[discord.Message, Optional['CounterStore']], str]
+
+_SIMPLE_VARIABLES: Dict[str, Renderer] = {
+    'user': lambda message, counters: message.author.display_name,
+    'user.mention': lambda message, counters: message.author.mention,
+    'user.id': lambda message, counters: str(message.author.id),
+    'channel': lambda message, counters: getattr(message.channel, 'name', 'Unknown'),
+    'guild': lambda message, counters: getattr(message.guild, 'name', 'Unknown'),
+    'message': lambda message, counters: message.content,
+    'message.id': lambda message, counters: str(message.id),
+    'timestamp': lambda message, counters: discord.utils.format_dt(discord.utils.utcnow())
+}
+
+def _random_number(low: int, high: int) -> Renderer:
+    if low > high:
+        low, high = high, low
+    return lambda message, counters: str(random.randint(low, high))
+
+def _counter(name: str) -> Renderer:
+    def render(message, counters):
+        if counters is None:
+            return '0'
+        return str(counters.increment(message.guild.id if message.guild else 0, name))
+    return render
+
+class ResponseTemplate:
+    """
+    A response template parsed into literal text and variable renderers.
+
+    Supported variables:
+    - {user}, {user.mention}, {user.id}
+    - {channel}, {guild}
+    - {message}, {message.id}
+    - {timestamp}
+    - {random.number:min:max} - Random number between min and max
+    - {count:name} - Increment and show a per-server counter with the given name
+
+    Unknown variables are left in the output unchanged.
+    """
+
+    __slots__ = ('source', 'plan', 'counter_names')
+
+    def __init__(self, source: str):
+        """
+        Parse a template.
+
+        Args:
+            source (str): The template text
+        """
+        self.source = source
+        plan: List[Union[str, Renderer]] = []
+        self.counter_names: List[str] = []
+        position = 0
+        for match in _VARIABLE.finditer(source):
+            renderer = self._compile_variable(match.group(1))
+            if renderer is None:
+                # Unknown variables stay in the surrounding literal text
+                continue
+            if match.start() > position:
+                plan.append(source[position:match.start()])
+            plan.append(renderer)
+            position = match.end()
+        if position < len(source):
+            plan.append(source[position:])
+        self.plan: Tuple[Union[str, Renderer], ...] = tuple(plan)
+
+    def _compile_variable(self, name: str) -> Optional[Renderer]:
+        renderer = _SIMPLE_VARIABLES.get(name)
+        if renderer is not None:
+            return renderer
+        match = _RANDOM_NUMBER.match(name)
+        if match:
+            return _random_number(int(match.group(1)), int(match.group(2)))
+        match = _COUNTER.match(name)
+        if match:
+            self.counter_names.append(match.group(1))
+            return _counter(match.group(1))
+        return None
+
+    @property
+    def is_static(self) -> bool:
+        """Whether the template has no variables at all."""
+        return all(isinstance(part, str) for part in self.plan)
+
+    def render(self, message: discord.Message, counters: Optional['CounterStore'] = None) -> str:
+        """
+        Render the template for a message.
+
+        Args:
+            message (discord.Message): The message that triggered the listener
+            counters (CounterStore, optional): Store for {count:name} variables
+
+        Returns:
+            str: The rendered response
+        """
+        return ''.join([part if isinstance(part, str) else part(message, counters) for part in self.plan])
+
+def compile_template(value: Any) -> Optional[ResponseTemplate]:
+    """
+    Compile a template if the value is text.
+
+    Returns:
+        Optional[ResponseTemplate]: The compiled template, or None for non-string values
+    """
+    return ResponseTemplate(value) if isinstance(value, str) else None
+
+class CounterStore:
+    """
+    In-memory listener counters, persisted to the database in periodic batches.
+
+    Counters are keyed by (guild ID, name). Increments are served from memory and
+    accumulate as pending deltas; flush() writes all pending deltas in one
+    transaction, so counts survive restarts without touching disk per message.
+    """
+
+    def __init__(self, db=None, flush_interval: float = 30.0):
+        """
+        Args:
+            db (UnifiedDatabase, optional): Database to persist counters in; memory only if None
+            flush_interval (float): Seconds between background flushes
+        """
+        self.db = db
+        self.flush_interval = flush_interval
+        self.values: Dict[Tuple[int, str], int] = {}
+        self.pending: Dict[Tuple[int, str], int] = {}
+        self.loaded = False
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        # Statistics
+        self.increments = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+
+    def increment(self, guild_id: int, name: str, amount: int = 1) -> int:
+        """
+        Increment a counter in memory.
+
+        Returns:
+            int: The new counter value
+        """
+        key = (guild_id, name)
+        value = self.values.get(key, 0) + amount
+        self.values[key] = value
+        self.pending[key] = self.pending.get(key, 0) + amount
+        self.increments += 1
+        return value
+
+    def get(self, guild_id: int, name: str) -> int:
+        """Get the current value of a counter."""
+        return self.values.get((guild_id, name), 0)
+
+    async def load(self):
+        """Load persisted counters, keeping any increments made before loading finished."""
+        if self.db is None or self.loaded:
+            return
+        try:
+            rows = await self.db.get_listener_counters()
+        except Exception as e:
+            logger.error(f"Error loading listener counters: {e}", exc_info=True)
+            return
+        for guild_id, name, value in rows:
+            key = (int(guild_id), name)
+            self.values[key] = value + self.pending.get(key, 0)
+        self.loaded = True
+        logger.debug(f"Loaded {len(rows)} listener counters")
+
+    async def flush(self) -> int:
+        """
+        Write pending increments to the database in one batch.
+
+        Returns:
+            int: Number of counters written
+        """
+        if self.db is None or not self.pending:
+            return 0
+        async with self._flush_lock:
+            batch, self.pending = self.pending, {}
+            rows = [(str(guild_id), name, delta) for (guild_id, name), delta in batch.items()]
+            try:
+                written = await self.db.add_listener_counters(rows)
+            except Exception as e:
+                written = 0
+                logger.error(f"Error flushing listener counters: {e}", exc_info=True)
+            if not written:
+                # Put the deltas back so the next flush retries them
+                for key, delta in batch.items():
+                    self.pending[key] = self.pending.get(key, 0) + delta
+                return 0
+            self.flushes += 1
+            self.rows_flushed += written
+            return written
+
+    def start(self):
+        """Start the background flush loop (loads persisted values first)."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        await self.load()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if not self.loaded:
+                await self.load()
+            await self.flush()
+
+    async def close(self):
+        """Stop the flush loop and write any pending increments."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get counter metrics."""
+        return {
+            'counters': len(self.values),
+            'pending': len(self.pending),
+            'increments': self.increments,
+            'flushes': self.flushes,
+            'rows_flushed': self.rows_flushed
+        }
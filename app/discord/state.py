@@ -1,15 +1,31 @@
 import asyncio
+from collections import OrderedDict
 from datetime import datetime, timedelta
+import json
 import logging
+import os
+import sqlite3
 import time
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+from utils.token_counter import count_message_tokens
+from config.ai_config import AI_CONTEXT_TRIM_STEP
 
 logger = logging.getLogger('discord_bot')  # Updated logger name for consistency
 
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
 class UserState:
     """
     Keeps track of a user's state including context, history, and timing.
+    
+    The context of an idle user can be packed into a compressed blob; it is
+    unpacked transparently on the next access.
     """
     
+    __slots__ = ('user_id', 'timeout', '_context', '_packed', 'token_counts', 'last_access',
+                 'max_context_items', 'dirty')
+    
     def __init__(self, user_id: str, timeout: int = 3600):
         """
         Initialize user state.
@@ -20,10 +36,64 @@ class UserState:
         """
         self.user_id = user_id
         self.timeout = timeout
-        self.context = []  # List of prompts and responses
+        self._context = []  # List of prompts and responses
+        self._packed: Optional[bytes] = None  # Compressed context while the user is idle
+        # Token counts of each context entry by provider, computed on first use
+        self.token_counts: List[Dict[str, int]] = []
         self.last_access = time.time()
         # Set a maximum context size to prevent memory issues
         self.max_context_items = 20
+        # Changed since the last snapshot
+        self.dirty = False
+    
+    @classmethod
+    def from_snapshot(cls, user_id: str, timeout: int, last_access: float, packed: bytes) -> 'UserState':
+        """Recreate a user state from a snapshot taken with packed_context()."""
+        state = cls(user_id, timeout)
+        state.last_access = last_access
+        state._packed = packed
+        return state
+    
+    @property
+    def context(self) -> list:
+        """The prompts and responses of the conversation (unpacked on access)."""
+        if self._packed is not None:
+            self._context = json.loads(zlib.decompress(self._packed))
+            self.token_counts = [{} for _ in self._context]
+            self._packed = None
+        return self._context
+    
+    @context.setter
+    def context(self, value: list):
+        self._context = value
+        self._packed = None
+        self.dirty = True
+    
+    def pack(self) -> bool:
+        """
+        Compress the context until it is next used.
+        
+        Returns:
+            bool: Whether the context was packed
+        """
+        if self._packed is not None or not self._context:
+            return False
+        self._packed = self.packed_context()
+        self._context = []
+        self.token_counts = []
+        return True
+    
+    def packed_context(self) -> bytes:
+        """The context as a compressed blob."""
+        if self._packed is not None:
+            return self._packed
+        return zlib.compress(json.dumps(self._context, separators=(',', ':')).encode('utf-8'))
+    
+    def memory_size(self) -> int:
+        """Approximate bytes held by the context."""
+        if self._packed is not None:
+            return len(self._packed)
+        return sum(len(entry["content"]) + 64 for entry in self._context)
         
     def add_prompt(self, role: str, content: str):
         """
@@ -38,28 +108,79 @@ class UserState:
         
         # Add prompt to context
         self.context.append({"role": role, "content": content})
+        self.token_counts.append({})
+        self.dirty = True
         
         # Limit context size to prevent memory issues
         if len(self.context) > self.max_context_items:
-            # Remove oldest messages, but keep at least one system message if present
-            system_messages = [i for i in range(len(self.context)) if self.context[i]["role"] == "system"]
-            if system_messages and system_messages[0] == 0:
-                # Keep the first system message and remove the next oldest message
-                self.context.pop(1)
-            else:
-                # No system message at the start, so just remove the oldest message
-                self.context.pop(0)
+            # Remove oldest messages, but keep the first system message if present
+            first = 1 if self.context[0]["role"] == "system" else 0
+            # A step at a time, so the start of the conversation (the prefix providers
+            # cache) stays the same for several turns instead of changing every turn
+            drop = max(len(self.context) - self.max_context_items,
+                       min(AI_CONTEXT_TRIM_STEP, len(self.context) - first - 1))
+            del self.context[first:first + drop]
+            del self.token_counts[first:first + drop]
+    
+    def entry_tokens(self, index: int, provider: Optional[str] = None) -> int:
+        """
+        Get the token count of a context entry, counting it only once per provider.
+        
+        Args:
+            index (int): Position of the entry in the context
+            provider (str, optional): Provider whose tokenizer to count with
+            
+        Returns:
+            int: Number of tokens
+        """
+        counts = self.token_counts[index]
+        key = provider or ''
+        if key not in counts:
+            counts[key] = count_message_tokens(self.context[index], provider)
+        return counts[key]
+    
+    def context_tokens(self, provider: Optional[str] = None) -> int:
+        """Get the token count of the whole context."""
+        return sum(self.entry_tokens(index, provider) for index in range(len(self.context)))
         
-    def get_context(self) -> list:
+    def get_context(self, provider: Optional[str] = None, token_budget: Optional[int] = None,
+                    trim_step: int = 1) -> list:
         """
-        Get the current context.
+        Get the current context, optionally trimmed to a token budget.
         
+        Trimming keeps the newest entries that fit the budget (always at least the
+        latest one) and a leading system entry. A trimmed context never starts with
+        an assistant entry, which some providers reject. Entries are dropped
+        trim_step at a time, so the trimmed context keeps the same start (and
+        providers can keep serving it from their prompt cache) for several turns.
+        
+        Args:
+            provider (str, optional): Provider whose tokenizer to count with
+            token_budget (int, optional): Maximum tokens of the returned context
+            trim_step (int): Entries dropped at a time when trimming
+            
         Returns:
             list: List of prompt dictionaries
         """
         # Update last access time
         self.last_access = time.time()
-        return self.context
+        if not token_budget or not self.context:
+            return self.context
+        
+        pinned = 1 if self.context[0]["role"] == "system" else 0
+        remaining = token_budget - sum(self.entry_tokens(index, provider) for index in range(pinned))
+        start = len(self.context) - 1
+        remaining -= self.entry_tokens(start, provider)
+        while start > pinned and self.entry_tokens(start - 1, provider) <= remaining:
+            start -= 1
+            remaining -= self.entry_tokens(start, provider)
+        if trim_step > 1 and start > pinned:
+            start = min(pinned + -(-(start - pinned) // trim_step) * trim_step, len(self.context) - 1)
+        while start < len(self.context) - 1 and self.context[start]["role"] == "assistant":
+            start += 1
+        if start == pinned:
+            return self.context
+        return self.context[:pinned] + self.context[start:]
         
     def has_timed_out(self) -> bool:
         """
@@ -70,27 +191,117 @@ class UserState:
         """
         return time.time() - self.last_access > self.timeout
         
+    def get_summary(self) -> Optional[str]:
+        """Get the rolling summary of compacted turns, if any."""
+        if self.context and self.context[0]["role"] == "system" and self.context[0]["content"].startswith(SUMMARY_PREFIX):
+            return self.context[0]["content"][len(SUMMARY_PREFIX):]
+        return None
+    
+    def compactable_entries(self, keep_recent: int) -> list:
+        """
+        Get the older turns that compaction would fold into the rolling summary.
+        
+        The newest keep_recent entries stay verbatim, and the retained part always
+        starts with a user turn.
+        
+        Args:
+            keep_recent (int): Number of newest entries to keep
+            
+        Returns:
+            list: The entries to fold (empty if there is nothing to compact)
+        """
+        pinned = 1 if self.context and self.context[0]["role"] == "system" else 0
+        end = len(self.context) - keep_recent
+        while pinned < end < len(self.context) and self.context[end]["role"] != "user":
+            end += 1
+        if end <= pinned or end >= len(self.context):
+            return []
+        return self.context[pinned:end]
+    
+    def apply_compaction(self, folded: list, summary: str):
+        """
+        Replace folded turns with a rolling summary entry at the start of the context.
+        
+        Turns added while the summary was being written are kept; folded turns that
+        were already dropped are ignored.
+        
+        Args:
+            folded (list): The entries the summary covers
+            summary (str): The new rolling summary (covering any previous summary too)
+        """
+        folded_ids = {id(entry) for entry in folded}
+        if not any(id(entry) in folded_ids for entry in self.context):
+            # The context was cleared (or reloaded) while the summary was being written
+            return
+        if self.get_summary() is not None:
+            folded_ids.add(id(self.context[0]))
+        kept = [(entry, counts) for entry, counts in zip(self.context, self.token_counts) if id(entry) not in folded_ids]
+        self.context = [{"role": "system", "content": SUMMARY_PREFIX + summary}] + [entry for entry, _ in kept]
+        self.token_counts = [{}] + [counts for _, counts in kept]
+        
     def clear_context(self):
         """Clear the context"""
         self.context = []
+        self.token_counts = []
         self.last_access = time.time()
 
 class BotState:
     """
     Keeps track of the bot's state, including user states.
+    
+    User states are kept in least recently used order, so expiry and eviction only
+    look at the oldest users. Idle users' contexts are compressed. When a memory cap
+    is set, the least recently used users are evicted once it is exceeded. With a
+    database path, conversations are snapshotted to SQLite periodically and restored
+    after a restart, and evicted users are reloaded from there on their next request.
     """
     
-    def __init__(self, timeout: int = 3600):
+    def __init__(self, timeout: int = 3600, compress_after: float = 300.0, max_memory_bytes: int = 0,
+                 db_path: Optional[str] = None, snapshot_interval: float = 60.0):
         """
         Initialize bot state.
         
         Args:
             timeout (int): Time in seconds before user history is cleared
+            compress_after (float): Idle seconds before a user's context is compressed
+            max_memory_bytes (int): Approximate memory cap for contexts (0 for no cap)
+            db_path (str, optional): SQLite file for snapshots (memory only when None)
+            snapshot_interval (float): Seconds between maintenance passes and snapshots
         """
-        self.users = {}  # Dictionary of user states
+        self.users: "OrderedDict[str, UserState]" = OrderedDict()  # Least recently used first
         self.timeout = timeout
-        self.last_cleanup = time.time()
-        self.cleanup_interval = 300  # 5 minutes between cleanups
+        self.compress_after = compress_after
+        self.max_memory_bytes = max_memory_bytes
+        self.db_path = db_path
+        self.snapshot_interval = snapshot_interval
+        # Users to delete from the snapshot, and evicted users whose changes are not written yet
+        self.removed: Set[str] = set()
+        self.unsaved: Dict[str, Tuple[float, bytes]] = {}
+        # Users in the snapshot that are not in memory
+        self.persisted: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        
+        # Statistics
+        self.expired = 0
+        self.evicted = 0
+        self.packed = 0
+        self.restored = 0
+        self.snapshots = 0
+        
+        if self.db_path:
+            self._init_db()
+    
+    def _init_db(self):
+        try:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS user_state ("
+                    "user_id TEXT PRIMARY KEY, last_access REAL NOT NULL, context BLOB NOT NULL)"
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Disabling user state snapshots at {self.db_path}: {e}")
+            self.db_path = None
         
     def get_user_state(self, user_id: str) -> UserState:
         """
@@ -102,28 +313,195 @@ class BotState:
         Returns:
             UserState: The user's state
         """
-        # Run periodic cleanup to prevent memory leaks
-        if time.time() - self.last_cleanup > self.cleanup_interval:
-            self._cleanup()
+        # Expire timed out users; only the least recently used ones are looked at
+        self._cleanup()
+            
+        # Get, restore or create user state
+        state = self.users.get(user_id)
+        if state is None:
+            state = self._restore(user_id) or UserState(user_id, self.timeout)
+            self.users[user_id] = state
+        else:
+            self.users.move_to_end(user_id)
+        state.last_access = time.time()
+        return state
+    
+    async def load_user_state(self, user_id: str) -> UserState:
+        """
+        Get a user's state, reading an evicted user's snapshot in a worker thread.
+        
+        Callers on the event loop use this instead of get_user_state, which would
+        read the snapshot database on the loop.
+        
+        Args:
+            user_id (str): Discord user ID
             
-        # Get or create user state
-        if user_id not in self.users:
-            self.users[user_id] = UserState(user_id, self.timeout)
-        return self.users[user_id]
+        Returns:
+            UserState: The user's state
+        """
+        if user_id not in self.users and user_id in self.persisted and user_id not in self.unsaved:
+            try:
+                row = await asyncio.to_thread(self._db_fetch, user_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Error restoring state of user {user_id}: {e}")
+                row = None
+            # The user may have been restored or cleared while the row was read
+            if user_id not in self.users and user_id in self.persisted:
+                self.persisted.discard(user_id)
+                state = self._from_row(user_id, row, unsaved=False) if row else None
+                if state is not None:
+                    self.users[user_id] = state
+        return self.get_user_state(user_id)
         
     def _cleanup(self):
         """Clean up timed out user states"""
-        timed_out_users = []
-        for user_id, state in self.users.items():
-            if state.has_timed_out():
-                timed_out_users.append(user_id)
-        
-        # Remove timed out users
-        for user_id in timed_out_users:
+        while self.users:
+            user_id, state = next(iter(self.users.items()))
+            if not state.has_timed_out():
+                break
             del self.users[user_id]
-            
-        # Update last cleanup time
-        self.last_cleanup = time.time()
+            self.removed.add(user_id)
+            self.expired += 1
+    
+    def _restore(self, user_id: str) -> Optional[UserState]:
+        """Reload an evicted user from the snapshot (load_user_state reads it off the loop first)."""
+        if user_id not in self.persisted:
+            return None
+        self.persisted.discard(user_id)
+        row = self.unsaved.pop(user_id, None)
+        unsaved = row is not None
+        if row is None:
+            try:
+                row = self._db_fetch(user_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Error restoring state of user {user_id}: {e}")
+                return None
+            if row is None:
+                return None
+        return self._from_row(user_id, row, unsaved)
+    
+    def _db_fetch(self, user_id: str) -> Optional[tuple]:
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(
+                "SELECT last_access, context FROM user_state WHERE user_id = ?", (user_id,)
+            ).fetchone()
+    
+    def _from_row(self, user_id: str, row: tuple, unsaved: bool) -> Optional[UserState]:
+        """A restored user state from its snapshot row, or None if it has expired since."""
+        state = UserState.from_snapshot(user_id, self.timeout, row[0], row[1])
+        if state.has_timed_out():
+            self.removed.add(user_id)
+            return None
+        # Changes made before the eviction still need writing
+        state.dirty = unsaved
+        self.restored += 1
+        return state
+    
+    def maintain(self):
+        """Expire timed out users, compress idle ones and enforce the memory cap."""
+        self._cleanup()
+        now = time.time()
+        for state in self.users.values():
+            if now - state.last_access < self.compress_after:
+                break
+            if state.pack():
+                self.packed += 1
+        if not self.max_memory_bytes:
+            return
+        total = sum(state.memory_size() for state in self.users.values())
+        while total > self.max_memory_bytes and len(self.users) > 1:
+            user_id, state = self.users.popitem(last=False)
+            total -= state.memory_size()
+            self.evicted += 1
+            if self.db_path:
+                if state.dirty:
+                    self.unsaved[user_id] = (state.last_access, state.packed_context())
+                self.persisted.add(user_id)
+    
+    async def load(self):
+        """Restore the conversations of the last snapshot (compressed until used)."""
+        if not self.db_path:
+            return
+        try:
+            rows = await asyncio.to_thread(self._db_load, time.time() - self.timeout)
+        except sqlite3.Error as e:
+            logger.error(f"Error loading user state snapshot: {e}", exc_info=True)
+            return
+        for user_id, last_access, packed in rows:
+            if user_id not in self.users:
+                self.users[user_id] = UserState.from_snapshot(user_id, self.timeout, last_access, packed)
+        # Keep least recently used order across restored and new users
+        for user_id in sorted(self.users, key=lambda uid: self.users[uid].last_access):
+            self.users.move_to_end(user_id)
+        logger.info(f"Restored {len(rows)} conversations from the user state snapshot")
+    
+    def _db_load(self, expired_before: float) -> list:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM user_state WHERE last_access <= ?", (expired_before,))
+            return conn.execute(
+                "SELECT user_id, last_access, context FROM user_state ORDER BY last_access"
+            ).fetchall()
+    
+    async def snapshot(self) -> int:
+        """
+        Write changed conversations to the snapshot and delete expired ones.
+        
+        Returns:
+            int: Number of conversations written
+        """
+        if not self.db_path:
+            return 0
+        changed = [state for state in self.users.values() if state.dirty]
+        rows = [(user_id, last_access, packed) for user_id, (last_access, packed) in self.unsaved.items()]
+        rows += [(state.user_id, state.last_access, state.packed_context()) for state in changed]
+        removed = [user_id for user_id in self.removed if user_id not in self.users]
+        if not rows and not removed:
+            return 0
+        for state in changed:
+            state.dirty = False
+        unsaved, self.unsaved = self.unsaved, {}
+        self.removed = set()
+        try:
+            await asyncio.to_thread(self._db_write, rows, removed)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing user state snapshot: {e}", exc_info=True)
+            for state in changed:
+                state.dirty = True
+            self.unsaved.update(unsaved)
+            self.removed.update(removed)
+            return 0
+        self.snapshots += 1
+        return len(rows)
+    
+    def _db_write(self, rows: list, removed: list):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO user_state (user_id, last_access, context) VALUES (?, ?, ?)", rows
+            )
+            conn.executemany("DELETE FROM user_state WHERE user_id = ?", [(user_id,) for user_id in removed])
+    
+    def start(self):
+        """Start the background maintenance and snapshot loop (restores the last snapshot first)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._maintenance_loop())
+    
+    async def _maintenance_loop(self):
+        await self.load()
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            self.maintain()
+            await self.snapshot()
+    
+    async def close(self):
+        """Stop the maintenance loop and write a final snapshot."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.snapshot()
     
     def clear_user_state(self, user_id: str):
         """
@@ -134,6 +512,10 @@ class BotState:
         """
         if user_id in self.users:
             self.users[user_id].clear_context()
+        elif user_id in self.persisted:
+            self.persisted.discard(user_id)
+            self.unsaved.pop(user_id, None)
+            self.removed.add(user_id)
             
     def get_user_count(self) -> int:
         """
@@ -142,4 +524,16 @@ class BotState:
         Returns:
             int: Number of active users
         """
-        return len(self.users)
\ No newline at end of file
+        return len(self.users)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get user state metrics."""
+        return {
+            'users': len(self.users),
+            'persisted_only': len(self.persisted),
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'packed': self.packed,
+            'restored': self.restored,
+            'snapshots': self.snapshots
+        }
@@ -0,0 +1,239 @@
+"""
+Progressive Discord replies for streamed AI responses.
+
+A StreamingReply turns a stream of text deltas into a reply that grows as the
+model writes. The first delta replaces the deferred "thinking" reply right away.
+After that, edits are throttled to one per interval, so a fast stream never
+exceeds Discord's message edit rate limit. Text past Discord's 2,000 character
+limit rolls over into a new follow-up message.
+
+A StreamingEmbeds reply shows several streamed answers side by side, one embed
+each, in a single message that is edited on the same throttle.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import discord
+
+logger = logging.getLogger('discord_bot')
+
+MESSAGE_LIMIT = 2000
+# Discord's limits on an embed's description and on the text of all embeds of a message
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBEDS_TOTAL_LIMIT = 6000
+# Characters of each embed kept free for its title and footer
+EMBED_OVERHEAD = 100
+
+class StreamingReply:
+    """
+    A follow-up reply to an interaction that is edited as text streams in.
+    """
+
+    def __init__(self, interaction: discord.Interaction, header: str = "",
+                 edit_interval: float = 1.2, limit: int = MESSAGE_LIMIT):
+        """
+        Args:
+            interaction (discord.Interaction): The deferred interaction to reply to
+            header (str): Text shown before the streamed text (e.g. the echoed prompt)
+            edit_interval (float): Minimum seconds between edits of the reply
+            limit (int): Characters per message before rolling over to a new one
+        """
+        self.interaction = interaction
+        self.header = header
+        self.edit_interval = edit_interval
+        self.limit = limit
+        self.text = ""
+        self.messages: List[discord.Message] = []
+        self._shown: List[str] = []
+
+        self._changed = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._renderer: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.edits = 0
+
+    async def feed(self, delta: str):
+        """Append a delta; the reply is updated at the next allowed edit."""
+        if not delta:
+            return
+        self.text += delta
+        self._changed.set()
+        if self._renderer is None:
+            self._renderer = asyncio.create_task(self._render_loop())
+
+    async def finish(self) -> str:
+        """
+        Show the complete text and stop rendering.
+
+        Returns:
+            str: The complete streamed text, stripped
+        """
+        self._finished.set()
+        self._changed.set()
+        if self._renderer is not None:
+            await self._renderer
+        else:
+            await self._render()
+        return self.text.strip()
+
+    async def replace(self, content: str):
+        """
+        Replace the streamed text with other text (e.g. a summary), keeping the header.
+
+        The first message is edited and any rolled-over messages are deleted.
+        """
+        await self.finish()
+        self.text = content
+        pages = self._pages(content)
+        while len(self.messages) > len(pages):
+            message = self.messages.pop()
+            self._shown.pop()
+            try:
+                await message.delete()
+            except discord.HTTPException as e:
+                logger.warning(f"Could not delete rolled-over reply message: {e}")
+        for index, page in enumerate(pages):
+            if not await self._show(index, page):
+                break
+
+    async def _render_loop(self):
+        while not self._finished.is_set():
+            await self._changed.wait()
+            self._changed.clear()
+            await self._render()
+            try:
+                # Wait out the edit interval, unless the stream finishes first
+                await asyncio.wait_for(self._finished.wait(), self.edit_interval)
+            except asyncio.TimeoutError:
+                pass
+        await self._render()
+
+    def _pages(self, body: str) -> List[str]:
+        content = f"{self.header}{body.strip()}" or "\u200b"
+        return [content[i:i + self.limit] for i in range(0, len(content), self.limit)]
+
+    async def _render(self):
+        for index, page in enumerate(self._pages(self.text)):
+            if not await self._show(index, page):
+                break
+
+    async def _show(self, index: int, page: str) -> bool:
+        if index < len(self._shown) and self._shown[index] == page:
+            return True
+        try:
+            if index < len(self.messages):
+                await self.messages[index].edit(content=page)
+                self._shown[index] = page
+                self.edits += 1
+            else:
+                message = await self.interaction.followup.send(page, wait=True)
+                self.messages.append(message)
+                self._shown.append(page)
+            return True
+        except discord.HTTPException as e:
+            # Leave the page as it was; the next render tries again
+            logger.warning(f"Failed to update streamed reply: {e}")
+            return False
+
+class StreamingEmbeds:
+    """
+    A follow-up message with one embed per answer, edited as the answers stream in.
+    """
+
+    def __init__(self, interaction: discord.Interaction, titles: Dict[str, str], header: str = "",
+                 edit_interval: float = 1.2):
+        """
+        Args:
+            interaction (discord.Interaction): The deferred interaction to reply to
+            titles (Dict[str, str]): Embed title of each answer, in display order
+            header (str): Message content above the embeds (e.g. the echoed prompt)
+            edit_interval (float): Minimum seconds between edits of the message
+        """
+        self.interaction = interaction
+        self.titles = dict(titles)
+        self.header = header
+        self.edit_interval = edit_interval
+        # All embeds of a message share Discord's total limit
+        self.panel_limit = min(EMBED_DESCRIPTION_LIMIT, EMBEDS_TOTAL_LIMIT // max(1, len(titles)) - EMBED_OVERHEAD)
+        self.texts: Dict[str, str] = {key: "" for key in titles}
+        self.footers: Dict[str, str] = {key: "Waiting..." for key in titles}
+        self.message: Optional[discord.Message] = None
+        self._shown = None
+
+        self._changed = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._renderer: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.edits = 0
+
+    async def feed(self, key: str, delta: str):
+        """Append a delta to an answer; the message is updated at the next allowed edit."""
+        if not delta:
+            return
+        self.texts[key] += delta
+        self.footers[key] = "Writing..."
+        self._update()
+
+    async def complete(self, key: str, text: str, footer: str = ""):
+        """Show the final text of an answer, with a footer such as its latency."""
+        self.texts[key] = text
+        self.footers[key] = footer
+        self._update()
+
+    async def finish(self):
+        """Show every answer as it stands and stop rendering."""
+        self._finished.set()
+        self._changed.set()
+        if self._renderer is not None:
+            await self._renderer
+        else:
+            await self._render()
+
+    def _update(self):
+        self._changed.set()
+        if self._renderer is None:
+            self._renderer = asyncio.create_task(self._render_loop())
+
+    async def _render_loop(self):
+        while not self._finished.is_set():
+            await self._changed.wait()
+            self._changed.clear()
+            await self._render()
+            try:
+                # Wait out the edit interval, unless the answers finish first
+                await asyncio.wait_for(self._finished.wait(), self.edit_interval)
+            except asyncio.TimeoutError:
+                pass
+        await self._render()
+
+    def _embeds(self) -> List[discord.Embed]:
+        embeds = []
+        for key, title in self.titles.items():
+            text = self.texts[key].strip() or "\u200b"
+            if len(text) > self.panel_limit:
+                text = text[:self.panel_limit - 3] + "..."
+            embed = discord.Embed(title=title, description=text, color=discord.Color.blue())
+            if self.footers[key]:
+                embed.set_footer(text=self.footers[key])
+            embeds.append(embed)
+        return embeds
+
+    async def _render(self):
+        embeds = self._embeds()
+        shown = [embed.to_dict() for embed in embeds]
+        if shown == self._shown:
+            return
+        try:
+            if self.message is None:
+                self.message = await self.interaction.followup.send(self.header or None, embeds=embeds, wait=True)
+            else:
+                await self.message.edit(content=self.header or None, embeds=embeds)
+                self.edits += 1
+            self._shown = shown
+        except discord.HTTPException as e:
+            # Leave the message as it was; the next render tries again
+            logger.warning(f"Failed to update streamed embeds: {e}")
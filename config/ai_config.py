@@ -1,5 +1,5 @@
 import os
-from config.base import logger
+from config.base import logger, BASE_DATA_DIRECTORY
 
 # AI API keys
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
@@ -17,6 +17,34 @@ GROK_MODEL = os.getenv('GROK_MODEL', 'grok-3-beta')
 # Default to Google's model for backward compatibility
 SUMMARIZATION_MODEL = os.getenv('SUMMARIZATION_MODEL', 'gemini-2.0-flash-lite')
 SUMMARIZATION_PROVIDER = os.getenv('SUMMARIZATION_PROVIDER', 'google')  # Options: google, openai, claude, grok
+# Fall back to (and hedge with) the other configured providers when the summarization provider fails or is slow
+SUMMARIZATION_FALLBACK = os.getenv('SUMMARIZATION_FALLBACK', 'true').lower() == 'true'
+# How long answers are summarized:
+#   extractive - local sentence extraction only, no second model call
+#   refine     - local summary at once, replaced by a model summary written in the background
+#   llm        - wait for a model summary before replying
+SUMMARY_MODE = os.getenv('SUMMARY_MODE', 'refine').lower()
+# Ask models to end long answers with their own summary, so one completion gives both
+AI_INLINE_SUMMARY = os.getenv('AI_INLINE_SUMMARY', 'false').lower() == 'true'
+
+# Output length of /ask answers by where they are shown (0 keeps the model's MAX_TOKENS / asks for no length)
+#   direct  - read in full in the conversation (DMs), so kept to a few Discord messages
+#   channel - the user sees a summary and the full answer goes to the guild's response channel
+#   fan_out - one of the side-by-side answers of /ask all, which share a message's embed space
+RESPONSE_LENGTHS = {
+    'direct': (
+        int(os.getenv('DIRECT_RESPONSE_MAX_TOKENS', '1200')),
+        int(os.getenv('DIRECT_RESPONSE_MAX_CHARS', '4000'))
+    ),
+    'channel': (
+        int(os.getenv('CHANNEL_RESPONSE_MAX_TOKENS', '2048')),
+        int(os.getenv('CHANNEL_RESPONSE_MAX_CHARS', '0'))
+    ),
+    'fan_out': (
+        int(os.getenv('FAN_OUT_RESPONSE_MAX_TOKENS', '600')),
+        int(os.getenv('FAN_OUT_RESPONSE_MAX_CHARS', '1400'))
+    ),
+}
 
 # System prompts
 GPT_SYSTEM_PROMPT = "You are a helpful, friendly AI assistant. Provide accurate and concise information."
@@ -24,6 +52,53 @@ GOOGLE_SYSTEM_PROMPT = "You are Google's Gemini AI model, designed to be helpful
 CLAUDE_SYSTEM_PROMPT = "You are Claude, an AI assistant created by Anthropic. Respond to queries with the eloquence and creativity of a poet while remaining helpful and accurate."
 GROK_SYSTEM_PROMPT = "You are Grok, an AI made by xAI. You have a humorous and witty personality. Provide answers that are accurate but with a touch of humor."
 
+# Threads for provider SDK calls that have no async form
+AI_EXECUTOR_MAX_WORKERS = int(os.getenv('AI_EXECUTOR_MAX_WORKERS', '8'))
+
+# Provider-side prompt caching: Claude requests carry cache breakpoints (cache writes cost
+# more than plain input, reads much less); the other providers cache identical prefixes on their own
+AI_PROMPT_CACHING = os.getenv('AI_PROMPT_CACHING', 'true').lower() == 'true'
+# Conversations over the context budget are trimmed by this many entries at a time, so their
+# start (the cached prefix) stays the same for several turns instead of moving every turn
+AI_CONTEXT_TRIM_STEP = int(os.getenv('AI_CONTEXT_TRIM_STEP', '6'))
+
+# Streamed /ask replies: edits are throttled to stay inside Discord's message edit rate limit
+AI_STREAMING_ENABLED = os.getenv('AI_STREAMING_ENABLED', 'true').lower() == 'true'
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.2'))  # Seconds between edits
+
+# Shared HTTP connection pools of the provider clients
+AI_HTTP2 = os.getenv('AI_HTTP2', 'true').lower() == 'true'  # Used when the h2 package is installed
+AI_HTTP_MAX_CONNECTIONS = int(os.getenv('AI_HTTP_MAX_CONNECTIONS', '100'))  # Per provider
+AI_HTTP_MAX_KEEPALIVE = int(os.getenv('AI_HTTP_MAX_KEEPALIVE', '20'))  # Idle connections kept per provider
+AI_HTTP_KEEPALIVE_EXPIRY = float(os.getenv('AI_HTTP_KEEPALIVE_EXPIRY', '120'))  # Seconds an idle connection is kept
+AI_PREWARM = os.getenv('AI_PREWARM', 'true').lower() == 'true'  # Open provider connections at startup
+AI_WARMUP_INTERVAL = float(os.getenv('AI_WARMUP_INTERVAL', '45'))  # Idle seconds before a connection is refreshed (0 disables)
+
+# AI response cache
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '500'))
+AI_CACHE_MAX_BYTES = int(os.getenv('AI_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', '3600'))  # Seconds
+AI_CACHE_PERSIST = os.getenv('AI_CACHE_PERSIST', 'false').lower() == 'true'
+AI_CACHE_DB_PATH = os.getenv('AI_CACHE_DB_PATH', os.path.join(BASE_DATA_DIRECTORY, 'db', 'ai_response_cache.db'))
+
+# Provider admission queue: seconds a call may wait for capacity before it is turned away
+AI_QUEUE_DEADLINE = float(os.getenv('AI_QUEUE_DEADLINE', '30'))  # Interactive commands
+AI_BACKGROUND_QUEUE_DEADLINE = float(os.getenv('AI_BACKGROUND_QUEUE_DEADLINE', '120'))  # Summaries
+
+# Provider health: circuit breakers, retries of transient errors and hedged requests
+AI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('AI_CIRCUIT_FAILURE_THRESHOLD', '5'))  # Consecutive failures
+AI_CIRCUIT_OPEN_SECONDS = float(os.getenv('AI_CIRCUIT_OPEN_SECONDS', '30'))
+AI_CIRCUIT_MAX_OPEN_SECONDS = float(os.getenv('AI_CIRCUIT_MAX_OPEN_SECONDS', '300'))
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '2'))
+AI_MAX_RETRY_WAIT = float(os.getenv('AI_MAX_RETRY_WAIT', '20'))  # Longest Retry-After we wait out
+AI_HEDGE_PERCENTILE = float(os.getenv('AI_HEDGE_PERCENTILE', '95'))  # Latency percentile before hedging
+AI_HEDGE_DEFAULT_DELAY = float(os.getenv('AI_HEDGE_DEFAULT_DELAY', '8'))  # Seconds, until latencies are known
+
+# Background compaction of long conversations into a rolling summary
+CONTEXT_COMPACTION_ENABLED = os.getenv('CONTEXT_COMPACTION_ENABLED', 'true').lower() == 'true'
+CONTEXT_COMPACTION_TRIGGER_TOKENS = int(os.getenv('CONTEXT_COMPACTION_TRIGGER_TOKENS', '3000'))
+CONTEXT_COMPACTION_KEEP_RECENT = int(os.getenv('CONTEXT_COMPACTION_KEEP_RECENT', '6'))  # Entries kept verbatim
+
 # AI Provider Configuration Classes
 class OpenAIConfig:
     MODEL = OPENAI_MODEL
@@ -33,6 +108,14 @@ class OpenAIConfig:
     FREQUENCY_PENALTY = float(os.getenv('OPENAI_FREQUENCY_PENALTY', '0.0'))
     PRESENCE_PENALTY = float(os.getenv('OPENAI_PRESENCE_PENALTY', '0.0'))
     TIMEOUT = int(os.getenv('OPENAI_TIMEOUT', '60'))  # Seconds
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('OPENAI_CONTEXT_TOKEN_BUDGET', '8000'))  # Prompt tokens sent per request
+    # Admission limits (0 disables a limit)
+    MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '8'))
+    RPM = int(os.getenv('OPENAI_RPM', '500'))  # Requests per minute
+    TPM = int(os.getenv('OPENAI_TPM', '200000'))  # Tokens per minute
+    IMAGE_TIMEOUT = int(os.getenv('OPENAI_IMAGE_TIMEOUT', '120'))  # Seconds
+    IMAGE_MAX_CONCURRENCY = int(os.getenv('OPENAI_IMAGE_MAX_CONCURRENCY', '2'))
+    IMAGE_RPM = int(os.getenv('OPENAI_IMAGE_RPM', '5'))
 
 class GoogleConfig:
     MODEL = GOOGLE_GENAI_MODEL
@@ -40,6 +123,12 @@ class GoogleConfig:
     MAX_OUTPUT_TOKENS = int(os.getenv('GOOGLE_MAX_OUTPUT_TOKENS', '4096'))
     TOP_P = float(os.getenv('GOOGLE_TOP_P', '0.95'))
     TOP_K = int(os.getenv('GOOGLE_TOP_K', '64'))
+    TIMEOUT = int(os.getenv('GOOGLE_TIMEOUT', '60'))  # Seconds
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('GOOGLE_CONTEXT_TOKEN_BUDGET', '16000'))  # Prompt tokens sent per request
+    # Admission limits (0 disables a limit)
+    MAX_CONCURRENCY = int(os.getenv('GOOGLE_MAX_CONCURRENCY', '8'))
+    RPM = int(os.getenv('GOOGLE_RPM', '1000'))  # Requests per minute
+    TPM = int(os.getenv('GOOGLE_TPM', '1000000'))  # Tokens per minute
     
 class ClaudeConfig:
     MODEL = CLAUDE_MODEL
@@ -47,6 +136,12 @@ class ClaudeConfig:
     MAX_TOKENS = int(os.getenv('CLAUDE_MAX_TOKENS', '1000'))
     TOP_P = float(os.getenv('CLAUDE_TOP_P', '1.0'))
     TOP_K = int(os.getenv('CLAUDE_TOP_K', '5'))
+    TIMEOUT = int(os.getenv('CLAUDE_TIMEOUT', '60'))  # Seconds
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('CLAUDE_CONTEXT_TOKEN_BUDGET', '8000'))  # Prompt tokens sent per request
+    # Admission limits (0 disables a limit)
+    MAX_CONCURRENCY = int(os.getenv('CLAUDE_MAX_CONCURRENCY', '4'))
+    RPM = int(os.getenv('CLAUDE_RPM', '50'))  # Requests per minute
+    TPM = int(os.getenv('CLAUDE_TPM', '50000'))  # Tokens per minute
     
 class GrokConfig:
     MODEL = GROK_MODEL
@@ -54,11 +149,18 @@ class GrokConfig:
     MAX_TOKENS = int(os.getenv('GROK_MAX_TOKENS', '2048'))
     TOP_P = float(os.getenv('GROK_TOP_P', '0.95'))
     FREQUENCY_PENALTY = float(os.getenv('GROK_FREQUENCY_PENALTY', '0.0'))
+    TIMEOUT = int(os.getenv('GROK_TIMEOUT', '60'))  # Seconds
+    CONTEXT_TOKEN_BUDGET = int(os.getenv('GROK_CONTEXT_TOKEN_BUDGET', '8000'))  # Prompt tokens sent per request
+    # Admission limits (0 disables a limit)
+    MAX_CONCURRENCY = int(os.getenv('GROK_MAX_CONCURRENCY', '4'))
+    RPM = int(os.getenv('GROK_RPM', '60'))  # Requests per minute
+    TPM = int(os.getenv('GROK_TPM', '100000'))  # Tokens per minute
 
 # Summarization-specific configurations
 class SummarizationConfig:
     PROVIDER = SUMMARIZATION_PROVIDER
     MODEL = SUMMARIZATION_MODEL
+    TIMEOUT = int(os.getenv('SUMMARIZATION_TIMEOUT', '30'))  # Seconds
     
     # OpenAI summarization settings
     OPENAI_TEMPERATURE = float(os.getenv('SUMMARIZATION_OPENAI_TEMPERATURE', '0.3'))
@@ -24,4 +24,34 @@ PREVIOUS_ROLE_COLORS_FILE = os.path.join(BASE_DATA_DIRECTORY, 'previous_role_col
 MESSAGE_LISTENERS_FILE = os.path.join(BASE_DATA_DIRECTORY, 'message_listeners.json')
 ASCII_EMOJI_FILE = os.path.join(BASE_DATA_DIRECTORY, 'static', 'ascii_emoji.json')
 TASK_EXAMPLES_FILE = os.path.join(BASE_DATA_DIRECTORY, 'static', 'task_examples.json')
-TASKS_FILE = os.path.join(BASE_DATA_DIRECTORY, 'tasks.json')
\ No newline at end of file
+TASKS_FILE = os.path.join(BASE_DATA_DIRECTORY, 'tasks.json')
+
+# Channel history backfill settings
+ENABLE_HISTORY_BACKFILL = os.getenv('ENABLE_HISTORY_BACKFILL', 'true').lower() == 'true'
+BACKFILL_MAX_CONCURRENCY = int(os.getenv('BACKFILL_MAX_CONCURRENCY', '4'))  # Channels crawled at once
+BACKFILL_REQUESTS_PER_SECOND = float(os.getenv('BACKFILL_REQUESTS_PER_SECOND', '4.0'))  # History pages per second
+BACKFILL_LOOKBACK_DAYS = int(os.getenv('BACKFILL_LOOKBACK_DAYS', '7'))  # Window for channels with no checkpoint
+BACKFILL_CHECKPOINTS_FILE = os.path.join(BASE_DATA_DIRECTORY, 'backfill_checkpoints.json')
+
+# Conversation state of AI commands
+USER_STATE_TIMEOUT = int(os.getenv('USER_STATE_TIMEOUT', '3600'))  # Idle seconds before a conversation is forgotten
+USER_STATE_COMPRESS_AFTER = float(os.getenv('USER_STATE_COMPRESS_AFTER', '300'))  # Idle seconds before a conversation is compressed
+USER_STATE_MAX_MEMORY_BYTES = int(os.getenv('USER_STATE_MAX_MEMORY_BYTES', str(32 * 1024 * 1024)))  # 0 for no cap
+USER_STATE_PERSIST = os.getenv('USER_STATE_PERSIST', 'true').lower() == 'true'
+USER_STATE_DB_PATH = os.getenv('USER_STATE_DB_PATH', os.path.join(BASE_DATA_DIRECTORY, 'db', 'user_state.db'))
+USER_STATE_SNAPSHOT_INTERVAL = float(os.getenv('USER_STATE_SNAPSHOT_INTERVAL', '60'))  # Seconds between snapshots
+
+# Regex listener safety settings
+REGEX_LISTENER_TIME_BUDGET_MS = int(os.getenv('REGEX_LISTENER_TIME_BUDGET_MS', '50'))  # Per-search budget
+REGEX_LISTENER_MAX_STRIKES = int(os.getenv('REGEX_LISTENER_MAX_STRIKES', '3'))  # Timeouts before a listener is disabled
+REGEX_LISTENER_WORKERS = int(os.getenv('REGEX_LISTENER_WORKERS', '1'))  # Worker processes for regex matching
+
+# Message listener {count:name} counters
+LISTENER_COUNTER_FLUSH_INTERVAL = float(os.getenv('LISTENER_COUNTER_FLUSH_INTERVAL', '30'))  # Seconds between {count:name} flushes
+
+# Message listener action sends (Discord allows roughly 5 messages per 5 seconds per channel)
+LISTENER_SENDS_PER_WINDOW = int(os.getenv('LISTENER_SENDS_PER_WINDOW', '5'))
+LISTENER_SEND_WINDOW = float(os.getenv('LISTENER_SEND_WINDOW', '5'))
+
+# Message listener definitions file
+LISTENER_FILE_POLL_INTERVAL = float(os.getenv('LISTENER_FILE_POLL_INTERVAL', '2'))  # Seconds between checks for edits to the listeners file
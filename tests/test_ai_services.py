@@ -0,0 +1,262 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from utils.ai_services import (
+    ClaudeStrategy, OpenAIStrategy, ProviderTimeout, call_provider,
+    InlineSummaryFilter, split_inline_summary, fan_out_responses, ResponseMetrics, SummarizationStrategy
+)
+
+def make_completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+class FakeAsyncCompletions:
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        return make_completion(kwargs['messages'][-1]['content'])
+
+class FakeSyncCompletions:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def create(self, **kwargs):
+        time.sleep(self.delay)
+        return make_completion("sync")
+
+def make_client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+class TestCallProvider(unittest.TestCase):
+    def test_concurrent_requests_overlap(self):
+        strategy = OpenAIStrategy(make_client(FakeAsyncCompletions(0.3)), Mock())
+
+        async def run():
+            started = time.perf_counter()
+            results = await asyncio.gather(*(
+                strategy.generate_response([{"role": "user", "content": f"q{index}"}], "system")
+                for index in range(10)
+            ))
+            return results, time.perf_counter() - started
+
+        results, elapsed = asyncio.run(run())
+        self.assertEqual(results, [f"q{index}" for index in range(10)])
+        self.assertLess(elapsed, 1.5)
+
+    def test_blocking_sdk_runs_off_the_event_loop(self):
+        completions = FakeSyncCompletions(0.3)
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            await asyncio.gather(*(call_provider(completions.create, 5, messages=[]) for _ in range(4)))
+            task.cancel()
+            return ticks
+
+        self.assertGreater(asyncio.run(run()), 5)
+
+    def test_timeout_is_reported_to_the_user(self):
+        strategy = OpenAIStrategy(make_client(FakeAsyncCompletions(5)), Mock())
+        with patch('utils.ai_services.OpenAIConfig.TIMEOUT', 0.1):
+            result = asyncio.run(strategy.generate_response([{"role": "user", "content": "q"}], "system"))
+        self.assertIn("no response within 0.1 seconds", result)
+
+        with self.assertRaises(ProviderTimeout):
+            asyncio.run(call_provider(FakeAsyncCompletions(5).create, 0.05, messages=[]))
+
+class FakeAsyncStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+class TestStreamResponse(unittest.TestCase):
+    def collect(self, strategy):
+        async def run():
+            return [delta async for delta in strategy.stream_response([{"role": "user", "content": "q"}], "system")]
+        return asyncio.run(run())
+
+    def test_openai_deltas(self):
+        chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+            for text in ["Hel", None, "lo"]
+        ] + [SimpleNamespace(choices=[])]
+
+        async def create(**kwargs):
+            self.assertTrue(kwargs['stream'])
+            return FakeAsyncStream(chunks)
+
+        client = make_client(SimpleNamespace(create=create))
+        self.assertEqual(self.collect(OpenAIStrategy(client, Mock())), ["Hel", "lo"])
+
+    def test_claude_deltas_from_blocking_client_and_errors_mid_stream(self):
+        def events():
+            yield SimpleNamespace(type='message_start')
+            yield SimpleNamespace(type='content_block_delta', delta=SimpleNamespace(text="Roses"))
+            raise RuntimeError("connection reset")
+
+        client = SimpleNamespace(messages=SimpleNamespace(create=lambda **kwargs: events()))
+        deltas = self.collect(ClaudeStrategy(client, Mock()))
+        self.assertEqual(deltas[0], "Roses")
+        self.assertEqual(deltas[1], "\n\nSorry, an error occurred while contacting Claude: connection reset")
+
+class TestResponseMetrics(unittest.TestCase):
+    def test_generate_response_carries_usage_and_latency(self):
+        async def create(**kwargs):
+            await asyncio.sleep(0.02)
+            response = make_completion("answer")
+            response.usage = SimpleNamespace(prompt_tokens=120, completion_tokens=30, total_tokens=150,
+                                             prompt_tokens_details=SimpleNamespace(cached_tokens=64))
+            return response
+
+        client = make_client(SimpleNamespace(create=create))
+        result = asyncio.run(OpenAIStrategy(client, Mock()).generate_response([{"role": "user", "content": "q"}], "system"))
+        self.assertEqual(result, "answer")
+        metrics = result.metrics
+        self.assertEqual((metrics.prompt_tokens, metrics.completion_tokens, metrics.cached_tokens), (120, 30, 64))
+        self.assertEqual(metrics.total_tokens, 150)
+        self.assertGreaterEqual(metrics.latency, 0.02)
+        self.assertEqual(metrics.time_to_first_token, metrics.latency)
+
+    def test_summaries_carry_metrics(self):
+        async def create(**kwargs):
+            response = make_completion("summary")
+            response.usage = SimpleNamespace(prompt_tokens=80, completion_tokens=10, total_tokens=90)
+            return response
+
+        strategy = SummarizationStrategy(make_client(SimpleNamespace(create=create)), Mock(), provider='openai')
+        result = asyncio.run(strategy.generate_response([{"role": "user", "content": "q"}], "summarize"))
+        self.assertEqual(result, "summary")
+        self.assertEqual((result.metrics.prompt_tokens, result.metrics.completion_tokens), (80, 10))
+        self.assertIsNotNone(result.metrics.latency)
+
+    def test_stream_fills_time_to_first_token_and_usage(self):
+        chunks = [SimpleNamespace(type='message_start', message=SimpleNamespace(
+                      usage=SimpleNamespace(input_tokens=10, output_tokens=1, cache_read_input_tokens=90,
+                                            cache_creation_input_tokens=0))),
+                  SimpleNamespace(type='content_block_delta', delta=SimpleNamespace(text="Roses")),
+                  SimpleNamespace(type='message_delta', usage=SimpleNamespace(output_tokens=12))]
+
+        async def create(**kwargs):
+            return FakeAsyncStream(chunks)
+
+        async def run():
+            metrics = ResponseMetrics()
+            client = SimpleNamespace(messages=SimpleNamespace(create=create))
+            deltas = [delta async for delta in ClaudeStrategy(client, Mock()).stream_response([{"role": "user", "content": "q"}], "system", metrics)]
+            return deltas, metrics
+
+        deltas, metrics = asyncio.run(run())
+        self.assertEqual(deltas, ["Roses"])
+        self.assertEqual((metrics.prompt_tokens, metrics.cached_tokens, metrics.completion_tokens), (100, 90, 12))
+        self.assertLessEqual(metrics.time_to_first_token, metrics.latency)
+        self.assertEqual(metrics.to_dict()['total_tokens'], 112)
+
+class TestOutputLength(unittest.TestCase):
+    def test_max_tokens_is_lowered_on_a_copy(self):
+        strategy = OpenAIStrategy(None, Mock())
+        limited = strategy.with_max_tokens(300)
+        self.assertEqual(limited._request([], "")['max_tokens'], 300)
+        self.assertEqual(strategy._request([], "")['max_tokens'], strategy.max_tokens)
+        self.assertNotEqual(limited.cache_key([], ""), strategy.cache_key([], ""))
+
+    def test_configured_limit_is_never_raised(self):
+        strategy = ClaudeStrategy(None, Mock())
+        self.assertIs(strategy.with_max_tokens(strategy.max_tokens + 1), strategy)
+        self.assertIs(strategy.with_max_tokens(0), strategy)
+
+class TestInlineSummary(unittest.TestCase):
+    def test_split_answer_and_summary(self):
+        self.assertEqual(split_inline_summary("Long answer.\n[[SUMMARY]]\nShort."), ("Long answer.", "Short."))
+        self.assertEqual(split_inline_summary("Long answer.\n**[[Summary]]**: Short."), ("Long answer.", "Short."))
+        self.assertEqual(split_inline_summary("Just an answer."), ("Just an answer.", None))
+
+    def test_unusable_summaries_fall_back(self):
+        self.assertEqual(split_inline_summary("Answer.\n[[SUMMARY]]\n" + "x" * 50, limit=10), ("Answer.", None))
+        self.assertEqual(split_inline_summary("Answer.\n[[SUMMARY]]\n"), ("Answer.", None))
+        self.assertEqual(split_inline_summary("[[SUMMARY]] Only a summary."), ("Only a summary.", None))
+
+    def test_stream_filter_holds_back_the_summary(self):
+        inline = InlineSummaryFilter()
+        deltas = ["The answer [1] is", " long.\n[[SUM", "MARY]]\nThe", " summary."]
+        shown = "".join(inline.feed(delta) for delta in deltas) + inline.flush()
+        self.assertEqual(shown.rstrip(), "The answer [1] is long.")
+        self.assertEqual(split_inline_summary(inline.text), ("The answer [1] is long.", "The summary."))
+
+    def test_stream_filter_without_marker_shows_everything(self):
+        inline = InlineSummaryFilter()
+        shown = inline.feed("See [docs") + inline.feed("] for more") + inline.flush()
+        self.assertEqual(shown, "See [docs] for more")
+
+class FakeStrategy:
+    def __init__(self, delay, text):
+        self.delay = delay
+        self.text = text
+
+    async def generate_response(self, context, system_prompt):
+        await asyncio.sleep(self.delay)
+        if isinstance(self.text, Exception):
+            raise self.text
+        return f"{system_prompt}: {self.text}"
+
+    async def stream_response(self, context, system_prompt, metrics=None):
+        for word in self.text.split():
+            await asyncio.sleep(self.delay)
+            yield word + " "
+
+class TestFanOut(unittest.TestCase):
+    def test_answers_arrive_in_completion_order(self):
+        requests = {
+            'slow': (FakeStrategy(0.2, "slow answer"), "s"),
+            'fast': (FakeStrategy(0.01, "fast answer"), "f"),
+            'broken': (FakeStrategy(0.05, RuntimeError("boom")), "b")
+        }
+
+        async def run():
+            started = time.monotonic()
+            answers = [answer async for answer in fan_out_responses(requests, [])]
+            return answers, time.monotonic() - started
+
+        answers, elapsed = asyncio.run(run())
+        self.assertEqual([provider for provider, _, _ in answers], ['fast', 'broken', 'slow'])
+        self.assertEqual(answers[0][1], "f: fast answer")
+        self.assertEqual(answers[1][1], "Sorry, an error occurred: boom")
+        self.assertLess(answers[0][2], answers[2][2])
+        # Concurrent, so about as long as the slowest provider rather than the sum
+        self.assertLess(elapsed, 0.2 + 0.15)
+
+    def test_streams_deltas_per_provider(self):
+        requests = {
+            'a': (FakeStrategy(0.01, "one two"), ""),
+            'b': (FakeStrategy(0.01, "three"), "")
+        }
+        deltas = []
+
+        async def on_delta(provider, delta):
+            deltas.append((provider, delta))
+
+        async def run():
+            return {provider: text async for provider, text, _ in fan_out_responses(requests, [], on_delta)}
+
+        self.assertEqual(asyncio.run(run()), {'a': "one two", 'b': "three"})
+        self.assertEqual([delta for provider, delta in deltas if provider == 'a'], ["one ", "two "])
+
+if __name__ == '__main__':
+    unittest.main()
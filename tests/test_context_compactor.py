@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+
+from app.discord.context_compactor import ContextCompactor
+from app.discord.state import UserState, SUMMARY_PREFIX
+
+def make_state(turns=6):
+    state = UserState("1")
+    for index in range(turns):
+        state.add_prompt("user", f"question {index} " + "x" * 200)
+        state.add_prompt("assistant", f"answer {index} " + "y" * 200)
+    return state
+
+class TestContextCompactor(unittest.TestCase):
+    def test_folds_older_turns_into_a_rolling_summary(self):
+        prompts = []
+
+        async def summarize(prompt):
+            prompts.append(prompt)
+            return f"summary {len(prompts)}"
+
+        async def run():
+            state = make_state()
+            compactor = ContextCompactor(summarize, trigger_tokens=100, keep_recent=4)
+            await compactor.maybe_compact(state)
+            self.assertEqual(state.context[0], {"role": "system", "content": SUMMARY_PREFIX + "summary 1"})
+            self.assertEqual([entry["content"][:10] for entry in state.context[1:]],
+                             ["question 4", "answer 4 y", "question 5", "answer 5 y"])
+            self.assertEqual(len(state.token_counts), len(state.context))
+
+            # The next compaction folds the previous summary into the new one
+            state.add_prompt("user", "question 6 " + "x" * 200)
+            state.add_prompt("assistant", "answer 6 " + "y" * 200)
+            await compactor.maybe_compact(state)
+            self.assertIn("Previous summary:\nsummary 1", prompts[1])
+            self.assertEqual(state.get_summary(), "summary 2")
+            self.assertEqual(len(state.context), 5)
+            self.assertEqual(compactor.get_stats()['compactions'], 2)
+
+        asyncio.run(run())
+
+    def test_keeps_turns_added_during_compaction(self):
+        release = None
+
+        async def summarize(prompt):
+            await release.wait()
+            return "summary"
+
+        async def run():
+            nonlocal release
+            release = asyncio.Event()
+            state = make_state()
+            compactor = ContextCompactor(summarize, trigger_tokens=100, keep_recent=2)
+            task = compactor.maybe_compact(state)
+            await asyncio.sleep(0)
+            # Only one compaction per user at a time
+            self.assertIsNone(compactor.maybe_compact(state))
+            state.add_prompt("user", "new question")
+            release.set()
+            await task
+            self.assertEqual(state.get_summary(), "summary")
+            self.assertEqual(state.context[-1]["content"], "new question")
+            self.assertEqual(len(state.context), 4)
+
+        asyncio.run(run())
+
+    def test_failed_summary_keeps_the_context(self):
+        async def summarize(prompt):
+            return None
+
+        async def run():
+            state = make_state()
+            before = list(state.context)
+            compactor = ContextCompactor(summarize, trigger_tokens=100, keep_recent=2)
+            await compactor.maybe_compact(state)
+            self.assertEqual(state.context, before)
+            self.assertEqual(compactor.get_stats()['failures'], 1)
+
+        asyncio.run(run())
+
+    def test_short_context_is_not_compacted(self):
+        async def summarize(prompt):
+            raise AssertionError("should not summarize")
+
+        async def run():
+            compactor = ContextCompactor(summarize, trigger_tokens=10000, keep_recent=4)
+            self.assertIsNone(compactor.maybe_compact(make_state(turns=2)))
+
+        asyncio.run(run())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+from cryptography.fernet import Fernet
+
+from utils.database import UnifiedDatabase, _latency_summary, prepare_message_row
+
+# ai_interactions as created before per-response metrics were stored
+OLD_AI_INTERACTIONS = """
+CREATE TABLE ai_interactions (
+    interaction_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, user_name TEXT NOT NULL,
+    guild_id TEXT NOT NULL, channel_id TEXT NOT NULL, model TEXT NOT NULL,
+    prompt_encrypted TEXT NOT NULL, response_encrypted TEXT NOT NULL, timestamp TEXT NOT NULL,
+    tokens_used INTEGER, execution_time REAL, metadata_encrypted TEXT
+)
+"""
+
+class TestAIInteractionMetrics(unittest.TestCase):
+    def test_metrics_are_stored_and_aggregated_per_model_per_day(self):
+        async def run(path):
+            database = UnifiedDatabase(path, Fernet.generate_key().decode())
+            await database.initialize()
+            try:
+                for index in range(20):
+                    stored = await database.store_ai_interaction({
+                        'interaction_id': str(index), 'user_id': '1', 'user_name': 'user', 'guild_id': 'g',
+                        'channel_id': 'c', 'model': 'Claude' if index % 2 else 'Grok', 'prompt': 'p',
+                        'response': 'r', 'timestamp': datetime.now().isoformat(),
+                        # One cached response (no execution time) that must not count
+                        'execution_time': 0.0 if index == 0 else index / 10,
+                        'time_to_first_token': index / 100, 'prompt_tokens': 100,
+                        'completion_tokens': 20, 'cached_tokens': 80, 'tokens_used': 120
+                    })
+                    self.assertTrue(stored)
+                return await database.get_ai_stats(days=7)
+            finally:
+                await database.close()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bot.db')
+            # Tables from before the metric columns existed are migrated in place
+            connection = sqlite3.connect(path)
+            connection.execute(OLD_AI_INTERACTIONS)
+            connection.close()
+            stats = asyncio.run(run(path))
+
+        latency = {entry['model']: entry for entry in stats['ai_latency']}
+        self.assertEqual(sorted(latency), ['Claude', 'Grok'])
+        self.assertEqual(latency['Grok']['count'], 9)
+        self.assertEqual(latency['Claude']['latency_p50'], 0.9)
+        self.assertEqual(latency['Claude']['latency_p95'], 1.9)
+        self.assertEqual(latency['Claude']['ttft_p95'], 0.19)
+        self.assertEqual(latency['Claude']['prompt_tokens'], 1000)
+        self.assertEqual(latency['Claude']['cached_tokens'], 800)
+
+    def test_summary_without_timings(self):
+        summary = _latency_summary([("2024-01-01", "GPT", 0.5, None, None, None, None)])
+        self.assertEqual(summary[0]['latency_p50'], 0.5)
+        self.assertIsNone(summary[0]['ttft_p50'])
+        self.assertEqual(summary[0]['prompt_tokens'], 0)
+
+class TestStoreMessageRows(unittest.TestCase):
+    def test_bot_rows_are_dropped_unless_tracked(self):
+        async def run(path):
+            key = Fernet.generate_key().decode()
+            database = UnifiedDatabase(path, key)
+            await database.initialize()
+            database.track_bot_messages = False
+            try:
+                rows = [prepare_message_row(key, {
+                    'message_id': str(index), 'channel_id': '1', 'guild_id': '2', 'author_id': '3',
+                    'author_name': 'author', 'content': 'hi', 'timestamp': '2024-01-01T00:00:00',
+                    'is_bot': index == 0
+                }) for index in range(3)]
+                return await database.store_message_rows(rows)
+            finally:
+                await database.close()
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(asyncio.run(run(os.path.join(directory, 'bot.db'))), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+
+from app.discord.event_bus import MessageEventBus, MessageFilter
+
+def make_message(content="hello", channel_id=1, guild_id=10, bot=False, role_ids=(), mention_ids=()):
+    message = Mock()
+    message.id = 12345
+    message.content = content
+    message.author.id = 99
+    message.author.bot = bot
+    message.author.roles = [Mock(id=role_id) for role_id in role_ids]
+    message.channel.id = channel_id
+    message.guild = Mock(id=guild_id) if guild_id else None
+    message.mentions = [Mock(id=user_id) for user_id in mention_ids]
+    return message
+
+class TestMessageEventBus(unittest.TestCase):
+    def setUp(self):
+        self.bus = MessageEventBus(logger=Mock())
+        self.bus.set_bot_user_id(555)
+        self.calls = []
+
+    def handler(self, name):
+        async def _handler(context):
+            self.calls.append(name)
+        return _handler
+
+    def dispatch(self, message):
+        return asyncio.run(self.bus.dispatch(message))
+
+    def test_context_is_normalized_once(self):
+        context = self.dispatch(make_message("Hello <@555>", role_ids=(7, 8), mention_ids=(555,)))
+        self.assertEqual(context.lowered, "hello <@555>")
+        self.assertEqual(context.role_ids, frozenset({7, 8}))
+        self.assertTrue(context.mentions_bot)
+
+    def test_bots_only_reach_subscribers_that_include_them(self):
+        self.bus.subscribe('humans', self.handler('humans'))
+        self.bus.subscribe('everyone', self.handler('everyone'), MessageFilter(include_bots=True))
+        self.dispatch(make_message(bot=True))
+        self.assertEqual(self.calls, ['everyone'])
+
+    def test_priority_order_across_scopes(self):
+        self.bus.subscribe('global', self.handler('global'), priority=0)
+        self.bus.subscribe('channel', self.handler('channel'), MessageFilter(channel_ids=[1]), priority=10)
+        self.bus.subscribe('guild', self.handler('guild'), MessageFilter(guild_ids=[10]), priority=5)
+        self.bus.subscribe('other_channel', self.handler('other_channel'), MessageFilter(channel_ids=[2]), priority=20)
+        self.dispatch(make_message(channel_id=1, guild_id=10))
+        self.assertEqual(self.calls, ['channel', 'guild', 'global'])
+
+    def test_content_role_and_mention_filters(self):
+        self.bus.subscribe('prefix', self.handler('prefix'), MessageFilter(prefixes=('!',)))
+        self.bus.subscribe('keyword', self.handler('keyword'), MessageFilter(keywords=('THANKS',)))
+        self.bus.subscribe('role', self.handler('role'), MessageFilter(role_ids=[7]))
+        self.bus.subscribe('no_role', self.handler('no_role'), MessageFilter(exclude_role_ids=[7]))
+        self.bus.subscribe('mention', self.handler('mention'), MessageFilter(require_mention=True))
+        self.dispatch(make_message("Thanks a lot", role_ids=(7,)))
+        self.assertEqual(sorted(self.calls), ['keyword', 'role'])
+
+    def test_failing_handler_does_not_stop_others(self):
+        async def broken(context):
+            raise RuntimeError("boom")
+        self.bus.subscribe('broken', broken, priority=10)
+        self.bus.subscribe('after', self.handler('after'))
+        self.dispatch(make_message())
+        self.assertEqual(self.calls, ['after'])
+        self.assertEqual(self.bus.get_stats()['handler_errors'], 1)
+
+    def test_slow_handler_does_not_hold_up_the_others(self):
+        async def storage(context):
+            await asyncio.sleep(0.05)
+            self.calls.append('storage')
+        async def listeners(context):
+            self.calls.append('listeners')
+        self.bus.subscribe('storage', storage, priority=100)
+        self.bus.subscribe('listeners', listeners, priority=50)
+        self.dispatch(make_message())
+        self.assertEqual(self.calls, ['listeners', 'storage'])
+
+    def test_unsubscribe(self):
+        self.bus.subscribe('temp', self.handler('temp'))
+        self.assertTrue(self.bus.unsubscribe('temp'))
+        self.assertFalse(self.bus.unsubscribe('temp'))
+        self.dispatch(make_message())
+        self.assertEqual(self.calls, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from utils.extractive_summary import extractive_summary, split_sentences, rank_sentences
+
+ANSWER = """Quantum computers use qubits, which can hold a superposition of states.
+
+## How qubits work
+- A qubit in superposition is measured as 0 or 1 with some probability.
+- Entangled qubits have measurement outcomes that are correlated.
+
+```python
+print("not a sentence")
+```
+
+Quantum algorithms use superposition and entanglement of qubits to solve some problems faster. My favourite color is green. Shor's algorithm, for example, factors integers efficiently on a quantum computer with enough qubits."""
+
+class TestExtractiveSummary(unittest.TestCase):
+    def test_splits_sentences_without_code_or_markup(self):
+        sentences = split_sentences(ANSWER)
+        self.assertIn("A qubit in superposition is measured as 0 or 1 with some probability.", sentences)
+        self.assertIn("My favourite color is green.", sentences)
+        self.assertNotIn('print("not a sentence")', sentences)
+        self.assertFalse(any(sentence.startswith(("#", "-")) for sentence in sentences))
+
+    def test_summary_fits_the_limit_and_keeps_central_sentences(self):
+        summary = extractive_summary(ANSWER, 200)
+        self.assertLessEqual(len(summary), 200)
+        self.assertTrue(summary.startswith("Quantum computers use qubits"))
+        self.assertNotIn("favourite color", summary)
+
+    def test_off_topic_sentence_ranks_lowest(self):
+        sentences = split_sentences(ANSWER)
+        scores = rank_sentences(sentences)
+        self.assertEqual(min(range(len(sentences)), key=lambda i: scores[i]),
+                         sentences.index("My favourite color is green."))
+
+    def test_short_and_unsplittable_text(self):
+        self.assertEqual(extractive_summary("  Short answer.  ", 400), "Short answer.")
+        summary = extractive_summary("x" * 1000, 50)
+        self.assertEqual(len(summary), 50)
+        self.assertTrue(summary.endswith("..."))
+
+if __name__ == '__main__':
+    unittest.main()
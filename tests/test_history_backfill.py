@@ -0,0 +1,114 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import discord
+
+from app.discord.history_backfill import HistoryBackfill
+
+class FakeChannel:
+    """Text channel whose history is a list of snowflakes; fails every request after fail_after."""
+
+    def __init__(self, channel_id, count, fail_after=None):
+        self.id = channel_id
+        self.guild = SimpleNamespace(id=1)
+        self.fail_after = fail_after
+        self.requests = 0
+        base = discord.utils.time_snowflake(datetime.now(timezone.utc) - timedelta(days=1))
+        self.message_ids = [base + ((index + 1) << 22) for index in range(count)]
+
+    def message(self, message_id):
+        return SimpleNamespace(id=message_id, channel=self, guild=self.guild)
+
+    def post(self):
+        """Add a new message to the end of the history and return it."""
+        message_id = self.message_ids[-1] + (1 << 22)
+        self.message_ids.append(message_id)
+        return self.message(message_id)
+
+    async def history(self, limit=100, after=None, oldest_first=True):
+        self.requests += 1
+        if self.fail_after is not None and self.requests > self.fail_after:
+            raise RuntimeError("connection lost")
+        for message_id in [message_id for message_id in self.message_ids if message_id > after.id][:limit]:
+            yield self.message(message_id)
+
+class RecordingMonitor:
+    def __init__(self, on_message=None):
+        self.message_ids = []
+        self.on_message = on_message
+
+    async def process_message(self, message):
+        self.message_ids.append(message.id)
+        if self.on_message:
+            self.on_message(message)
+        return True
+
+class TestHistoryBackfill(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.checkpoint_file = os.path.join(self.directory.name, 'backfill', 'checkpoints.json')
+
+    def make_backfill(self, monitor):
+        return HistoryBackfill(None, monitor, self.checkpoint_file, requests_per_second=0,
+                               page_size=10, flush_interval=0)
+
+    def test_interrupted_crawl_resumes_from_the_checkpoint(self):
+        channel = FakeChannel(5, 25, fail_after=2)
+        first = self.make_backfill(RecordingMonitor())
+        stats = asyncio.run(first.backfill_channels([channel]))
+        self.assertEqual((stats['messages'], stats['channels_failed']), (20, 1))
+
+        channel.fail_after = None
+        monitor = RecordingMonitor()
+        resumed = self.make_backfill(monitor)
+        stats = asyncio.run(resumed.backfill_channels([channel]))
+        self.assertEqual(monitor.message_ids, channel.message_ids[20:])
+        self.assertEqual((stats['messages'], stats['channels_done']), (5, 1))
+
+        # Statistics describe each run, not every run so far
+        stats = asyncio.run(resumed.backfill_channels([channel]))
+        self.assertEqual((stats['messages'], stats['channels_done']), (0, 1))
+        self.assertEqual(resumed.stats['messages'], 0)
+
+    def test_live_messages_are_not_crawled_again(self):
+        channel = FakeChannel(5, 15)
+        live = []
+        # A message arrives through the gateway while the channel is being crawled
+        def deliver_live(message):
+            if not live:
+                live.append(channel.post())
+                backfill.note_live_message(live[-1])
+        monitor = RecordingMonitor(on_message=deliver_live)
+        backfill = self.make_backfill(monitor)
+        asyncio.run(backfill.backfill_channels([channel]))
+        self.assertEqual(backfill.checkpoints['5'], live[0].id)
+
+        # Once the crawl is done, live messages move the checkpoint straight away
+        async def deliver_and_crawl():
+            backfill.note_live_message(channel.post())
+            return await backfill.backfill_channels([channel])
+        monitor.on_message = None
+        crawled = len(monitor.message_ids)
+        stats = asyncio.run(deliver_and_crawl())
+        self.assertEqual(stats['messages'], 0)
+        self.assertEqual(len(monitor.message_ids), crawled)
+        self.assertEqual(len(set(monitor.message_ids)), len(monitor.message_ids))
+
+    def test_startup_crawl_runs_once(self):
+        async def run():
+            backfill = self.make_backfill(RecordingMonitor())
+            backfill.client = SimpleNamespace(guilds=[])
+            first = backfill.start()
+            # on_ready fires again after a reconnect
+            self.assertIs(backfill.start(), first)
+            await first
+
+        asyncio.run(run())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from cryptography.fernet import Fernet
+
+from tools.import_discord_export import ExportImporter, iter_records, normalize_record
+from utils.database import MESSAGE_ROW_IS_BOT
+
+class RecordingDatabase:
+    """Stand-in for UnifiedDatabase that keeps the rows written, failing after a set number of transactions."""
+
+    def __init__(self, track_bot_messages=True, fail_after=None):
+        self.track_bot_messages = track_bot_messages
+        self.fail_after = fail_after
+        self.transactions = []
+
+    async def store_message_rows(self, rows):
+        if self.fail_after is not None and len(self.transactions) >= self.fail_after:
+            return 0
+        self.transactions.append(list(rows))
+        return len(rows)
+
+    def message_ids(self):
+        return [row[0] for rows in self.transactions for row in rows]
+
+def write_exporter_json(path, count, bot_every=0, channel=None):
+    messages = [{
+        "id": str(1000 + index),
+        "timestamp": f"2024-01-01T00:{index // 60:02d}:{index % 60:02d}+00:00",
+        "content": f"message {index}",
+        "author": {"id": "7", "name": "alice", "isBot": bool(bot_every) and index % bot_every == 0},
+        "attachments": []
+    } for index in range(count)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"guild": {"id": "10"}, "channel": channel or {"id": "20"}, "messages": messages}, f)
+
+class TestParsers(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_exporter_json_header_fills_channel_and_guild(self):
+        path = os.path.join(self.directory.name, 'export.json')
+        write_exporter_json(path, 3)
+        context = {}
+        records = [normalize_record(record, context) for record in iter_records(path, context)]
+        self.assertEqual([record['message_id'] for record in records], ['1000', '1001', '1002'])
+        self.assertEqual((records[0]['channel_id'], records[0]['guild_id']), ('20', '10'))
+        self.assertEqual(records[2]['author_name'], 'alice')
+
+    def test_messages_key_is_only_matched_at_the_top_level(self):
+        path = os.path.join(self.directory.name, 'export.json')
+        channel = {"id": "20", "name": "messages", "topic": 'post "messages": [here]',
+                   "tags": ["a", "b"], "pinned": {"messages": [{"id": "1"}]}}
+        write_exporter_json(path, 3, channel=channel)
+        # Tiny reads put buffer boundaries inside the header's strings and arrays
+        with patch('tools.import_discord_export.READ_CHUNK_SIZE', 7):
+            context = {}
+            records = [normalize_record(record, context) for record in iter_records(path, context)]
+        self.assertEqual([record['message_id'] for record in records], ['1000', '1001', '1002'])
+        self.assertEqual((records[0]['channel_id'], records[0]['guild_id']), ('20', '10'))
+
+    def test_malformed_header_is_an_error(self):
+        path = os.path.join(self.directory.name, 'export.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"guild": {"id": "10"} "messages": []}')
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_records(path, {}))
+
+    def test_exporter_csv_gets_stable_synthetic_ids(self):
+        path = os.path.join(self.directory.name, 'export.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['AuthorID', 'Author', 'Date', 'Content', 'Attachments'])
+            writer.writerow(['7', 'alice', '2024-01-01T10:00:00', 'hello, world', 'https://a/1.png https://a/2.png'])
+            writer.writerow(['', 'nobody', '2024-01-01T10:01:00', 'no author', ''])
+
+        def parse():
+            return [normalize_record(record, {'channel_id': '20'}) for record in iter_records(path, {})]
+
+        first, unusable = parse()
+        self.assertIsNone(unusable)
+        self.assertEqual(first['content'], 'hello, world')
+        self.assertEqual(first['timestamp'], '2024-01-01T10:00:00+00:00')
+        self.assertEqual([attachment['url'] for attachment in first['attachments']], ['https://a/1.png', 'https://a/2.png'])
+        self.assertTrue(first['message_id'].startswith('import-'))
+        # Re-imports upsert the same rows instead of duplicating them
+        self.assertEqual(parse()[0]['message_id'], first['message_id'])
+
+class TestCheckpoints(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.source = os.path.join(self.directory.name, 'export.json')
+        self.checkpoint_file = os.path.join(self.directory.name, 'checkpoints', 'import.json')
+        self.key = Fernet.generate_key().decode()
+
+    def run_import(self, db):
+        importer = ExportImporter(db, self.key, self.checkpoint_file, workers=1, chunk_size=2,
+                                  transaction_size=4, report_interval=3600)
+        importer.start_time = 0.0
+
+        async def run():
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                await importer.import_source(executor, self.source, {})
+
+        asyncio.run(run())
+        return importer
+
+    def test_interrupted_import_resumes_after_the_last_transaction(self):
+        write_exporter_json(self.source, 10)
+        with self.assertRaises(RuntimeError):
+            self.run_import(RecordingDatabase(fail_after=1))
+        db = RecordingDatabase()
+        self.run_import(db)
+        self.assertEqual(db.message_ids(), [str(1000 + index) for index in range(4, 10)])
+        # A finished file is skipped on the next run
+        again = RecordingDatabase()
+        self.run_import(again)
+        self.assertEqual(again.transactions, [])
+
+    def test_changed_file_is_imported_from_the_start(self):
+        write_exporter_json(self.source, 10)
+        self.run_import(RecordingDatabase())
+        write_exporter_json(self.source, 12)
+        db = RecordingDatabase()
+        self.run_import(db)
+        self.assertEqual(len(db.message_ids()), 12)
+
+    def test_bot_messages_follow_track_bot_messages(self):
+        write_exporter_json(self.source, 10, bot_every=3)
+        db = RecordingDatabase(track_bot_messages=False)
+        importer = self.run_import(db)
+        self.assertEqual(importer.stats['bots'], 4)
+        self.assertEqual(len(db.message_ids()), 6)
+        self.assertFalse(any(row[MESSAGE_ROW_IS_BOT] for rows in db.transactions for row in rows))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+from app.discord.listener_actions import ListenerActionExecutor, SendBucket, WebhookCache, _ChannelQueue
+
+def make_listener(name, action_type, text):
+    return SimpleNamespace(
+        name=name,
+        action_type=action_type,
+        action_value=text,
+        render_response=lambda message, counters: text
+    )
+
+class TestSendBucket(unittest.TestCase):
+    def test_allows_a_burst_then_waits_for_the_window(self):
+        bucket = SendBucket(capacity=2, window=5.0)
+        self.assertEqual(bucket.delay(now=0), 0)
+        bucket.record(now=0)
+        bucket.record(now=1)
+        self.assertEqual(bucket.delay(now=2), 3)
+        self.assertEqual(bucket.delay(now=5), 0)
+
+class TestListenerActionExecutor(unittest.TestCase):
+    def test_sends_keep_order_and_reactions_run(self):
+        async def run():
+            sent = []
+            message = Mock()
+            message.channel.id = 1
+            message.channel.send = AsyncMock(side_effect=lambda content: sent.append(content))
+            message.add_reaction = AsyncMock()
+            executor = ListenerActionExecutor(idle_timeout=0.05)
+            for index in range(4):
+                executor.submit(make_listener(f"reply{index}", 'reply', f"#{index}"), message)
+            executor.submit(make_listener("react", 'react', "👍"), message)
+            await executor.close()
+            self.assertEqual(sent, ["#0", "#1", "#2", "#3"])
+            message.add_reaction.assert_awaited_once_with("👍")
+            self.assertEqual(executor.get_stats()['sends'], 4)
+        asyncio.run(run())
+
+    def test_job_queued_as_the_worker_times_out_is_still_sent(self):
+        async def run():
+            sent = []
+            async def job():
+                sent.append("late")
+
+            class LateQueue(asyncio.Queue):
+                # The first wait times out just as a job is queued
+                late = False
+
+                async def get(self):
+                    if not self.late:
+                        self.late = True
+                        self.put_nowait((job, "late"))
+                        await asyncio.Event().wait()
+                    return await super().get()
+
+            executor = ListenerActionExecutor(idle_timeout=0.05)
+            queue = executor.channels[1] = _ChannelQueue(5, 5.0)
+            queue.jobs = LateQueue()
+            await executor._drain(1, queue)
+            self.assertEqual(sent, ["late"])
+            self.assertNotIn(1, executor.channels)
+        asyncio.run(run())
+
+class TestWebhookCache(unittest.TestCase):
+    def test_concurrent_lookups_share_one_request_until_invalidated(self):
+        async def run():
+            webhook = Mock()
+            webhook.name = "MessageListener"
+            channel = Mock(id=1)
+            channel.webhooks = AsyncMock(return_value=[webhook])
+            cache = WebhookCache()
+            results = await asyncio.gather(*(cache.get(channel) for _ in range(5)))
+            self.assertTrue(all(result is webhook for result in results))
+            self.assertEqual(channel.webhooks.await_count, 1)
+            cache.invalidate(1)
+            await cache.get(channel)
+            self.assertEqual(channel.webhooks.await_count, 2)
+        asyncio.run(run())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import random
+import unittest
+from types import SimpleNamespace
+
+from app.discord.cogs.message_listeners_cog import MessageListener
+from app.discord.listener_index import AhoCorasick, CooldownStore, ListenerIndex
+
+def make_context(content, channel_id=1):
+    return SimpleNamespace(content=content, lowered=content.lower(), channel_id=channel_id)
+
+def make_listener(name, trigger_type, trigger_value, ignore_case=True, allowed_channels=None, enabled=True):
+    return MessageListener(
+        name=name,
+        description="",
+        trigger_type=trigger_type,
+        trigger_value=trigger_value,
+        action_type="reply",
+        action_value="ok",
+        ignore_case=ignore_case,
+        allowed_channels=allowed_channels,
+        enabled=enabled
+    )
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_reports_overlapping_matches(self):
+        automaton = AhoCorasick([("he", "he"), ("she", "she"), ("hers", "hers"), ("his", "his")])
+        hits = sorted((end, payload) for end, _, payload in automaton.search("ushers"))
+        self.assertEqual(hits, [(3, "he"), (3, "she"), (5, "hers")])
+
+class TestListenerIndex(unittest.TestCase):
+    def setUp(self):
+        self.listeners = [
+            make_listener("contains", "contains", "hello bot"),
+            make_listener("any", "contains_any", ["thank you", "thanks", "thx"]),
+            make_listener("starts", "startswith", "!roll"),
+            make_listener("ends", "endswith", "?"),
+            make_listener("exact", "exact", "ping"),
+            make_listener("cased", "contains", "WoW", ignore_case=False),
+            make_listener("regex", "regex", r"roll\s+a\s+d(\d+)"),
+            make_listener("backref", "regex", r"(\w)\1{3}"),
+            make_listener("channel_only", "contains", "secret", allowed_channels=[2]),
+            make_listener("disabled", "contains", "hello", enabled=False)
+        ]
+        self.index = ListenerIndex(self.listeners)
+
+    def names(self, content, channel_id=1):
+        return [listener.name for listener in self.index.candidates(make_context(content, channel_id))]
+
+    def regex_names(self, channel_id=1):
+        return [listener.name for listener in self.index.deferred_regex(make_context("", channel_id))]
+
+    def test_text_triggers(self):
+        self.assertEqual(self.names("Hello Bot, thanks!"), ["contains", "any"])
+        self.assertEqual(self.names("!roll please?"), ["starts", "ends"])
+        self.assertEqual(self.names("PING"), ["exact"])
+        self.assertEqual(self.names("ping pong"), [])
+        self.assertEqual(self.names("wow"), [])
+        self.assertEqual(self.names("WoW"), ["cased"])
+
+    def test_regex_triggers_are_left_to_the_caller(self):
+        self.assertEqual(self.names("please ROLL a d20"), [])
+        self.assertEqual(self.regex_names(), ["regex", "backref"])
+        self.assertEqual(self.index.position(self.listeners[7]), 7)
+
+    def test_channel_prefilter(self):
+        self.assertEqual(self.names("secret"), [])
+        self.assertEqual(self.names("secret", channel_id=2), ["channel_only"])
+
+    def test_matches_reference_behaviour(self):
+        words = ["hello", "bot", "thanks", "thx", "!roll", "ping", "WoW", "roll", "a", "d6", "?", "aaaa", "secret"]
+        rng = random.Random(1234)
+        for _ in range(500):
+            content = " ".join(rng.choice(words) for _ in range(rng.randint(1, 6)))
+            expected = [
+                listener.name for listener in self.listeners
+                if listener.enabled and not listener.allowed_channels and listener.trigger_type != "regex"
+                and listener.matches_content(make_context(content))
+            ]
+            self.assertEqual(self.names(content), expected, content)
+
+class TestCooldownStore(unittest.TestCase):
+    def test_cooldown_expires_and_forgets_keys(self):
+        store = CooldownStore()
+        self.assertTrue(store.try_acquire(1, 10, now=0))
+        self.assertFalse(store.try_acquire(1, 10, now=5))
+        self.assertTrue(store.try_acquire(2, 10, now=5))
+        self.assertTrue(store.try_acquire(1, 10, now=10))
+        store.try_acquire(3, 10, now=100)
+        self.assertEqual(len(store), 1)
+
+if __name__ == '__main__':
+    unittest.main()
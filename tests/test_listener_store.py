@@ -0,0 +1,70 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from app.discord.listener_store import ListenerStore
+
+class TestListenerStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'message_listeners.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test_saves_coalesce_and_notify_other_subscribers(self):
+        async def run():
+            store = ListenerStore(self.path)
+            seen = {'cog': [], 'monitor': []}
+
+            async def cog(data):
+                seen['cog'].append(data)
+
+            async def monitor(data):
+                seen['monitor'].append(data)
+
+            store.subscribe(cog)
+            store.subscribe(monitor)
+            for count in range(1, 6):
+                store.save([{'name': f'l{index}'} for index in range(count)], source=cog)
+            await store.flush()
+            self.assertEqual(len(self.read()), 5)
+            self.assertLessEqual(store.writes, 2)
+            self.assertEqual(seen['cog'], [])
+            self.assertEqual(len(seen['monitor'][-1]), 5)
+            # Our own write is not mistaken for an external edit
+            self.assertFalse(await store.check_for_changes())
+        asyncio.run(run())
+
+    def test_external_edits_are_reloaded(self):
+        async def run():
+            store = ListenerStore(self.path)
+            store.save([{'name': 'a'}])
+            await store.flush()
+            reloaded = []
+
+            async def subscriber(data):
+                reloaded.append(data)
+
+            store.subscribe(subscriber)
+            with open(self.path, 'w') as f:
+                json.dump([{'name': 'a'}, {'name': 'b'}], f)
+            os.utime(self.path, ns=(1, 1))
+            self.assertTrue(await store.check_for_changes())
+            self.assertEqual([entry['name'] for entry in reloaded[0]], ['a', 'b'])
+
+            # A half-written file is ignored until it parses
+            with open(self.path, 'w') as f:
+                f.write('[{"name": ')
+            self.assertFalse(await store.check_for_changes())
+            self.assertEqual(len(store.data), 2)
+        asyncio.run(run())
+
+if __name__ == '__main__':
+    unittest.main()
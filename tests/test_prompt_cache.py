@@ -0,0 +1,127 @@
+import asyncio
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import anthropic
+import openai
+
+from utils.ai_services import ClaudeStrategy, OpenAIStrategy, SummarizationStrategy
+from utils.prompt_cache import cache_breakpoint, get_prompt_cache, prompt_usage
+from utils.provider_clients import _httpx_module
+
+CONTEXT = [
+    {"role": "system", "content": "Summary of the earlier conversation:\nWe talked about tides."},
+    {"role": "user", "content": "What causes tides?"},
+    {"role": "assistant", "content": "Mostly the Moon."},
+    {"role": "user", "content": "And the Sun?"}
+]
+
+class StandInServer:
+    """Answers SDK requests like a provider would, keeping the request bodies."""
+
+    def __init__(self, client_class, respond):
+        self.requests = []
+        self.respond = respond
+        self.module = _httpx_module(client_class)
+        self.http_client = client_class(transport=self.module.MockTransport(self.handle))
+
+    def handle(self, request):
+        body = json.loads(request.content)
+        self.requests.append(body)
+        return self.respond(self.module, body)
+
+def claude_response(module, body):
+    return module.Response(200, json={
+        "id": "msg_1", "type": "message", "role": "assistant", "model": body["model"],
+        "content": [{"type": "text", "text": "The Sun too, less so."}],
+        "stop_reason": "end_turn", "stop_sequence": None,
+        "usage": {"input_tokens": 20, "output_tokens": 8,
+                  "cache_read_input_tokens": 1500, "cache_creation_input_tokens": 30}
+    })
+
+def openai_stream(module, body):
+    chunk = {"id": "c1", "object": "chat.completion.chunk", "created": 1, "model": body["model"]}
+    events = [
+        {**chunk, "choices": [{"index": 0, "delta": {"content": "Yes, "}, "finish_reason": None}]},
+        {**chunk, "choices": [{"index": 0, "delta": {"content": "the Sun."}, "finish_reason": "stop"}]},
+        {**chunk, "choices": [], "usage": {"prompt_tokens": 2048, "completion_tokens": 4, "total_tokens": 2052,
+                                           "prompt_tokens_details": {"cached_tokens": 1920}}}
+    ]
+    stream = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+    return module.Response(200, content=stream.encode(), headers={"content-type": "text/event-stream"})
+
+def claude_client(http_client):
+    return anthropic.AsyncAnthropic(api_key="test", http_client=http_client, max_retries=0)
+
+class TestPromptCache(unittest.TestCase):
+    def test_claude_requests_carry_cache_breakpoints(self):
+        async def run():
+            server = StandInServer(anthropic.DefaultAsyncHttpxClient, claude_response)
+            client = claude_client(server.http_client)
+            before = get_prompt_cache('claude').get_stats()
+            result = await ClaudeStrategy(client, Mock()).generate_response(CONTEXT, "You are a poet.")
+            await client.close()
+            return server.requests[0], result, before, get_prompt_cache('claude').get_stats()
+
+        request, result, before, after = asyncio.run(run())
+        self.assertEqual(result, "The Sun too, less so.")
+        self.assertIn("temperature", request)
+        self.assertIn("top_p", request)
+        # Static system prompt first and cached, then the conversation summary
+        self.assertEqual(request["system"][0], {"type": "text", "text": "You are a poet.", "cache_control": {"type": "ephemeral"}})
+        self.assertNotIn("cache_control", request["system"][1])
+        self.assertTrue(request["system"][1]["text"].endswith("We talked about tides."))
+        self.assertEqual([message["role"] for message in request["messages"]], ["user", "assistant", "user"])
+        self.assertEqual(request["messages"][0]["content"], "What causes tides?")
+        self.assertEqual(request["messages"][-1]["content"],
+                         [{"type": "text", "text": "And the Sun?", "cache_control": {"type": "ephemeral"}}])
+        self.assertEqual(after["prompt_tokens"] - before["prompt_tokens"], 1550)
+        self.assertEqual(after["cached_tokens"] - before["cached_tokens"], 1500)
+        self.assertEqual(after["cache_write_tokens"] - before["cache_write_tokens"], 30)
+
+    def test_claude_summaries_send_sampling_parameters(self):
+        async def run():
+            server = StandInServer(anthropic.DefaultAsyncHttpxClient, claude_response)
+            client = claude_client(server.http_client)
+            strategy = SummarizationStrategy(client, Mock(), provider='claude', model='claude-test')
+            result = await strategy.generate_response(CONTEXT[1:], "Summarize.")
+            await client.close()
+            return server.requests[0], result
+
+        request, result = asyncio.run(run())
+        self.assertEqual(result, "The Sun too, less so.")
+        self.assertIn("temperature", request)
+        self.assertEqual(request["system"], "Summarize.")
+
+    def test_openai_stream_reports_cached_tokens(self):
+        async def run():
+            server = StandInServer(openai.DefaultAsyncHttpxClient, openai_stream)
+            client = openai.AsyncOpenAI(api_key="test", http_client=server.http_client, max_retries=0)
+            before = get_prompt_cache('openai').get_stats()
+            deltas = [delta async for delta in OpenAIStrategy(client, Mock()).stream_response(CONTEXT[1:], "Be brief.")]
+            await client.close()
+            return server.requests[0], deltas, before, get_prompt_cache('openai').get_stats()
+
+        request, deltas, before, after = asyncio.run(run())
+        self.assertEqual(deltas, ["Yes, ", "the Sun."])
+        self.assertEqual(request["stream_options"], {"include_usage": True})
+        # The system prompt leads, followed by the turns oldest first
+        self.assertEqual(request["messages"][0], {"role": "system", "content": "Be brief."})
+        self.assertEqual(request["messages"][1:], CONTEXT[1:])
+        self.assertEqual(after["prompt_tokens"] - before["prompt_tokens"], 2048)
+        self.assertEqual(after["cached_tokens"] - before["cached_tokens"], 1920)
+
+    def test_google_usage_and_breakpoints_on_block_content(self):
+        response = SimpleNamespace(usage_metadata=SimpleNamespace(prompt_token_count=3000, cached_content_token_count=2048))
+        self.assertEqual(prompt_usage(response), (3000, 2048, 0))
+        self.assertIsNone(prompt_usage(SimpleNamespace(text="no usage")))
+
+        message = {"role": "user", "content": [{"type": "text", "text": "a"}, {"type": "text", "text": "b"}]}
+        marked = cache_breakpoint(message)
+        self.assertEqual(marked["content"][1]["cache_control"], {"type": "ephemeral"})
+        self.assertNotIn("cache_control", message["content"][1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import asyncio
+import time
+import unittest
+
+from utils.provider_clients import ProviderClients
+
+class TestProviderClients(unittest.TestCase):
+    def make_registry(self, requests, base_urls=None):
+        # The SDKs may be built on httpx or its httpx2 fork; each pool gets a mock of its own kind
+        def mock_transport(module):
+            def handler(request):
+                requests.append((request.method, request.url.host))
+                return module.Response(404)
+            return module.MockTransport(handler)
+
+        registry = ProviderClients(warmup_interval=30, transport=mock_transport)
+        registry.create("sk-openai", None, "sk-claude", "sk-grok", base_urls=base_urls)
+        return registry
+
+    def test_clients_share_the_registry_pools(self):
+        async def run():
+            registry = self.make_registry([])
+            self.assertIsNone(registry.get('google'))
+            self.assertEqual(sorted(registry.http_clients), ['claude', 'grok', 'openai'])
+            self.assertIs(registry.get('openai')._client, registry.http_clients['openai'])
+            self.assertIs(registry.get('claude')._client, registry.http_clients['claude'])
+            await registry.close()
+            self.assertTrue(registry.http_clients['openai'].is_closed)
+
+        asyncio.run(run())
+
+    def test_warm_up_pings_each_provider_origin(self):
+        async def run():
+            requests = []
+            registry = self.make_registry(requests)
+            latencies = await registry.warm_up()
+            self.assertEqual(sorted(latencies), ['claude', 'grok', 'openai'])
+            self.assertEqual(sorted(requests), [('HEAD', 'api.anthropic.com'), ('HEAD', 'api.openai.com'), ('HEAD', 'api.x.ai')])
+            await registry.close()
+
+        asyncio.run(run())
+
+    def test_keep_warm_only_pings_idle_providers(self):
+        async def run():
+            requests = []
+            registry = self.make_registry(requests)
+            await registry.warm_up()
+            requests.clear()
+            registry.last_activity['openai'] -= 60
+            await registry.keep_warm()
+            self.assertEqual(requests, [('HEAD', 'api.openai.com')])
+            self.assertGreater(registry.last_activity['openai'], time.monotonic() - 5)
+            await registry.close()
+
+        asyncio.run(run())
+
+    def test_clients_can_use_another_api_url(self):
+        async def run():
+            requests = []
+            registry = self.make_registry(requests, base_urls={'openai': 'http://127.0.0.1:8089/v1'})
+            self.assertEqual(str(registry.get('openai').base_url), 'http://127.0.0.1:8089/v1/')
+            self.assertEqual(str(registry.get('grok').base_url), 'https://api.x.ai/v1/')
+            await registry.warm_up(['openai'])
+            # Warm-up opens a connection to where requests will go
+            self.assertEqual(requests, [('HEAD', '127.0.0.1')])
+            await registry.close()
+
+        asyncio.run(run())
+
+if __name__ == '__main__':
+    unittest.main()
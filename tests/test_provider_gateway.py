@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+
+from utils.provider_gateway import Priority, ProviderBusy, ProviderGateway, TokenBucket
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refills_at_the_per_minute_rate(self):
+        bucket = TokenBucket(60)
+        bucket.take(60, now=bucket.updated)
+        self.assertAlmostEqual(bucket.delay(1, now=bucket.updated), 1.0)
+        self.assertEqual(bucket.delay(1, now=bucket.updated + 1.0), 0.0)
+
+class TestProviderGateway(unittest.TestCase):
+    def test_concurrency_limit_and_priority_order(self):
+        async def run():
+            gateway = ProviderGateway('test', max_concurrency=1)
+            order = []
+            active = 0
+            peak = 0
+
+            async def call(name, priority):
+                nonlocal active, peak
+                async with gateway.admit(priority):
+                    active += 1
+                    peak = max(peak, active)
+                    order.append(name)
+                    await asyncio.sleep(0.01)
+                    active -= 1
+
+            first = asyncio.create_task(call("first", Priority.INTERACTIVE))
+            await asyncio.sleep(0)
+            await asyncio.gather(
+                call("summary", Priority.BACKGROUND),
+                call("question", Priority.INTERACTIVE),
+                first
+            )
+            self.assertEqual(peak, 1)
+            self.assertEqual(order, ["first", "question", "summary"])
+        asyncio.run(run())
+
+    def test_rate_limited_calls_wait_and_deadlines_reject(self):
+        async def run():
+            gateway = ProviderGateway('test', rpm=600)
+            gateway.rpm.tokens = 0
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            async with gateway.admit():
+                waited = loop.time() - started
+            # 600 requests per minute refill one request every 0.1 seconds
+            self.assertGreater(waited, 0.05)
+
+            gateway.rpm.tokens = 0
+            with self.assertRaises(ProviderBusy):
+                async with gateway.admit(deadline=0.01):
+                    pass
+            self.assertEqual(gateway.get_stats()['rejected'], 1)
+            self.assertEqual(gateway.get_stats()['queued'], 0)
+        asyncio.run(run())
+
+    def test_pause_holds_calls_until_it_ends_or_their_deadline(self):
+        async def run():
+            gateway = ProviderGateway('test')
+            loop = asyncio.get_running_loop()
+            gateway.pause(0.1)
+            self.assertTrue(gateway.paused())
+            started = loop.time()
+            async with gateway.admit():
+                waited = loop.time() - started
+            self.assertGreaterEqual(waited, 0.09)
+            self.assertFalse(gateway.paused())
+
+            gateway.pause(1.0)
+            with self.assertRaises(ProviderBusy):
+                async with gateway.admit(deadline=0.05):
+                    pass
+            self.assertEqual(gateway.get_stats()['pauses'], 2)
+        asyncio.run(run())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from utils import provider_gateway, provider_health
+from utils.ai_services import OpenAIStrategy, hedged_response
+from utils.provider_health import CLOSED, HALF_OPEN, OPEN, ProviderHealth, ProviderUnavailable
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+class FakeStrategy:
+    def __init__(self, provider, delay, result):
+        self.provider = provider
+        self.client = object()
+        self.delay = delay
+        self.result = result
+        self.calls = 0
+
+    async def generate_response(self, context, system_prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.result
+
+class TestProviderHealth(unittest.TestCase):
+    def test_circuit_opens_then_probes_and_closes(self):
+        health = ProviderHealth('test', failure_threshold=2, open_seconds=10)
+        health.record_failure(FakeStatusError(503))
+        health.record_failure(FakeStatusError(503))
+        self.assertEqual(health.state, OPEN)
+        with self.assertRaises(ProviderUnavailable):
+            health.check()
+
+        with patch('utils.provider_health.time.monotonic', return_value=time.monotonic() + 11):
+            health.check()
+            self.assertEqual(health.state, HALF_OPEN)
+            # Only one probe at a time
+            with self.assertRaises(ProviderUnavailable):
+                health.check()
+        health.record_success(0.5)
+        self.assertEqual(health.state, CLOSED)
+
+    def test_rate_limits_do_not_open_the_circuit(self):
+        health = ProviderHealth('test', failure_threshold=1)
+        health.record_failure(FakeStatusError(429, {'retry-after': '30'}))
+        self.assertEqual(health.state, CLOSED)
+        # Waiting out the rate limit is up to the gateway; calls are not turned away here
+        health.check()
+        self.assertTrue(health.available())
+
+        # Client errors are not the provider's fault
+        health = ProviderHealth('test', failure_threshold=1)
+        health.record_failure(FakeStatusError(400))
+        self.assertEqual(health.state, CLOSED)
+
+class TestResilientCalls(unittest.TestCase):
+    def setUp(self):
+        provider_health._health.clear()
+        provider_gateway._gateways.clear()
+
+    def test_rate_limited_call_is_retried_after_retry_after(self):
+        attempts = []
+
+        async def create(**kwargs):
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise FakeStatusError(429, {'retry-after-ms': '50'})
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        result = asyncio.run(OpenAIStrategy(client, Mock()).generate_response([{"role": "user", "content": "q"}], "sys"))
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(attempts), 2)
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.05)
+
+    def test_rate_limit_holds_other_calls_instead_of_failing_them(self):
+        attempts = []
+
+        async def create(**kwargs):
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise FakeStatusError(429, {'retry-after-ms': '200'})
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        strategy = OpenAIStrategy(client, Mock())
+        context = [{"role": "user", "content": "q"}]
+
+        async def run():
+            first = asyncio.create_task(strategy.generate_response(context, "sys"))
+            await asyncio.sleep(0.05)
+            # Asked while the provider is paused: these wait for the pause to end
+            results = await asyncio.gather(first, *(strategy.generate_response(context, "sys") for _ in range(3)))
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(results, ["ok"] * 4)
+        self.assertEqual(len(attempts), 5)
+        self.assertTrue(all(attempt - attempts[0] >= 0.2 for attempt in attempts[1:]))
+        self.assertEqual(provider_health.get_health('openai').short_circuited, 0)
+        self.assertEqual(provider_gateway.get_gateway('openai').get_stats()['pauses'], 1)
+
+    def test_hedges_to_the_secondary_when_the_primary_is_slow(self):
+        primary = FakeStrategy('slow', 1.0, "primary")
+        secondary = FakeStrategy('fast', 0.01, "secondary")
+
+        async def run():
+            started = time.monotonic()
+            result = await hedged_response([primary, secondary], [], "sys", hedge_after=0.05)
+            return result, time.monotonic() - started
+
+        result, elapsed = asyncio.run(run())
+        self.assertEqual(result, "secondary")
+        self.assertLess(elapsed, 0.5)
+
+    def test_falls_back_immediately_when_the_primary_fails(self):
+        primary = FakeStrategy('broken', 0, "Sorry, an error occurred while summarizing with Google Gemini: 503")
+        secondary = FakeStrategy('working', 0, "summary")
+        result = asyncio.run(hedged_response([primary, secondary], [], "sys", hedge_after=10))
+        self.assertEqual(result, "summary")
+        self.assertEqual((primary.calls, secondary.calls), (1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
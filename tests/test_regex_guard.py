@@ -0,0 +1,54 @@
+import asyncio
+import re
+import time
+import unittest
+
+from app.discord.regex_guard import RegexGuard, check_pattern
+
+class TestCheckPattern(unittest.TestCase):
+    def test_rejects_invalid_and_nested_quantifiers(self):
+        self.assertIsNone(check_pattern(r"roll\s+a\s+d(\d+)"))
+        self.assertIn("Invalid", check_pattern(r"(unclosed"))
+        self.assertIn("Nested", check_pattern(r"^(a+)+$"))
+        self.assertIn("longer", check_pattern("a" * 501))
+
+class TestRegexGuard(unittest.TestCase):
+    def setUp(self):
+        self.guard = RegexGuard(time_budget=0.2, max_strikes=2)
+
+    def tearDown(self):
+        self.guard.close()
+
+    def test_runaway_search_is_abandoned_without_losing_others(self):
+        items = [
+            ('bad', r'^(a|aa)+$', 0, 'a' * 40 + '!'),
+            ('ok', r'd(\d+)', 0, 'roll d20'),
+            ('bad', r'^(a|aa)+$', 0, 'a' * 40 + '!')
+        ]
+        outcomes = asyncio.run(self.guard.search_many(items))
+        self.assertEqual([outcome.timed_out for outcome in outcomes], [True, False, True])
+        self.assertEqual(outcomes[1].span, (5, 8))
+        self.assertTrue(self.guard.should_disable('bad'))
+        self.assertFalse(self.guard.should_disable('ok'))
+
+    def test_match_data_comes_from_the_worker(self):
+        pattern = re.compile(r'roll (?P<count>\d+)?d(\d+)(x)?', re.IGNORECASE)
+        text = 'please ROLL d20 now'
+        outcome, = asyncio.run(self.guard.search_many([('dice', pattern.pattern, pattern.flags, text)]))
+        match, expected = outcome.match(pattern, text), pattern.search(text)
+        self.assertEqual(match.span(), expected.span())
+        self.assertEqual(match.group(0, 2), expected.group(0, 2))
+        self.assertEqual(match.groups('-'), expected.groups('-'))
+        self.assertEqual(match.groupdict(), expected.groupdict())
+        self.assertEqual(match['count'], None)
+        self.assertEqual(match.lastindex, expected.lastindex)
+
+    def test_validate_rejects_catastrophic_pattern(self):
+        self.assertIsNone(asyncio.run(self.guard.validate(r'hello\s+world')))
+        began = time.perf_counter()
+        self.assertIsNotNone(asyncio.run(self.guard.validate(r'^(a|aa)+$')))
+        # Rejection stops at the first probe over budget instead of running them all
+        self.assertLess(time.perf_counter() - began, 4 * self.guard.time_budget + 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from utils.response_cache import ResponseCache, make_cache_key
+
+PARAMS = {'model': 'gpt-4o-mini', 'temperature': 0.7}
+
+class TestCacheKey(unittest.TestCase):
+    def test_conversations_of_equal_length_get_different_keys(self):
+        first = make_cache_key('openai', PARAMS, "sys", [{"role": "user", "content": "What is 2+2?"}])
+        second = make_cache_key('openai', PARAMS, "sys", [{"role": "user", "content": "What is 3+3?"}])
+        self.assertNotEqual(first, second)
+
+    def test_whitespace_does_not_change_the_key(self):
+        first = make_cache_key('openai', PARAMS, "sys", [{"role": "user", "content": "hello  world"}])
+        second = make_cache_key('openai', PARAMS, " sys ", [{"role": "user", "content": "hello world\n"}])
+        self.assertEqual(first, second)
+
+    def test_sampling_params_are_part_of_the_key(self):
+        context = [{"role": "user", "content": "hi"}]
+        self.assertNotEqual(
+            make_cache_key('openai', PARAMS, "sys", context),
+            make_cache_key('openai', {**PARAMS, 'temperature': 0.2}, "sys", context)
+        )
+
+class TestResponseCache(unittest.TestCase):
+    def test_lru_eviction_by_entries_and_bytes(self):
+        async def run():
+            cache = ResponseCache(max_entries=2, max_bytes=1000)
+            cache.set("a", "1")
+            cache.set("b", "2")
+            await cache.get("a")
+            cache.set("c", "3")
+            self.assertIsNone(await cache.get("b"))
+            self.assertEqual(await cache.get("a"), "1")
+
+            cache.set("d", "x" * 998)
+            self.assertLessEqual(cache.size, 1000)
+            self.assertEqual(list(cache.entries), ["d"])
+        asyncio.run(run())
+
+    def test_entries_expire(self):
+        async def run():
+            cache = ResponseCache(ttl=10)
+            with patch('utils.response_cache.time.time', return_value=1000.0):
+                cache.set("a", "1")
+            with patch('utils.response_cache.time.time', return_value=1011.0):
+                self.assertIsNone(await cache.get("a"))
+            self.assertEqual(cache.get_stats()['expirations'], 1)
+        asyncio.run(run())
+
+    def test_persistent_tier_survives_a_restart(self):
+        async def run(path):
+            cache = ResponseCache(db_path=path)
+            cache.set("a", "persisted")
+            await cache.close()
+            restarted = ResponseCache(db_path=path)
+            self.assertEqual(await restarted.get("a"), "persisted")
+            self.assertEqual(restarted.get_stats()['persistent_hits'], 1)
+        with tempfile.TemporaryDirectory() as directory:
+            asyncio.run(run(os.path.join(directory, 'cache.db')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from app.discord.response_templates import CounterStore, ResponseTemplate
+from utils.database import UnifiedDatabase
+
+def make_message(content="hi", guild_id=10):
+    message = Mock()
+    message.id = 42
+    message.content = content
+    message.author.display_name = "Alice"
+    message.author.mention = "<@1>"
+    message.author.id = 1
+    message.channel.name = "general"
+    message.guild = Mock(id=guild_id) if guild_id else None
+    if message.guild:
+        message.guild.name = "Guild"
+    return message
+
+class TestResponseTemplate(unittest.TestCase):
+    def test_renders_variables_in_one_pass(self):
+        template = ResponseTemplate("Hi {user} ({user.id}) in #{channel}: {message} {unknown}")
+        rendered = template.render(make_message(content="{user.mention}"))
+        # Message text is inserted verbatim, never re-substituted
+        self.assertEqual(rendered, "Hi Alice (1) in #general: {user.mention} {unknown}")
+
+    def test_random_number_and_static_templates(self):
+        template = ResponseTemplate("rolled {random.number:3:3}")
+        self.assertEqual(template.render(make_message()), "rolled 3")
+        self.assertFalse(template.is_static)
+        self.assertTrue(ResponseTemplate("plain {text}").is_static)
+
+    def test_counters_are_per_guild(self):
+        template = ResponseTemplate("#{count:hugs}")
+        counters = CounterStore()
+        self.assertEqual(template.render(make_message(), counters), "#1")
+        self.assertEqual(template.render(make_message(), counters), "#2")
+        self.assertEqual(template.render(make_message(guild_id=11), counters), "#1")
+        self.assertEqual(template.counter_names, ["hugs"])
+
+class TestCounterStore(unittest.TestCase):
+    def test_flush_persists_batched_increments(self):
+        async def run(db_path):
+            db = UnifiedDatabase(db_path)
+            counters = CounterStore(db)
+            for _ in range(5):
+                counters.increment(10, "hugs")
+            self.assertEqual(await counters.flush(), 1)
+            self.assertEqual(await counters.flush(), 0)
+            counters.increment(10, "hugs")
+            await counters.close()
+
+            restored = CounterStore(db)
+            restored.increment(10, "hugs")
+            await restored.load()
+            self.assertEqual(restored.get(10, "hugs"), 7)
+            db.queue.stop()
+
+        with tempfile.TemporaryDirectory() as directory:
+            asyncio.run(run(os.path.join(directory, "db", "test.db")))
+
+if __name__ == '__main__':
+    unittest.main()
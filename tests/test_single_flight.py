@@ -0,0 +1,53 @@
+import asyncio
+import unittest
+
+from utils.single_flight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        async def run():
+            flight = SingleFlight()
+            calls = 0
+
+            async def compute():
+                nonlocal calls
+                calls += 1
+                await asyncio.sleep(0.05)
+                return "answer"
+
+            results = await asyncio.gather(*(flight.run("key", compute) for _ in range(5)))
+            self.assertEqual(calls, 1)
+            self.assertEqual([result for result, _ in results], ["answer"] * 5)
+            self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+            self.assertEqual(flight.get_stats()['in_flight'], 0)
+
+            # Once the call has finished, the next caller starts a new one
+            await flight.run("key", compute)
+            self.assertEqual(calls, 2)
+        asyncio.run(run())
+
+    def test_errors_are_shared_and_cancelled_leaders_are_replaced(self):
+        async def run():
+            flight = SingleFlight()
+
+            async def fail():
+                await asyncio.sleep(0.02)
+                raise RuntimeError("provider down")
+
+            results = await asyncio.gather(flight.run("a", fail), flight.run("a", fail), return_exceptions=True)
+            self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+            async def slow():
+                await asyncio.sleep(0.05)
+                return "done"
+
+            leader = asyncio.create_task(flight.run("b", slow))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(flight.run("b", slow))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            self.assertEqual(await waiter, ("done", False))
+        asyncio.run(run())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from app.discord.state import BotState, UserState
+
+class TestUserStateContextBudget(unittest.TestCase):
+    def make_state(self):
+        state = UserState("1")
+        for index in range(5):
+            state.add_prompt("user", f"question {index} " + "x" * 400)
+            state.add_prompt("assistant", f"answer {index} " + "y" * 400)
+        state.add_prompt("user", "latest question")
+        return state
+
+    def test_keeps_newest_entries_within_the_budget(self):
+        state = self.make_state()
+        context = state.get_context('google', token_budget=250)
+        self.assertEqual(context[-1]["content"], "latest question")
+        self.assertEqual(context[0]["role"], "user")
+        self.assertLessEqual(sum(state.entry_tokens(state.context.index(entry), 'google') for entry in context), 250)
+        self.assertLess(len(context), len(state.context))
+        # Without a budget the whole context is returned
+        self.assertEqual(len(state.get_context()), 11)
+
+    def test_latest_entry_is_kept_even_over_budget(self):
+        state = self.make_state()
+        self.assertEqual(state.get_context('claude', token_budget=1), [{"role": "user", "content": "latest question"}])
+
+    def test_trimmed_start_moves_in_steps(self):
+        state = UserState("1")
+        starts = []
+        for index in range(9):
+            state.add_prompt("user", f"question {index}")
+            state.add_prompt("assistant", f"answer {index}")
+            with patch('app.discord.state.count_message_tokens', return_value=100):
+                context = state.get_context('claude', token_budget=800, trim_step=6)
+            self.assertLessEqual(len(context), 8)
+            starts.append(context[0]["content"])
+        # The start (the cacheable prefix) stays put for three turns at a time
+        self.assertEqual(starts, ["question 0"] * 4 + ["question 3"] * 3 + ["question 6"] * 2)
+
+    def test_item_cap_drops_a_step_at_a_time(self):
+        state = UserState("1")
+        state.context = [{"role": "system", "content": "summary"}]
+        state.token_counts = [{}]
+        for index in range(20):
+            state.add_prompt("user" if index % 2 == 0 else "assistant", f"entry {index}")
+        # 21 entries exceed the cap of 20: six of the oldest turns go at once, the system entry stays
+        self.assertEqual(len(state.context), 15)
+        self.assertEqual(state.context[0]["content"], "summary")
+        self.assertEqual(state.context[1]["content"], "entry 6")
+        self.assertEqual(len(state.token_counts), 15)
+
+    def test_token_counts_are_computed_once_per_entry(self):
+        state = self.make_state()
+        with patch('app.discord.state.count_message_tokens', return_value=10) as count:
+            state.get_context('claude', token_budget=1000)
+            state.get_context('claude', token_budget=1000)
+            self.assertEqual(count.call_count, len(state.context))
+            state.get_context('openai', token_budget=1000)
+            self.assertEqual(count.call_count, 2 * len(state.context))
+
+class TestUserStatePacking(unittest.TestCase):
+    def test_packed_context_is_unpacked_on_access(self):
+        state = UserState("1")
+        state.add_prompt("user", "hello " * 100)
+        state.add_prompt("assistant", "hi")
+        before = list(state.context)
+        size = state.memory_size()
+        self.assertTrue(state.pack())
+        self.assertLess(state.memory_size(), size)
+        self.assertEqual(state.context, before)
+        self.assertEqual(len(state.token_counts), 2)
+        self.assertFalse(hasattr(state, '__dict__'))
+
+class TestBotState(unittest.TestCase):
+    def test_expiry_only_looks_at_least_recently_used_users(self):
+        bot_state = BotState(timeout=60)
+        for user_id in ("a", "b", "c"):
+            bot_state.get_user_state(user_id)
+        bot_state.users["a"].last_access -= 120
+        bot_state.get_user_state("c")
+        self.assertEqual(list(bot_state.users), ["b", "c"])
+        self.assertEqual(bot_state.get_stats()['expired'], 1)
+
+    def test_idle_users_are_packed_and_memory_cap_evicts_lru(self):
+        bot_state = BotState(compress_after=30, max_memory_bytes=1500)
+        for user_id in ("a", "b", "c"):
+            bot_state.get_user_state(user_id).add_prompt("user", user_id * 1000)
+        bot_state.users["a"].last_access -= 60
+        bot_state.maintain()
+        self.assertEqual(bot_state.packed, 1)
+        # The least recently used users go first, however small
+        self.assertEqual(list(bot_state.users), ["c"])
+        self.assertEqual(bot_state.evicted, 2)
+
+    def test_snapshot_restores_conversations_after_restart(self):
+        async def run(db_path):
+            bot_state = BotState(db_path=db_path, max_memory_bytes=1500)
+            bot_state.get_user_state("a").add_prompt("user", "remember me")
+            bot_state.get_user_state("b").add_prompt("user", "b" * 1000)
+            bot_state.get_user_state("c").add_prompt("user", "c" * 1000)
+            # "a" is evicted before it was ever written
+            bot_state.maintain()
+            self.assertNotIn("a", bot_state.users)
+            self.assertEqual(bot_state.get_user_state("a").context[0]["content"], "remember me")
+            bot_state.get_user_state("a").add_prompt("assistant", "I do")
+            await bot_state.close()
+
+            restarted = BotState(db_path=db_path)
+            await restarted.load()
+            self.assertEqual([entry["content"] for entry in restarted.get_user_state("a").context], ["remember me", "I do"])
+            restarted.clear_user_state("a")
+            restarted.users["b"].last_access = time.time() - 7200
+            restarted.get_user_state("c")
+            self.assertEqual(await restarted.snapshot(), 1)
+
+            third = BotState(db_path=db_path)
+            await third.load()
+            self.assertEqual(third.get_user_state("a").context, [])
+            self.assertEqual(set(third.users), {"a", "c"})
+
+        with tempfile.TemporaryDirectory() as directory:
+            asyncio.run(run(os.path.join(directory, "user_state.db")))
+
+    def test_evicted_user_is_read_back_off_the_event_loop(self):
+        async def run(db_path):
+            bot_state = BotState(db_path=db_path, max_memory_bytes=1500)
+            bot_state.get_user_state("a").add_prompt("user", "remember me")
+            await bot_state.snapshot()
+            bot_state.get_user_state("b").add_prompt("user", "b" * 1000)
+            bot_state.get_user_state("c").add_prompt("user", "c" * 1000)
+            bot_state.maintain()
+            self.assertNotIn("a", bot_state.users)
+            loop_thread = threading.get_ident()
+            threads = []
+            fetch = bot_state._db_fetch
+            def recording_fetch(user_id):
+                threads.append(threading.get_ident())
+                return fetch(user_id)
+            bot_state._db_fetch = recording_fetch
+            state = await bot_state.load_user_state("a")
+            self.assertEqual(state.context[0]["content"], "remember me")
+            self.assertEqual(len(threads), 1)
+            self.assertNotEqual(threads[0], loop_thread)
+            self.assertEqual(bot_state.restored, 1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            asyncio.run(run(os.path.join(directory, "user_state.db")))
+
+if __name__ == '__main__':
+    unittest.main()
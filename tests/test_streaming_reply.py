@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, Mock
+
+from app.discord.streaming_reply import StreamingReply, StreamingEmbeds
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+        self.edit = AsyncMock(side_effect=self._edit)
+        self.delete = AsyncMock()
+
+    async def _edit(self, content):
+        self.content = content
+
+def make_interaction():
+    interaction = Mock()
+    interaction.followup.send = AsyncMock(side_effect=lambda content, wait: FakeMessage(content))
+    return interaction
+
+class TestStreamingReply(unittest.TestCase):
+    def test_edits_are_throttled(self):
+        async def run():
+            reply = StreamingReply(make_interaction(), "> ", edit_interval=0.2)
+            for index in range(50):
+                await reply.feed(f"{index} ")
+                await asyncio.sleep(0.005)
+            result = await reply.finish()
+            self.assertEqual(result, " ".join(str(index) for index in range(50)))
+            self.assertEqual(reply.messages[0].content, f"> {result}")
+            # About 0.25s of streaming at one edit per 0.2s, plus the final edit
+            self.assertLessEqual(reply.edits, 3)
+        asyncio.run(run())
+
+    def test_rolls_over_at_the_message_limit(self):
+        async def run():
+            reply = StreamingReply(make_interaction(), "> ", edit_interval=0.01)
+            for _ in range(25):
+                await reply.feed("x" * 100)
+                await asyncio.sleep(0)
+            result = await reply.finish()
+            self.assertEqual(len(reply.messages), 2)
+            self.assertEqual([len(message.content) for message in reply.messages], [2000, 502])
+            self.assertEqual("".join(message.content for message in reply.messages), f"> {result}")
+
+            await reply.replace("short summary")
+            self.assertEqual(len(reply.messages), 1)
+            self.assertEqual(reply.messages[0].content, "> short summary")
+        asyncio.run(run())
+
+class FakeEmbedMessage:
+    def __init__(self, content, embeds):
+        self.content = content
+        self.embeds = embeds
+        self.edit = AsyncMock(side_effect=self._edit)
+
+    async def _edit(self, content, embeds):
+        self.content = content
+        self.embeds = embeds
+
+class TestStreamingEmbeds(unittest.TestCase):
+    def test_one_embed_per_answer_in_a_single_message(self):
+        async def run():
+            interaction = Mock()
+            interaction.followup.send = AsyncMock(side_effect=lambda content, embeds, wait: FakeEmbedMessage(content, embeds))
+            reply = StreamingEmbeds(interaction, {'a': "Model A", 'b': "Model B"}, "> question", edit_interval=0.05)
+            await reply.feed('b', "partial")
+            await asyncio.sleep(0.01)
+            await reply.complete('a', "x" * 5000, "1.2s")
+            await reply.complete('b', "done", "0.8s")
+            await reply.finish()
+            interaction.followup.send.assert_awaited_once()
+            message = reply.message
+            self.assertEqual(message.content, "> question")
+            self.assertEqual([embed.title for embed in message.embeds], ["Model A", "Model B"])
+            self.assertEqual(message.embeds[1].description, "done")
+            self.assertEqual(message.embeds[1].footer.text, "0.8s")
+            # Long answers are cut to their share of the message's embed limit
+            self.assertEqual(len(message.embeds[0].description), reply.panel_limit)
+            self.assertLessEqual(sum(len(embed) for embed in message.embeds), 6000)
+        asyncio.run(run())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+from utils import token_counter
+from utils.token_counter import count_tokens, load_encoding
+
+class FakeEncoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+class TestEncodingPreload(unittest.TestCase):
+    def setUp(self):
+        self.threads = []
+        patcher = patch.object(token_counter, '_encoding', self.load)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, token_counter, '_encoding_loaded', False)
+        token_counter._encoding_loaded = False
+
+    def load(self):
+        self.threads.append(threading.current_thread())
+        return FakeEncoding()
+
+    def test_counts_are_estimated_until_the_encoding_is_loaded(self):
+        text = 'one two three four five six seven eight'
+        self.assertEqual(count_tokens(text, 'openai'), 10)
+        self.assertEqual(self.threads, [])
+
+        self.assertTrue(asyncio.run(load_encoding()))
+        # The vocabulary was read in a worker thread, not on the event loop
+        self.assertIsNot(self.threads[0], threading.main_thread())
+        self.assertEqual(count_tokens(text, 'openai'), 8)
+        self.assertEqual(count_tokens(text, 'claude'), 12)
+
+if __name__ == '__main__':
+    unittest.main()
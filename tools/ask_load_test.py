@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end load test of the /ask path.
+
+Drives AICogCommands._handle_ai_request with fake interactions at a configurable
+concurrency. The provider clients are the bot's own, built on the shared
+connection pools but pointed at the local stand-in server (tools/mock_ai_server.py).
+No network access or API quota is needed. The report gives throughput,
+percentiles of end-to-end latency, of the time until the user first sees output
+and of the provider's time to first token, and the gateway, circuit breaker and
+server counters. Answers are streamed into the fake replies with --stream.
+
+Provider limits come from the usual configuration, so their effect can be
+measured by changing it between runs, e.g.:
+    OPENAI_MAX_CONCURRENCY=4 python tools/ask_load_test.py --requests 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import List, Optional
+
+# Add the project root to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_ai_server import MockAIServer, add_server_arguments
+
+from app.discord.cogs.gen_ai_cog import AICogCommands, ASK_MODELS
+from app.discord.state import BotState
+from config.ai_config import AI_CACHE_MAX_ENTRIES, AI_CACHE_MAX_BYTES, AI_CACHE_TTL
+from utils.ai_services import is_error_response
+from utils.provider_clients import ProviderClients
+from utils.provider_gateway import get_gateway
+from utils.provider_health import get_health
+from utils.response_cache import ResponseCache
+from utils.token_counter import load_encoding
+
+class FakeMessage:
+    """A sent follow-up message that can be edited and deleted."""
+
+    def __init__(self, content: Optional[str], embed=None):
+        self.content = content
+        self.embed = embed
+
+    async def edit(self, content=None, embed=None, **kwargs):
+        self.content = content
+        self.embed = embed
+
+    @property
+    def text(self) -> str:
+        if self.content:
+            return self.content
+        return getattr(self.embed, 'description', None) or ''
+
+    async def delete(self):
+        pass
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for a direct-message /ask reply."""
+
+    def __init__(self, user_id: int):
+        self.user = SimpleNamespace(id=user_id, name=f"user{user_id}", discriminator="0")
+        self.guild = None
+        self.channel = SimpleNamespace(id=1, name="load-test")
+        self.response = SimpleNamespace(defer=self._defer)
+        self.followup = SimpleNamespace(send=self._send)
+        self.started = time.perf_counter()
+        self.first_output: Optional[float] = None
+        self.messages: List[FakeMessage] = []
+
+    async def _defer(self, *args, **kwargs):
+        pass
+
+    async def _send(self, content=None, embed=None, embeds=None, ephemeral=False, wait=False):
+        if self.first_output is None:
+            self.first_output = time.perf_counter() - self.started
+        message = FakeMessage(content, embed or (embeds[0] if embeds else None))
+        self.messages.append(message)
+        return message
+
+    def error(self) -> Optional[str]:
+        """What went wrong, if the user did not get an answer."""
+        reply = "\n\n".join(message.text for message in self.messages if message.text)
+        # Replies quote the prompt before the answer: "✉️: prompt\n📫: answer"
+        answer = reply.split("📫: ", 1)[-1]
+        if not answer:
+            return "no reply"
+        if is_error_response(answer):
+            # The error text without the answer it may follow, one line and short enough to group by
+            return answer[answer.find("Sorry, "):].splitlines()[0][:160]
+        return None
+
+class RecordingMonitor:
+    """Stand-in for MessageMonitor that keeps the AI interactions the cog logs."""
+
+    def __init__(self):
+        self.interactions = []
+
+    async def store_ai_interaction(self, interaction_data):
+        self.interactions.append(interaction_data)
+        return True
+
+def percentile(values: List[float], percent: float) -> float:
+    """The given percentile of values (nearest rank), 0 without values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))]
+
+def format_percentiles(values: List[float]) -> str:
+    return " / ".join(f"{percentile(values, percent) * 1000:.0f}ms" for percent in (50, 95, 99))
+
+async def run(args):
+    # Failures are counted in the report; the bot's own logging would drown it by default
+    logging.basicConfig(level=args.log_level.upper())
+    logger = logging.getLogger('discord_bot')
+
+    server = None
+    if args.base_url:
+        root = args.base_url.rstrip('/')
+        base_urls = {'openai': f"{root}/v1", 'grok': f"{root}/v1", 'claude': root, 'google': root}
+    else:
+        server = MockAIServer(
+            ttft=args.ttft, token_interval=args.token_interval, response_tokens=args.response_tokens,
+            error_rate=args.error_rate, error_statuses=args.error_statuses, retry_after=args.retry_after,
+            abort_rate=args.abort_rate, seed=args.seed
+        )
+        await server.start()
+        base_urls = server.base_urls
+
+    registry = ProviderClients(warmup_interval=0)
+    registry.create('mock-key', 'mock-key', 'mock-key', 'mock-key', base_urls=base_urls)
+    await registry.warm_up([args.provider])
+    # The bot loads the tokenizer at startup too
+    await load_encoding()
+
+    monitor = RecordingMonitor()
+    bot = SimpleNamespace(tree=SimpleNamespace(add_command=lambda command: None))
+    cog = AICogCommands(bot, BotState(), {}, logger, message_monitor=monitor)
+    # Start from an empty in-memory cache, whatever the persistence settings
+    cog.response_cache = ResponseCache(max_entries=AI_CACHE_MAX_ENTRIES, max_bytes=AI_CACHE_MAX_BYTES, ttl=AI_CACHE_TTL)
+    if args.stream:
+        # Fake interactions have no webhook, but take follow-ups like one
+        cog._can_stream = lambda interaction: True
+    cog.setup_clients(*(registry.get(provider) for provider in ('openai', 'google', 'claude', 'grok')))
+    model_name, system_prompt = ASK_MODELS[args.provider]
+    strategy = cog.strategies[args.provider]
+
+    distinct_prompts = args.distinct_prompts or args.requests
+    users = args.users or args.requests
+    semaphore = asyncio.Semaphore(args.concurrency)
+    # Timings only count answered requests, so a run where everything fails fast does not look fast
+    latencies = []
+    first_outputs = []
+    errors = Counter()
+
+    async def ask(index: int):
+        async with semaphore:
+            interaction = FakeInteraction(index % users)
+            prompt = f"Question {index % distinct_prompts}: why do the tides change?"
+            try:
+                await cog._handle_ai_request(interaction, prompt, strategy, model_name, system_prompt)
+                error = interaction.error()
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"[:160]
+            if error:
+                errors[error] += 1
+                return
+            latencies.append(time.perf_counter() - interaction.started)
+            if interaction.first_output is not None:
+                first_outputs.append(interaction.first_output)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ask(index) for index in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    await cog.close()
+    await registry.close()
+    if server:
+        await server.stop()
+
+    logged = [data for data in monitor.interactions if not is_error_response(data['response'])]
+    ttfts = [data['time_to_first_token'] for data in logged if data.get('time_to_first_token') is not None]
+    completion_tokens = sum(data.get('completion_tokens') or 0 for data in logged)
+    answered = len(latencies)
+    gateway = get_gateway(args.provider).get_stats()
+    health = get_health(args.provider).get_stats()
+
+    print(f"Provider:        {args.provider} ({model_name}, {'streamed' if args.stream else 'not streamed'})")
+    print(f"Requests:        {args.requests} at concurrency {args.concurrency}")
+    print(f"Answered:        {answered} ({args.requests - answered} failed)")
+    for error, count in errors.most_common(5):
+        print(f"  {count:5d} x {error}")
+    if len(errors) > 5:
+        print(f"  ... and {len(errors) - 5} other errors")
+    print(f"Elapsed:         {elapsed:.2f}s")
+    print(f"Throughput:      {answered / elapsed if elapsed else 0:.1f} answered req/s, "
+          f"{completion_tokens / elapsed if elapsed else 0:.0f} completion tokens/s")
+    print(f"Latency:         {format_percentiles(latencies)} (p50 / p95 / p99)")
+    print(f"First output:    {format_percentiles(first_outputs)}")
+    print(f"Provider TTFT:   {format_percentiles(ttfts)}")
+    print(f"Gateway:         {gateway['admitted']} admitted, {gateway['rejected']} rejected, "
+          f"{gateway['average_wait'] * 1000:.0f}ms average wait")
+    print(f"Circuit:         {health['state']}, {health['failures']} failures, {health['rate_limited']} rate limited, "
+          f"{health['short_circuited']} short-circuited")
+    print(f"Shared calls:    {cog.in_flight.get_stats()}")
+    print(f"Response cache:  {cog.response_cache.get_stats()}")
+    if server:
+        server_stats = server.get_stats()
+        print(f"Server:          {server_stats}")
+        if not sum(server_stats['requests'].values()):
+            print("WARNING: no request reached the server; the timings above measure failures, not the provider")
+    return answered
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /ask end to end against the local stand-in AI server")
+    parser.add_argument('--provider', choices=sorted(ASK_MODELS), default='openai')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20, help="Requests in flight at once")
+    parser.add_argument('--users', type=int, default=0, help="Distinct users (default: one per request)")
+    parser.add_argument('--distinct-prompts', type=int, default=0,
+                        help="Distinct prompts, so repeats hit the cache or share a call (default: all distinct)")
+    parser.add_argument('--stream', action='store_true', help="Stream answers into the replies")
+    parser.add_argument('--base-url', default=None,
+                        help="Root URL of an already running mock_ai_server.py (default: start one)")
+    parser.add_argument('--log-level', default='critical', choices=['debug', 'info', 'warning', 'error', 'critical'],
+                        help="Level of the bot's logging shown during the run")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    answered = asyncio.run(run(args))
+    # A run that answered nothing is a failure, however fast it was
+    sys.exit(0 if answered else 1)
+
+if __name__ == "__main__":
+    main()
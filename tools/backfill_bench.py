@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Offline throughput test for the channel history backfill.
+
+Runs HistoryBackfill against an in-memory fake Discord client with simulated page
+latency and optional rate-limit responses, then reports messages per second. By
+default messages go to a counting stand-in for MessageMonitor; pass --database to
+store them through a real MessageMonitor and a temporary UnifiedDatabase.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import secrets
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+# Add the project root to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+
+from app.discord.history_backfill import HistoryBackfill
+
+class FakeResponse:
+    """Minimal aiohttp-like response so discord.HTTPException can be constructed."""
+
+    def __init__(self, status: int, reason: str):
+        self.status = status
+        self.reason = reason
+
+class FakeMessage:
+    """Just enough of discord.Message for MessageMonitor.process_message."""
+
+    def __init__(self, message_id: int, channel, author):
+        self.id = message_id
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = f"backfill test message {message_id}"
+        self.created_at = discord.utils.snowflake_time(message_id)
+        self.type = discord.MessageType.default
+        self.attachments = []
+
+class FakeChannel:
+    """Text channel whose history is a sorted list of snowflakes."""
+
+    def __init__(self, channel_id: int, guild, message_count: int, start: datetime,
+                 latency: float, rate_limit_chance: float):
+        self.id = channel_id
+        self.guild = guild
+        self.name = f"channel-{channel_id}"
+        self.type = discord.ChannelType.text
+        self.latency = latency
+        self.rate_limit_chance = rate_limit_chance
+        self.requests = 0
+        self.author = SimpleNamespace(id=1000 + channel_id, name=f"user{channel_id}", discriminator="0", bot=False)
+        step = max(1, int((datetime.now(timezone.utc) - start).total_seconds() * 1000 / max(message_count, 1)))
+        base = discord.utils.time_snowflake(start)
+        # The low bits carry the channel id so snowflakes stay unique across channels
+        self.message_ids = [base + ((i + 1) * step << 22) + channel_id for i in range(message_count)]
+
+    def permissions_for(self, member):
+        return SimpleNamespace(read_messages=True, read_message_history=True)
+
+    async def history(self, limit=100, after=None, oldest_first=True):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if random.random() < self.rate_limit_chance:
+            error = discord.HTTPException(FakeResponse(429, 'Too Many Requests'), 'rate limited')
+            error.retry_after = 0.05
+            raise error
+        after_id = after.id if after else 0
+        count = 0
+        for message_id in self.message_ids:
+            if message_id <= after_id:
+                continue
+            yield FakeMessage(message_id, self, self.author)
+            count += 1
+            if count >= limit:
+                break
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f"guild-{guild_id}"
+        self.member_count = 0
+        self.me = SimpleNamespace(id=1)
+        self.text_channels = []
+
+class FakeClient:
+    """Stand-in for discord.Client exposing only the guild list."""
+
+    def __init__(self, guilds: int, channels_per_guild: int, messages_per_channel: int,
+                 lookback_days: int, latency: float, rate_limit_chance: float):
+        start = datetime.now(timezone.utc) - timedelta(days=lookback_days) + timedelta(minutes=1)
+        self.guilds = []
+        channel_id = 1
+        for guild_id in range(1, guilds + 1):
+            guild = FakeGuild(guild_id)
+            for _ in range(channels_per_guild):
+                guild.text_channels.append(
+                    FakeChannel(channel_id, guild, messages_per_channel, start, latency, rate_limit_chance)
+                )
+                channel_id += 1
+            self.guilds.append(guild)
+
+class CountingMonitor:
+    """Stand-in for MessageMonitor that only counts (and de-duplicates) messages."""
+
+    def __init__(self):
+        self.seen = set()
+        self.duplicates = 0
+
+    async def process_message(self, message):
+        if message.id in self.seen:
+            self.duplicates += 1
+        self.seen.add(message.id)
+        return True
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix='backfill_bench_')
+    checkpoint_file = os.path.join(workdir, 'checkpoints.json')
+    client = FakeClient(args.guilds, args.channels, args.messages, args.lookback_days,
+                        args.latency, args.rate_limit_chance)
+
+    db = None
+    if args.database:
+        from utils.database import UnifiedDatabase
+        from app.discord.message_monitor import MessageMonitor
+        key = secrets.token_hex(32)
+        db = UnifiedDatabase(db_path=os.path.join(workdir, 'messages.db'), encryption_key=key)
+        await db.initialize()
+        monitor = MessageMonitor(db=db, encryption_key=key)
+    else:
+        monitor = CountingMonitor()
+
+    backfill = HistoryBackfill(
+        client, monitor, checkpoint_file,
+        max_concurrency=args.concurrency,
+        requests_per_second=args.rps,
+        lookback_days=args.lookback_days
+    )
+    start = time.perf_counter()
+    stats = await backfill.backfill_guilds()
+    elapsed = time.perf_counter() - start
+
+    # A second run from the saved checkpoints should fetch nothing new
+    resumed = HistoryBackfill(client, monitor, checkpoint_file, max_concurrency=args.concurrency, requests_per_second=0)
+    resume_stats = await resumed.backfill_guilds()
+
+    if db:
+        await db.close()
+
+    expected = args.guilds * args.channels * args.messages
+    print(f"Channels:        {stats['channels_done']} done, {stats['channels_failed']} failed")
+    print(f"Messages:        {stats['messages']} / {expected}")
+    print(f"Requests:        {stats['requests']} ({stats['rate_limited']} rate limited)")
+    print(f"Elapsed:         {elapsed:.2f}s")
+    print(f"Throughput:      {stats['messages'] / elapsed if elapsed else 0:.1f} msg/s")
+    print(f"Resumed run:     {resume_stats['messages']} new messages, {resume_stats['requests']} requests")
+    if isinstance(monitor, CountingMonitor):
+        print(f"Duplicates:      {monitor.duplicates}")
+    print(f"Work directory:  {workdir}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the channel history backfill against a fake client")
+    parser.add_argument('--guilds', type=int, default=2)
+    parser.add_argument('--channels', type=int, default=10, help="Text channels per guild")
+    parser.add_argument('--messages', type=int, default=1000, help="Messages per channel")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rps', type=float, default=50.0, help="History requests per second (0 = unlimited)")
+    parser.add_argument('--latency', type=float, default=0.02, help="Simulated seconds per history page")
+    parser.add_argument('--rate-limit-chance', type=float, default=0.0, help="Probability a page returns 429")
+    parser.add_argument('--lookback-days', type=int, default=7)
+    parser.add_argument('--database', action='store_true', help="Store through a real MessageMonitor and database")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Import Discord message exports into the unified database.
+
+Supported inputs (files or directories, searched recursively):
+  - Discord data packages: messages/c<id>/messages.csv or messages.json next to channel.json
+  - DiscordChatExporter JSON exports ({"guild": ..., "channel": ..., "messages": [...]})
+  - DiscordChatExporter CSV exports (AuthorID, Author, Date, Content, Attachments, ...)
+  - JSON Lines files with one message object per line
+
+Files are parsed incrementally so exports larger than memory can be imported.
+Records are validated and normalized into the same shape MessageMonitor stores,
+encrypted in a process pool, and written in large transactions. Progress is
+checkpointed per source file so an interrupted import resumes where it stopped;
+a file that changed since its checkpoint is imported again from the start. Bot
+messages are skipped unless the database tracks them, as for live messages.
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+# Add the project root to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.base import BASE_DATA_DIRECTORY, ENCRYPTION_KEY
+from config.storage_config import MESSAGES_DB_PATH
+from utils.database import UnifiedDatabase, prepare_message_row
+
+logger = logging.getLogger('discord_bot')
+
+DEFAULT_CHECKPOINT_FILE = os.path.join(BASE_DATA_DIRECTORY, 'import_checkpoints.json')
+READ_CHUNK_SIZE = 1 << 20  # 1 MiB per read when streaming JSON
+FINGERPRINT_BYTES = 1 << 16  # Bytes hashed from each end of a file for its checkpoint fingerprint
+
+# ----- Incremental parsing -----
+
+def iter_json_array(fp, key=None):
+    """
+    Yield the items of a JSON array without loading the whole document.
+
+    Args:
+        fp: Text file object positioned at the start of the document
+        key (str, optional): Name of a top-level object key holding the array;
+            None when the document itself is an array
+
+    Yields:
+        The header object (the other top-level keys before the array, only when key is given),
+        then each item
+
+    Raises:
+        json.JSONDecodeError: If the document is malformed
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+
+    def read_more():
+        nonlocal buffer, eof
+        chunk = fp.read(READ_CHUNK_SIZE)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+    def skip_whitespace(pos):
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) or eof:
+                return pos
+            read_more()
+
+    def expect(pos, chars):
+        pos = skip_whitespace(pos)
+        if pos >= len(buffer) or buffer[pos] not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}", buffer, pos)
+        return pos
+
+    def decode(pos):
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # A value ending with the buffer may be cut short (a number); read on to be sure
+                if end < len(buffer) or eof:
+                    return value, end
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            read_more()
+
+    if key is None:
+        pos = expect(0, '[') + 1
+    else:
+        # Decode the top-level members one by one until the key whose value is the array,
+        # so the same name nested deeper or inside a string is never mistaken for it
+        header = {}
+        pos = expect(0, '{') + 1
+        while True:
+            pos = expect(pos, '"}')
+            if buffer[pos] == '}':
+                # No such array: the whole document was the header
+                yield header
+                return
+            name, pos = decode(pos)
+            pos = skip_whitespace(expect(pos, ':') + 1)
+            if name == key and buffer[pos:pos + 1] == '[':
+                break
+            header[name], pos = decode(pos)
+            pos = expect(pos, ',}')
+            if buffer[pos] == ',':
+                pos += 1
+        yield header
+        pos += 1
+
+    while True:
+        # Skip separators between items
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            read_more()
+        if pos >= len(buffer) or buffer[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            read_more()
+            continue
+        yield item
+        pos = end
+        # Drop consumed text occasionally rather than re-slicing the buffer per item
+        if pos >= READ_CHUNK_SIZE:
+            buffer = buffer[pos:]
+            pos = 0
+
+def normalize_timestamp(value):
+    """Convert the timestamp formats used by exports into ISO 8601, or None."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        try:
+            parsed = datetime.strptime(str(value).strip(), '%d-%b-%y %I:%M %p')
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.isoformat()
+
+def synthetic_id(*parts):
+    """Stable ID for exports that carry no message ID, so re-imports upsert instead of duplicating."""
+    digest = hashlib.sha1('\x1f'.join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f"import-{digest}"
+
+def normalize_attachments(value):
+    """Attachment lists come as URL strings, space separated URLs, or exporter objects."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [{'url': url} for url in value.replace(',', ' ').split() if url]
+    attachments = []
+    for attachment in value:
+        if isinstance(attachment, str):
+            attachments.append({'url': attachment})
+        elif isinstance(attachment, dict):
+            attachments.append({
+                'id': str(attachment.get('id', '')),
+                'filename': attachment.get('fileName') or attachment.get('filename'),
+                'url': attachment.get('url'),
+                'size': attachment.get('fileSizeBytes') or attachment.get('size')
+            })
+    return attachments
+
+def normalize_record(record, context):
+    """
+    Map one export record onto the message_data shape used by UnifiedDatabase.store_message.
+
+    Args:
+        record (dict): Raw record from a JSON, JSON Lines or CSV export
+        context (dict): Source defaults (channel_id, guild_id, author_id, author_name)
+
+    Returns:
+        dict or None: Normalized message data, or None if the record is unusable
+    """
+    author = record.get('author') if isinstance(record.get('author'), dict) else {}
+    content = record.get('content', record.get('Contents', record.get('Content', '')))
+    message_id = record.get('message_id') or record.get('id') or record.get('ID')
+    author_id = record.get('author_id') or author.get('id') or record.get('AuthorID') or context.get('author_id')
+    author_name = (record.get('author_name') or author.get('name') or record.get('Author')
+                   or context.get('author_name') or 'Unknown')
+    timestamp = normalize_timestamp(record.get('timestamp') or record.get('Timestamp') or record.get('Date'))
+    channel_id = record.get('channel_id') or context.get('channel_id')
+
+    if not timestamp or not author_id or not channel_id:
+        return None
+    if not message_id:
+        message_id = synthetic_id(channel_id, author_id, timestamp, content)
+
+    message_type = record.get('message_type') or record.get('type') or 'default'
+    return {
+        'message_id': str(message_id),
+        'channel_id': str(channel_id),
+        'guild_id': str(record.get('guild_id') or context.get('guild_id') or '0'),
+        'author_id': str(author_id),
+        'author_name': str(author_name),
+        'content': content or '',
+        'timestamp': timestamp,
+        'message_type': str(message_type).lower(),
+        'is_bot': bool(record.get('is_bot', author.get('isBot', False))),
+        'attachments': normalize_attachments(record.get('attachments') or record.get('Attachments'))
+    }
+
+# ----- Source discovery -----
+
+def _read_json_file(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def discover_sources(paths, defaults):
+    """
+    Find importable files and the context each one needs.
+
+    Returns:
+        list: (path, context) tuples in a stable order
+    """
+    sources = []
+    for root_path in paths:
+        if os.path.isfile(root_path):
+            candidates = [root_path]
+        else:
+            candidates = []
+            for dirpath, _, filenames in os.walk(root_path):
+                for filename in filenames:
+                    if filename.lower().endswith(('.json', '.jsonl', '.csv')) and filename not in ('channel.json', 'user.json', 'index.json'):
+                        candidates.append(os.path.join(dirpath, filename))
+            candidates.sort()
+
+        # Data packages store the exporting user's account next to the messages folder
+        owner = {}
+        for account_path in (os.path.join(root_path, 'account', 'user.json'),
+                             os.path.join(os.path.dirname(root_path.rstrip(os.sep)), 'account', 'user.json')):
+            if os.path.isfile(account_path):
+                owner = _read_json_file(account_path)
+                break
+
+        for path in candidates:
+            context = dict(defaults)
+            if owner:
+                context.setdefault('author_id', str(owner.get('id', '')) or None)
+                context.setdefault('author_name', owner.get('username'))
+            channel_info = _read_json_file(os.path.join(os.path.dirname(path), 'channel.json'))
+            if channel_info:
+                context['channel_id'] = str(channel_info.get('id', context.get('channel_id') or ''))
+                guild = channel_info.get('guild') or {}
+                if guild.get('id'):
+                    context['guild_id'] = str(guild['id'])
+            sources.append((os.path.abspath(path), context))
+    return sources
+
+def iter_records(path, context):
+    """Yield raw records from one source file, updating context from export headers."""
+    lower = path.lower()
+    if lower.endswith('.csv'):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            yield from csv.DictReader(f)
+    elif lower.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        yield {}
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            first = ''
+            while not first:
+                char = f.read(1)
+                if not char:
+                    return
+                first = char.strip()
+            f.seek(0)
+            if first == '[':
+                yield from iter_json_array(f)
+                return
+            items = iter_json_array(f, key='messages')
+            header = next(items, None) or {}
+            if isinstance(header.get('channel'), dict):
+                context['channel_id'] = str(header['channel'].get('id') or context.get('channel_id') or '')
+            if isinstance(header.get('guild'), dict) and header['guild'].get('id'):
+                context['guild_id'] = str(header['guild']['id'])
+            yield from items
+
+# ----- Encryption workers -----
+
+def encrypt_chunk(encryption_key, records):
+    """
+    Validate and encrypt a chunk of normalized records (runs in a worker process).
+
+    Returns:
+        tuple: (rows, number of invalid records)
+    """
+    rows = []
+    invalid = 0
+    for record in records:
+        try:
+            rows.append(prepare_message_row(encryption_key, record))
+        except ValueError:
+            invalid += 1
+    return rows, invalid
+
+# ----- Checkpoints -----
+
+def file_fingerprint(path):
+    """Size plus a hash of both ends of a file, so a changed export is noticed without reading all of it."""
+    size = os.path.getsize(path)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        if size > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, size - FINGERPRINT_BYTES))
+            digest.update(f.read(FINGERPRINT_BYTES))
+    return f"{size}:{digest.hexdigest()}"
+
+def load_checkpoints(path):
+    data = _read_json_file(path) if os.path.exists(path) else {}
+    return data if isinstance(data, dict) else {}
+
+def save_checkpoints(path, checkpoints):
+    """Write checkpoints atomically (temp file + rename)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoints, f, indent=2)
+    os.replace(tmp_path, path)
+
+# ----- Import pipeline -----
+
+class ExportImporter:
+    """Streams export records through a process pool into the database."""
+
+    def __init__(self, db, encryption_key, checkpoint_file, workers=None, chunk_size=500,
+                 transaction_size=5000, resume=True, report_interval=5.0):
+        self.db = db
+        self.encryption_key = encryption_key
+        self.checkpoint_file = checkpoint_file
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.transaction_size = transaction_size
+        self.resume = resume
+        self.report_interval = report_interval
+        self.checkpoints = load_checkpoints(checkpoint_file) if resume else {}
+        self.stats = {'read': 0, 'written': 0, 'invalid': 0, 'skipped': 0, 'bots': 0}
+        self.start_time = None
+        self.last_report = 0.0
+
+    def _report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_report < self.report_interval:
+            return
+        self.last_report = now
+        elapsed = max(now - self.start_time, 1e-9)
+        print(f"[{elapsed:7.1f}s] read {self.stats['read']}, written {self.stats['written']}, "
+              f"invalid {self.stats['invalid']}, skipped {self.stats['skipped']}, bots {self.stats['bots']} "
+              f"({self.stats['written'] / elapsed:.0f} rows/s)", flush=True)
+
+    async def _commit(self, source, fingerprint, rows, consumed):
+        """Write a transaction, then advance the source checkpoint past the records it covered."""
+        written = await self.db.store_message_rows(rows) if rows else 0
+        if rows and not written:
+            raise RuntimeError(f"Transaction failed while importing {source}")
+        self.stats['written'] += written
+        self.checkpoints[source] = {'records': consumed, 'fingerprint': fingerprint}
+        await asyncio.to_thread(save_checkpoints, self.checkpoint_file, dict(self.checkpoints))
+        self._report()
+
+    async def import_source(self, executor, source, context):
+        """Import one file, resuming from its checkpoint."""
+        loop = asyncio.get_running_loop()
+        fingerprint = await asyncio.to_thread(file_fingerprint, source)
+        checkpoint = self.checkpoints.get(source, {})
+        done = checkpoint.get('records', 0)
+        if checkpoint and checkpoint.get('fingerprint') != fingerprint:
+            # Record positions of a changed file mean nothing; rows upsert, so start over
+            print(f"{source} changed since the last run, importing it from the start")
+            done = 0
+        elif checkpoint.get('complete'):
+            print(f"Skipping {source} (already imported)")
+            return
+        # Bot messages are left out unless the database tracks them (as for live messages)
+        skip_bots = not self.db.track_bot_messages
+
+        in_flight = deque()  # (future, records consumed once this chunk is written)
+        pending_rows = []
+        pending_consumed = done
+        chunk = []
+        position = 0
+
+        async def drain(limit):
+            nonlocal pending_rows, pending_consumed
+            while len(in_flight) > limit:
+                future, consumed = in_flight.popleft()
+                rows, invalid = await future
+                self.stats['invalid'] += invalid
+                pending_rows.extend(rows)
+                pending_consumed = consumed
+                if len(pending_rows) >= self.transaction_size:
+                    await self._commit(source, fingerprint, pending_rows, pending_consumed)
+                    pending_rows = []
+
+        for record in iter_records(source, context):
+            position += 1
+            if position <= done:
+                continue
+            self.stats['read'] += 1
+            normalized = normalize_record(record, context) if isinstance(record, dict) else None
+            if normalized is None:
+                self.stats['skipped'] += 1
+            elif skip_bots and normalized['is_bot']:
+                self.stats['bots'] += 1
+            else:
+                chunk.append(normalized)
+            if len(chunk) >= self.chunk_size:
+                in_flight.append((loop.run_in_executor(executor, encrypt_chunk, self.encryption_key, chunk), position))
+                chunk = []
+                # Keep a couple of chunks queued per worker without buffering the whole file
+                await drain(self.workers * 2)
+
+        in_flight.append((loop.run_in_executor(executor, encrypt_chunk, self.encryption_key, chunk), position))
+        await drain(0)
+        await self._commit(source, fingerprint, pending_rows, position)
+        self.checkpoints[source]['complete'] = True
+        await asyncio.to_thread(save_checkpoints, self.checkpoint_file, dict(self.checkpoints))
+
+    async def run(self, sources):
+        self.start_time = time.monotonic()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for source, context in sources:
+                print(f"Importing {source}")
+                await self.import_source(executor, source, context)
+        self._report(force=True)
+        return dict(self.stats)
+
+async def run(args):
+    defaults = {key: value for key, value in {
+        'channel_id': args.channel_id,
+        'guild_id': args.guild_id,
+        'author_id': args.author_id,
+        'author_name': args.author_name
+    }.items() if value}
+    sources = discover_sources(args.paths, defaults)
+    if not sources:
+        print("No importable files found.")
+        return
+
+    db = UnifiedDatabase(db_path=args.db, encryption_key=ENCRYPTION_KEY)
+    await db.initialize()
+    try:
+        importer = ExportImporter(
+            db, ENCRYPTION_KEY, args.checkpoint_file,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            transaction_size=args.transaction_size,
+            resume=not args.restart
+        )
+        stats = await importer.run(sources)
+        elapsed = time.monotonic() - importer.start_time
+        print(f"Imported {stats['written']} messages from {len(sources)} files in {elapsed:.1f}s "
+              f"({stats['written'] / elapsed if elapsed else 0:.0f} rows/s)")
+    finally:
+        await db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Import Discord JSON/CSV exports into the message database")
+    parser.add_argument('paths', nargs='+', help="Export files or directories")
+    parser.add_argument('--db', default=MESSAGES_DB_PATH, help="Database file to import into")
+    parser.add_argument('--workers', type=int, default=None, help="Encryption processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=500, help="Records per encryption task")
+    parser.add_argument('--transaction-size', type=int, default=5000, help="Rows per database transaction")
+    parser.add_argument('--checkpoint-file', default=DEFAULT_CHECKPOINT_FILE)
+    parser.add_argument('--restart', action='store_true', help="Ignore existing checkpoints")
+    parser.add_argument('--channel-id', help="Channel ID for exports that do not include one")
+    parser.add_argument('--guild-id', help="Guild ID for exports that do not include one")
+    parser.add_argument('--author-id', help="Author ID for data-package exports (defaults to account/user.json)")
+    parser.add_argument('--author-name', help="Author name for data-package exports")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
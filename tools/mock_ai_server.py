@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI, Anthropic and Gemini APIs.
+
+Answers chat completion (OpenAI and Grok), message (Anthropic) and
+generateContent (Gemini) requests in each API's own format, streamed or not,
+with made-up text. Nothing leaves the machine and no quota is used. The time to
+the first token and the gap between tokens are drawn from configurable
+distributions. A share of requests can fail with provider-style errors, or drop
+their connection halfway through a stream.
+
+Latency distributions are given as 'kind:parameters', in seconds:
+    fixed:0.4              always 0.4
+    uniform:0.2:1.0        between 0.2 and 1.0
+    normal:0.5:0.1         mean 0.5, standard deviation 0.1
+    lognormal:0.4:0.5      median 0.4, sigma 0.5 (a long tail, like real providers)
+    exponential:0.3        mean 0.3
+
+Run it on its own and point clients at it:
+    python tools/mock_ai_server.py --port 8089 --ttft lognormal:0.4:0.5 --error-rate 0.02
+    OpenAI/Grok: http://127.0.0.1:8089/v1, Anthropic and Gemini: http://127.0.0.1:8089
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+WORDS = (
+    "the model answers every question with a short and plausible reply about tides moons "
+    "orbits light waves energy gravity oceans weather clouds rivers mountains and stars"
+).split()
+
+# Error body and status text of each injected status code, per API
+OPENAI_ERRORS = {429: 'rate_limit_exceeded', 500: 'server_error', 503: 'service_unavailable'}
+ANTHROPIC_ERRORS = {429: 'rate_limit_error', 500: 'api_error', 503: 'overloaded_error', 529: 'overloaded_error'}
+GOOGLE_ERRORS = {429: 'RESOURCE_EXHAUSTED', 500: 'INTERNAL', 503: 'UNAVAILABLE'}
+
+class LatencyDistribution:
+    """
+    Seconds drawn from a distribution given as 'kind:parameters'.
+    """
+
+    KINDS = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exponential': 1}
+
+    def __init__(self, spec: str, rng: Optional[random.Random] = None):
+        """
+        Args:
+            spec (str): Distribution, e.g. 'lognormal:0.4:0.5'
+            rng (random.Random, optional): Random number generator to draw from
+
+        Raises:
+            ValueError: If the distribution is unknown or has the wrong parameters
+        """
+        kind, *params = spec.split(':')
+        if kind not in self.KINDS or len(params) != self.KINDS[kind]:
+            raise ValueError(f"Invalid latency distribution '{spec}'")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(param) for param in params]
+        self.rng = rng or random.Random()
+
+    def sample(self) -> float:
+        """Draw a number of seconds (never negative)."""
+        if self.kind == 'fixed':
+            value = self.params[0]
+        elif self.kind == 'uniform':
+            value = self.rng.uniform(*self.params)
+        elif self.kind == 'normal':
+            value = self.rng.gauss(*self.params)
+        elif self.kind == 'lognormal':
+            median, sigma = self.params
+            value = self.rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        else:
+            value = self.rng.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0.0
+        return max(0.0, value)
+
+    def __str__(self) -> str:
+        return self.spec
+
+class MockAIServer:
+    """
+    HTTP server answering OpenAI, Anthropic and Gemini API requests with made-up text.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, ttft: str = 'lognormal:0.4:0.5',
+                 token_interval: str = 'fixed:0.01', response_tokens: int = 60, error_rate: float = 0.0,
+                 error_statuses: List[int] = (429, 500, 503), retry_after: float = 1.0,
+                 abort_rate: float = 0.0, seed: Optional[int] = None):
+        """
+        Args:
+            host (str): Interface to listen on
+            port (int): Port to listen on (0 picks a free one)
+            ttft (str): Distribution of the time to the first token
+            token_interval (str): Distribution of the time between tokens
+            response_tokens (int): Words in each answer
+            error_rate (float): Share of requests answered with an error
+            error_statuses (list): HTTP statuses injected errors are drawn from
+            retry_after (float): Retry-After seconds sent with 429 responses
+            abort_rate (float): Share of streams whose connection drops halfway
+            seed (int, optional): Seed for reproducible latencies, errors and answers
+        """
+        self.host = host
+        self.port = port
+        self.rng = random.Random(seed)
+        self.ttft = LatencyDistribution(ttft, self.rng)
+        self.token_interval = LatencyDistribution(token_interval, self.rng)
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.error_statuses = list(error_statuses)
+        self.retry_after = retry_after
+        self.abort_rate = abort_rate
+        self._runner: Optional[web.AppRunner] = None
+
+        # Statistics
+        self.requests: Dict[str, int] = {}
+        self.streams = 0
+        self.errors_injected = 0
+        self.streams_aborted = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    @property
+    def url(self) -> str:
+        """Root URL of the running server."""
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def base_urls(self) -> Dict[str, str]:
+        """API URL of each provider, as the SDK clients expect it."""
+        return {'openai': f"{self.url}/v1", 'grok': f"{self.url}/v1", 'claude': self.url, 'google': self.url}
+
+    async def start(self) -> str:
+        """
+        Start listening.
+
+        Returns:
+            str: Root URL of the server
+        """
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post('/v1/chat/completions', self._openai)
+        app.router.add_post('/v1/messages', self._anthropic)
+        app.router.add_post('/{version}/models/{call}', self._google)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def stop(self):
+        """Stop the server."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get request metrics."""
+        return {
+            'requests': dict(self.requests),
+            'streams': self.streams,
+            'errors_injected': self.errors_injected,
+            'streams_aborted': self.streams_aborted,
+            'peak_in_flight': self.peak_in_flight
+        }
+
+    # Request handling shared by the APIs
+
+    async def _handle(self, request: web.Request, api: str, stream: bool, respond, stream_events, error):
+        self.requests[api] = self.requests.get(api, 0) + 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            body = await request.read()
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.errors_injected += 1
+                status = self.rng.choice(self.error_statuses)
+                headers = {'retry-after': str(self.retry_after)} if status == 429 else None
+                return web.json_response(error(status), status=status, headers=headers)
+            # Rough prompt size, as about four characters a token
+            prompt_tokens = max(1, len(body) // 4)
+            words = [self.rng.choice(WORDS) for _ in range(self.response_tokens)]
+            tokens = [word if index == 0 else f" {word}" for index, word in enumerate(words)]
+            if not stream:
+                await asyncio.sleep(self.ttft.sample() + sum(self.token_interval.sample() for _ in tokens[1:]))
+                return web.json_response(respond("".join(tokens).capitalize() + ".", prompt_tokens, len(tokens)))
+            return await self._stream(request, stream_events(tokens, prompt_tokens))
+        finally:
+            self.in_flight -= 1
+
+    async def _stream(self, request: web.Request, events) -> web.StreamResponse:
+        """Send server-sent events, waiting for the first token and between tokens."""
+        self.streams += 1
+        response = web.StreamResponse(headers={'content-type': 'text/event-stream', 'cache-control': 'no-cache'})
+        await response.prepare(request)
+        abort_at = None
+        if self.abort_rate and self.rng.random() < self.abort_rate:
+            abort_at = self.response_tokens // 2
+        first = True
+        sent_tokens = 0
+        for event, carries_token in events:
+            if carries_token:
+                await asyncio.sleep(self.ttft.sample() if first else self.token_interval.sample())
+                first = False
+                if abort_at is not None and sent_tokens >= abort_at:
+                    self.streams_aborted += 1
+                    # Drop the connection mid-stream, as a failing provider or proxy would
+                    request.transport.close()
+                    return response
+                sent_tokens += 1
+            await response.write(event.encode())
+        await response.write_eof()
+        return response
+
+    # OpenAI and Grok chat completions
+
+    async def _openai(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        model = payload.get('model', 'mock')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        def usage(prompt_tokens, completion_tokens):
+            return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                    'total_tokens': prompt_tokens + completion_tokens, 'prompt_tokens_details': {'cached_tokens': 0}}
+
+        def respond(text, prompt_tokens, completion_tokens):
+            return {
+                'id': completion_id, 'object': 'chat.completion', 'created': created, 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+                'usage': usage(prompt_tokens, completion_tokens)
+            }
+
+        def stream_events(tokens, prompt_tokens):
+            chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model}
+            for index, token in enumerate(tokens):
+                finish_reason = 'stop' if index == len(tokens) - 1 else None
+                delta = {'role': 'assistant', 'content': token} if index == 0 else {'content': token}
+                event = {**chunk, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+                yield f"data: {json.dumps(event)}\n\n", True
+            if (payload.get('stream_options') or {}).get('include_usage'):
+                yield f"data: {json.dumps({**chunk, 'choices': [], 'usage': usage(prompt_tokens, len(tokens))})}\n\n", False
+            yield "data: [DONE]\n\n", False
+
+        def error(status):
+            code = OPENAI_ERRORS.get(status, 'server_error')
+            return {'error': {'message': f"Injected {code}", 'type': code, 'param': None, 'code': code}}
+
+        return await self._handle(request, 'openai', bool(payload.get('stream')), respond, stream_events, error)
+
+    # Anthropic messages
+
+    async def _anthropic(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        model = payload.get('model', 'mock')
+        message_id = f"msg_{uuid.uuid4().hex[:12]}"
+
+        def message(content, input_tokens, output_tokens, stop_reason):
+            return {
+                'id': message_id, 'type': 'message', 'role': 'assistant', 'model': model, 'content': content,
+                'stop_reason': stop_reason, 'stop_sequence': None,
+                'usage': {'input_tokens': input_tokens, 'output_tokens': output_tokens,
+                          'cache_read_input_tokens': 0, 'cache_creation_input_tokens': 0}
+            }
+
+        def respond(text, prompt_tokens, completion_tokens):
+            return message([{'type': 'text', 'text': text}], prompt_tokens, completion_tokens, 'end_turn')
+
+        def sse(event_type, data):
+            return f"event: {event_type}\ndata: {json.dumps({'type': event_type, **data})}\n\n"
+
+        def stream_events(tokens, prompt_tokens):
+            yield sse('message_start', {'message': message([], prompt_tokens, 1, None)}), False
+            yield sse('content_block_start', {'index': 0, 'content_block': {'type': 'text', 'text': ''}}), False
+            for token in tokens:
+                yield sse('content_block_delta', {'index': 0, 'delta': {'type': 'text_delta', 'text': token}}), True
+            yield sse('content_block_stop', {'index': 0}), False
+            yield sse('message_delta', {'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                        'usage': {'output_tokens': len(tokens)}}), False
+            yield sse('message_stop', {}), False
+
+        def error(status):
+            return {'type': 'error', 'error': {'type': ANTHROPIC_ERRORS.get(status, 'api_error'), 'message': "Injected error"}}
+
+        return await self._handle(request, 'claude', bool(payload.get('stream')), respond, stream_events, error)
+
+    # Gemini generateContent and streamGenerateContent
+
+    async def _google(self, request: web.Request) -> web.StreamResponse:
+        model, _, method = request.match_info['call'].partition(':')
+        if method not in ('generateContent', 'streamGenerateContent'):
+            raise web.HTTPNotFound()
+
+        def usage(prompt_tokens, completion_tokens):
+            return {'promptTokenCount': prompt_tokens, 'candidatesTokenCount': completion_tokens,
+                    'totalTokenCount': prompt_tokens + completion_tokens}
+
+        def candidate(text, finished):
+            entry = {'content': {'parts': [{'text': text}], 'role': 'model'}, 'index': 0}
+            if finished:
+                entry['finishReason'] = 'STOP'
+            return entry
+
+        def respond(text, prompt_tokens, completion_tokens):
+            return {'candidates': [candidate(text, True)], 'usageMetadata': usage(prompt_tokens, completion_tokens),
+                    'modelVersion': model}
+
+        def stream_events(tokens, prompt_tokens):
+            for index, token in enumerate(tokens):
+                event = {'candidates': [candidate(token, index == len(tokens) - 1)], 'modelVersion': model,
+                         'usageMetadata': usage(prompt_tokens, index + 1)}
+                yield f"data: {json.dumps(event)}\n\n", True
+
+        def error(status):
+            return {'error': {'code': status, 'message': "Injected error", 'status': GOOGLE_ERRORS.get(status, 'INTERNAL')}}
+
+        return await self._handle(request, 'google', method == 'streamGenerateContent', respond, stream_events, error)
+
+async def serve(args):
+    server = MockAIServer(
+        host=args.host, port=args.port, ttft=args.ttft, token_interval=args.token_interval,
+        response_tokens=args.response_tokens, error_rate=args.error_rate, error_statuses=args.error_statuses,
+        retry_after=args.retry_after, abort_rate=args.abort_rate, seed=args.seed
+    )
+    await server.start()
+    print(f"Mock AI server listening on {server.url}")
+    for provider, url in server.base_urls.items():
+        print(f"  {provider:<7} {url}")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.stop()
+        print(json.dumps(server.get_stats(), indent=2))
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Add the options of the stand-in server to a command line parser."""
+    parser.add_argument('--ttft', default='lognormal:0.4:0.5', help="Distribution of the time to the first token")
+    parser.add_argument('--token-interval', default='fixed:0.01', help="Distribution of the time between tokens")
+    parser.add_argument('--response-tokens', type=int, default=60, help="Words in each answer")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with an error")
+    parser.add_argument('--error-statuses', type=lambda value: [int(status) for status in value.split(',')],
+                        default=[429, 500, 503], help="Comma-separated HTTP statuses of injected errors")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds of 429 responses")
+    parser.add_argument('--abort-rate', type=float, default=0.0, help="Share of streams dropped halfway")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for reproducible runs")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve stand-in OpenAI, Anthropic and Gemini APIs locally")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
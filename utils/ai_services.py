@@ -1,32 +1,393 @@
 from abc import ABC, abstractmethod
+import asyncio
+import copy
+import functools
+import inspect
 import logging
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Optional, Tuple
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI
 from config.ai_config import (
     OpenAIConfig, GoogleConfig, ClaudeConfig, GrokConfig, SummarizationConfig,
-    SUMMARIZATION_PROVIDER
+    SUMMARIZATION_PROVIDER, AI_EXECUTOR_MAX_WORKERS,
+    AI_MAX_RETRIES, AI_MAX_RETRY_WAIT, AI_HEDGE_PERCENTILE, AI_HEDGE_DEFAULT_DELAY, AI_PROMPT_CACHING
 )
+from utils.response_cache import make_cache_key
+from utils.provider_gateway import Priority, estimate_tokens, get_gateway
+from utils.provider_health import error_status, get_health, is_retryable, retry_after_seconds
+from utils.prompt_cache import CACHE_CONTROL, cache_breakpoint, get_prompt_cache, prompt_usage
+from utils.token_counter import count_tokens
 
 logger = logging.getLogger('discord_bot')
 
+# Bounded pool for SDK methods that only exist in blocking form, so they never run on the event loop
+_executor = None
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=AI_EXECUTOR_MAX_WORKERS, thread_name_prefix='AIProvider')
+    return _executor
+
+class ProviderTimeout(TimeoutError):
+    """Raised when an AI provider does not answer within its configured timeout."""
+
+async def call_provider(method, timeout: float, **kwargs):
+    """
+    Call an AI SDK method without blocking the event loop.
+    
+    Async SDK methods are awaited directly; blocking ones run in a bounded thread pool.
+    Either way the call is abandoned after the timeout, and cancelling the awaiting
+    task cancels the request (for async clients the HTTP request is aborted).
+    
+    Args:
+        method: The SDK method, e.g. client.chat.completions.create
+        timeout (float): Seconds to wait for the provider
+        **kwargs: Arguments for the method
+        
+    Returns:
+        The SDK response
+        
+    Raises:
+        ProviderTimeout: If the provider did not answer in time
+    """
+    if inspect.iscoroutinefunction(inspect.unwrap(method)):
+        call = method(**kwargs)
+    else:
+        loop = asyncio.get_running_loop()
+        call = loop.run_in_executor(_get_executor(), functools.partial(method, **kwargs))
+    try:
+        return await asyncio.wait_for(call, timeout)
+    except asyncio.TimeoutError:
+        raise ProviderTimeout(f"no response within {timeout:g} seconds") from None
+
+async def iterate_stream(stream, timeout: float) -> AsyncIterator:
+    """
+    Iterate over a streaming SDK response without blocking the event loop.
+    
+    Async streams are iterated directly; blocking iterators are advanced in the
+    bounded thread pool. Each chunk must arrive within the timeout.
+    
+    Args:
+        stream: The stream returned by an SDK call made with streaming enabled
+        timeout (float): Seconds to wait for each chunk
+        
+    Yields:
+        The SDK's stream chunks
+        
+    Raises:
+        ProviderTimeout: If the provider stalled mid-stream
+    """
+    if hasattr(stream, '__aiter__'):
+        iterator = stream.__aiter__()
+        next_chunk = iterator.__anext__
+    else:
+        iterator = iter(stream)
+        loop = asyncio.get_running_loop()
+
+        async def next_chunk():
+            chunk = await loop.run_in_executor(_get_executor(), next, iterator, StopAsyncIteration)
+            if chunk is StopAsyncIteration:
+                raise StopAsyncIteration
+            return chunk
+    while True:
+        try:
+            chunk = await asyncio.wait_for(next_chunk(), timeout)
+        except asyncio.TimeoutError:
+            raise ProviderTimeout(f"stream stalled for {timeout:g} seconds") from None
+        except StopAsyncIteration:
+            return
+        yield chunk
+
+def _chat_completion_delta(chunk) -> Optional[str]:
+    """Text of an OpenAI-compatible chat completion chunk."""
+    if not getattr(chunk, 'choices', None):
+        return None
+    return getattr(chunk.choices[0].delta, 'content', None)
+
+def _claude_delta(event) -> Optional[str]:
+    """Text of an Anthropic Messages stream event."""
+    if getattr(event, 'type', None) != 'content_block_delta':
+        return None
+    return getattr(event.delta, 'text', None)
+
+# Sampling parameters the Messages API takes that recent anthropic SDKs left out of create()
+_CLAUDE_SAMPLING_PARAMS = ('temperature', 'top_p', 'top_k')
+
+@functools.lru_cache(maxsize=None)
+def _accepted_params(function) -> Optional[frozenset]:
+    """Keyword parameters of a function, or None if it takes any (**kwargs) or has no signature."""
+    try:
+        parameters = inspect.signature(function).parameters
+    except (TypeError, ValueError):
+        return None
+    if any(parameter.kind is inspect.Parameter.VAR_KEYWORD for parameter in parameters.values()):
+        return None
+    return frozenset(parameters)
+
+def claude_create_params(client, params: dict) -> dict:
+    """
+    Fit Messages request parameters to the installed SDK's create() signature.
+    
+    anthropic 1.x dropped temperature/top_p/top_k from create(); the API still takes
+    them, so they are sent as extra body fields instead of failing with a TypeError.
+    
+    Args:
+        client: The Anthropic client (or None)
+        params (dict): Request parameters, changed in place
+        
+    Returns:
+        dict: The parameters
+    """
+    create = getattr(getattr(client, 'messages', None), 'create', None)
+    if create is None:
+        return params
+    accepted = _accepted_params(getattr(create, '__func__', create))
+    if accepted is None:
+        return params
+    moved = {key: params.pop(key) for key in _CLAUDE_SAMPLING_PARAMS if key in params and key not in accepted}
+    if moved:
+        params['extra_body'] = {**params.get('extra_body', {}), **moved}
+    return params
+
+def _google_delta(chunk) -> Optional[str]:
+    """Text of a Google GenAI stream chunk."""
+    try:
+        return chunk.text
+    except (AttributeError, ValueError):
+        return None
+
+def _response_tokens(response) -> int:
+    """Total tokens reported in a provider response's usage data (0 if absent)."""
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        total = getattr(usage, 'total_tokens', None)
+        if isinstance(total, int):
+            return total
+        input_tokens = getattr(usage, 'input_tokens', 0)
+        output_tokens = getattr(usage, 'output_tokens', 0)
+        if isinstance(input_tokens, int) and isinstance(output_tokens, int):
+            return input_tokens + output_tokens
+    metadata = getattr(response, 'usage_metadata', None)
+    total = getattr(metadata, 'total_token_count', None)
+    return total if isinstance(total, int) else 0
+
+def _retry_delay(error: BaseException, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying a failed call, or None if it should not be retried."""
+    if attempt >= AI_MAX_RETRIES or isinstance(error, ProviderTimeout) or not is_retryable(error):
+        # Timeouts are not retried: the caller has already waited the full timeout
+        return None
+    delay = retry_after_seconds(error)
+    if delay is None:
+        # Exponential backoff with jitter
+        delay = 0.5 * (2 ** attempt) * random.uniform(0.5, 1.0)
+    return delay if delay <= AI_MAX_RETRY_WAIT else None
+
+def _record_failure(provider: str, error: BaseException):
+    """Report a failed call; a rate limit pauses the provider's gateway for its Retry-After."""
+    get_health(provider).record_failure(error)
+    if error_status(error) == 429:
+        retry_after = retry_after_seconds(error)
+        if retry_after:
+            get_gateway(provider).pause(retry_after)
+
+def _provider_ready(provider: str) -> bool:
+    """Whether a call to a provider would go out now (circuit not open, gateway not paused)."""
+    return get_health(provider).available() and not get_gateway(provider).paused()
+
+def _strip_prefix(text: str, prefix: str) -> str:
+    stripped = text.lstrip()
+    return stripped[len(prefix):].lstrip() if stripped.startswith(prefix) else text
+
+def is_error_response(text: str) -> bool:
+    """Whether a strategy's response is one of its error messages (which must not be cached)."""
+    return text.startswith("Sorry, ") or "\n\nSorry, an error occurred" in text
+
+def _completion_tokens(item) -> Optional[int]:
+    """Output tokens reported by a provider response or stream chunk (None if absent)."""
+    # Anthropic streams report usage on their message_start and message_delta events
+    usage = getattr(item, 'usage', None) or getattr(getattr(item, 'message', None), 'usage', None)
+    if usage is not None:
+        for field in ('completion_tokens', 'output_tokens'):
+            tokens = getattr(usage, field, None)
+            if isinstance(tokens, int):
+                return tokens
+    tokens = getattr(getattr(item, 'usage_metadata', None), 'candidates_token_count', None)
+    return tokens if isinstance(tokens, int) else None
+
+class ResponseMetrics:
+    """
+    Token usage and timing of one provider response.
+    
+    Token counts are None when the provider did not report them.
+    """
+    
+    __slots__ = ('prompt_tokens', 'completion_tokens', 'cached_tokens', 'time_to_first_token', 'latency')
+    
+    def __init__(self):
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.cached_tokens: Optional[int] = None
+        # Seconds from sending the request to the first text (the whole text without streaming)
+        self.time_to_first_token: Optional[float] = None
+        # Seconds from sending the request to the end of the response
+        self.latency: Optional[float] = None
+    
+    @property
+    def total_tokens(self) -> Optional[int]:
+        """Prompt plus completion tokens, if either was reported."""
+        if self.prompt_tokens is None and self.completion_tokens is None:
+            return None
+        return (self.prompt_tokens or 0) + (self.completion_tokens or 0)
+    
+    def record_usage(self, item):
+        """Take the token counts reported by a response or stream chunk, if it has any."""
+        usage = prompt_usage(item)
+        if usage:
+            self.prompt_tokens, self.cached_tokens = usage[0], usage[1]
+        completion = _completion_tokens(item)
+        if completion is not None:
+            self.completion_tokens = completion
+    
+    def update(self, other: 'ResponseMetrics'):
+        """Copy the values of other metrics."""
+        for field in self.__slots__:
+            setattr(self, field, getattr(other, field))
+    
+    def to_dict(self) -> dict:
+        """The metrics as a dictionary, rounded for storage."""
+        values = {field: getattr(self, field) for field in self.__slots__}
+        for field in ('time_to_first_token', 'latency'):
+            if values[field] is not None:
+                values[field] = round(values[field], 4)
+        values['total_tokens'] = self.total_tokens
+        return values
+
+class AIResponse(str):
+    """
+    A strategy's response text, carrying the metrics of the call that produced it.
+    
+    It is a str, so callers that only need the text are unaffected.
+    """
+    
+    metrics: Optional[ResponseMetrics]
+    
+    def __new__(cls, text: str, metrics: Optional[ResponseMetrics] = None):
+        response = super().__new__(cls, text)
+        response.metrics = metrics
+        return response
+
+# Answer-plus-summary mode: the model ends a long answer with a marker line and a summary,
+# so a single completion gives both
+INLINE_SUMMARY_MARKER = "[[SUMMARY]]"
+_INLINE_SUMMARY = re.compile(r'(?:\*\*)?\[\[\s*summary\s*\]\](?:\*\*)?:?', re.IGNORECASE)
+# Streamed text held back in case it is the start of the marker
+_MARKER_HOLD = len(INLINE_SUMMARY_MARKER) + 6
+
+def with_inline_summary(system_prompt: str, limit: int) -> str:
+    """Extend a system prompt to ask for a summary after long answers."""
+    return (
+        f"{system_prompt}\n\n"
+        f"If your answer is longer than {limit} characters, end it with a line containing only "
+        f"{INLINE_SUMMARY_MARKER}, followed by a summary of the answer in fewer than {limit} characters. "
+        f"Do not refer to the summary anywhere else."
+    )
+
+def split_inline_summary(text: str, limit: Optional[int] = None) -> Tuple[str, Optional[str]]:
+    """
+    Split a response written with with_inline_summary into answer and summary.
+    
+    Args:
+        text (str): The response
+        limit (int, optional): Summaries longer than this are discarded
+        
+    Returns:
+        Tuple[str, Optional[str]]: The answer, and its summary (None if the model wrote
+            none, or an unusable one)
+    """
+    matches = list(_INLINE_SUMMARY.finditer(text))
+    if not matches:
+        return text, None
+    marker = matches[-1]
+    answer = text[:marker.start()].rstrip()
+    summary = text[marker.end():].strip()
+    if not answer:
+        # Only a summary; show it as the answer
+        return summary or text, None
+    if not summary or (limit and len(summary) > limit):
+        return answer, None
+    return answer, summary
+
+def with_length_limit(system_prompt: str, max_chars: int) -> str:
+    """Extend a system prompt to ask for answers of at most max_chars characters."""
+    return (
+        f"{system_prompt}\n\n"
+        f"Your answer is shown in Discord messages: keep it under {max_chars} characters, "
+        f"leading with the direct answer."
+    )
+
+class InlineSummaryFilter:
+    """
+    Passes the answer part of a streamed answer-plus-summary response through, holding back the summary.
+    """
+    
+    def __init__(self):
+        self.text = ""
+        self.shown = 0
+        self.in_summary = False
+    
+    def feed(self, delta: str) -> str:
+        """Add a delta; returns the text that can be shown now."""
+        self.text += delta
+        if self.in_summary:
+            return ""
+        marker = _INLINE_SUMMARY.search(self.text, self.shown)
+        if marker:
+            self.in_summary = True
+            return self._show(marker.start())
+        # A trailing "[" or "*" may be the start of the marker
+        cut = len(self.text)
+        for index in range(max(self.shown, len(self.text) - _MARKER_HOLD), len(self.text)):
+            if self.text[index] in '[*':
+                cut = index
+                break
+        return self._show(cut)
+    
+    def flush(self) -> str:
+        """Text still held back at the end of the stream."""
+        return "" if self.in_summary else self._show(len(self.text))
+    
+    def _show(self, end: int) -> str:
+        shown = self.text[self.shown:end]
+        self.shown = end
+        return shown
+
 # Client factory functions
 
-def get_openai_client(api_key):
-    """Initialize and return an OpenAI client"""
+GROK_BASE_URL = "https://api.x.ai/v1"
+
+def get_openai_client(api_key, http_client=None, base_url=None):
+    """Initialize and return an async OpenAI client (on a shared httpx.AsyncClient and at another API URL, if given)"""
     logger.debug("Attempting to initialize OpenAI client.")
     if not api_key:
         logger.debug("No OpenAI API key provided. Client not initialized.") # Change to debug
         return None
     try:
-        client = OpenAI(api_key=api_key)
+        # Retries are done by the strategies, which honor Retry-After and the provider's circuit breaker
+        client = AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=OpenAIConfig.TIMEOUT, max_retries=0,
+                             http_client=http_client)
         logger.debug("OpenAI client initialized successfully.")
         return client
     except Exception as e:
         logger.error(f"Error initializing OpenAI client: {str(e)}", exc_info=True)
         return None
 
-def get_google_genai_client(api_key):
-    """Initialize and return a Google GenAI client"""
+def get_google_genai_client(api_key, http_client=None, base_url=None):
+    """Initialize and return a Google GenAI client (strategies use its async client.aio interface)"""
     logger.debug("Attempting to initialize Google GenAI client.")
     if not api_key:
         logger.debug("No Google GenAI API key provided. Client not initialized.") # Change to debug
@@ -34,9 +395,16 @@ def get_google_genai_client(api_key):
         
     try:
         from google import genai
+        from google.genai import types
         logger.debug("Imported google.genai successfully.")
-        # Initialize the client with API key
-        client = genai.Client(api_key=api_key)
+        # Initialize the client with API key; async requests go through the shared connection pool if given
+        options = {}
+        if http_client is not None:
+            options['httpx_async_client'] = http_client
+        if base_url:
+            options['base_url'] = base_url
+        http_options = types.HttpOptions(**options) if options else None
+        client = genai.Client(api_key=api_key, http_options=http_options)
         logger.debug("Google GenAI client initialized successfully.")
         return client
     except ImportError as e:
@@ -46,8 +414,8 @@ def get_google_genai_client(api_key):
         logger.error(f"Error initializing Google GenAI client: {str(e)}", exc_info=True)
         return None
 
-def get_claude_client(api_key):
-    """Initialize and return a Claude/Anthropic client"""
+def get_claude_client(api_key, http_client=None, base_url=None):
+    """Initialize and return an async Claude/Anthropic client (on a shared httpx.AsyncClient and at another API URL, if given)"""
     logger.debug("Attempting to initialize Claude client.")
     if not api_key:
         logger.debug("No Claude API key provided. Client not initialized.") # Change to debug
@@ -56,7 +424,8 @@ def get_claude_client(api_key):
     try:
         import anthropic
         logger.debug("Imported anthropic successfully.")
-        client = anthropic.Client(api_key=api_key)
+        client = anthropic.AsyncAnthropic(api_key=api_key, base_url=base_url, timeout=ClaudeConfig.TIMEOUT, max_retries=0,
+                                          http_client=http_client)
         logger.debug("Claude client initialized successfully.")
         return client
     except ImportError as e:
@@ -66,17 +435,18 @@ def get_claude_client(api_key):
         logger.error(f"Error initializing Claude client: {str(e)}", exc_info=True)
         return None
 
-def get_grok_client(api_key):
-    """Initialize and return a Grok client (using OpenAI compatible SDK)"""
+def get_grok_client(api_key, http_client=None, base_url=None):
+    """Initialize and return an async Grok client (using OpenAI compatible SDK)"""
     logger.debug("Attempting to initialize Grok client.")
     if not api_key:
         logger.debug("No Grok API key provided. Client not initialized.") # Change to debug
         return None
         
     try:
-        from openai import OpenAI as GrokClient
+        from openai import AsyncOpenAI as GrokClient
         logger.debug("Imported GrokClient (OpenAI) successfully.")
-        client = GrokClient(api_key=api_key, base_url="https://api.x.ai/v1")
+        client = GrokClient(api_key=api_key, base_url=base_url or GROK_BASE_URL, timeout=GrokConfig.TIMEOUT, max_retries=0,
+                            http_client=http_client)
         logger.debug("Grok client initialized successfully.")
         return client
     except ImportError as e:
@@ -86,10 +456,33 @@ def get_grok_client(api_key):
         logger.error(f"Error initializing Grok client: {str(e)}", exc_info=True)
         return None
 
+async def close_ai_clients(*clients):
+    """Close the HTTP connection pools of async AI clients."""
+    for client in clients:
+        if client is None:
+            continue
+        try:
+            # google-genai keeps its async transport under client.aio
+            closer = getattr(getattr(client, 'aio', client), 'aclose', None) or getattr(client, 'close', None)
+            if closer is None:
+                continue
+            result = closer()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.warning(f"Error closing AI client {type(client).__name__}: {e}")
+
 # Client strategy classes for generating responses
 
 class AIClientStrategy(ABC):
     """Abstract base class for AI client strategies."""
+    provider = None
+    priority = Priority.INTERACTIVE
+    # Tokens of system prompt plus conversation sent per request (None for no limit)
+    context_token_budget = None
+    # Output tokens requested per response
+    max_tokens = None
+    
     def __init__(self, client, logger):
         self.client = client
         self.logger = logger
@@ -99,38 +492,230 @@ class AIClientStrategy(ABC):
     async def generate_response(self, context: list, system_prompt: str) -> str:
         """Generate a response using the provided context and system prompt"""
         pass
+    
+    def cache_params(self) -> dict:
+        """The model and sampling parameters that determine the response."""
+        return {}
+    
+    def context_budget(self, system_prompt: str) -> Optional[int]:
+        """Tokens left for the conversation context once the system prompt is counted."""
+        if not self.context_token_budget:
+            return None
+        return max(1, self.context_token_budget - count_tokens(system_prompt, self.provider))
+    
+    def with_max_tokens(self, max_tokens: Optional[int]):
+        """
+        A copy of the strategy whose responses are limited to max_tokens.
+        
+        The configured limit is never raised; the strategy itself is returned when
+        there is nothing to lower.
+        """
+        if not max_tokens or not self.max_tokens or max_tokens >= self.max_tokens:
+            return self
+        limited = copy.copy(self)
+        limited.max_tokens = max_tokens
+        return limited
+    
+    def cache_key(self, context: list, system_prompt: str) -> str:
+        """The response cache key for a request."""
+        return make_cache_key(self.provider, self.cache_params(), system_prompt, context)
+    
+    async def stream_response(self, context: list, system_prompt: str,
+                              metrics: Optional[ResponseMetrics] = None) -> AsyncIterator[str]:
+        """
+        Generate a response as a stream of text deltas.
+        
+        Strategies without streaming support yield the complete response as a single delta.
+        Errors are yielded as text, like generate_response returns them.
+        
+        Args:
+            context (list): The conversation
+            system_prompt (str): The system prompt
+            metrics (ResponseMetrics, optional): Filled in with the response's token usage and timing
+        """
+        result = await self.generate_response(context, system_prompt)
+        if metrics is not None and getattr(result, 'metrics', None) is not None:
+            metrics.update(result.metrics)
+        yield result
+    
+    async def _call(self, method, timeout: float, tokens: int,
+                    metrics: Optional[ResponseMetrics] = None, **kwargs):
+        """
+        call_provider, once the provider's gateway admits the call.
+        
+        Outcomes are reported to the provider's health tracker. Calls fail fast while its
+        circuit is open, and transient errors are retried with backoff (or after the
+        provider's Retry-After, for which the gateway also holds other calls). The usage and latency of the successful call are
+        recorded in metrics, if given.
+        """
+        health = get_health(self.provider)
+        for attempt in range(AI_MAX_RETRIES + 1):
+            health.check()
+            recorded = False
+            try:
+                async with get_gateway(self.provider).admit(self.priority, tokens) as admission:
+                    started = time.monotonic()
+                    try:
+                        response = await call_provider(method, timeout, **kwargs)
+                    except Exception as e:
+                        _record_failure(self.provider, e)
+                        recorded = True
+                        error = e
+                    else:
+                        latency = time.monotonic() - started
+                        health.record_success(latency)
+                        recorded = True
+                        if metrics is not None:
+                            metrics.time_to_first_token = metrics.latency = latency
+                            metrics.record_usage(response)
+                        used = _response_tokens(response)
+                        if used:
+                            admission.settle(used)
+                        usage = prompt_usage(response)
+                        if usage:
+                            get_prompt_cache(self.provider).record(*usage)
+                        return response
+            finally:
+                if not recorded:
+                    health.release_probe()
+            delay = _retry_delay(error, attempt)
+            if delay is None:
+                raise error
+            self.logger.warning(f"{self.provider} call failed ({error}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    
+    async def _stream_deltas(self, open_stream: Callable, timeout: float,
+                             extract: Callable[[object], Optional[str]], provider: str,
+                             tokens: int = 0, metrics: Optional[ResponseMetrics] = None) -> AsyncIterator[str]:
+        """
+        Open a provider stream and yield its text deltas.
+        
+        The stream holds a slot of the provider's gateway until it ends.
+        
+        Args:
+            open_stream (callable): Coroutine function starting the streaming request
+            timeout (float): Seconds to wait for the stream to open and for each chunk
+            extract (callable): Gets the text delta from a chunk (None for chunks without text)
+            provider (str): Provider name for logs and error messages
+            tokens (int): Estimated tokens of the request
+            metrics (ResponseMetrics, optional): Filled in with the stream's token usage and timing
+        """
+        streamed = False
+        health = get_health(self.provider)
+        recorded = False
+        usage = None
+        try:
+            health.check()
+            async with get_gateway(self.provider).admit(self.priority, tokens):
+                started = time.monotonic()
+                try:
+                    stream = await open_stream()
+                    async for chunk in iterate_stream(stream, timeout):
+                        # Usage comes with the first (Anthropic) or last chunks of a stream
+                        usage = prompt_usage(chunk) or usage
+                        if metrics is not None:
+                            metrics.record_usage(chunk)
+                        text = extract(chunk)
+                        if text:
+                            if not streamed and metrics is not None:
+                                metrics.time_to_first_token = time.monotonic() - started
+                            streamed = True
+                            yield text
+                except Exception as e:
+                    _record_failure(self.provider, e)
+                    recorded = True
+                    raise
+                health.record_success(time.monotonic() - started)
+                recorded = True
+                if metrics is not None:
+                    metrics.latency = time.monotonic() - started
+                if usage:
+                    get_prompt_cache(self.provider).record(*usage)
+            self.logger.debug(f"{provider} stream finished.")
+        except Exception as e:
+            self.logger.error(f"Error during {provider} streaming: {str(e)}", exc_info=True)
+            separator = "\n\n" if streamed else ""
+            yield f"{separator}Sorry, an error occurred while contacting {provider}: {str(e)}"
+        finally:
+            if not recorded:
+                health.release_probe()
+    
+    def _google_generate(self):
+        """The Google GenAI generate_content method, preferring the async client."""
+        aio = getattr(self.client, 'aio', None)
+        return aio.models.generate_content if aio is not None else self.client.models.generate_content
 
 class OpenAIStrategy(AIClientStrategy):
     """Strategy for generating responses using OpenAI's API"""
+    provider = 'openai'
+    context_token_budget = OpenAIConfig.CONTEXT_TOKEN_BUDGET
+    max_tokens = OpenAIConfig.MAX_TOKENS
+    
     async def generate_response(self, context: list, system_prompt: str) -> str:
         self.logger.debug(f"OpenAIStrategy generating response. Context length: {len(context)}")
         if not self.client:
             self.logger.error("OpenAI client not initialized")
             return "Sorry, I cannot generate a response because the OpenAI API is not configured."
             
-        messages = [{"role": "system", "content": system_prompt}] + context
-        self.logger.debug(f"Sending {len(messages)} messages to OpenAI API.")
+        request = self._request(context, system_prompt)
+        self.logger.debug(f"Sending {len(request['messages'])} messages to OpenAI API.")
+        metrics = ResponseMetrics()
         try:
-            response = self.client.chat.completions.create(
-                model=OpenAIConfig.MODEL,
-                messages=messages,
-                temperature=OpenAIConfig.TEMPERATURE,
-                max_tokens=OpenAIConfig.MAX_TOKENS,
-                top_p=OpenAIConfig.TOP_P,
-                frequency_penalty=OpenAIConfig.FREQUENCY_PENALTY,
-                presence_penalty=OpenAIConfig.PRESENCE_PENALTY,
-                timeout=OpenAIConfig.TIMEOUT
+            response = await self._call(
+                self.client.chat.completions.create,
+                OpenAIConfig.TIMEOUT,
+                estimate_tokens(context, system_prompt, self.max_tokens),
+                metrics=metrics,
+                **request
             )
             self.logger.debug("Received response from OpenAI API.")
             result = response.choices[0].message.content.strip()
             self.logger.debug(f"OpenAI response length: {len(result)}")
-            return result
+            return AIResponse(result, metrics)
         except Exception as e:
             self.logger.error(f"Error during OpenAI API call: {str(e)}", exc_info=True)
             return f"Sorry, an error occurred while contacting OpenAI: {str(e)}"
 
+    async def stream_response(self, context: list, system_prompt: str,
+                              metrics: Optional[ResponseMetrics] = None) -> AsyncIterator[str]:
+        if not self.client:
+            self.logger.error("OpenAI client not initialized")
+            yield "Sorry, I cannot generate a response because the OpenAI API is not configured."
+            return
+        request = self._request(context, system_prompt)
+        self.logger.debug(f"Streaming {len(request['messages'])} messages to OpenAI API.")
+        open_stream = lambda: call_provider(
+            self.client.chat.completions.create, OpenAIConfig.TIMEOUT,
+            stream=True, stream_options={"include_usage": True}, **request
+        )
+        async for text in self._stream_deltas(
+            open_stream, OpenAIConfig.TIMEOUT, _chat_completion_delta, "OpenAI",
+            tokens=estimate_tokens(context, system_prompt, self.max_tokens), metrics=metrics
+        ):
+            yield text
+
+    def cache_params(self) -> dict:
+        params = self._request([], "")
+        del params['messages']
+        return params
+
+    def _request(self, context: list, system_prompt: str) -> dict:
+        return {
+            'model': OpenAIConfig.MODEL,
+            'messages': [{"role": "system", "content": system_prompt}] + context,
+            'temperature': OpenAIConfig.TEMPERATURE,
+            'max_tokens': self.max_tokens,
+            'top_p': OpenAIConfig.TOP_P,
+            'frequency_penalty': OpenAIConfig.FREQUENCY_PENALTY,
+            'presence_penalty': OpenAIConfig.PRESENCE_PENALTY
+        }
+
 class GoogleGenAIStrategy(AIClientStrategy):
     """Strategy for generating responses using Google's Gemini API"""
+    provider = 'google'
+    context_token_budget = GoogleConfig.CONTEXT_TOKEN_BUDGET
+    max_tokens = GoogleConfig.MAX_OUTPUT_TOKENS
+    
     async def generate_response(self, context: list, system_prompt: str) -> str:
         self.logger.debug(f"GoogleGenAIStrategy generating response. Context length: {len(context)}")
         if not self.client:
@@ -138,38 +723,17 @@ class GoogleGenAIStrategy(AIClientStrategy):
             return "Sorry, I cannot generate a response because the Google GenAI API is not configured."
         
         try:
-            # Format messages into a single prompt with clear role indicators
-            formatted_content = f"System: {system_prompt}\n\n"
-            
-            for message in context:
-                role = message["role"]
-                content = message["content"]
-                if role == "user":
-                    formatted_content += f"User: {content}\n\n"
-                elif role == "assistant":
-                    formatted_content += f"Assistant: {content}\n\n"
-            
-            # For the last user message, ensure we're asking for a detailed response
-            if context and context[-1]["role"] == "user":
-                formatted_content += "Assistant: "
-            
-            self.logger.debug("Formatted context for Google GenAI API.")
+            formatted_content, generation_config = self._request(context, system_prompt)
             
             # Generate the response using the documented approach
             self.logger.debug("Sending request to Google GenAI API.")
             
-            # Import the types module from Google GenAI
-            from google.genai import types
-            
-            # Create config object with settings from configuration
-            generation_config = types.GenerateContentConfig(
-                temperature=GoogleConfig.TEMPERATURE,
-                max_output_tokens=GoogleConfig.MAX_OUTPUT_TOKENS,
-                top_p=GoogleConfig.TOP_P,
-                top_k=GoogleConfig.TOP_K
-            )
-            
-            response = self.client.models.generate_content(
+            metrics = ResponseMetrics()
+            response = await self._call(
+                self._google_generate(),
+                GoogleConfig.TIMEOUT,
+                estimate_tokens(context, system_prompt, self.max_tokens),
+                metrics=metrics,
                 model=GoogleConfig.MODEL,
                 contents=formatted_content,
                 config=generation_config
@@ -186,7 +750,7 @@ class GoogleGenAIStrategy(AIClientStrategy):
                     result = result[len("Assistant:"):].strip()
                 
                 self.logger.debug(f"Google GenAI response length: {len(result)}")
-                return result
+                return AIResponse(result, metrics)
             else:
                 self.logger.warning("Response doesn't have a 'text' attribute, trying alternative extraction")
                 result = str(response)
@@ -196,13 +760,97 @@ class GoogleGenAIStrategy(AIClientStrategy):
                     result = result.split("text:")[1].strip()
                 
                 self.logger.debug(f"Google GenAI response (fallback extraction) length: {len(result)}")
-                return result
+                return AIResponse(result, metrics)
         except Exception as e:
             self.logger.error(f"Error in Google GenAI: {str(e)}", exc_info=True)
             return f"Sorry, an error occurred while contacting Google GenAI: {str(e)}"
 
+    async def stream_response(self, context: list, system_prompt: str,
+                              metrics: Optional[ResponseMetrics] = None) -> AsyncIterator[str]:
+        if not self.client:
+            self.logger.error("Google GenAI client not initialized")
+            yield "Sorry, I cannot generate a response because the Google GenAI API is not configured."
+            return
+        aio = getattr(self.client, 'aio', None)
+        method = aio.models.generate_content_stream if aio is not None else self.client.models.generate_content_stream
+        
+        async def open_stream():
+            formatted_content, generation_config = self._request(context, system_prompt)
+            self.logger.debug("Streaming request to Google GenAI API.")
+            return await call_provider(
+                method,
+                GoogleConfig.TIMEOUT,
+                model=GoogleConfig.MODEL,
+                contents=formatted_content,
+                config=generation_config
+            )
+        
+        # Hold back the start of the stream until it is clear whether the model echoed the "Assistant:" prefix
+        prefix = "Assistant:"
+        head = ""
+        async for text in self._stream_deltas(
+            open_stream, GoogleConfig.TIMEOUT, _google_delta, "Google GenAI",
+            tokens=estimate_tokens(context, system_prompt, self.max_tokens), metrics=metrics
+        ):
+            if head is None:
+                yield text
+                continue
+            head += text
+            if len(head.lstrip()) >= len(prefix):
+                yield _strip_prefix(head, prefix)
+                head = None
+        if head:
+            yield _strip_prefix(head, prefix)
+
+    def cache_params(self) -> dict:
+        return {
+            'model': GoogleConfig.MODEL,
+            'temperature': GoogleConfig.TEMPERATURE,
+            'max_output_tokens': self.max_tokens,
+            'top_p': GoogleConfig.TOP_P,
+            'top_k': GoogleConfig.TOP_K
+        }
+
+    def _request(self, context: list, system_prompt: str):
+        """Build the prompt text and generation config for a request."""
+        # Format messages into a single prompt with clear role indicators
+        formatted_content = f"System: {system_prompt}\n\n"
+        
+        for message in context:
+            role = message["role"]
+            content = message["content"]
+            if role == "user":
+                formatted_content += f"User: {content}\n\n"
+            elif role == "assistant":
+                formatted_content += f"Assistant: {content}\n\n"
+            elif role == "system":
+                # e.g. the rolling summary of a compacted conversation
+                formatted_content += f"System: {content}\n\n"
+        
+        # For the last user message, ensure we're asking for a detailed response
+        if context and context[-1]["role"] == "user":
+            formatted_content += "Assistant: "
+        
+        self.logger.debug("Formatted context for Google GenAI API.")
+        
+        # Import the types module from Google GenAI
+        from google.genai import types
+        
+        # Create config object with settings from configuration
+        generation_config = types.GenerateContentConfig(
+            temperature=GoogleConfig.TEMPERATURE,
+            max_output_tokens=self.max_tokens,
+            top_p=GoogleConfig.TOP_P,
+            top_k=GoogleConfig.TOP_K
+        )
+        return formatted_content, generation_config
+
 class ClaudeStrategy(AIClientStrategy):
     """Strategy for generating responses using Anthropic's Claude API"""
+    provider = 'claude'
+    context_token_budget = ClaudeConfig.CONTEXT_TOKEN_BUDGET
+    max_tokens = ClaudeConfig.MAX_TOKENS
+    
     async def generate_response(self, context: list, system_prompt: str) -> str:
         self.logger.debug(f"ClaudeStrategy generating response. Context length: {len(context)}")
         if not self.client:
@@ -213,15 +861,15 @@ class ClaudeStrategy(AIClientStrategy):
         user_messages = context
         self.logger.debug(f"Sending {len(user_messages)} messages to Claude API.")
 
+        metrics = ResponseMetrics()
         try:
             # Call the Messages API with the correct arguments
-            response = self.client.messages.create(
-                model=ClaudeConfig.MODEL,
-                max_tokens=ClaudeConfig.MAX_TOKENS,
-                temperature=ClaudeConfig.TEMPERATURE,
-                top_p=ClaudeConfig.TOP_P,
-                system=system_prompt,
-                messages=user_messages
+            response = await self._call(
+                self.client.messages.create,
+                ClaudeConfig.TIMEOUT,
+                estimate_tokens(user_messages, system_prompt, self.max_tokens),
+                metrics=metrics,
+                **self._request(user_messages, system_prompt)
             )
             self.logger.debug("Received response from Claude API.")
 
@@ -231,10 +879,10 @@ class ClaudeStrategy(AIClientStrategy):
                     # Concatenate all TextBlock objects into a single string
                     result = "".join(block.text if hasattr(block, "text") else str(block) for block in response.content).strip()
                     self.logger.debug(f"Claude response length (list): {len(result)}")
-                    return result
+                    return AIResponse(result, metrics)
                 result = response.content.strip()
                 self.logger.debug(f"Claude response length (single): {len(result)}")
-                return result
+                return AIResponse(result, metrics)
             else:
                 self.logger.error("Claude API response does not contain 'content'.")
                 return "Sorry, the response from Claude was malformed."
@@ -242,39 +890,118 @@ class ClaudeStrategy(AIClientStrategy):
             self.logger.error(f"Error during Claude API call: {str(e)}", exc_info=True)
             return f"Sorry, an error occurred while contacting Claude: {str(e)}"
 
+    async def stream_response(self, context: list, system_prompt: str,
+                              metrics: Optional[ResponseMetrics] = None) -> AsyncIterator[str]:
+        if not self.client:
+            self.logger.error("Claude client not initialized")
+            yield "Sorry, I cannot generate a response because the Claude API is not configured."
+            return
+        self.logger.debug(f"Streaming {len(context)} messages to Claude API.")
+        request = self._request(context, system_prompt)
+        open_stream = lambda: call_provider(self.client.messages.create, ClaudeConfig.TIMEOUT, stream=True, **request)
+        async for text in self._stream_deltas(
+            open_stream, ClaudeConfig.TIMEOUT, _claude_delta, "Claude",
+            tokens=estimate_tokens(context, system_prompt, self.max_tokens), metrics=metrics
+        ):
+            yield text
+
+    def cache_params(self) -> dict:
+        params = self._request([], "")
+        del params['messages'], params['system']
+        return params
+
+    def _request(self, context: list, system_prompt: str) -> dict:
+        # The Messages API takes system text only as a parameter, so context system entries move there
+        system = [system_prompt] + [m["content"] for m in context if m["role"] == "system"]
+        messages = [m for m in context if m["role"] != "system"]
+        if AI_PROMPT_CACHING:
+            # Breakpoints after the static system prompt and at the end of the conversation, so the
+            # next turn reads everything up to its new message from the provider's prompt cache
+            system = [{"type": "text", "text": text} for text in system]
+            system[0]["cache_control"] = CACHE_CONTROL
+            if messages:
+                messages[-1] = cache_breakpoint(messages[-1])
+        else:
+            system = "\n\n".join(system)
+        return claude_create_params(self.client, {
+            'model': ClaudeConfig.MODEL,
+            'max_tokens': self.max_tokens,
+            'temperature': ClaudeConfig.TEMPERATURE,
+            'top_p': ClaudeConfig.TOP_P,
+            'system': system,
+            'messages': messages
+        })
+
 class GrokStrategy(AIClientStrategy):
     """Strategy for generating responses using xAI's Grok API"""
+    provider = 'grok'
+    context_token_budget = GrokConfig.CONTEXT_TOKEN_BUDGET
+    max_tokens = GrokConfig.MAX_TOKENS
+    
     async def generate_response(self, context: list, system_prompt: str) -> str:
         self.logger.debug(f"GrokStrategy generating response. Context length: {len(context)}")
         if not self.client:
             self.logger.error("Grok client not initialized")
             return "Sorry, I cannot generate a response because the Grok API is not configured."
             
-        messages = [{"role": "system", "content": system_prompt}] + context
-        self.logger.debug(f"Sending {len(messages)} messages to Grok API.")
+        request = self._request(context, system_prompt)
+        self.logger.debug(f"Sending {len(request['messages'])} messages to Grok API.")
         
+        metrics = ResponseMetrics()
         try:
             # Updated to use the new API pattern
-            response = self.client.chat.completions.create(
-                model=GrokConfig.MODEL,
-                messages=messages,
-                temperature=GrokConfig.TEMPERATURE,
-                max_tokens=GrokConfig.MAX_TOKENS,
-                top_p=GrokConfig.TOP_P,
-                frequency_penalty=GrokConfig.FREQUENCY_PENALTY
+            response = await self._call(
+                self.client.chat.completions.create,
+                GrokConfig.TIMEOUT,
+                estimate_tokens(context, system_prompt, self.max_tokens),
+                metrics=metrics,
+                **request
             )
             self.logger.debug("Received response from Grok API.")
             result = response.choices[0].message.content.strip()
             self.logger.debug(f"Grok response length: {len(result)}")
-            return result
+            return AIResponse(result, metrics)
         except Exception as e:
             self.logger.error(f"Error during Grok API call: {str(e)}", exc_info=True)
             return f"Sorry, an error occurred while contacting Grok: {str(e)}"
 
+    async def stream_response(self, context: list, system_prompt: str,
+                              metrics: Optional[ResponseMetrics] = None) -> AsyncIterator[str]:
+        if not self.client:
+            self.logger.error("Grok client not initialized")
+            yield "Sorry, I cannot generate a response because the Grok API is not configured."
+            return
+        request = self._request(context, system_prompt)
+        self.logger.debug(f"Streaming {len(request['messages'])} messages to Grok API.")
+        open_stream = lambda: call_provider(
+            self.client.chat.completions.create, GrokConfig.TIMEOUT,
+            stream=True, stream_options={"include_usage": True}, **request
+        )
+        async for text in self._stream_deltas(
+            open_stream, GrokConfig.TIMEOUT, _chat_completion_delta, "Grok",
+            tokens=estimate_tokens(context, system_prompt, self.max_tokens), metrics=metrics
+        ):
+            yield text
+
+    def cache_params(self) -> dict:
+        params = self._request([], "")
+        del params['messages']
+        return params
+
+    def _request(self, context: list, system_prompt: str) -> dict:
+        return {
+            'model': GrokConfig.MODEL,
+            'messages': [{"role": "system", "content": system_prompt}] + context,
+            'temperature': GrokConfig.TEMPERATURE,
+            'max_tokens': self.max_tokens,
+            'top_p': GrokConfig.TOP_P,
+            'frequency_penalty': GrokConfig.FREQUENCY_PENALTY
+        }
+
 class SummarizationStrategy(AIClientStrategy):
     """Generic strategy for text summarization that can use different AI backends."""
     
-    def __init__(self, client, logger, provider=SUMMARIZATION_PROVIDER):
+    def __init__(self, client, logger, provider=SUMMARIZATION_PROVIDER, model=None):
         """
         Initialize the summarization strategy.
         
@@ -282,11 +1009,38 @@ class SummarizationStrategy(AIClientStrategy):
             client: The client instance for the AI provider
             logger: Logger instance
             provider: The AI provider to use ('google', 'openai', 'claude', or 'grok')
+            model: The model to use (defaults to the configured summarization model)
         """
         super().__init__(client, logger)
         self.provider = provider.lower()
+        self.model = model or SummarizationConfig.MODEL
+        # Summaries queue behind interactive requests to the same provider
+        self.priority = Priority.BACKGROUND
         self.logger.debug(f"Initialized SummarizationStrategy with provider: {self.provider}")
 
+    def cache_params(self) -> dict:
+        params = {
+            'google': {
+                'temperature': SummarizationConfig.GOOGLE_TEMPERATURE,
+                'max_output_tokens': SummarizationConfig.GOOGLE_MAX_OUTPUT_TOKENS,
+                'top_p': SummarizationConfig.GOOGLE_TOP_P,
+                'top_k': SummarizationConfig.GOOGLE_TOP_K
+            },
+            'openai': {
+                'temperature': SummarizationConfig.OPENAI_TEMPERATURE,
+                'max_tokens': SummarizationConfig.OPENAI_MAX_TOKENS
+            },
+            'claude': {
+                'temperature': SummarizationConfig.CLAUDE_TEMPERATURE,
+                'max_tokens': SummarizationConfig.CLAUDE_MAX_TOKENS
+            },
+            'grok': {
+                'temperature': SummarizationConfig.GROK_TEMPERATURE,
+                'max_tokens': SummarizationConfig.GROK_MAX_TOKENS
+            }
+        }.get(self.provider, {})
+        return {'model': self.model, 'summary': True, **params}
+
     async def generate_response(self, context: list, system_prompt: str) -> str:
         """Generate a summary using the configured provider."""
         self.logger.debug(f"SummarizationStrategy generating response using {self.provider}. Context length: {len(context)}")
@@ -310,6 +1064,7 @@ class SummarizationStrategy(AIClientStrategy):
     
     async def _generate_google_summary(self, context: list, system_prompt: str) -> str:
         """Generate summary using Google's Gemini API."""
+        metrics = ResponseMetrics()
         try:
             # Format messages into a single prompt with clear role indicators
             formatted_content = f"System: {system_prompt}\n\n"
@@ -340,8 +1095,12 @@ class SummarizationStrategy(AIClientStrategy):
             )
             
             # Use the dedicated summarization model
-            response = self.client.models.generate_content(
-                model=SummarizationConfig.MODEL,
+            response = await self._call(
+                self._google_generate(),
+                SummarizationConfig.TIMEOUT,
+                estimate_tokens(context, system_prompt, SummarizationConfig.GOOGLE_MAX_OUTPUT_TOKENS),
+                metrics=metrics,
+                model=self.model,
                 contents=formatted_content,
                 config=generation_config
             )
@@ -357,7 +1116,7 @@ class SummarizationStrategy(AIClientStrategy):
                     result = result[len("Assistant:"):].strip()
                 
                 self.logger.debug(f"Summarization length: {len(result)}")
-                return result
+                return AIResponse(result, metrics)
             else:
                 self.logger.warning("Summarization response doesn't have a 'text' attribute, trying alternative extraction")
                 result = str(response)
@@ -367,19 +1126,24 @@ class SummarizationStrategy(AIClientStrategy):
                     result = result.split("text:")[1].strip()
                 
                 self.logger.debug(f"Summarization (fallback extraction) length: {len(result)}")
-                return result
+                return AIResponse(result, metrics)
         except Exception as e:
             self.logger.error(f"Error in Google Gemini summarization: {str(e)}", exc_info=True)
             return f"Sorry, an error occurred while summarizing with Google Gemini: {str(e)}"
     
     async def _generate_openai_summary(self, context: list, system_prompt: str) -> str:
         """Generate summary using OpenAI's API."""
+        metrics = ResponseMetrics()
         try:
             messages = [{"role": "system", "content": system_prompt}] + context
             self.logger.debug(f"Sending {len(messages)} messages to OpenAI API for summarization.")
             
-            response = self.client.chat.completions.create(
-                model=SummarizationConfig.MODEL,
+            response = await self._call(
+                self.client.chat.completions.create,
+                SummarizationConfig.TIMEOUT,
+                estimate_tokens(context, system_prompt, SummarizationConfig.OPENAI_MAX_TOKENS),
+                metrics=metrics,
+                model=self.model,
                 messages=messages,
                 temperature=SummarizationConfig.OPENAI_TEMPERATURE,
                 max_tokens=SummarizationConfig.OPENAI_MAX_TOKENS
@@ -388,25 +1152,32 @@ class SummarizationStrategy(AIClientStrategy):
             self.logger.debug("Received summarization response from OpenAI API.")
             result = response.choices[0].message.content.strip()
             self.logger.debug(f"OpenAI summarization length: {len(result)}")
-            return result
+            return AIResponse(result, metrics)
         except Exception as e:
             self.logger.error(f"Error during OpenAI summarization: {str(e)}", exc_info=True)
             return f"Sorry, an error occurred while summarizing with OpenAI: {str(e)}"
     
     async def _generate_claude_summary(self, context: list, system_prompt: str) -> str:
         """Generate summary using Anthropic's Claude API."""
+        metrics = ResponseMetrics()
         try:
             # Build the user messages
             user_messages = context
             self.logger.debug(f"Sending {len(user_messages)} messages to Claude API for summarization.")
 
             # Call the Messages API with the correct arguments
-            response = self.client.messages.create(
-                model=SummarizationConfig.MODEL,
-                max_tokens=SummarizationConfig.CLAUDE_MAX_TOKENS,
-                temperature=SummarizationConfig.CLAUDE_TEMPERATURE,
-                system=system_prompt,
-                messages=user_messages
+            response = await self._call(
+                self.client.messages.create,
+                SummarizationConfig.TIMEOUT,
+                estimate_tokens(context, system_prompt, SummarizationConfig.CLAUDE_MAX_TOKENS),
+                metrics=metrics,
+                **claude_create_params(self.client, {
+                    'model': self.model,
+                    'max_tokens': SummarizationConfig.CLAUDE_MAX_TOKENS,
+                    'temperature': SummarizationConfig.CLAUDE_TEMPERATURE,
+                    'system': system_prompt,
+                    'messages': user_messages
+                })
             )
             
             self.logger.debug("Received summarization response from Claude API.")
@@ -417,10 +1188,10 @@ class SummarizationStrategy(AIClientStrategy):
                     # Concatenate all TextBlock objects into a single string
                     result = "".join(block.text if hasattr(block, "text") else str(block) for block in response.content).strip()
                     self.logger.debug(f"Claude summarization length (list): {len(result)}")
-                    return result
+                    return AIResponse(result, metrics)
                 result = response.content.strip()
                 self.logger.debug(f"Claude summarization length: {len(result)}")
-                return result
+                return AIResponse(result, metrics)
             else:
                 self.logger.error("Claude API summarization response does not contain 'content'.")
                 return "Sorry, the summary from Claude was malformed."
@@ -430,12 +1201,17 @@ class SummarizationStrategy(AIClientStrategy):
     
     async def _generate_grok_summary(self, context: list, system_prompt: str) -> str:
         """Generate summary using Grok API."""
+        metrics = ResponseMetrics()
         try:
             messages = [{"role": "system", "content": system_prompt}] + context
             self.logger.debug(f"Sending {len(messages)} messages to Grok API for summarization.")
             
-            response = self.client.chat.completions.create(
-                model=SummarizationConfig.MODEL,
+            response = await self._call(
+                self.client.chat.completions.create,
+                SummarizationConfig.TIMEOUT,
+                estimate_tokens(context, system_prompt, SummarizationConfig.GROK_MAX_TOKENS),
+                metrics=metrics,
+                model=self.model,
                 messages=messages,
                 temperature=SummarizationConfig.GROK_TEMPERATURE,
                 max_tokens=SummarizationConfig.GROK_MAX_TOKENS
@@ -444,7 +1220,7 @@ class SummarizationStrategy(AIClientStrategy):
             self.logger.debug("Received summarization response from Grok API.")
             result = response.choices[0].message.content.strip()
             self.logger.debug(f"Grok summarization length: {len(result)}")
-            return result
+            return AIResponse(result, metrics)
         except Exception as e:
             self.logger.error(f"Error during Grok summarization: {str(e)}", exc_info=True)
             return f"Sorry, an error occurred while summarizing with Grok: {str(e)}"
@@ -453,4 +1229,125 @@ class SummarizationStrategy(AIClientStrategy):
 class GoogleSummarizationStrategy(SummarizationStrategy):
     """Legacy class for backward compatibility with existing code."""
     def __init__(self, client, logger):
-        super().__init__(client, logger, provider='google')
\ No newline at end of file
+        super().__init__(client, logger, provider='google')
+
+async def hedged_response(strategies: list, context: list, system_prompt: str,
+                          hedge_after: Optional[float] = None) -> str:
+    """
+    Get a response from whichever of several strategies answers first without an error.
+    
+    The first strategy is called (unless its provider is unavailable, in which case it
+    is tried last); the remaining ones are ordered by their providers' recent latency.
+    The next strategy is started as soon as the current one fails, or when it has not
+    answered within hedge_after seconds, by default the configured latency percentile
+    of its provider. Calls still running when a response wins are cancelled.
+    
+    Args:
+        strategies (list): Strategies in order of preference
+        context (list): The conversation
+        system_prompt (str): The system prompt
+        hedge_after (float, optional): Seconds before hedging to the next strategy
+        
+    Returns:
+        str: The first successful response, or the last error message if all failed
+    """
+    def rank(strategy):
+        health = get_health(strategy.provider)
+        return (not _provider_ready(strategy.provider), health.latency_ewma if health.latency_ewma is not None else float('inf'))
+    
+    candidates = [strategy for strategy in strategies if strategy.client]
+    if not candidates:
+        return "Sorry, no AI provider is configured."
+    first, rest = candidates[0], sorted(candidates[1:], key=rank)
+    if not _provider_ready(first.provider):
+        rest.append(first)
+    else:
+        rest.insert(0, first)
+    candidates = rest
+    
+    pending = set()
+    last_error = None
+    next_index = 0
+    
+    def start_next() -> Optional[float]:
+        nonlocal next_index
+        strategy = candidates[next_index]
+        next_index += 1
+        pending.add(asyncio.create_task(strategy.generate_response(context, system_prompt)))
+        if hedge_after is not None:
+            return hedge_after
+        return get_health(strategy.provider).latency_percentile(AI_HEDGE_PERCENTILE) or AI_HEDGE_DEFAULT_DELAY
+    
+    wait = start_next()
+    try:
+        while pending:
+            timeout = wait if next_index < len(candidates) else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                logger.debug(f"Hedging request to {candidates[next_index].provider}")
+                wait = start_next()
+                continue
+            for task in done:
+                pending.discard(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    result = f"Sorry, an error occurred: {str(e)}"
+                if not is_error_response(result):
+                    return result
+                last_error = result
+            if next_index < len(candidates):
+                wait = start_next()
+    finally:
+        for task in pending:
+            task.cancel()
+    return last_error
+
+async def fan_out_responses(requests: dict, context: list,
+                            on_delta: Optional[Callable[[str, str], Awaitable[None]]] = None) -> AsyncIterator[Tuple[str, str, float]]:
+    """
+    Ask several strategies concurrently and yield each answer as it completes.
+    
+    A slow or failing provider delays only its own answer. Calls still running when
+    the caller stops iterating are cancelled.
+    
+    Args:
+        requests (dict): (strategy, system prompt) of each provider
+        context (list): The conversation, shared by every provider
+        on_delta (callable, optional): Coroutine function called with (provider, delta)
+            as text streams in; without it the answers are not streamed
+            
+    Yields:
+        Tuple[str, str, float]: Provider, its answer (or error message) and seconds it took;
+            answers are AIResponse objects carrying their metrics
+    """
+    started = time.monotonic()
+    
+    async def ask(provider: str, strategy, system_prompt: str) -> Tuple[str, str, float]:
+        try:
+            if on_delta is None:
+                result = await strategy.generate_response(context, system_prompt)
+            else:
+                parts = []
+                metrics = ResponseMetrics()
+                async for delta in strategy.stream_response(context, system_prompt, metrics):
+                    parts.append(delta)
+                    await on_delta(provider, delta)
+                result = AIResponse("".join(parts).strip(), metrics)
+        except Exception as e:
+            logger.error(f"Error in {provider} fan-out response: {e}", exc_info=True)
+            result = f"Sorry, an error occurred: {str(e)}"
+        return provider, result, time.monotonic() - started
+    
+    pending = {
+        asyncio.create_task(ask(provider, strategy, system_prompt))
+        for provider, (strategy, system_prompt) in requests.items()
+    }
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
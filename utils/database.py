@@ -60,6 +60,79 @@ def validate_timestamp(timestamp):
     logger.warning(f"Invalid timestamp format: {timestamp}")
     raise ValueError(f"Invalid timestamp format")
 
+MESSAGE_UPSERT_SQL = '''
+INSERT INTO messages (
+    message_id, channel_id, guild_id, author_id, author_name, 
+    content_encrypted, timestamp, attachments_encrypted, message_type, is_bot, 
+    metadata_encrypted
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(message_id) DO UPDATE SET
+    content_encrypted = excluded.content_encrypted,
+    attachments_encrypted = excluded.attachments_encrypted
+'''
+# Position of is_bot in a prepared message row
+MESSAGE_ROW_IS_BOT = 9
+
+LISTENER_COUNTERS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS listener_counters (
+    guild_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (guild_id, name)
+)
+'''
+
+def prepare_message_row(encryption_key: str, message_data: Dict[str, Any]) -> tuple:
+    """
+    Validate and encrypt message data into a row for MESSAGE_UPSERT_SQL.
+    
+    Args:
+        encryption_key (str): Key used to encrypt content and attachments
+        message_data (dict): Message data as passed to UnifiedDatabase.store_message
+        
+    Returns:
+        tuple: Parameters for MESSAGE_UPSERT_SQL
+        
+    Raises:
+        ValueError: If an ID or the timestamp is invalid
+    """
+    message_id = validate_id(message_data.get('message_id'))
+    channel_id = validate_id(message_data.get('channel_id'))
+    guild_id = validate_id(message_data.get('guild_id'))
+    author_id = validate_id(message_data.get('author_id'))
+    author_name = validate_string(message_data.get('author_name', 'Unknown'))
+    content = message_data.get('content', '')
+    timestamp = validate_timestamp(message_data.get('timestamp'))
+    message_type = validate_string(message_data.get('message_type', 'text'))
+    is_bot = bool(message_data.get('is_bot', False))
+    
+    # Encrypt the content before storing
+    content_encrypted = encrypt_data(encryption_key, content)
+    
+    # Encrypt attachments if any
+    attachments_encrypted = None
+    if message_data.get('attachments'):
+        if isinstance(message_data['attachments'], list):
+            attachments_json = json.dumps(message_data['attachments'])
+        else:
+            attachments_json = message_data['attachments']
+        attachments_encrypted = encrypt_data(encryption_key, attachments_json)
+    
+    return (
+        message_id,
+        channel_id,
+        guild_id,
+        author_id,
+        author_name,
+        content_encrypted,
+        timestamp,
+        attachments_encrypted,
+        message_type,
+        is_bot,
+        None  # metadata_encrypted
+    )
+
 # Add the missing get_db_path function
 def get_db_path(db_name: str) -> str:
     """
@@ -85,6 +158,53 @@ def get_db_path(db_name: str) -> str:
 # Store database connections per thread
 thread_local = threading.local()
 
+# Per-response metrics of AI interactions, added to the table after its first release
+AI_INTERACTION_METRIC_COLUMNS = {
+    'prompt_tokens': 'INTEGER',
+    'completion_tokens': 'INTEGER',
+    'cached_tokens': 'INTEGER',
+    'time_to_first_token': 'REAL'
+}
+
+def _percentile(ordered: List[float], percentile: float) -> Optional[float]:
+    """The given percentile of sorted values (nearest rank), or None without values."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(percentile / 100.0 * (len(ordered) - 1))))]
+
+def _latency_summary(rows) -> List[Dict[str, Any]]:
+    """
+    Aggregate AI interaction rows by day and model.
+    
+    Args:
+        rows: (date, model, execution_time, time_to_first_token, prompt_tokens,
+            completion_tokens, cached_tokens) tuples ordered by date and model
+            
+    Returns:
+        List[Dict[str, Any]]: Request count, p50/p95 latency and time to first token,
+            and token totals of each model on each day
+    """
+    groups: Dict[tuple, List[tuple]] = {}
+    for row in rows:
+        groups.setdefault((row[0], row[1]), []).append(tuple(row[2:]))
+    summary = []
+    for (date, model), values in groups.items():
+        latencies = sorted(value[0] for value in values if value[0] is not None)
+        first_tokens = sorted(value[1] for value in values if value[1] is not None)
+        summary.append({
+            "date": date,
+            "model": model,
+            "count": len(values),
+            "latency_p50": _percentile(latencies, 50),
+            "latency_p95": _percentile(latencies, 95),
+            "ttft_p50": _percentile(first_tokens, 50),
+            "ttft_p95": _percentile(first_tokens, 95),
+            "prompt_tokens": sum(value[2] or 0 for value in values),
+            "completion_tokens": sum(value[3] or 0 for value in values),
+            "cached_tokens": sum(value[4] or 0 for value in values)
+        })
+    return summary
+
 # Security improvement: Enhanced connection pool with better timeout handling
 class ConnectionPool:
     def __init__(self, db_path: str, max_connections: int = 5, timeout: int = 30):
@@ -213,19 +333,28 @@ class DatabaseQueue:
                 try:
                     logger.debug(f"DBWorker {threading.current_thread().name} executing operation.")
                     result = operation()
-                    if not future.done():
-                        future.set_result(result)
+                    # Futures belong to the event loop's thread; resolve them there so the loop wakes up
+                    future.get_loop().call_soon_threadsafe(self._resolve, future, result, None)
                     logger.debug(f"DBWorker {threading.current_thread().name} finished operation successfully.")
                 except Exception as e:
                     logger.error(f"DBWorker {threading.current_thread().name} encountered error during operation: {e}", exc_info=True)
-                    if not future.done():
-                        future.set_exception(e)
+                    future.get_loop().call_soon_threadsafe(self._resolve, future, None, e)
                 finally:
                     self.queue.task_done()
             except Exception as e:
                 logger.error(f"Error in database worker {threading.current_thread().name}: {e}", exc_info=True)
         logger.debug(f"DBWorker {threading.current_thread().name} stopping loop.")
     
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any, error: Optional[BaseException]):
+        """Complete a future on its event loop's thread."""
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
     async def execute(self, operation: Callable) -> Any:
         """
         Add an operation to the queue and wait for its result.
@@ -421,9 +550,15 @@ class UnifiedDatabase:
                 timestamp TEXT NOT NULL,
                 tokens_used INTEGER,
                 execution_time REAL,
-                metadata_encrypted TEXT
+                metadata_encrypted TEXT,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                cached_tokens INTEGER,
+                time_to_first_token REAL
             )
             ''')
+            # Columns added after the table was first created
+            self._add_missing_columns(cursor, 'ai_interactions', AI_INTERACTION_METRIC_COLUMNS)
             
             logger.debug("Creating table: files")
             cursor.execute('''
@@ -485,6 +620,9 @@ class UnifiedDatabase:
             )
             ''')
             
+            logger.debug("Creating table: listener_counters")
+            cursor.execute(LISTENER_COUNTERS_TABLE_SQL)
+            
             logger.debug("Creating indexes...")
             # Message indexes
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_author ON messages (author_id)')
@@ -521,6 +659,16 @@ class UnifiedDatabase:
             logger.error(f"Error creating tables: {e}", exc_info=True)
             raise
     
+    @staticmethod
+    def _add_missing_columns(cursor, table: str, columns: Dict[str, str]):
+        """Add columns (name to SQL type) that an existing table does not have yet."""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, sql_type in columns.items():
+            if name not in existing:
+                logger.info(f"Adding column {name} to table {table}")
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+    
     # Message-related methods
     async def store_message(self, message_data: Dict[str, Any]) -> bool:
         """
@@ -535,64 +683,23 @@ class UnifiedDatabase:
         try:
             conn = await self._get_connection()
             
-            # Security improvement: Input validation
+            # If the message is from a bot and we're not tracking bot messages, skip it
+            if message_data.get('is_bot', False) and not self.track_bot_messages:
+                await self._release_connection(conn)
+                return True
+            
+            # Security improvement: Input validation, then encrypt content and attachments
             try:
-                message_id = validate_id(message_data.get('message_id'))
-                channel_id = validate_id(message_data.get('channel_id'))
-                guild_id = validate_id(message_data.get('guild_id'))
-                author_id = validate_id(message_data.get('author_id'))
-                author_name = validate_string(message_data.get('author_name', 'Unknown'))
-                content = message_data.get('content', '')
-                timestamp = validate_timestamp(message_data.get('timestamp'))
-                message_type = validate_string(message_data.get('message_type', 'text'))
-                is_bot = bool(message_data.get('is_bot', False))
+                row = prepare_message_row(self.encryption_key, message_data)
             except ValueError as e:
                 logger.error(f"Invalid data in message: {e}")
                 await self._release_connection(conn)
                 return False
-            
-            # If the message is from a bot and we're not tracking bot messages, skip it
-            if is_bot and not self.track_bot_messages:
-                await self._release_connection(conn)
-                return True
                 
             cursor = conn.cursor()
             
-            # Encrypt the content before storing
-            content_encrypted = encrypt_data(self.encryption_key, content)
-            
-            # Encrypt attachments if any
-            attachments_encrypted = None
-            if 'attachments' in message_data and message_data['attachments']:
-                if isinstance(message_data['attachments'], list):
-                    attachments_json = json.dumps(message_data['attachments'])
-                else:
-                    attachments_json = message_data['attachments']
-                attachments_encrypted = encrypt_data(self.encryption_key, attachments_json)
-                
             # Security improvement: Comprehensive prepared statement
-            cursor.execute('''
-            INSERT INTO messages (
-                message_id, channel_id, guild_id, author_id, author_name, 
-                content_encrypted, timestamp, attachments_encrypted, message_type, is_bot, 
-                metadata_encrypted
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(message_id) DO UPDATE SET
-                content_encrypted = excluded.content_encrypted,
-                attachments_encrypted = excluded.attachments_encrypted
-            ''', (
-                message_id,
-                channel_id,
-                guild_id,
-                author_id,
-                author_name,
-                content_encrypted,
-                timestamp,
-                attachments_encrypted,
-                message_type,
-                is_bot,
-                None  # metadata_encrypted
-            ))
+            cursor.execute(MESSAGE_UPSERT_SQL, row)
             
             # Security improvement: Commit with proper error handling
             try:
@@ -615,6 +722,38 @@ class UnifiedDatabase:
             except Exception:
                 pass
             return False
+    
+    async def store_message_rows(self, rows: List[tuple]) -> int:
+        """
+        Write many prepared message rows in a single transaction.
+        
+        Rows come from prepare_message_row, so validation and encryption can happen
+        elsewhere (e.g. in a process pool) and only the inserts run on the DB queue.
+        Bot messages are dropped unless track_bot_messages is set, as in store_message.
+        
+        Args:
+            rows (List[tuple]): Rows produced by prepare_message_row
+            
+        Returns:
+            int: Number of rows written (0 if the transaction was rolled back)
+        """
+        if not self.track_bot_messages:
+            rows = [row for row in rows if not row[MESSAGE_ROW_IS_BOT]]
+        if not rows:
+            return 0
+        
+        def _store_message_rows_sync():
+            conn = self._connect()
+            try:
+                conn.executemany(MESSAGE_UPSERT_SQL, rows)
+                conn.commit()
+                return len(rows)
+            except sqlite3.Error as e:
+                logger.error(f"Error storing batch of {len(rows)} messages: {e}", exc_info=True)
+                conn.rollback()
+                return 0
+        
+        return await self.queue.execute(_store_message_rows_sync)
             
     async def store_message_files(self, message_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
@@ -824,6 +963,59 @@ class UnifiedDatabase:
                 pass
             return False
     
+    # Listener counter methods
+    async def get_listener_counters(self) -> List[tuple]:
+        """
+        Get all persisted message listener counters.
+        
+        Returns:
+            List[tuple]: (guild_id, name, value) rows
+        """
+        def _get_listener_counters_sync():
+            conn = self._connect()
+            conn.execute(LISTENER_COUNTERS_TABLE_SQL)
+            rows = conn.execute('SELECT guild_id, name, value FROM listener_counters').fetchall()
+            return [(row['guild_id'], row['name'], row['value']) for row in rows]
+        
+        return await self.queue.execute(_get_listener_counters_sync)
+    
+    async def add_listener_counters(self, rows: List[tuple]) -> int:
+        """
+        Add increments to message listener counters in a single transaction.
+        
+        Args:
+            rows (List[tuple]): (guild_id, name, delta) rows
+            
+        Returns:
+            int: Number of counters updated (0 if the transaction was rolled back)
+        """
+        if not rows:
+            return 0
+        
+        def _add_listener_counters_sync():
+            conn = self._connect()
+            updated_at = datetime.now().isoformat()
+            try:
+                conn.execute(LISTENER_COUNTERS_TABLE_SQL)
+                conn.executemany(
+                    '''
+                    INSERT INTO listener_counters (guild_id, name, value, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(guild_id, name) DO UPDATE SET
+                        value = value + excluded.value,
+                        updated_at = excluded.updated_at
+                    ''',
+                    [(guild_id, name, delta, updated_at) for guild_id, name, delta in rows]
+                )
+                conn.commit()
+                return len(rows)
+            except sqlite3.Error as e:
+                logger.error(f"Error updating {len(rows)} listener counters: {e}", exc_info=True)
+                conn.rollback()
+                return 0
+        
+        return await self.queue.execute(_add_listener_counters_sync)
+    
     async def store_channel(self, channel_data: Dict[str, Any]) -> bool:
         """
         Store or update a channel in the database.
@@ -884,14 +1076,15 @@ class UnifiedDatabase:
                     metadata_json = interaction_data['metadata'] if isinstance(interaction_data['metadata'], str) else json.dumps(interaction_data['metadata'])
                     metadata_encrypted = encrypt_data(self.encryption_key, metadata_json)
                 
-                conn = self._get_connection()
+                conn = self._connect()
                 cursor = conn.cursor()
                 cursor.execute('''
                 INSERT OR REPLACE INTO ai_interactions (
                     interaction_id, user_id, user_name, guild_id, channel_id, model,
                     prompt_encrypted, response_encrypted, timestamp,
-                    tokens_used, execution_time, metadata_encrypted
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    tokens_used, execution_time, metadata_encrypted,
+                    prompt_tokens, completion_tokens, cached_tokens, time_to_first_token
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
                     interaction_data['interaction_id'],
                     interaction_data['user_id'],
@@ -904,7 +1097,11 @@ class UnifiedDatabase:
                     interaction_data['timestamp'],
                     interaction_data.get('tokens_used'),
                     interaction_data.get('execution_time'),
-                    metadata_encrypted
+                    metadata_encrypted,
+                    interaction_data.get('prompt_tokens'),
+                    interaction_data.get('completion_tokens'),
+                    interaction_data.get('cached_tokens'),
+                    interaction_data.get('time_to_first_token')
                 ))
                 
                 conn.commit()
@@ -912,7 +1109,7 @@ class UnifiedDatabase:
                 return True
             except Exception as e:
                 logger.error(f"Error storing AI interaction: {e}", exc_info=True)
-                conn = self._get_connection()
+                conn = self._connect()
                 conn.rollback()
                 return False
                 
@@ -1813,10 +2010,11 @@ class UnifiedDatabase:
                 stats = {
                     "ai_models": [],
                     "ai_daily": [],
-                    "ai_users": []
+                    "ai_users": [],
+                    "ai_latency": []
                 }
                 
-                conn = self._get_connection()
+                conn = self._connect()
                 cursor = conn.cursor()
                 
                 # Check if the ai_interactions table exists
@@ -1896,6 +2094,17 @@ class UnifiedDatabase:
                 
                 stats["ai_users"] = [{"username": row[0], "count": row[1]} for row in cursor.fetchall()]
                 
+                # Latency percentiles and token totals per model per day (cached responses excluded)
+                query = f"""
+                    SELECT DATE(timestamp) as date, model, execution_time, time_to_first_token,
+                           prompt_tokens, completion_tokens, cached_tokens
+                    FROM ai_interactions
+                    WHERE DATE(timestamp) >= ? AND execution_time > 0 {"AND guild_id = ?" if guild_id else ""}
+                    ORDER BY date, model
+                """
+                cursor.execute(query, [days_ago] + params)
+                stats["ai_latency"] = _latency_summary(cursor.fetchall())
+                
                 return stats
             except Exception as e:
                 logger.error(f"Error getting AI stats: {e}", exc_info=True)
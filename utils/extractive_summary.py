@@ -0,0 +1,120 @@
+"""
+Local extractive summaries of AI responses.
+
+Sentences are ranked with TextRank: a sentence scores high when it shares
+words with many other high-scoring sentences. The best sentences that fit the
+length limit are then kept in their original order. This needs no model or
+network call, so a summary is ready in milliseconds.
+"""
+
+import math
+import re
+from typing import List
+
+# Sentences beyond this are not ranked (ranking is quadratic in the sentence count)
+MAX_SENTENCES = 200
+
+_CODE_BLOCK = re.compile(r'```.*?```', re.DOTALL)
+_LINE_MARKUP = re.compile(r'^\s*(?:#+|>|[-*+]|\d+[.)])\s+')
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=["\'(\[*_]?[A-Z0-9])')
+_WORD = re.compile(r"[a-z0-9][a-z0-9'-]*")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers herself him himself his how i if in into is it its itself just let me more most my myself
+no nor not now of off on once only or other our ours ourselves out over own same she should so some such
+than that the their theirs them themselves then there these they this those through to too under until up
+very was we were what when where which while who whom why will with would you your yours yourself
+""".split())
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split a response into sentences, skipping code blocks and list/heading markup.
+
+    Args:
+        text (str): The response
+
+    Returns:
+        List[str]: The sentences in order
+    """
+    sentences = []
+    for line in _CODE_BLOCK.sub(' ', text).splitlines():
+        line = _LINE_MARKUP.sub('', line).strip()
+        if not line:
+            continue
+        sentences.extend(sentence.strip() for sentence in _SENTENCE_END.split(line) if len(sentence.strip()) > 2)
+    return sentences
+
+def _content_words(sentence: str) -> set:
+    return {word for word in _WORD.findall(sentence.lower()) if word not in STOPWORDS and len(word) > 1}
+
+def rank_sentences(sentences: List[str], damping: float = 0.85, iterations: int = 30) -> List[float]:
+    """
+    Score sentences with TextRank over their content-word overlap.
+
+    Args:
+        sentences (List[str]): The sentences
+        damping (float): PageRank damping factor
+        iterations (int): Maximum power iterations
+
+    Returns:
+        List[float]: Score of each sentence
+    """
+    words = [_content_words(sentence) for sentence in sentences]
+    count = len(sentences)
+    weights = [[0.0] * count for _ in range(count)]
+    for i in range(count):
+        for j in range(i + 1, count):
+            overlap = len(words[i] & words[j])
+            if overlap:
+                weight = overlap / (math.log(1 + len(words[i])) + math.log(1 + len(words[j])))
+                weights[i][j] = weights[j][i] = weight
+    totals = [sum(row) for row in weights]
+
+    scores = [1.0] * count
+    for _ in range(iterations):
+        updated = [
+            (1 - damping) + damping * sum(
+                weights[j][i] / totals[j] * scores[j] for j in range(count) if weights[j][i]
+            )
+            for i in range(count)
+        ]
+        converged = max((abs(a - b) for a, b in zip(updated, scores)), default=0.0) < 1e-4
+        scores = updated
+        if converged:
+            break
+    return scores
+
+def extractive_summary(text: str, limit: int) -> str:
+    """
+    Summarize a response locally to at most limit characters.
+
+    Args:
+        text (str): The response
+        limit (int): Maximum length of the summary
+
+    Returns:
+        str: The highest-ranked sentences that fit, in their original order
+    """
+    text = text.strip()
+    if len(text) <= limit:
+        return text
+    sentences = split_sentences(text)[:MAX_SENTENCES]
+    if not sentences:
+        return text[:limit - 3] + "..."
+
+    scores = rank_sentences(sentences)
+    # Answers tend to lead with their point
+    scores[0] *= 1.5
+    chosen = []
+    length = 0
+    for index in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+        cost = len(sentences[index]) + (1 if chosen else 0)
+        if length + cost <= limit:
+            chosen.append(index)
+            length += cost
+    if not chosen:
+        best = sentences[max(range(len(sentences)), key=lambda i: scores[i])]
+        return best[:limit - 3] + "..."
+    return " ".join(sentences[index] for index in sorted(chosen))
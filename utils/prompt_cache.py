@@ -0,0 +1,124 @@
+"""
+Provider-side prompt caching.
+
+Providers can reuse the processed prefix of a prompt they have seen recently.
+OpenAI, Grok and Gemini do this automatically for long identical prefixes.
+Anthropic caches the prompt up to blocks marked with cache_control. The
+strategies lay out requests with the parts that change least first: the system
+prompt, then the conversation summary, then the turns, oldest first. Claude
+requests also carry cache breakpoints.
+
+This module marks those breakpoints. It also reads how many prompt tokens each
+response reports as served from the cache, and keeps per-provider totals.
+"""
+
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger('discord_bot')
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+def cache_breakpoint(message: dict) -> dict:
+    """
+    A copy of a Claude message whose content ends with a cache breakpoint.
+
+    Args:
+        message (dict): Message with string or block-list content
+
+    Returns:
+        dict: The message with its last content block marked for caching
+    """
+    content = message["content"]
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content}]
+    else:
+        blocks = [dict(block) for block in content]
+    if blocks:
+        blocks[-1]["cache_control"] = CACHE_CONTROL
+    return {**message, "content": blocks}
+
+def _count(value) -> Optional[int]:
+    return value if isinstance(value, int) else None
+
+def prompt_usage(item: Any) -> Optional[Tuple[int, int, int]]:
+    """
+    Prompt token usage reported by a provider response or stream chunk.
+
+    Args:
+        item: An OpenAI-compatible, Anthropic or Google GenAI response, stream chunk or event
+
+    Returns:
+        Tuple[int, int, int]: Prompt tokens, how many of them were read from the prompt
+            cache and how many were written to it; None if the item reports no usage
+    """
+    # Anthropic streams report usage on the message of their message_start event
+    message = getattr(item, 'message', None)
+    usage = getattr(message, 'usage', None) or getattr(item, 'usage', None)
+    if usage is not None:
+        read = _count(getattr(usage, 'cache_read_input_tokens', None))
+        written = _count(getattr(usage, 'cache_creation_input_tokens', None))
+        input_tokens = _count(getattr(usage, 'input_tokens', None))
+        if input_tokens is not None:
+            # Anthropic input_tokens exclude the tokens read from or written to the cache
+            return input_tokens + (read or 0) + (written or 0), read or 0, written or 0
+        prompt_tokens = _count(getattr(usage, 'prompt_tokens', None))
+        if prompt_tokens is not None:
+            details = getattr(usage, 'prompt_tokens_details', None)
+            return prompt_tokens, _count(getattr(details, 'cached_tokens', None)) or 0, 0
+    metadata = getattr(item, 'usage_metadata', None)
+    prompt_tokens = _count(getattr(metadata, 'prompt_token_count', None))
+    if prompt_tokens is not None:
+        return prompt_tokens, _count(getattr(metadata, 'cached_content_token_count', None)) or 0, 0
+    return None
+
+class PromptCacheStats:
+    """
+    Prompt tokens sent to one provider and how many of them its prompt cache served.
+    """
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name (str): Provider name
+        """
+        self.name = name
+
+        # Statistics
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.cache_write_tokens = 0
+
+    def record(self, prompt_tokens: int, cached_tokens: int, cache_write_tokens: int = 0):
+        """Record the prompt usage of one response."""
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        self.cache_write_tokens += cache_write_tokens
+        if cached_tokens:
+            logger.debug(f"{self.name} served {cached_tokens} of {prompt_tokens} prompt tokens from cache")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get prompt cache metrics."""
+        return {
+            'requests': self.requests,
+            'prompt_tokens': self.prompt_tokens,
+            'cached_tokens': self.cached_tokens,
+            'uncached_tokens': self.prompt_tokens - self.cached_tokens,
+            'cache_write_tokens': self.cache_write_tokens,
+            'hit_ratio': self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+        }
+
+_stats: Dict[str, PromptCacheStats] = {}
+
+def get_prompt_cache(provider: str) -> PromptCacheStats:
+    """Get the shared prompt cache metrics of a provider."""
+    stats = _stats.get(provider)
+    if stats is None:
+        stats = _stats[provider] = PromptCacheStats(provider)
+    return stats
+
+def get_prompt_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Prompt cache metrics of every provider used."""
+    return {name: stats.get_stats() for name, stats in _stats.items()}
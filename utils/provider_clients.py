@@ -0,0 +1,227 @@
+"""
+Shared HTTP connection pools for the AI provider clients.
+
+Each provider's SDK client sits on an httpx.AsyncClient owned by this registry.
+The registry sets its connection limits and keep-alive, and uses HTTP/2 when
+the h2 package is installed. Connections are opened before the first request
+(warm_up). A periodic ping keeps them from idling out. That way the first /ask
+after startup, or after a quiet period, does not pay for DNS, TCP and TLS setup.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from config.ai_config import (
+    AI_HTTP2, AI_HTTP_MAX_CONNECTIONS, AI_HTTP_MAX_KEEPALIVE, AI_HTTP_KEEPALIVE_EXPIRY,
+    AI_PREWARM, AI_WARMUP_INTERVAL
+)
+from utils.ai_services import (
+    GROK_BASE_URL, get_openai_client, get_google_genai_client, get_claude_client, get_grok_client,
+    close_ai_clients
+)
+
+logger = logging.getLogger('discord_bot')
+
+# Origin of each provider's API, pinged to open and refresh pooled connections
+PROVIDER_ORIGINS = {
+    'openai': 'https://api.openai.com/',
+    'google': 'https://generativelanguage.googleapis.com/',
+    'claude': 'https://api.anthropic.com/',
+    'grok': GROK_BASE_URL.rsplit('/v1', 1)[0] + '/',
+}
+
+def _sdk_http_client_class(provider: str) -> type:
+    """The AsyncClient class a provider's SDK expects (recent SDKs use the httpx2 fork of httpx)."""
+    try:
+        if provider in ('openai', 'grok'):
+            import openai
+            return openai.DefaultAsyncHttpxClient
+        if provider == 'claude':
+            import anthropic
+            return anthropic.DefaultAsyncHttpxClient
+    except (ImportError, AttributeError):
+        pass
+    # google-genai accepts httpx itself
+    return httpx.AsyncClient
+
+def _httpx_module(client_class: type):
+    """The httpx package (httpx or httpx2) an AsyncClient class comes from."""
+    for base in client_class.__mro__:
+        if base.__name__ == 'AsyncClient':
+            return sys.modules[base.__module__.split('.')[0]]
+    return httpx
+
+def http2_available() -> bool:
+    """Whether httpx can speak HTTP/2 (it needs the h2 package)."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class ProviderClients:
+    """
+    Provider SDK clients built once on shared, kept-alive connection pools.
+    """
+
+    def __init__(self, warmup_interval: float = AI_WARMUP_INTERVAL, transport: Optional[Callable[[Any], Any]] = None):
+        """
+        Args:
+            warmup_interval (float): Idle seconds after which a provider's connection is refreshed (0 disables)
+            transport (callable, optional): Builds the transport of a pool from its httpx module,
+                e.g. a mock transport
+        """
+        self.warmup_interval = warmup_interval
+        self.transport = transport
+        self.http_clients: Dict[str, Any] = {}
+        self.clients: Dict[str, Any] = {}
+        self.last_activity: Dict[str, float] = {}
+        # Origins of providers whose clients use another API URL
+        self.origins: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.warmups = 0
+        self.warmup_failures = 0
+        self.last_warmup_latency: Dict[str, float] = {}
+
+    def _http_client(self, provider: str):
+        async def record_activity(request):
+            self.last_activity[provider] = time.monotonic()
+
+        client_class = _sdk_http_client_class(provider)
+        module = _httpx_module(client_class)
+        client = client_class(
+            http2=AI_HTTP2 and self.transport is None and http2_available(),
+            limits=module.Limits(
+                max_connections=AI_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=AI_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=AI_HTTP_KEEPALIVE_EXPIRY
+            ),
+            # The SDKs pass their own per-request timeouts
+            timeout=module.Timeout(60.0, connect=10.0),
+            follow_redirects=True,
+            transport=self.transport(module) if self.transport else None,
+            event_hooks={'request': [record_activity]}
+        )
+        self.http_clients[provider] = client
+        return client
+
+    def create(self, openai_api_key: Optional[str], google_api_key: Optional[str],
+               claude_api_key: Optional[str], grok_api_key: Optional[str],
+               base_urls: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Build the SDK client of every provider with an API key.
+
+        Args:
+            base_urls (dict, optional): API URL to use instead of the provider's own, by
+                provider (e.g. a local stand-in server)
+
+        Returns:
+            Dict[str, Any]: Client of each provider (None for providers without a key)
+        """
+        factories = {
+            'openai': (get_openai_client, openai_api_key),
+            'google': (get_google_genai_client, google_api_key),
+            'claude': (get_claude_client, claude_api_key),
+            'grok': (get_grok_client, grok_api_key),
+        }
+        for provider, (factory, api_key) in factories.items():
+            base_url = (base_urls or {}).get(provider)
+            if base_url:
+                parts = urlsplit(base_url)
+                self.origins[provider] = f"{parts.scheme}://{parts.netloc}/"
+            client = None
+            if api_key:
+                client = factory(api_key, http_client=self._http_client(provider), base_url=base_url)
+            if client is None:
+                self.http_clients.pop(provider, None)
+            self.clients[provider] = client
+        logger.debug(f"Provider clients created on shared pools (HTTP/2: {AI_HTTP2 and http2_available()})")
+        return self.clients
+
+    def get(self, provider: str) -> Any:
+        """The SDK client of a provider, or None."""
+        return self.clients.get(provider)
+
+    async def warm_up(self, providers: Optional[list] = None) -> Dict[str, float]:
+        """
+        Open (or refresh) a pooled connection to each provider.
+
+        A HEAD request to the API origin sets up DNS, TCP and TLS without using any quota.
+        Its status code does not matter.
+
+        Args:
+            providers (list, optional): Providers to warm up (defaults to all with a client)
+
+        Returns:
+            Dict[str, float]: Seconds each successful warm-up took
+        """
+        providers = [p for p in (providers or list(self.http_clients)) if p in self.http_clients]
+        results = await asyncio.gather(*(self._ping(provider) for provider in providers), return_exceptions=True)
+        latencies = {}
+        for provider, result in zip(providers, results):
+            if isinstance(result, Exception):
+                self.warmup_failures += 1
+                logger.debug(f"Warm-up of {provider} connection failed: {result}")
+            else:
+                self.warmups += 1
+                latencies[provider] = self.last_warmup_latency[provider] = result
+        return latencies
+
+    async def _ping(self, provider: str) -> float:
+        started = time.monotonic()
+        await self.http_clients[provider].head(self.origins.get(provider) or PROVIDER_ORIGINS[provider])
+        return time.monotonic() - started
+
+    async def keep_warm(self) -> Dict[str, float]:
+        """Refresh the connections of providers that have been idle for the warm-up interval."""
+        now = time.monotonic()
+        idle = [
+            provider for provider in self.http_clients
+            if now - self.last_activity.get(provider, 0.0) >= self.warmup_interval
+        ]
+        return await self.warm_up(idle) if idle else {}
+
+    def start(self):
+        """Pre-connect (if enabled) and keep idle connections warm in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._warm_loop())
+
+    async def _warm_loop(self):
+        if AI_PREWARM:
+            latencies = await self.warm_up()
+            logger.info("Pre-connected to AI providers: " + ", ".join(f"{p} {s * 1000:.0f}ms" for p, s in latencies.items()))
+        if not self.warmup_interval:
+            return
+        while True:
+            await asyncio.sleep(self.warmup_interval / 2)
+            await self.keep_warm()
+
+    async def close(self):
+        """Stop warming and close the SDK clients and their connection pools."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await close_ai_clients(*self.clients.values())
+        for client in self.http_clients.values():
+            await client.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get warm-up metrics."""
+        return {
+            'providers': sorted(self.http_clients),
+            'warmups': self.warmups,
+            'warmup_failures': self.warmup_failures,
+            'last_warmup_latency': dict(self.last_warmup_latency)
+        }
@@ -0,0 +1,285 @@
+"""
+Admission control for AI provider calls.
+
+Every provider has a gateway. A call must be admitted before it is made. It is
+admitted only while the provider has a free concurrency slot and its
+requests-per-minute and tokens-per-minute buckets allow it. Otherwise the call
+waits in the gateway's queue instead of being sent and answered with a 429.
+
+Waiting calls are admitted by priority class first (interactive commands before
+summaries and other background work), then in arrival order. A call that is
+still queued at its deadline is turned away with ProviderBusy.
+
+When a provider answers with a 429, its gateway is paused for the Retry-After
+time. Queued and new calls wait out the pause within their deadline, instead of
+being sent into the rate limit or failing straight away.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, Dict, List, Optional
+
+from config.ai_config import (
+    OpenAIConfig, GoogleConfig, ClaudeConfig, GrokConfig,
+    AI_QUEUE_DEADLINE, AI_BACKGROUND_QUEUE_DEADLINE
+)
+
+logger = logging.getLogger('discord_bot')
+
+class Priority(IntEnum):
+    """Priority classes of queued provider calls (lower is admitted first)."""
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+class ProviderBusy(Exception):
+    """Raised when a call could not be admitted before its deadline."""
+
+def estimate_tokens(context: list, system_prompt: str = "", max_output_tokens: int = 0) -> int:
+    """
+    Rough token cost of a request for the tokens-per-minute budget.
+
+    Uses about four characters per token for the prompt. The full output allowance
+    is added, since providers count it against the limit when the request is admitted.
+    """
+    characters = len(system_prompt) + sum(len(str(message.get('content', ''))) for message in context)
+    return characters // 4 + 1 + max_output_tokens
+
+class TokenBucket:
+    """
+    Bucket refilled continuously at a per-minute rate (0 disables the limit).
+    """
+
+    __slots__ = ('per_minute', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+
+    def delay(self, amount: float, now: Optional[float] = None) -> float:
+        """Seconds until the amount can be taken."""
+        if not self.per_minute:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        # A request larger than the whole bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60.0 / self.per_minute
+
+    def take(self, amount: float, now: Optional[float] = None):
+        """Remove the amount from the bucket."""
+        if not self.per_minute:
+            return
+        self._refill(time.monotonic() if now is None else now)
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        """Return an overestimated amount."""
+        if self.per_minute and amount > 0:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+class _Waiter:
+    __slots__ = ('priority', 'sequence', 'tokens', 'future')
+
+    def __init__(self, priority: int, sequence: int, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.sequence = sequence
+        self.tokens = tokens
+        self.future = future
+
+    def __lt__(self, other: '_Waiter') -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+class Admission:
+    """A granted provider call; report actual token usage through settle()."""
+
+    __slots__ = ('gateway', 'tokens')
+
+    def __init__(self, gateway: 'ProviderGateway', tokens: int):
+        self.gateway = gateway
+        self.tokens = tokens
+
+    def settle(self, actual_tokens: int):
+        """Refund the part of the token estimate the call did not use."""
+        self.gateway.tpm.refund(self.tokens - actual_tokens)
+        self.tokens = actual_tokens
+
+class ProviderGateway:
+    """
+    Concurrency slots plus RPM/TPM buckets for one provider, with a priority queue in front.
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 0, rpm: int = 0, tpm: int = 0):
+        """
+        Args:
+            name (str): Provider name
+            max_concurrency (int): Calls allowed in flight at once (0 for no limit)
+            rpm (int): Requests per minute (0 for no limit)
+            tpm (int): Tokens per minute (0 for no limit)
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.rpm = TokenBucket(rpm)
+        self.tpm = TokenBucket(tpm)
+        self.active = 0
+        self.paused_until = 0.0
+        self.queue: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        # Statistics
+        self.admitted = 0
+        self.rejected = 0
+        self.pauses = 0
+        self.total_wait = 0.0
+
+    @asynccontextmanager
+    async def admit(self, priority: Priority = Priority.INTERACTIVE, tokens: int = 0,
+                    deadline: Optional[float] = None):
+        """
+        Wait for admission and hold a concurrency slot for the duration of the block.
+
+        Args:
+            priority (Priority): Priority class of the call
+            tokens (int): Estimated tokens of the call
+            deadline (float, optional): Seconds the call may wait in the queue
+                (defaults to the configured deadline of its priority class)
+
+        Yields:
+            Admission: The granted call
+
+        Raises:
+            ProviderBusy: If the call was not admitted before the deadline
+        """
+        if deadline is None:
+            deadline = AI_QUEUE_DEADLINE if priority == Priority.INTERACTIVE else AI_BACKGROUND_QUEUE_DEADLINE
+        await self._acquire(priority, tokens, deadline)
+        try:
+            yield Admission(self, tokens)
+        finally:
+            self.active -= 1
+            self._dispatch()
+
+    async def _acquire(self, priority: int, tokens: int, deadline: float):
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(priority, next(self._sequence), tokens, future)
+        heapq.heappush(self.queue, waiter)
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), deadline)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the deadline passed
+                pass
+            else:
+                future.cancel()
+                self._remove(waiter)
+                self.rejected += 1
+                raise ProviderBusy(f"{self.name} is busy; no capacity within {deadline:g} seconds") from None
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.active -= 1
+            else:
+                future.cancel()
+                self._remove(waiter)
+            self._dispatch()
+            raise
+        self.admitted += 1
+        self.total_wait += time.monotonic() - started
+
+    def pause(self, seconds: float):
+        """
+        Admit no calls for a number of seconds (e.g. a provider's Retry-After).
+
+        Args:
+            seconds (float): Seconds until calls may be admitted again
+        """
+        paused_until = time.monotonic() + seconds
+        if paused_until <= self.paused_until:
+            return
+        self.paused_until = paused_until
+        self.pauses += 1
+        logger.info(f"Pausing {self.name} calls for {seconds:.1f}s after a rate limit response")
+        try:
+            self._dispatch()
+        except RuntimeError:
+            # No running loop (the pause still applies to later admissions)
+            pass
+
+    def paused(self) -> bool:
+        """Whether admissions are paused."""
+        return time.monotonic() < self.paused_until
+
+    def _remove(self, waiter: _Waiter):
+        if waiter in self.queue:
+            self.queue.remove(waiter)
+            heapq.heapify(self.queue)
+
+    def _dispatch(self):
+        """Admit queued calls while slots and budgets allow, or wake up when they will."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self.queue:
+            if self.max_concurrency and self.active >= self.max_concurrency:
+                return
+            waiter = self.queue[0]
+            if waiter.future.done():
+                heapq.heappop(self.queue)
+                continue
+            now = time.monotonic()
+            delay = max(self.paused_until - now, self.rpm.delay(1, now), self.tpm.delay(waiter.tokens, now))
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self.queue)
+            self.rpm.take(1, now)
+            self.tpm.take(waiter.tokens, now)
+            self.active += 1
+            waiter.future.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get gateway metrics."""
+        return {
+            'active': self.active,
+            'queued': len(self.queue),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'pauses': self.pauses,
+            'average_wait': self.total_wait / self.admitted if self.admitted else 0.0
+        }
+
+_PROVIDER_LIMITS = {
+    'openai': (OpenAIConfig.MAX_CONCURRENCY, OpenAIConfig.RPM, OpenAIConfig.TPM),
+    'openai_images': (OpenAIConfig.IMAGE_MAX_CONCURRENCY, OpenAIConfig.IMAGE_RPM, 0),
+    'google': (GoogleConfig.MAX_CONCURRENCY, GoogleConfig.RPM, GoogleConfig.TPM),
+    'claude': (ClaudeConfig.MAX_CONCURRENCY, ClaudeConfig.RPM, ClaudeConfig.TPM),
+    'grok': (GrokConfig.MAX_CONCURRENCY, GrokConfig.RPM, GrokConfig.TPM),
+}
+
+_gateways: Dict[str, ProviderGateway] = {}
+
+def get_gateway(provider: str) -> ProviderGateway:
+    """Get the shared gateway of a provider, configured from config/ai_config.py."""
+    gateway = _gateways.get(provider)
+    if gateway is None:
+        max_concurrency, rpm, tpm = _PROVIDER_LIMITS.get(provider, (0, 0, 0))
+        gateway = _gateways[provider] = ProviderGateway(provider, max_concurrency, rpm, tpm)
+    return gateway
+
+def get_gateway_stats() -> Dict[str, Dict[str, Any]]:
+    """Metrics of every gateway in use."""
+    return {name: gateway.get_stats() for name, gateway in _gateways.items()}
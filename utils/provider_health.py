@@ -0,0 +1,221 @@
+"""
+Health tracking of AI providers.
+
+Every provider call reports its outcome here. From those reports each provider
+keeps an EWMA of its latency, an EWMA of its error rate, a window of recent
+latencies for percentiles, and a circuit breaker:
+
+- closed: calls go through
+- open: after repeated failures, calls fail fast for a cool-down period instead
+  of waiting out the provider timeout
+- half-open: after the cool-down a single probe call is let through; its outcome
+  closes the circuit again or reopens it for a longer period
+
+Rate limit responses do not count as failures. Callers pause the provider's
+gateway for the Retry-After time instead (see utils/provider_gateway.py), so
+calls made meanwhile wait rather than fail.
+"""
+
+import email.utils
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from config.ai_config import (
+    AI_CIRCUIT_FAILURE_THRESHOLD, AI_CIRCUIT_OPEN_SECONDS, AI_CIRCUIT_MAX_OPEN_SECONDS
+)
+
+logger = logging.getLogger('discord_bot')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class ProviderUnavailable(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status of an SDK error, if it has one."""
+    for attribute in ('status_code', 'status', 'code'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Seconds the provider asked us to wait, from the Retry-After headers of an SDK error."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        value = headers.get('retry-after-ms')
+        if value is not None:
+            return float(value) / 1000.0
+        value = headers.get('retry-after')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            retry_at = email.utils.parsedate_to_datetime(value)
+            return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an error is transient (rate limit, overload, timeout or connection failure)."""
+    if isinstance(error, TimeoutError):
+        return True
+    status = error_status(error)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return 'Connection' in type(error).__name__ or 'Timeout' in type(error).__name__
+
+class ProviderHealth:
+    """
+    Latency, error rate and circuit breaker state of one provider.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, open_seconds: float = 30.0,
+                 max_open_seconds: float = 300.0, alpha: float = 0.2, window: int = 100):
+        """
+        Args:
+            name (str): Provider name
+            failure_threshold (int): Consecutive failures that open the circuit
+            open_seconds (float): First cool-down of an opened circuit
+            max_open_seconds (float): Longest cool-down after repeated failed probes
+            alpha (float): EWMA smoothing factor
+            window (int): Recent latencies kept for percentiles
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.alpha = alpha
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.cooldown = open_seconds
+        self.probing = False
+
+        # Statistics
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.short_circuited = 0
+
+    def check(self):
+        """
+        Raise instead of letting a call through when the provider should not be called.
+
+        Raises:
+            ProviderUnavailable: If the circuit is open or a probe is already running
+        """
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self.opened_at < self.cooldown:
+                self.short_circuited += 1
+                raise ProviderUnavailable(f"{self.name} is temporarily unavailable after repeated errors")
+            self.state = HALF_OPEN
+            self.probing = False
+            logger.info(f"Circuit for {self.name} is half-open; sending a probe request")
+        if self.state == HALF_OPEN:
+            if self.probing:
+                self.short_circuited += 1
+                raise ProviderUnavailable(f"{self.name} is recovering from errors; please try again shortly")
+            self.probing = True
+
+    def release_probe(self):
+        """Give up a probe claimed by check() when the call ended without an outcome."""
+        if self.state == HALF_OPEN:
+            self.probing = False
+
+    def available(self) -> bool:
+        """Whether a call would currently be let through (without claiming a probe)."""
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= self.cooldown
+        return not (self.state == HALF_OPEN and self.probing)
+
+    def record_success(self, latency: float):
+        """Record a successful call and its latency in seconds."""
+        self.successes += 1
+        self.latencies.append(latency)
+        self.latency_ewma = latency if self.latency_ewma is None else \
+            self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+        self.error_rate = (1 - self.alpha) * self.error_rate
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            logger.info(f"Circuit for {self.name} closed")
+        self.state = CLOSED
+        self.probing = False
+        self.cooldown = self.open_seconds
+
+    def record_failure(self, error: BaseException):
+        """Record a failed call; transient failures count toward opening the circuit."""
+        if error_status(error) == 429:
+            self.rate_limited += 1
+            if self.state == HALF_OPEN:
+                self.probing = False
+            return
+        if not is_retryable(error):
+            # The request was bad, not the provider
+            if self.state == HALF_OPEN:
+                self.probing = False
+            return
+        self.failures += 1
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, self.max_open_seconds)
+            self._open()
+        elif self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probing = False
+        logger.warning(f"Circuit for {self.name} opened for {self.cooldown:.0f}s after {self.consecutive_failures} failures")
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """The given percentile of recent successful call latencies, or None without data."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(percentile / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get health metrics."""
+        return {
+            'state': self.state,
+            'latency_ewma': self.latency_ewma,
+            'latency_p95': self.latency_percentile(95),
+            'error_rate': self.error_rate,
+            'successes': self.successes,
+            'failures': self.failures,
+            'rate_limited': self.rate_limited,
+            'short_circuited': self.short_circuited
+        }
+
+_health: Dict[str, ProviderHealth] = {}
+
+def get_health(provider: str) -> ProviderHealth:
+    """Get the shared health tracker of a provider."""
+    health = _health.get(provider)
+    if health is None:
+        health = _health[provider] = ProviderHealth(
+            provider,
+            failure_threshold=AI_CIRCUIT_FAILURE_THRESHOLD,
+            open_seconds=AI_CIRCUIT_OPEN_SECONDS,
+            max_open_seconds=AI_CIRCUIT_MAX_OPEN_SECONDS
+        )
+    return health
+
+def get_health_stats() -> Dict[str, Dict[str, Any]]:
+    """Health metrics of every provider called so far."""
+    return {name: health.get_stats() for name, health in _health.items()}
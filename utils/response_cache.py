@@ -0,0 +1,209 @@
+"""
+Cache of AI provider responses.
+
+Entries are keyed on a hash of everything that determines a provider's answer:
+the provider, the model and its sampling parameters, the system prompt, and the
+whole conversation context. Two different conversations therefore never share
+an answer, even when they are the same length.
+
+The in-memory tier is an LRU bounded by entry count and by total size, and every
+entry expires after a TTL. An optional SQLite tier keeps entries across restarts.
+Lookups and writes to it run in a worker thread, and writes happen in the
+background so a reply is never held up by them.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger('discord_bot')
+
+def _normalize_text(text: Any) -> str:
+    return " ".join(str(text).split())
+
+def make_cache_key(provider: str, params: Dict[str, Any], system_prompt: str, context: List[Dict[str, Any]]) -> str:
+    """
+    Build the cache key for a provider request.
+
+    Whitespace differences in the prompts do not change the key.
+
+    Args:
+        provider (str): Provider name, e.g. 'openai'
+        params (dict): Model and sampling parameters of the request
+        system_prompt (str): The system prompt
+        context (list): The conversation as role/content messages
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    normalized = {
+        'provider': provider,
+        'params': params,
+        'system': _normalize_text(system_prompt),
+        'context': [
+            [str(message.get('role', '')).lower(), _normalize_text(message.get('content', ''))]
+            for message in context
+        ]
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """
+    LRU + TTL cache of provider responses, with an optional persistent SQLite tier.
+    """
+
+    def __init__(self, max_entries: int = 500, max_bytes: int = 8 * 1024 * 1024,
+                 ttl: float = 3600.0, db_path: Optional[str] = None):
+        """
+        Args:
+            max_entries (int): Entries kept in memory
+            max_bytes (int): Total size of the cached responses kept in memory
+            ttl (float): Seconds an entry stays valid
+            db_path (str, optional): SQLite file for the persistent tier (disabled when None)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.db_path = db_path
+        self.entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self.size = 0
+        self._writes: Set[asyncio.Task] = set()
+
+        # Statistics
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if self.db_path:
+            self._init_db()
+
+    def _init_db(self):
+        try:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS ai_response_cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                conn.execute("DELETE FROM ai_response_cache WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            logger.error(f"Disabling persistent AI response cache at {self.db_path}: {e}")
+            self.db_path = None
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): Key from make_cache_key
+
+        Returns:
+            Optional[str]: The cached response, or None
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            value, expires_at, _ = entry
+            if expires_at > time.time():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._remove(key)
+            self.expirations += 1
+        if self.db_path:
+            try:
+                row = await asyncio.to_thread(self._db_get, key)
+            except sqlite3.Error as e:
+                logger.warning(f"Error reading persistent AI response cache: {e}")
+                row = None
+            if row is not None:
+                value, expires_at = row
+                self._store(key, value, expires_at)
+                self.persistent_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: str):
+        """
+        Cache a response (and write it to the persistent tier in the background).
+
+        Args:
+            key (str): Key from make_cache_key
+            value (str): The response
+        """
+        expires_at = time.time() + self.ttl
+        self._store(key, value, expires_at)
+        if self.db_path:
+            try:
+                task = asyncio.get_running_loop().create_task(asyncio.to_thread(self._db_set, key, value, expires_at))
+            except RuntimeError:
+                self._db_set(key, value, expires_at)
+                return
+            self._writes.add(task)
+            task.add_done_callback(self._write_done)
+
+    def _write_done(self, task: asyncio.Task):
+        self._writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Error writing persistent AI response cache: {task.exception()}")
+
+    def _store(self, key: str, value: str, expires_at: float):
+        size = len(value.encode('utf-8')) + len(key)
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self.entries[key] = (value, expires_at, size)
+        self.size += size
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def _db_get(self, key: str) -> Optional[Tuple[str, float]]:
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM ai_response_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return row
+
+    def _db_set(self, key: str, value: str, expires_at: float):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+
+    async def close(self):
+        """Wait for pending writes to the persistent tier."""
+        if self._writes:
+            await asyncio.gather(*list(self._writes), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache metrics."""
+        lookups = self.hits + self.persistent_hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'persistent_hits': self.persistent_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.persistent_hits) / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'persistent': bool(self.db_path)
+        }
@@ -0,0 +1,82 @@
+"""
+Coalescing of identical concurrent requests.
+
+When the same work is requested again while a first request for it is still
+running, the later callers do not start their own; they wait for the first
+one's result. This keeps bursts of identical AI requests (a popular question,
+a double-submitted command) down to a single provider call.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger('discord_bot')
+
+class SingleFlight:
+    """
+    At most one in-flight call per key; concurrent callers with the same key share its result.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+
+        # Statistics
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run compute(), or wait for the call already in flight for the key.
+
+        Errors of the shared call are raised to every waiter. If the call is
+        cancelled (its caller went away), waiters fall back to running compute()
+        themselves.
+
+        Args:
+            key (Hashable): Identifies the work, e.g. a response cache key
+            compute (callable): Coroutine function doing the work
+
+        Returns:
+            Tuple[Any, bool]: The result, and whether it came from another caller's call
+        """
+        while True:
+            future = self.calls.get(key)
+            if future is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    # This waiter itself was cancelled
+                    raise
+                logger.debug("Shared request was cancelled; retrying it for a waiting caller")
+
+        future = asyncio.get_running_loop().create_future()
+        self.calls[key] = future
+        self.leaders += 1
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            if self.calls.get(key) is future:
+                del self.calls[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing metrics."""
+        return {
+            'in_flight': len(self.calls),
+            'leaders': self.leaders,
+            'coalesced': self.coalesced
+        }
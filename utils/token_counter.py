@@ -0,0 +1,80 @@
+"""
+Token counting for conversation context budgets.
+
+OpenAI and Grok text is counted exactly with tiktoken when it is installed.
+Other providers, and OpenAI without tiktoken, use a characters-per-token
+estimate for the provider. That is close enough to keep a prompt inside its
+budget, and it does not need a network round trip to a token counting API.
+
+Loading the tiktoken vocabulary blocks, so it is done once at startup in a
+worker thread (load_encoding). Counts are estimated until it has loaded.
+"""
+
+import asyncio
+import functools
+import logging
+import math
+from typing import Dict, Optional
+
+logger = logging.getLogger('discord_bot')
+
+# Average characters per token of English text for each provider's tokenizer
+CHARS_PER_TOKEN: Dict[str, float] = {
+    'openai': 4.0,
+    'grok': 4.0,
+    'google': 4.0,
+    'claude': 3.5,
+}
+
+# Tokens each message adds for its role and separators
+MESSAGE_OVERHEAD = 4
+
+# Set once load_encoding() has run; until then OpenAI and Grok counts are estimated too
+_encoding_loaded = False
+
+@functools.lru_cache(maxsize=None)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding('o200k_base')
+    except ImportError:
+        return None
+    except Exception as e:
+        # tiktoken downloads its vocabulary on first use, which fails offline
+        logger.warning(f"tiktoken unavailable, estimating token counts: {e}")
+        return None
+
+async def load_encoding() -> bool:
+    """
+    Load the tiktoken encoding in a worker thread, off the event loop.
+
+    Returns:
+        bool: Whether exact counts are available
+    """
+    global _encoding_loaded
+    encoding = await asyncio.to_thread(_encoding)
+    _encoding_loaded = True
+    return encoding is not None
+
+def count_tokens(text: str, provider: Optional[str] = None) -> int:
+    """
+    Count the tokens of a text for a provider.
+
+    Args:
+        text (str): The text
+        provider (str, optional): Provider name ('openai', 'google', 'claude', 'grok')
+
+    Returns:
+        int: Number of tokens
+    """
+    if not text:
+        return 0
+    if provider in ('openai', 'grok'):
+        encoding = _encoding() if _encoding_loaded else None
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN.get(provider, 4.0))
+
+def count_message_tokens(message: Dict[str, str], provider: Optional[str] = None) -> int:
+    """Count the tokens of a role/content message, including its per-message overhead."""
+    return count_tokens(str(message.get('content', '')), provider) + MESSAGE_OVERHEAD
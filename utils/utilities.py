@@ -98,6 +98,19 @@ def split_message(content: str, limit: int = 2000) -> list:
         return [content]
     return [content[i:i + limit] for i in range(0, len(content), limit)]
 
+def response_destination(interaction, response_channels: dict) -> str:
+    """
+    Where route_response will show a response.
+    
+    Returns:
+        str: 'channel' when the user gets a summary and the full response goes to the
+            guild's response channel, 'direct' when the full response is sent to the user
+    """
+    guild = interaction.guild
+    if guild and isinstance(response_channels, dict) and response_channels.get(guild.id):
+        return 'channel'
+    return 'direct'
+
 async def route_response(
     interaction: discord.Interaction,
     prompt: str,
@@ -106,7 +119,13 @@ async def route_response(
     response_channels: dict,
     logger: logging.Logger
 ):
-    """Route response to user and optionally to a dedicated channel"""
+    """
+    Route response to user and optionally to a dedicated channel.
+    
+    Returns:
+        Optional[discord.Message]: The message showing the summary to the user, if one was
+            sent and can be edited later
+    """
     try:
         # Add detailed logging
         logger.debug(f"Routing response with length: {len(result)}")
@@ -146,7 +165,11 @@ async def route_response(
 
         # If a summary exists, send the summary to the user
         logger.debug(f"Sending summary to user and full response to channel")
-        await interaction.followup.send(f"✉️: {prompt}\n📫: {summary}")
+        if isinstance(interaction, discord.Interaction):
+            summary_message = await interaction.followup.send(f"✉️: {prompt}\n📫: {summary}", wait=True)
+        else:
+            summary_message = None
+            await interaction.followup.send(f"✉️: {prompt}\n📫: {summary}")
 
         # Append a random emoji to the full response for the response channel
         emoji = get_random_emoji()
@@ -154,6 +177,52 @@ async def route_response(
         for chunk in chunks:
             await response_channel.send(chunk)
         logger.debug(f"Full response sent to channel {response_channel.name}")
+        return summary_message
     except Exception as e:
         logger.error(f"Error routing response: {str(e)}")
         await interaction.followup.send("An error occurred while routing your response.")
+
+async def route_streamed_response(
+    reply,
+    prompt: str,
+    result: str,
+    summary: Optional[str],
+    response_channels: dict,
+    logger: logging.Logger
+):
+    """
+    Finish routing a response that was already streamed to the user.
+    
+    Mirrors route_response: when a summary exists, the streamed reply collapses
+    to the summary and the full response goes to the guild's response channel.
+    
+    Args:
+        reply (StreamingReply): The reply the response was streamed into
+        prompt (str): The user's prompt
+        result (str): The complete response
+        summary (Optional[str]): Summary of the response, if it was too long
+        response_channels (dict): Response channel of each guild, by guild ID
+        logger (logging.Logger): Logger
+    
+    Returns:
+        Optional[StreamingReply]: The reply, if it now shows the summary
+    """
+    try:
+        guild = reply.interaction.guild
+        if not summary or not guild or not isinstance(response_channels, dict):
+            return
+        response_channel = response_channels.get(guild.id)
+        if not response_channel:
+            logger.error(f"No cached response channel found for guild '{guild.name}'.")
+            return
+
+        logger.debug("Replacing streamed reply with summary and sending full response to channel")
+        await reply.replace(summary)
+        emoji = get_random_emoji()
+        chunks = split_message(f"✉️: {prompt}\n📫: {result}\n\n{emoji}", limit=2000)
+        for chunk in chunks:
+            await response_channel.send(chunk)
+        logger.debug(f"Full response sent to channel {response_channel.name}")
+        return reply
+    except Exception as e:
+        logger.error(f"Error routing streamed response: {str(e)}")